@@ -7,11 +7,18 @@ __all__ = [
     'MAASClient',
     'MAASDispatcher',
     'MAASOAuth',
+    'MAASPooledDispatcher',
     ]
 
 import collections
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    wait,
+)
 import gzip
+import http.client
 from io import BytesIO
+import threading
 import urllib.error
 import urllib.parse
 import urllib.request
@@ -108,8 +115,7 @@ class MAASDispatcher:
         # Encode 'non-bytes' data into utf-8 bytes as required by urllib.
         if data is not None and not isinstance(data, bytes):
             data = bytes(data, 'utf-8')
-        req = RequestWithMethod(request_url, data, headers, method=method)
-        res = urllib.request.urlopen(req)
+        res = self._open(request_url, headers, method, data)
         # If we set the Accept-encoding header, then we decode the header for
         # the caller.
         is_gzip = (
@@ -124,6 +130,164 @@ class MAASDispatcher:
                 ungz, res.headers, res.url, res.code)
         return res
 
+    def _open(self, request_url, headers, method, data):
+        """Send the request and return the response.
+
+        :return: A file-like object that contains the response.
+        :raise urllib.error.URLError: If the request fails, or
+            `urllib.error.HTTPError` if the server returns an error.
+        """
+        req = RequestWithMethod(request_url, data, headers, method=method)
+        return urllib.request.urlopen(req)
+
+
+class MAASPooledDispatcher(MAASDispatcher):
+    """Connect to a MAAS server over persistent, pooled HTTP connections.
+
+    `MAASDispatcher` opens a new connection -- and, for HTTPS, negotiates TLS
+    afresh -- for every request. This instead keeps connections open between
+    requests and shares them between threads, opening at most `maxsize`
+    connections to each host at once. Callers wanting a connection while all
+    are in use wait for one to be released.
+
+    Each response is read in full before its connection is released, so the
+    response returned is backed by memory, not by the connection. Otherwise
+    it behaves as the response from `MAASDispatcher`, including raising
+    `urllib.error.HTTPError` for error responses and following redirects.
+    URLs for schemes other than HTTP and HTTPS are dispatched as usual.
+
+    :ivar maxsize: The maximum number of connections to each host.
+    """
+
+    # Errors that show that a connection was closed while it was idle.
+    stale_errors = (
+        http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+    # The same limit as urllib.request.HTTPRedirectHandler.
+    max_redirections = 10
+
+    def __init__(self, maxsize=4, timeout=None, context=None):
+        """Initialise the dispatcher.
+
+        :param maxsize: The maximum number of connections to each host.
+        :param timeout: Optional timeout, in seconds, for connection attempts
+            and for each read.
+        :param context: Optional `ssl.SSLContext` for HTTPS connections.
+        """
+        super(MAASPooledDispatcher, self).__init__()
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.context = context
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def _make_connection(self, scheme, netloc):
+        kwargs = {} if self.timeout is None else {"timeout": self.timeout}
+        if scheme == "https":
+            return http.client.HTTPSConnection(
+                netloc, context=self.context, **kwargs)
+        else:
+            return http.client.HTTPConnection(netloc, **kwargs)
+
+    def _acquire(self, scheme, netloc):
+        """Return a connection to `netloc`, and whether it has been used."""
+        with self._lock:
+            pool = self._pools.get((scheme, netloc))
+            if pool is None:
+                pool = threading.BoundedSemaphore(self.maxsize), []
+                self._pools[scheme, netloc] = pool
+        slots, idle = pool
+        slots.acquire()
+        with self._lock:
+            if len(idle) != 0:
+                return idle.pop(), True
+        try:
+            return self._make_connection(scheme, netloc), False
+        except BaseException:
+            slots.release()
+            raise
+
+    def _release(self, scheme, netloc, connection, reusable):
+        slots, idle = self._pools[scheme, netloc]
+        if reusable:
+            with self._lock:
+                idle.append(connection)
+        else:
+            connection.close()
+        slots.release()
+
+    def _request(self, request_url, headers, method, data):
+        """Send one request, retrying once per stale pooled connection.
+
+        :return: A tuple of the `http.client.HTTPResponse` and its body.
+        """
+        parts = urllib.parse.urlsplit(request_url)
+        selector = urllib.parse.urlunsplit(
+            ("", "", parts.path or "/", parts.query, ""))
+        while True:
+            connection, reused = self._acquire(parts.scheme, parts.netloc)
+            try:
+                connection.request(method, selector, data, headers)
+                response = connection.getresponse()
+                body = response.read()
+            except self.stale_errors as error:
+                self._release(parts.scheme, parts.netloc, connection, False)
+                if not reused:
+                    raise urllib.error.URLError(error)
+            except OSError as error:
+                self._release(parts.scheme, parts.netloc, connection, False)
+                raise urllib.error.URLError(error)
+            except BaseException:
+                self._release(parts.scheme, parts.netloc, connection, False)
+                raise
+            else:
+                self._release(
+                    parts.scheme, parts.netloc, connection,
+                    not response.will_close)
+                return response, body
+
+    def _open(self, request_url, headers, method, data):
+        scheme = urllib.parse.urlsplit(request_url).scheme
+        if scheme not in ("http", "https"):
+            return super(MAASPooledDispatcher, self)._open(
+                request_url, headers, method, data)
+        for _ in range(self.max_redirections + 1):
+            response, body = self._request(request_url, headers, method, data)
+            code, location = response.status, response.getheader("Location")
+            # Redirect as urllib.request.HTTPRedirectHandler does.
+            redirect = location is not None and (
+                code in (301, 302, 303, 307) and method in ("GET", "HEAD") or
+                code in (301, 302, 303) and method == "POST")
+            if not redirect:
+                break
+            request_url = urllib.parse.urljoin(request_url, location)
+            method, data = ("HEAD" if method == "HEAD" else "GET"), None
+            headers = {
+                key: value for key, value in headers.items()
+                if key.lower() not in ("content-length", "content-type")
+            }
+        if not 200 <= code < 300:
+            raise urllib.error.HTTPError(
+                request_url, code, response.reason, response.headers,
+                BytesIO(body))
+        return urllib.request.addinfourl(
+            BytesIO(body), response.headers, request_url, code)
+
+    def close(self):
+        """Close idle connections.
+
+        Connections in use are closed when they are released.
+        """
+        with self._lock:
+            idle = [
+                connection for _, connections in self._pools.values()
+                for connection in connections
+            ]
+            for _, connections in self._pools.values():
+                del connections[:]
+        for connection in idle:
+            connection.close()
+
 
 class MAASClient:
     """Base class for connecting to MAAS servers.
@@ -260,3 +424,36 @@ class MAASClient:
         # request will hang while trying to read a response (bug 1313556).
         return self.dispatcher.dispatch_query(
             url, method="DELETE", headers=headers, data=body)
+
+    def batch(self, requests, concurrency=4):
+        """Dispatch many requests concurrently.
+
+        Each request is signed and dispatched in a worker thread, so the
+        dispatcher must be thread-safe. Use a `MAASPooledDispatcher` with
+        `maxsize` of at least `concurrency` so that the workers reuse their
+        connections.
+
+        :param requests: An iterable of ``(method, path, params)`` tuples,
+            where `method` is one of "get", "post", "put", or "delete", and
+            `params` is a dict of keyword arguments for that method.
+        :param concurrency: The maximum number of requests in flight.
+        :return: A list of the results of the requests, in the same order.
+        :raise: The error of the first request to fail, in the same order,
+            once all requests have finished.
+        """
+        requests = list(requests)
+        for method, _, _ in requests:
+            if method not in ("get", "post", "put", "delete"):
+                raise ValueError("Unsupported method: %r" % (method,))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(self._dispatch_one, request)
+                for request in requests
+            ]
+            wait(futures)
+        # Every request has finished; none were cancelled.
+        return [future.result() for future in futures]
+
+    def _dispatch_one(self, request):
+        method, path, params = request
+        return getattr(self, method)(path, **params)
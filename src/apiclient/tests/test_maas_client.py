@@ -5,10 +5,14 @@
 
 __all__ = []
 
+from concurrent.futures import ThreadPoolExecutor
 import gzip
 from io import BytesIO
 import json
+import os
+import random
 from random import randint
+import threading
 from unittest.mock import ANY
 import urllib.error
 import urllib.parse
@@ -23,15 +27,20 @@ from apiclient.maas_client import (
     MAASClient,
     MAASDispatcher,
     MAASOAuth,
+    MAASPooledDispatcher,
 )
 from apiclient.testing.django import APIClientTestCase
 from maastesting.factory import factory
 from maastesting.fixtures import TempWDFixture
-from maastesting.httpd import HTTPServerFixture
+from maastesting.httpd import (
+    HTTPServerFixture,
+    SilentHTTPRequestHandler,
+)
 from maastesting.testcase import MAASTestCase
 from testtools.matchers import (
     AfterPreprocessing,
     Equals,
+    LessThan,
     MatchesListwise,
 )
 
@@ -140,6 +149,144 @@ class TestMAASDispatcher(MAASTestCase):
         self.assertEqual(content, read_content)
 
 
+class KeepAliveHTTPRequestHandler(SilentHTTPRequestHandler):
+    """Serve many requests on each connection, and count the connections."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super(KeepAliveHTTPRequestHandler, self).setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def send_header(self, keyword, value):
+        super(KeepAliveHTTPRequestHandler, self).send_header(keyword, value)
+        if keyword == "Location":
+            # Redirects have no body, but unless that is said the client
+            # waits for one on a connection that is kept alive.
+            super(KeepAliveHTTPRequestHandler, self).send_header(
+                "Content-Length", "0")
+
+
+class HangUpHTTPRequestHandler(KeepAliveHTTPRequestHandler):
+    """Close each connection after one request, without saying so first."""
+
+    def do_GET(self):
+        super(HangUpHTTPRequestHandler, self).do_GET()
+        self.close_connection = True
+
+
+class TestMAASPooledDispatcher(MAASTestCase):
+
+    def setUp(self):
+        super(TestMAASPooledDispatcher, self).setUp()
+        self.useFixture(TempWDFixture())
+
+    def make_server(self, handler=KeepAliveHTTPRequestHandler):
+        httpd = self.useFixture(HTTPServerFixture(handler=handler))
+        httpd.server.lock = threading.Lock()
+        httpd.server.connections = 0
+        return httpd
+
+    def make_dispatcher(self, maxsize=4):
+        dispatcher = MAASPooledDispatcher(maxsize=maxsize, timeout=5)
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def make_content(self):
+        name = factory.make_string()
+        content = factory.make_string(300).encode('ascii')
+        factory.make_file(location='.', name=name, contents=content)
+        return name, content
+
+    def test_reuses_connection(self):
+        httpd = self.make_server()
+        dispatcher = self.make_dispatcher()
+        name, content = self.make_content()
+        url = urljoin(httpd.url, name)
+        for _ in range(3):
+            response = dispatcher.dispatch_query(url, {})
+            self.assertEqual(200, response.code)
+            self.assertEqual(content, response.read())
+        self.assertEqual(1, httpd.server.connections)
+
+    def test_does_not_reuse_connection_closed_by_server(self):
+        # HTTPServerFixture speaks HTTP/1.0, so closes every connection.
+        httpd = self.useFixture(HTTPServerFixture())
+        dispatcher = self.make_dispatcher()
+        name, content = self.make_content()
+        url = urljoin(httpd.url, name)
+        for _ in range(2):
+            self.assertEqual(
+                content, dispatcher.dispatch_query(url, {}).read())
+
+    def test_reconnects_when_idle_connection_was_closed(self):
+        httpd = self.make_server(HangUpHTTPRequestHandler)
+        dispatcher = self.make_dispatcher()
+        name, content = self.make_content()
+        url = urljoin(httpd.url, name)
+        for _ in range(2):
+            self.assertEqual(
+                content, dispatcher.dispatch_query(url, {}).read())
+        self.assertEqual(2, httpd.server.connections)
+
+    def test_opens_no_more_than_maxsize_connections(self):
+        httpd = self.make_server()
+        dispatcher = self.make_dispatcher(maxsize=2)
+        name, content = self.make_content()
+        url = urljoin(httpd.url, name)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(
+                lambda _: dispatcher.dispatch_query(url, {}).read(),
+                range(32)))
+        self.assertEqual([content] * 32, responses)
+        self.assertThat(httpd.server.connections, LessThan(3))
+
+    def test_decodes_gzip(self):
+        httpd = self.make_server()
+        dispatcher = self.make_dispatcher()
+        name, content = self.make_content()
+        url = urljoin(httpd.url, name)
+        response = dispatcher.dispatch_query(
+            url, {'Accept-encoding': 'gzip'})
+        self.assertEqual('gzip', response.info().get('Content-Encoding'))
+        response = dispatcher.dispatch_query(url, {})
+        self.assertEqual(content, response.read())
+
+    def test_follows_redirects(self):
+        httpd = self.make_server()
+        dispatcher = self.make_dispatcher()
+        name = factory.make_name("dir")
+        os.mkdir(name)
+        response = dispatcher.dispatch_query(urljoin(httpd.url, name), {})
+        self.assertEqual(200, response.code)
+        self.assertEqual(urljoin(httpd.url, name + "/"), response.url)
+
+    def test_raises_HTTPError(self):
+        httpd = self.make_server()
+        dispatcher = self.make_dispatcher()
+        url = urljoin(httpd.url, factory.make_name("missing"))
+        error = self.assertRaises(
+            urllib.error.HTTPError, dispatcher.dispatch_query, url, {})
+        self.assertEqual(404, error.code)
+        self.assertEqual(url, error.url)
+
+    def test_raises_URLError_when_connection_fails(self):
+        # The server is bound to a port, but never set up to accept.
+        httpd = HTTPServerFixture()
+        url = httpd.url
+        httpd.server.server_close()
+        dispatcher = self.make_dispatcher()
+        self.assertRaises(
+            urllib.error.URLError, dispatcher.dispatch_query, url, {})
+
+    def test_dispatches_other_schemes_as_usual(self):
+        contents = factory.make_string().encode("ascii")
+        url = "file://%s" % self.make_file(contents=contents)
+        self.assertEqual(
+            contents, self.make_dispatcher().dispatch_query(url, {}).read())
+
+
 def make_path():
     """Create an arbitrary resource path."""
     return "/" + '/'.join(factory.make_string() for counter in range(2))
@@ -386,3 +533,44 @@ class TestMAASClient(APIClientTestCase):
         client = make_client()
         client.delete(make_path())
         self.assertIsNotNone(client.dispatcher.last_call['data'])
+
+    def test_batch_returns_results_in_order(self):
+        client = make_client()
+        self.patch(client, "get", lambda path, **params: ("get", path))
+        self.patch(client, "post", lambda path, **params: ("post", path))
+        requests = [
+            (random.choice(["get", "post"]), make_path(), {})
+            for _ in range(20)
+        ]
+        self.assertEqual(
+            [(method, path) for method, path, _ in requests],
+            client.batch(requests, concurrency=5))
+
+    def test_batch_passes_parameters(self):
+        client = make_client()
+        params = {factory.make_name("key"): factory.make_name("value")}
+        self.patch(client, "get", lambda path, **params: params)
+        self.assertEqual(
+            [params], client.batch([("get", make_path(), params)]))
+
+    def test_batch_raises_first_error_after_all_requests(self):
+        client = make_client()
+        paths = [make_path() for _ in range(5)]
+        dispatched = []
+
+        def get(path):
+            dispatched.append(path)
+            if path in paths[1:3]:
+                raise ValueError(path)
+            return path
+        self.patch(client, "get", get)
+        error = self.assertRaises(
+            ValueError, client.batch, [("get", path, {}) for path in paths])
+        self.assertEqual((paths[1],), error.args)
+        self.assertItemsEqual(paths, dispatched)
+
+    def test_batch_rejects_unknown_method(self):
+        client = make_client()
+        self.assertRaises(
+            ValueError, client.batch, [("patch", make_path(), {})])
+        self.assertIsNone(client.dispatcher.last_call)
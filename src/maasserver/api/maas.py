@@ -16,7 +16,10 @@ from maasserver.api.support import (
     operation,
     OperationsHandler,
 )
-from maasserver.api.utils import get_mandatory_param
+from maasserver.api.utils import (
+    get_mandatory_param,
+    get_optional_param,
+)
 from maasserver.enum import ENDPOINT
 from maasserver.exceptions import MAASAPIValidationError
 from maasserver.forms import UbuntuForm
@@ -29,7 +32,9 @@ from maasserver.models import (
     Config,
     PackageRepository,
 )
+from maasserver.utils.retrystats import retry_statistics
 from piston3.utils import rc
+from provisioningserver.utils.loadstats import load_statistics
 
 
 class MigratedConfigValue:
@@ -118,6 +123,61 @@ class MaasHandler(OperationsHandler):
     # about the available configuration items.
     get_config.__doc__ %= get_config_doc(indentation=8)
 
+    @admin_method
+    @operation(idempotent=True)
+    def get_retry_statistics(self, request):
+        """Get statistics about transactions that have been retried.
+
+        Statistics are kept separately by each region controller process, and
+        these are for the process that answers this request.
+
+        :param output_format: Either "json" (the default), or "prometheus"
+            for the Prometheus text exposition format.
+
+        Returns 400 if the output format is not recognised.
+        """
+        output_format = get_optional_param(
+            request.GET, 'output_format', 'json',
+            validators.OneOf(['json', 'prometheus']))
+        if output_format == 'prometheus':
+            return HttpResponse(
+                retry_statistics.render_prometheus(),
+                content_type='text/plain; version=0.0.4')
+        else:
+            return HttpResponse(
+                json.dumps(retry_statistics.get_statistics()),
+                content_type='application/json')
+
+    @admin_method
+    @operation(idempotent=True)
+    def get_load_statistics(self, request):
+        """Get statistics about how loaded the region controller is.
+
+        These are the lag of the reactor, the stacks of the reactor thread
+        when it was blocked, the number of tasks queued and running in each
+        thread-pool, how long they waited, the callables that have taken the
+        most time in thread-pools, and the backlog of database tasks.
+
+        Statistics are kept separately by each region controller process, and
+        these are for the process that answers this request.
+
+        :param output_format: Either "json" (the default), or "prometheus"
+            for the Prometheus text exposition format.
+
+        Returns 400 if the output format is not recognised.
+        """
+        output_format = get_optional_param(
+            request.GET, 'output_format', 'json',
+            validators.OneOf(['json', 'prometheus']))
+        if output_format == 'prometheus':
+            return HttpResponse(
+                load_statistics.render_prometheus(),
+                content_type='text/plain; version=0.0.4')
+        else:
+            return HttpResponse(
+                json.dumps(load_statistics.get_statistics()),
+                content_type='application/json')
+
     @classmethod
     def resource_uri(cls, *args, **kwargs):
         return ('maas_handler', [])
@@ -8,6 +8,9 @@ __all__ = [
     "get_storage_layout_params",
 ]
 
+from functools import partial
+import json
+from operator import itemgetter
 import re
 
 from django.conf import settings
@@ -83,6 +86,11 @@ from maasserver.node_constraint_filter_forms import (
     AcquireNodeForm,
     nodes_by_storage,
 )
+from maasserver.node_action import (
+    ACTIONS_DICT,
+    BulkNodeAction,
+    make_bulk_action_result,
+)
 from maasserver.node_status import NODE_TRANSITIONS
 from maasserver.preseed import get_curtin_merged_config
 from maasserver.storage_layouts import (
@@ -1015,6 +1023,18 @@ class MachineHandler(NodeHandler, OwnerDataMixin, PowerMixin):
         return machine
 
 
+def log_bulk_action_failure(action_name, result):
+    """Log `result` if the bulk action's post-commit tasks failed.
+
+    These run after the API response has been built, so cannot be reported
+    to the caller.
+    """
+    if result["success"] is False:
+        maaslog.error(
+            "%s: %s action failed: %s", result["system_id"],
+            action_name, result["error"])
+
+
 def create_machine(request):
     """Service an http request to create a machine.
 
@@ -1354,6 +1374,62 @@ class MachinesHandler(NodesHandler, PowersMixin):
                 % ', '.join(failed))
         return released_ids
 
+    @operation(idempotent=False)
+    def action(self, request):
+        """Perform a node action on multiple machines.
+
+        State changes are made in batches, and power operations for the
+        machines are dispatched concurrently once the changes are committed.
+        This returns without waiting for the power operations to complete;
+        machines for which they have been queued are reported as pending,
+        with a "success" of null, and their failures are logged.
+
+        :param action: The name of the action, e.g. "deploy" or "on".
+        :type action: unicode
+        :param machines: system_ids of the machines on which to act.
+        :param extra: Optional JSON-encoded object of parameters for the
+            action, e.g. '{"osystem": "ubuntu", "distro_series": "bionic"}'.
+        :type extra: unicode
+        :return: A list of results, one for each machine, with "system_id",
+            "success", and "error" keys.
+
+        Returns 400 if the action is not known or any of the machines cannot
+        be found.
+        Returns 403 if the user does not have permission to perform the action
+        on any of the machines.
+        """
+        action_name = get_mandatory_param(request.POST, 'action')
+        if action_name not in ACTIONS_DICT:
+            raise MAASAPIBadRequest("Unknown action: %s." % action_name)
+        try:
+            extra = json.loads(
+                get_optional_param(request.POST, 'extra', default='{}'))
+        except ValueError:
+            raise MAASAPIBadRequest("extra must be a JSON object.")
+        if not isinstance(extra, dict):
+            raise MAASAPIBadRequest("extra must be a JSON object.")
+        system_ids = set(request.POST.getlist('machines'))
+        # Check the existence of these nodes first.
+        self._check_system_ids_exist(system_ids)
+        # Make sure that the user has the required permission.
+        bulk = BulkNodeAction(
+            action_name, request.user, request, extra,
+            report=partial(log_bulk_action_failure, action_name))
+        permitted_ids = bulk.select(system_ids)
+        if len(permitted_ids) < len(system_ids):
+            raise PermissionDenied(
+                "You don't have the required permission to %s the "
+                "following machine(s): %s." % (
+                    action_name,
+                    ', '.join(sorted(system_ids.difference(permitted_ids)))))
+        results = bulk.apply(permitted_ids)
+        # Machines with post-commit work queued have no outcome yet.
+        reported = {result["system_id"] for result in results}
+        results.extend(
+            make_bulk_action_result(system_id, pending=True)
+            for system_id in permitted_ids if system_id not in reported)
+        return sorted(results, key=itemgetter("system_id"))
+
     @operation(idempotent=True)
     def list_allocated(self, request):
         """Fetch Machines that were allocated to the User/oauth token."""
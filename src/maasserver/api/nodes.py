@@ -16,6 +16,7 @@ import bson
 from django.db.models import Prefetch
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from formencode.validators import Int
 from maasserver.api.support import (
     admin_method,
     AnonymousOperationsHandler,
@@ -45,6 +46,7 @@ from maasserver.exceptions import (
 from maasserver.fields import MAC_RE
 from maasserver.forms import BulkNodeActionForm
 from maasserver.forms.ephemeral import TestForm
+from maasserver.json import MAASJSONEncoder
 from maasserver.models import (
     Filesystem,
     Interface,
@@ -63,6 +65,8 @@ from metadataserver.enum import (
     SCRIPT_STATUS_CHOICES,
 )
 from metadataserver.models.scriptset import get_status_from_qs
+from piston3.emitters import JSONEmitter
+from piston3.handler import typemapper
 from piston3.utils import rc
 from provisioningserver.drivers.power import UNKNOWN_POWER_TYPE
 
@@ -161,6 +165,88 @@ NODES_PREFETCH = [
     'nodemetadata_set',
 ]
 
+# The fields that need each relation in `NODES_PREFETCH`, keyed by the root
+# of the lookup. Relations that are not listed here are always prefetched.
+NODES_PREFETCH_FIELDS = {
+    'domain': ('domain', 'fqdn'),
+    'ownerdata_set': ('owner_data',),
+    'special_filesystems': ('special_filesystems',),
+    'gateway_link_ipv4': ('default_gateways',),
+    'gateway_link_ipv6': ('default_gateways',),
+    'blockdevice_set': (
+        'bcaches',
+        'blockdevice_set',
+        'boot_disk',
+        'cache_sets',
+        'constraints_by_type',
+        'iscsiblockdevice_set',
+        'physicalblockdevice_set',
+        'raids',
+        'storage',
+        'virtualblockdevice_set',
+        'volume_groups',
+    ),
+    'boot_interface': (
+        'boot_interface',
+        'default_gateways',
+        'interface_set',
+        'ip_addresses',
+    ),
+    'interface_set': (
+        'boot_interface',
+        'default_gateways',
+        'interface_set',
+        'ip_addresses',
+    ),
+    'tags': ('tag_names',),
+    'nodemetadata_set': ('hardware_info',),
+}
+
+# The number of nodes that are fetched, with their related objects, and
+# rendered at a time when listing a page of nodes.
+NODES_PAGE_BATCH_SIZE = 500
+
+
+def get_nodes_prefetch(fields):
+    """Return the lookups from `NODES_PREFETCH` needed to render `fields`.
+
+    :param fields: An iterable of field names.
+    """
+    fields = set(fields)
+    prefetch = []
+    for lookup in NODES_PREFETCH:
+        path = getattr(lookup, 'prefetch_through', lookup)
+        needed_by = NODES_PREFETCH_FIELDS.get(path.split('__', 1)[0])
+        if needed_by is None or not fields.isdisjoint(needed_by):
+            prefetch.append(lookup)
+    return prefetch
+
+
+def get_field_name(field):
+    """Return the name of a field as it appears in a handler's `fields`.
+
+    Nested fields are given as a (name, fields) tuple.
+    """
+    return field if isinstance(field, str) else field[0]
+
+
+class SelectedFieldsHandler:
+    """Stand-in for a handler that only emits some of its fields.
+
+    Piston takes the fields to emit for a model from the handler that the
+    typemapper associates with it. Subclassing the handler would register
+    the subclass globally, so this proxy is put into a copy of the
+    typemapper instead.
+    """
+
+    def __init__(self, handler, fields):
+        super(SelectedFieldsHandler, self).__init__()
+        self.handler = handler
+        self.fields = fields
+
+    def __getattr__(self, name):
+        return getattr(self.handler, name)
+
 
 def store_node_power_parameters(node, request):
     """Store power parameters in request.
@@ -576,9 +662,34 @@ class NodesHandler(OperationsHandler):
         :param agent_name: An optional agent name.  Only nodes relating to the
             nodes with matching agent names will be returned.
         :type agent_name: unicode
+
+        :param after_id: An optional system id. Only nodes listed after the
+            node with this system id will be returned. Use the system id of
+            the last node of the previous page to get the next page.
+        :type after_id: unicode
+
+        :param limit: An optional maximum number of nodes to return.
+        :type limit: int
+
+        :param fields: An optional field name. Only the named fields, and
+            the system id, will be returned for each node. This can be
+            specified multiple times to return several fields.
+        :type fields: unicode
+
+        The after_id, limit, and fields parameters are not supported when
+        listing all nodes, only when listing a single type of node.
         """
+        after_id = get_optional_param(request.GET, 'after_id')
+        limit = get_optional_param(request.GET, 'limit', None, Int(min=1))
+        fields = get_optional_list(request.GET, 'fields')
+        paged = (
+            after_id is not None or limit is not None or fields is not None)
 
         if self.base_model == Node:
+            if paged:
+                raise MAASAPIBadRequest(
+                    "after_id, limit, and fields can only be used when "
+                    "listing a single type of node.")
             # Avoid circular dependencies
             from maasserver.api.devices import DevicesHandler
             from maasserver.api.machines import MachinesHandler
@@ -598,6 +709,8 @@ class NodesHandler(OperationsHandler):
         else:
             nodes = filtered_nodes_list_from_request(request, self.base_model)
             nodes = nodes.select_related(*NODES_SELECT_RELATED)
+            if paged:
+                return self._read_page(nodes, after_id, limit, fields)
             nodes = prefetch_queryset(
                 nodes, NODES_PREFETCH).order_by('id')
             # Set related node parents so no extra queries are needed.
@@ -608,6 +721,78 @@ class NodesHandler(OperationsHandler):
                     block_device.node = node
             return nodes
 
+    def _read_page(self, nodes, after_id, limit, fields):
+        """Render a page of `nodes` as JSON.
+
+        Nodes are fetched and rendered `NODES_PAGE_BATCH_SIZE` at a time, so
+        only one batch of nodes and their related objects is held in memory.
+        Only the relations needed by the selected fields are prefetched.
+        """
+        [handler] = [
+            handler for handler, (model, anonymous) in typemapper.items()
+            if model is self.base_model and not anonymous
+        ]
+        selected = handler.fields
+        if fields is not None:
+            known = {get_field_name(field) for field in selected}
+            unknown = set(fields).difference(known)
+            if len(unknown) != 0:
+                raise MAASAPIValidationError(
+                    "Unknown field(s): %s" % ", ".join(sorted(unknown)))
+            selected = tuple(
+                field for field in selected
+                if get_field_name(field) in fields or
+                get_field_name(field) == 'system_id')
+        selected_names = {get_field_name(field) for field in selected}
+        prefetch = get_nodes_prefetch(selected_names)
+        prefetched = {
+            getattr(lookup, 'prefetch_through', lookup).split('__', 1)[0]
+            for lookup in prefetch
+        }
+
+        if after_id is not None:
+            after = Node.objects.filter(system_id=after_id).values_list(
+                'id', flat=True).first()
+            if after is None:
+                raise MAASAPIBadRequest("Unknown after_id: %s" % after_id)
+            nodes = nodes.filter(id__gt=after)
+
+        proxy = SelectedFieldsHandler(handler, selected)
+        page_typemapper = {
+            other: mapping for other, mapping in typemapper.items()
+            if mapping != typemapper[handler]
+        }
+        page_typemapper[proxy] = typemapper[handler]
+
+        chunks = []
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = NODES_PAGE_BATCH_SIZE
+            if remaining is not None:
+                size = min(size, remaining)
+                remaining -= size
+            batch = list(prefetch_queryset(
+                nodes, prefetch).order_by('id')[:size])
+            # Set related node parents so no extra queries are needed.
+            for node in batch:
+                if 'interface_set' in prefetched:
+                    for interface in node.interface_set.all():
+                        interface.node = node
+                if 'blockdevice_set' in prefetched:
+                    for block_device in node.blockdevice_set.all():
+                        block_device.node = node
+            emitter = JSONEmitter(batch, page_typemapper, proxy, (), False)
+            chunks.extend(
+                json.dumps(data, cls=MAASJSONEncoder)
+                for data in emitter.construct())
+            if len(batch) < size:
+                break
+            nodes = nodes.filter(id__gt=batch[-1].id)
+
+        return HttpResponse(
+            "[%s]" % ", ".join(chunks),
+            content_type="application/json; charset=utf-8")
+
     @operation(idempotent=True)
     def is_registered(self, request):
         """Returns whether or not the given MAC address is registered within
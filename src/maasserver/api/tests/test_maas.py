@@ -10,6 +10,7 @@ import json
 from operator import itemgetter
 
 from django.conf import settings
+from maasserver.api import maas as maas_module
 from maasserver.forms.settings import CONFIG_ITEMS_KEYS
 from maasserver.models import PackageRepository
 from maasserver.models.config import (
@@ -24,8 +25,10 @@ from maasserver.testing.osystems import (
     patch_usable_osystems,
 )
 from maasserver.utils.django_urls import reverse
+from maasserver.utils.retrystats import retry_statistics
 from maastesting.matchers import DocTestMatches
 from maastesting.testcase import MAASTestCase
+from provisioningserver.utils.loadstats import LoadStatistics
 from testtools.content import text_content
 from testtools.matchers import (
     AfterPreprocessing,
@@ -293,3 +296,90 @@ class MAASHandlerAPITest(APITestCase.ForUser):
             })
         self.assertEqual(http.client.OK, response.status_code)
         self.assertTrue(Config.objects.get_config("use_peer_proxy"))
+
+    def test_get_retry_statistics_requires_admin(self):
+        response = self.client.get(
+            reverse('maas_handler'), {"op": "get_retry_statistics"})
+        self.assertEqual(http.client.FORBIDDEN, response.status_code)
+
+    def test_get_retry_statistics_returns_json(self):
+        self.become_admin()
+        self.addCleanup(retry_statistics.reset)
+        name = factory.make_name("view")
+        retry_statistics.record_attempt(name, 1)
+        retry_statistics.record_retry(name, "deadlock", 0.5)
+        retry_statistics.record_attempt(name, 2)
+        response = self.client.get(
+            reverse('maas_handler'), {"op": "get_retry_statistics"})
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        statistics = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertEqual({
+            "calls": 1,
+            "attempts": 2,
+            "failures": 0,
+            "backoff_seconds": 0.5,
+            "retries": {"deadlock": 1},
+            "locks": {},
+        }, statistics[name])
+
+    def test_get_retry_statistics_returns_prometheus_text(self):
+        self.become_admin()
+        self.addCleanup(retry_statistics.reset)
+        name = factory.make_name("view")
+        retry_statistics.record_attempt(name, 1)
+        response = self.client.get(
+            reverse('maas_handler'), {
+                "op": "get_retry_statistics",
+                "output_format": "prometheus",
+            })
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        self.assertIn(
+            'maas_transaction_calls_total{name="%s"} 1' % name,
+            response.content.decode(settings.DEFAULT_CHARSET).splitlines())
+
+    def test_get_retry_statistics_rejects_unknown_output_format(self):
+        self.become_admin()
+        response = self.client.get(
+            reverse('maas_handler'), {
+                "op": "get_retry_statistics",
+                "output_format": factory.make_name("format"),
+            })
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+
+    def test_get_load_statistics_requires_admin(self):
+        response = self.client.get(
+            reverse('maas_handler'), {"op": "get_load_statistics"})
+        self.assertEqual(http.client.FORBIDDEN, response.status_code)
+
+    def test_get_load_statistics_returns_json(self):
+        self.become_admin()
+        statistics = LoadStatistics()
+        self.patch(maas_module, "load_statistics", statistics)
+        statistics.record_lag(0.25)
+        statistics.register_gauge("database_tasks_backlog", lambda: 3)
+        response = self.client.get(
+            reverse('maas_handler'), {"op": "get_load_statistics"})
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        parsed = json.loads(response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertEqual(0.25, parsed["reactor"]["max_lag_seconds"])
+        self.assertEqual({"database_tasks_backlog": 3}, parsed["gauges"])
+
+    def test_get_load_statistics_returns_prometheus_text(self):
+        self.become_admin()
+        statistics = LoadStatistics()
+        self.patch(maas_module, "load_statistics", statistics)
+        statistics.record_lag(0.25)
+        response = self.client.get(
+            reverse('maas_handler'), {
+                "op": "get_load_statistics",
+                "output_format": "prometheus",
+            })
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        self.assertIn(
+            'maas_reactor_lag_samples_total 1',
+            response.content.decode(settings.DEFAULT_CHARSET).splitlines())
@@ -11,11 +11,11 @@ import random
 
 from django.conf import settings
 from django.test import RequestFactory
-from maasserver import (
-    eventloop,
-    middleware,
+from maasserver import eventloop
+from maasserver.api import (
+    machines as machines_module,
+    nodes as nodes_module,
 )
-from maasserver.api import machines as machines_module
 from maasserver.enum import (
     INTERFACE_TYPE,
     NODE_STATUS,
@@ -59,7 +59,10 @@ from maasserver.utils import (
     osystems,
 )
 from maasserver.utils.django_urls import reverse
-from maasserver.utils.orm import reload_object
+from maasserver.utils.orm import (
+    post_commit_do,
+    reload_object,
+)
 from maastesting.djangotestcase import count_queries
 from maastesting.matchers import (
     MockCalledOnceWith,
@@ -312,11 +315,6 @@ class TestMachinesAPI(APITestCase.ForUser):
         self.assertIsNone(parsed_result[0]['pod'])
 
     def test_GET_machines_issues_constant_number_of_queries(self):
-        # Patch middleware so it does not affect query counting.
-        self.patch(
-            middleware.ExternalComponentsMiddleware,
-            '_check_rack_controller_connectivity')
-
         for _ in range(10):
             node = factory.make_Node_with_Interface_on_Subnet()
             factory.make_VirtualBlockDevice(node=node)
@@ -369,6 +367,93 @@ class TestMachinesAPI(APITestCase.ForUser):
             [machine.system_id for machine in machines],
             extract_system_ids(parsed_result))
 
+    def test_GET_with_limit_returns_first_machines(self):
+        machines = [factory.make_Node() for _ in range(3)]
+        response = self.client.get(reverse('machines_handler'), {
+            'limit': '2',
+        })
+        self.assertEqual(http.client.OK, response.status_code)
+        parsed_result = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertSequenceEqual(
+            [machine.system_id for machine in machines[:2]],
+            extract_system_ids(parsed_result))
+
+    def test_GET_with_after_id_returns_next_page(self):
+        machines = [factory.make_Node() for _ in range(5)]
+        response = self.client.get(reverse('machines_handler'), {
+            'after_id': machines[1].system_id,
+            'limit': '2',
+        })
+        self.assertEqual(http.client.OK, response.status_code)
+        parsed_result = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertSequenceEqual(
+            [machine.system_id for machine in machines[2:4]],
+            extract_system_ids(parsed_result))
+
+    def test_GET_pages_across_batches(self):
+        self.patch(nodes_module, "NODES_PAGE_BATCH_SIZE", 2)
+        machines = [factory.make_Node() for _ in range(5)]
+        response = self.client.get(reverse('machines_handler'), {
+            'after_id': machines[0].system_id,
+        })
+        self.assertEqual(http.client.OK, response.status_code)
+        parsed_result = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertSequenceEqual(
+            [machine.system_id for machine in machines[1:]],
+            extract_system_ids(parsed_result))
+
+    def test_GET_with_unknown_after_id_returns_bad_request(self):
+        response = self.client.get(reverse('machines_handler'), {
+            'after_id': factory.make_name('system_id'),
+        })
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+
+    def test_GET_with_invalid_limit_returns_bad_request(self):
+        response = self.client.get(reverse('machines_handler'), {
+            'limit': '0',
+        })
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+
+    def test_GET_with_fields_returns_only_those_fields(self):
+        machine = factory.make_Node_with_Interface_on_Subnet()
+        response = self.client.get(reverse('machines_handler'), {
+            'fields': ['hostname', 'interface_set'],
+        })
+        self.assertEqual(http.client.OK, response.status_code)
+        [parsed_machine] = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        # Piston adds the resource_uri of every object.
+        self.assertItemsEqual(
+            ['hostname', 'interface_set', 'system_id'],
+            set(parsed_machine).difference(['resource_uri']))
+        self.assertEqual(machine.hostname, parsed_machine['hostname'])
+        self.assertEqual(
+            [interface.name for interface in machine.interface_set.all()],
+            [interface['name'] for interface in parsed_machine[
+                'interface_set']])
+
+    def test_GET_with_unknown_fields_returns_bad_request(self):
+        factory.make_Node()
+        response = self.client.get(reverse('machines_handler'), {
+            'fields': ['hostname', 'unknown'],
+        })
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+
+    def test_GET_with_fields_skips_unneeded_prefetches(self):
+        for _ in range(3):
+            node = factory.make_Node_with_Interface_on_Subnet()
+            factory.make_VirtualBlockDevice(node=node)
+        num_queries_all, _ = count_queries(
+            self.client.get, reverse('machines_handler'), {'limit': '10'})
+        num_queries_few, response = count_queries(
+            self.client.get, reverse('machines_handler'),
+            {'limit': '10', 'fields': ['hostname']})
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertLess(num_queries_few, num_queries_all)
+
     def test_GET_with_id_returns_matching_machines(self):
         # The "read" operation takes optional "id" parameters.  Only
         # machines with matching ids will be returned.
@@ -1682,6 +1767,129 @@ class TestMachinesAPI(APITestCase.ForUser):
             (response.status_code,
              response.content.decode(settings.DEFAULT_CHARSET)))
 
+    def test_POST_action_performs_action_on_machines(self):
+        machines = [
+            factory.make_Node(status=NODE_STATUS.READY, owner=self.user)
+            for _ in range(3)
+        ]
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'action',
+                'action': 'mark-broken',
+                'machines': [machine.system_id for machine in machines],
+            })
+        self.assertEqual(http.client.OK, response.status_code)
+        results = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertItemsEqual([
+            {"system_id": machine.system_id, "success": True, "error": None}
+            for machine in machines
+        ], results)
+        self.assertEqual(
+            {NODE_STATUS.BROKEN},
+            {reload_object(machine).status for machine in machines})
+
+    def test_POST_action_reports_machines_with_power_operations_pending(
+            self):
+        powered = []
+
+        def _stop(machine, user=None, stop_mode='hard'):
+            return post_commit_do(powered.append, machine.system_id)
+
+        self.patch(Machine, "_stop", _stop)
+        machines = [
+            factory.make_Node(
+                status=NODE_STATUS.DEPLOYED, power_state=POWER_STATE.ON,
+                owner=self.user)
+            for _ in range(3)
+        ]
+        system_ids = sorted(machine.system_id for machine in machines)
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'action',
+                'action': 'off',
+                'machines': system_ids,
+            })
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual([
+            {"system_id": system_id, "success": None, "error": None}
+            for system_id in system_ids
+        ], json.loads(response.content.decode(settings.DEFAULT_CHARSET)))
+        self.assertItemsEqual(system_ids, powered)
+
+    def test_POST_action_logs_failed_power_operations(self):
+        exception = factory.make_exception("Power off failed.")
+
+        def power_off():
+            raise exception
+
+        def _stop(machine, user=None, stop_mode='hard'):
+            return post_commit_do(power_off)
+
+        self.patch(Machine, "_stop", _stop)
+        maaslog = self.patch(machines_module.maaslog, "error")
+        machine = factory.make_Node(
+            status=NODE_STATUS.DEPLOYED, power_state=POWER_STATE.ON,
+            owner=self.user)
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'action',
+                'action': 'off',
+                'machines': [machine.system_id],
+            })
+        self.assertEqual(http.client.OK, response.status_code)
+        # The failure happens after the response has been built.
+        self.assertEqual([
+            {"system_id": machine.system_id, "success": None, "error": None},
+        ], json.loads(response.content.decode(settings.DEFAULT_CHARSET)))
+        self.assertThat(maaslog, MockCalledOnceWith(
+            "%s: %s action failed: %s", machine.system_id, "off",
+            str(exception)))
+
+    def test_POST_action_reports_machines_not_actionable(self):
+        machine = factory.make_Node(
+            status=NODE_STATUS.BROKEN, owner=self.user)
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'action',
+                'action': 'mark-broken',
+                'machines': [machine.system_id],
+            })
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual([{
+            "system_id": machine.system_id, "success": False,
+            "error": "mark-broken action is not available for this node.",
+        }], json.loads(response.content.decode(settings.DEFAULT_CHARSET)))
+
+    def test_POST_action_rejects_unknown_action(self):
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'action',
+                'action': factory.make_name("action"),
+            })
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+
+    def test_POST_action_rejects_malformed_extra(self):
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'action',
+                'action': 'mark-broken',
+                'extra': '["not", "an", "object"]',
+            })
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+
+    def test_POST_action_forbidden_if_user_cannot_edit_machine(self):
+        machine = factory.make_Node(
+            status=NODE_STATUS.READY, owner=factory.make_User())
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'action',
+                'action': 'mark-broken',
+                'machines': [machine.system_id],
+            })
+        self.assertEqual(http.client.FORBIDDEN, response.status_code)
+        self.assertEqual(NODE_STATUS.READY, reload_object(machine).status)
+
     def test_POST_release_ignores_devices(self):
         device_ids = {
             factory.make_Device().system_id
@@ -334,6 +334,11 @@ class TestNodesAPI(APITestCase.ForUser):
             [node.system_id for node in nodes],
             extract_system_ids(parsed_result))
 
+    def test_GET_rejects_paging_across_node_types(self):
+        factory.make_Node()
+        response = self.client.get(reverse('nodes_handler'), {'limit': '1'})
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+
     def test_GET_with_id_returns_matching_nodes(self):
         # The "list" operation takes optional "id" parameters.  Only
         # nodes with matching ids will be returned.
@@ -14,7 +14,6 @@ from unittest.mock import (
 
 from apiclient.creds import convert_tuple_to_string
 from django.conf import settings
-from maasserver import middleware
 from maasserver.enum import NODE_STATUS
 from maasserver.models import Tag
 from maasserver.models.node import generate_node_system_id
@@ -158,11 +157,6 @@ class TestTagAPI(APITestCase.ForUser):
             [r['system_id'] for r in parsed_result])
 
     def test_GET_nodes_query_count(self):
-        # Patch middleware so it does not affect query counting.
-        self.patch(
-            middleware.ExternalComponentsMiddleware,
-            '_check_rack_controller_connectivity')
-
         tag = factory.make_Tag()
         for _ in range(3):
             machine = factory.make_Node_with_Interface_on_Subnet()
@@ -224,11 +218,6 @@ class TestTagAPI(APITestCase.ForUser):
             [r['system_id'] for r in parsed_result])
 
     def test_GET_machines_query_count(self):
-        # Patch middleware so it does not affect query counting.
-        self.patch(
-            middleware.ExternalComponentsMiddleware,
-            '_check_rack_controller_connectivity')
-
         tag = factory.make_Tag()
         for _ in range(3):
             machine = factory.make_Node_with_Interface_on_Subnet()
@@ -284,11 +273,6 @@ class TestTagAPI(APITestCase.ForUser):
             [r['system_id'] for r in parsed_result])
 
     def test_GET_devices_query_count(self):
-        # Patch middleware so it does not affect query counting.
-        self.patch(
-            middleware.ExternalComponentsMiddleware,
-            '_check_rack_controller_connectivity')
-
         tag = factory.make_Tag()
         for _ in range(3):
             device = factory.make_Device(owner=self.user)
@@ -342,10 +326,6 @@ class TestTagAPI(APITestCase.ForUser):
             [r['system_id'] for r in parsed_result])
 
     def test_GET_rack_controllers_query_count(self):
-        # Patch middleware so it does not affect query counting.
-        self.patch(
-            middleware.ExternalComponentsMiddleware,
-            '_check_rack_controller_connectivity')
         self.become_admin()
 
         tag = factory.make_Tag()
@@ -421,10 +401,6 @@ class TestTagAPI(APITestCase.ForUser):
             [r['system_id'] for r in parsed_result])
 
     def test_GET_region_controllers_query_count(self):
-        # Patch middleware so it does not affect query counting.
-        self.patch(
-            middleware.ExternalComponentsMiddleware,
-            '_check_rack_controller_connectivity')
         self.become_admin()
 
         tag = factory.make_Tag()
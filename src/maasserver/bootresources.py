@@ -45,6 +45,7 @@ from maasserver.components import (
     discard_persistent_error,
     register_persistent_error,
 )
+from maasserver.config import RegionConfiguration
 from maasserver.enum import (
     BOOT_RESOURCE_FILE_TYPE,
     BOOT_RESOURCE_FILE_TYPE_CHOICES,
@@ -84,6 +85,10 @@ from provisioningserver.import_images.download_descriptions import (
     image_passes_filter,
     validate_product,
 )
+from provisioningserver.import_images.download_scheduler import (
+    BandwidthLimiter,
+    ResumableUrlReader,
+)
 from provisioningserver.import_images.helpers import (
     get_os_from_product,
     get_signing_policy,
@@ -412,16 +417,17 @@ class BootResourceStore(ObjectStore):
     soon as possible.
     """
 
-    # Number of threads to run at the same time to write the contents of
-    # files from simplestreams into the database. Increasing this number
-    # might cause high network and database load.
-    write_threads = 2
-
     # Read at 10MiB per chunk.
     read_size = 1024 * 1024 * 10
 
     def __init__(self):
         """Initialize store."""
+        with RegionConfiguration.open() as config:
+            # Number of threads to run at the same time to write the contents
+            # of files from simplestreams into the database.
+            self.write_threads = config.image_download_concurrency
+            # Shared by all readers created for this store.
+            self.limiter = BandwidthLimiter(config.image_download_rate_limit)
         self.cache_current_resources()
         self._content_to_finalize = {}
         self._finalizing = False
@@ -1037,12 +1043,16 @@ class BootResourceRepoWriter(BasicMirrorWriter):
         the `BootResourceStore`.
     :ivar product_mapping: A `ProductMapping` describing the desired boot
         resources.
+    :ivar mirror: The URL of the upstream repo's mirror. When given, content
+        is read from it with a `ResumableUrlReader`, so that downloads resume
+        after transient failures and share the store's bandwidth limit.
     """
 
-    def __init__(self, store, product_mapping):
+    def __init__(self, store, product_mapping, mirror=None):
         assert isinstance(store, BootResourceStore)
         self.store = store
         self.product_mapping = product_mapping
+        self.mirror = mirror
         super(BootResourceRepoWriter, self).__init__(config={
             # Only download the latest version. Without this all versions
             # will be downloaded from simplestreams.
@@ -1095,6 +1105,11 @@ class BootResourceRepoWriter(BasicMirrorWriter):
             maaslog.warning('Ignoring unsupported product %s' % product_name)
             return
         else:
+            if self.mirror is not None:
+                contentsource = ResumableUrlReader(
+                    self.mirror.rstrip('/') + '/' + item['path'].lstrip('/'),
+                    limiter=self.store.limiter,
+                    user_agent=get_maas_user_agent())
             self.store.insert(item, contentsource)
 
 
@@ -1110,8 +1125,8 @@ def download_boot_resources(path, store, product_mapping,
     :param keyring_file: Optional path to a keyring file for verifying
         signatures.
     """
-    writer = BootResourceRepoWriter(store, product_mapping)
     (mirror, rpath) = sutil.path_from_mirror_url(path, None)
+    writer = BootResourceRepoWriter(store, product_mapping, mirror=mirror)
     policy = get_signing_policy(rpath, keyring_file)
     try:
         reader = UrlMirrorReader(
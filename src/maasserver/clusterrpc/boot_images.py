@@ -4,16 +4,20 @@
 """Obtain list of boot images from rack controllers."""
 
 __all__ = [
+    "RackBootImagesCache",
     "RackControllersImporter",
     "get_all_available_boot_images",
     "get_boot_images",
     "get_boot_images_for",
     "get_common_available_boot_images",
+    "get_image_sync_statuses",
     "is_import_boot_images_running",
 ]
 
 from collections import Sequence
 from functools import partial
+import threading
+import time
 from urllib.parse import (
     ParseResult,
     urlparse,
@@ -65,9 +69,103 @@ def suppress_failures(responses):
             yield response
 
 
+class RackBootImagesCache:
+    """A process-local cache of what rack controllers say about their images.
+
+    The images reported by each rack controller are cached against the time
+    that rack controller last finished importing images, its
+    `last_image_sync`, so they are fetched again once it imports anew. Rack
+    controllers that have never finished an import are never cached.
+
+    Whether any rack controller is importing images is cached for a short
+    time only, for callers that can accept a slightly stale answer.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        super(RackBootImagesCache, self).__init__()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._images = {}
+        self._running = None
+
+    def get_images(self, system_id, last_image_sync):
+        """Return the cached images for `system_id`, or `None`."""
+        if last_image_sync is None:
+            return None
+        with self._lock:
+            entry = self._images.get(system_id)
+        if entry is None or entry[0] != last_image_sync:
+            return None
+        else:
+            return entry[1]
+
+    def set_images(self, system_id, last_image_sync, images):
+        """Cache `images` reported by `system_id`.
+
+        :param images: A frozenset of images, each a frozenset of its items.
+        """
+        if last_image_sync is None:
+            return
+        with self._lock:
+            entry = self._images.get(system_id)
+            if entry is not None and entry[0] != last_image_sync:
+                # The rack has imported since it was last asked, so it may
+                # no longer be importing either.
+                self._running = None
+            self._images[system_id] = (last_image_sync, images)
+
+    def discard(self, system_id):
+        """Discard the images of `system_id`, e.g. when it reconnects."""
+        with self._lock:
+            self._images.pop(system_id, None)
+
+    def retain(self, system_ids):
+        """Discard the images of rack controllers not in `system_ids`."""
+        with self._lock:
+            for system_id in set(self._images).difference(system_ids):
+                del self._images[system_id]
+
+    def get_running(self, max_age):
+        """Return whether any rack was importing `max_age` seconds ago.
+
+        :return: `True` or `False`, or `None` if nothing is cached or the
+            cached answer is older than `max_age` seconds.
+        """
+        with self._lock:
+            entry = self._running
+        if entry is None or self.clock() - entry[0] > max_age:
+            return None
+        else:
+            return entry[1]
+
+    def set_running(self, running):
+        """Cache whether any rack controller is importing images."""
+        with self._lock:
+            self._running = (self.clock(), running)
+
+    def clear(self):
+        """Discard everything cached."""
+        with self._lock:
+            self._images.clear()
+            self._running = None
+
+
+# The cache for this process.
+rack_boot_images_cache = RackBootImagesCache()
+
+
 @synchronous
-def is_import_boot_images_running():
-    """Return True if any rack controller is currently import boot images."""
+def is_import_boot_images_running(max_age=None):
+    """Return True if any rack controller is currently import boot images.
+
+    :param max_age: If given, an answer obtained by this process up to this
+        many seconds ago may be returned instead of asking the racks again.
+    """
+    if max_age is not None:
+        running = rack_boot_images_cache.get_running(max_age)
+        if running is not None:
+            return running
+
     responses = async.gather(
         partial(client, IsImportBootImagesRunning)
         for client in getAllClients())
@@ -78,6 +176,7 @@ def is_import_boot_images_running():
     running = False
     for response in suppress_failures(responses):
         running = running or response["running"]
+    rack_boot_images_cache.set_running(running)
     return running
 
 
@@ -101,31 +200,90 @@ def get_boot_images(rack_controller):
         return call.wait(30).get("images")
 
 
-@synchronous
-def _get_available_boot_images():
-    """Obtain boot images available on connected rack controllers."""
+def _get_last_image_syncs(system_ids):
+    """Return a dict of `last_image_sync` for rack controllers."""
+    return dict(RackController.objects.filter(
+        system_id__in=system_ids).values_list(
+            "system_id", "last_image_sync"))
+
+
+def _images_to_set(images):
+    """Convert each image to a frozenset of its items."""
+    return frozenset(
+        frozenset(image.items())
+        for image in images
+    )
+
+
+def _list_boot_images(clients, timeout):
+    """Ask `clients` concurrently for their boot images.
+
+    Older rack controllers that do not know `ListBootImagesV2` are asked
+    again with `ListBootImages`, within what remains of `timeout`.
+
+    :return: A dict mapping the ident of each client that responded in time
+        to the list of images it reported.
+    """
+    deadline = time.monotonic() + timeout
+    results = {}
+
+    # Results are gathered in the order they arrive; each call is a partial
+    # of the client it was made with.
     listimages_v1 = lambda client: partial(client, ListBootImages)
     listimages_v2 = lambda client: partial(client, ListBootImagesV2)
-    clients_v2 = getAllClients()
-    responses_v2 = async.gather(map(listimages_v2, clients_v2))
+    responses_v2 = async.gatherCallResults(
+        map(listimages_v2, clients), timeout=timeout)
     clients_v1 = []
-    for i, response in enumerate(responses_v2):
+    for call, response in responses_v2:
         if (isinstance(response, Failure) and
                 response.check(UnhandledCommand) is not None):
-            clients_v1.append(clients_v2[i])
+            clients_v1.append(call.func)
         elif not isinstance(response, Failure):
-            # Convert each image to a frozenset of its items.
-            yield frozenset(
-                frozenset(image.items())
-                for image in response["images"]
-            )
-    responses_v1 = async.gather(map(listimages_v1, clients_v1))
-    for response in suppress_failures(responses_v1):
-        # Convert each image to a frozenset of its items.
-        yield frozenset(
-            frozenset(image.items())
-            for image in response["images"]
-        )
+            results[call.func.ident] = response["images"]
+    responses_v1 = async.gatherCallResults(
+        map(listimages_v1, clients_v1),
+        timeout=max(0, deadline - time.monotonic()))
+    for call, response in responses_v1:
+        if not isinstance(response, Failure):
+            results[call.func.ident] = response["images"]
+    return results
+
+
+def _get_boot_images_by_rack(clients, timeout=10.0):
+    """Obtain the boot images of the rack controllers behind `clients`.
+
+    Images are served from `rack_boot_images_cache` for rack controllers
+    that have not finished an import since they were last asked; the rest
+    are asked concurrently.
+
+    :return: A dict mapping the ident of each rack controller that responded
+        in time to a frozenset of its images, as from `_images_to_set`.
+    """
+    last_image_syncs = _get_last_image_syncs(
+        [client.ident for client in clients])
+    images_by_rack = {}
+    stale_clients = []
+    for client in clients:
+        images = rack_boot_images_cache.get_images(
+            client.ident, last_image_syncs.get(client.ident))
+        if images is None:
+            stale_clients.append(client)
+        else:
+            images_by_rack[client.ident] = images
+    responses = _list_boot_images(stale_clients, timeout)
+    for ident, images in responses.items():
+        images = images_by_rack[ident] = _images_to_set(images)
+        rack_boot_images_cache.set_images(
+            ident, last_image_syncs.get(ident), images)
+    return images_by_rack
+
+
+@synchronous
+def _get_available_boot_images():
+    """Obtain boot images available on connected rack controllers."""
+    clients = getAllClients()
+    rack_boot_images_cache.retain(client.ident for client in clients)
+    yield from _get_boot_images_by_rack(clients).values()
 
 
 @synchronous
@@ -152,6 +310,63 @@ def get_all_available_boot_images():
     return list(dict(image) for image in images)
 
 
+@synchronous
+def get_image_sync_statuses(system_ids, timeout=30):
+    """Obtain the image sync status of each of the given rack controllers.
+
+    Rack controllers are asked concurrently, and all share the one `timeout`
+    budget. Boot images are served from `rack_boot_images_cache` where
+    possible, so rack controllers that are in sync and have not imported
+    since they were last asked are not asked at all.
+
+    :param system_ids: The system IDs of rack controllers.
+    :param timeout: The number of seconds to wait for all responses.
+    :return: A dict mapping each system ID to its status, as returned by
+        `RackController.get_image_sync_status`. Rack controllers that are
+        not connected or do not respond in time are "unknown".
+    """
+    # Avoid circular imports.
+    from maasserver import bootresources
+    if bootresources.is_import_resources_running():
+        return dict.fromkeys(system_ids, "region-importing")
+
+    statuses = dict.fromkeys(system_ids, "unknown")
+    deadline = time.monotonic() + timeout
+    clients = [
+        client for client in getAllClients()
+        if client.ident in statuses
+    ]
+    images_by_rack = _get_boot_images_by_rack(clients, timeout)
+
+    # Rack controllers usually have the same images as each other, so only
+    # compare each distinct set of images with the region once.
+    in_sync = {}
+    out_of_sync_clients = []
+    for client in clients:
+        images = images_by_rack.get(client.ident)
+        if images is None:
+            continue
+        if images not in in_sync:
+            in_sync[images] = BootResource.objects.boot_images_are_in_sync(
+                [dict(image) for image in images])
+        if in_sync[images]:
+            statuses[client.ident] = "synced"
+        else:
+            out_of_sync_clients.append(client)
+
+    responses = async.gatherCallResults(
+        (partial(client, IsImportBootImagesRunning)
+         for client in out_of_sync_clients),
+        timeout=max(0, deadline - time.monotonic()))
+    for call, response in responses:
+        if not isinstance(response, Failure):
+            if response["running"]:
+                statuses[call.func.ident] = "syncing"
+            else:
+                statuses[call.func.ident] = "out-of-sync"
+    return statuses
+
+
 @synchronous
 def get_boot_images_for(
         rack_controller, osystem, architecture, subarchitecture, series):
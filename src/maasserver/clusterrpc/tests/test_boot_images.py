@@ -5,6 +5,7 @@
 
 __all__ = []
 
+from datetime import timedelta
 import os
 import random
 from unittest.mock import (
@@ -15,6 +16,7 @@ from unittest.mock import (
 )
 from urllib.parse import urlparse
 
+from maasserver import bootresources
 from maasserver.bootresources import get_simplestream_endpoint
 from maasserver.clusterrpc import boot_images as boot_images_module
 from maasserver.clusterrpc.boot_images import (
@@ -22,7 +24,9 @@ from maasserver.clusterrpc.boot_images import (
     get_boot_images,
     get_boot_images_for,
     get_common_available_boot_images,
+    get_image_sync_statuses,
     is_import_boot_images_running,
+    RackBootImagesCache,
     RackControllersImporter,
 )
 from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
@@ -44,16 +48,19 @@ from maasserver.testing.testcase import (
     MAASTransactionServerTestCase,
 )
 from maastesting.matchers import (
+    MockCalledOnce,
     MockCalledOnceWith,
     MockCallsMatch,
     MockNotCalled,
 )
+from maastesting.testcase import MAASTestCase
 from maastesting.twisted import TwistedLoggerFixture
 from provisioningserver.boot.tests import test_tftppath
 from provisioningserver.boot.tftppath import compose_image_path
 from provisioningserver.rpc import boot_images
 from provisioningserver.rpc.cluster import (
     ImportBootImages,
+    IsImportBootImagesRunning,
     ListBootImages,
     ListBootImagesV2,
 )
@@ -149,6 +156,89 @@ class TestIsImportBootImagesRunning(MAASTransactionServerTestCase):
 
         self.assertTrue(is_import_boot_images_running())
 
+    def test_returns_cached_answer_younger_than_max_age(self):
+        factory.make_RackController()
+        self.useFixture(RunningClusterRPCFixture())
+        self.patch(boot_images_module, "rack_boot_images_cache",
+                   RackBootImagesCache())
+
+        client, = getAllClients()
+        callRemote = self.patch(client._conn, "callRemote")
+        callRemote.return_value = succeed({'running': True})
+
+        self.assertTrue(is_import_boot_images_running(max_age=60))
+        self.assertTrue(is_import_boot_images_running(max_age=60))
+        self.assertThat(callRemote, MockCalledOnce())
+        # Without max_age the racks are always asked.
+        self.assertTrue(is_import_boot_images_running())
+        self.assertEqual(2, callRemote.call_count)
+
+
+class TestRackBootImagesCache(MAASTestCase):
+    """Tests for `RackBootImagesCache`."""
+
+    def test__get_images_returns_images_for_same_last_image_sync(self):
+        cache = RackBootImagesCache()
+        system_id = factory.make_name("system_id")
+        last_image_sync = factory.make_date()
+        cache.set_images(system_id, last_image_sync, sentinel.images)
+        self.assertIs(
+            sentinel.images, cache.get_images(system_id, last_image_sync))
+
+    def test__get_images_returns_None_for_other_last_image_sync(self):
+        cache = RackBootImagesCache()
+        system_id = factory.make_name("system_id")
+        last_image_sync = factory.make_date()
+        cache.set_images(system_id, last_image_sync, sentinel.images)
+        self.assertIsNone(cache.get_images(
+            system_id, last_image_sync + timedelta(minutes=1)))
+
+    def test__does_not_cache_racks_that_never_synced(self):
+        cache = RackBootImagesCache()
+        system_id = factory.make_name("system_id")
+        cache.set_images(system_id, None, sentinel.images)
+        self.assertIsNone(cache.get_images(system_id, None))
+
+    def test__retain_discards_other_racks(self):
+        cache = RackBootImagesCache()
+        last_image_sync = factory.make_date()
+        cache.set_images("keep", last_image_sync, sentinel.keep)
+        cache.set_images("discard", last_image_sync, sentinel.discard)
+        cache.retain(["keep"])
+        self.assertIs(sentinel.keep, cache.get_images("keep", last_image_sync))
+        self.assertIsNone(cache.get_images("discard", last_image_sync))
+
+    def test__discard_discards_rack(self):
+        cache = RackBootImagesCache()
+        last_image_sync = factory.make_date()
+        cache.set_images("keep", last_image_sync, sentinel.keep)
+        cache.set_images("discard", last_image_sync, sentinel.discard)
+        cache.discard("discard")
+        cache.discard("unknown")
+        self.assertIs(sentinel.keep, cache.get_images("keep", last_image_sync))
+        self.assertIsNone(cache.get_images("discard", last_image_sync))
+
+    def test__get_running_honours_max_age(self):
+        now = [100.0]
+        cache = RackBootImagesCache(clock=lambda: now[0])
+        self.assertIsNone(cache.get_running(10))
+        cache.set_running(True)
+        now[0] += 10
+        self.assertTrue(cache.get_running(10))
+        now[0] += 1
+        self.assertIsNone(cache.get_running(10))
+
+    def test__new_image_sync_discards_running(self):
+        cache = RackBootImagesCache()
+        system_id = factory.make_name("system_id")
+        last_image_sync = factory.make_date()
+        cache.set_images(system_id, last_image_sync, sentinel.images)
+        cache.set_running(True)
+        cache.set_images(
+            system_id, last_image_sync + timedelta(minutes=1),
+            sentinel.images)
+        self.assertIsNone(cache.get_running(60))
+
 
 def prepare_tftp_root(test):
     """Create a `current` directory and configure its use."""
@@ -334,6 +424,143 @@ class TestGetAvailableBootImages(MAASTransactionServerTestCase):
 
         self.assertItemsEqual([], self.get())
 
+    def test_caches_boot_images_until_rack_syncs_again(self):
+        rack = factory.make_RackController()
+        self.useFixture(RunningClusterRPCFixture())
+        self.patch(boot_images_module, "rack_boot_images_cache",
+                   RackBootImagesCache())
+
+        images = [make_rpc_boot_image() for _ in range(3)]
+        client, = getAllClients()
+        callRemote = self.patch(client._conn, "callRemote")
+        callRemote.return_value = succeed({'images': images})
+
+        self.assertItemsEqual(images, self.get())
+        self.assertItemsEqual(images, self.get())
+        self.assertThat(callRemote, MockCalledOnce())
+
+        rack.last_image_sync += timedelta(minutes=1)
+        rack.save()
+        self.assertItemsEqual(images, self.get())
+        self.assertEqual(2, callRemote.call_count)
+
+    def test_does_not_cache_boot_images_for_rack_never_synced(self):
+        factory.make_RackController(last_image_sync=None)
+        self.useFixture(RunningClusterRPCFixture())
+        self.patch(boot_images_module, "rack_boot_images_cache",
+                   RackBootImagesCache())
+
+        images = [make_rpc_boot_image() for _ in range(3)]
+        client, = getAllClients()
+        callRemote = self.patch(client._conn, "callRemote")
+        callRemote.return_value = succeed({'images': images})
+
+        self.assertItemsEqual(images, self.get())
+        self.assertItemsEqual(images, self.get())
+        self.assertEqual(2, callRemote.call_count)
+
+
+class TestGetImageSyncStatuses(MAASTransactionServerTestCase):
+    """Tests for `get_image_sync_statuses`."""
+
+    def setUp(self):
+        super(TestGetImageSyncStatuses, self).setUp()
+        self.patch(boot_images_module, "rack_boot_images_cache",
+                   RackBootImagesCache())
+        self.patch(bootresources, "is_import_resources_running")
+        bootresources.is_import_resources_running.return_value = False
+        self.in_sync = self.patch(
+            boot_images_module.BootResource.objects,
+            "boot_images_are_in_sync")
+
+    def patch_rack(self, client, images, running=False):
+        def callRemote(command, **kwargs):
+            if command is IsImportBootImagesRunning:
+                return succeed({'running': running})
+            else:
+                return succeed({'images': images})
+        return self.patch(client._conn, "callRemote", callRemote)
+
+    def test_returns_region_importing_when_region_imports(self):
+        rack = factory.make_RackController()
+        bootresources.is_import_resources_running.return_value = True
+        self.assertEqual(
+            {rack.system_id: "region-importing"},
+            get_image_sync_statuses([rack.system_id]))
+
+    def test_returns_unknown_for_disconnected_racks(self):
+        rack = factory.make_RackController()
+        self.assertEqual(
+            {rack.system_id: "unknown"},
+            get_image_sync_statuses([rack.system_id]))
+
+    def test_returns_status_of_each_rack(self):
+        rack_synced = factory.make_RackController()
+        rack_syncing = factory.make_RackController()
+        rack_out_of_sync = factory.make_RackController()
+        self.useFixture(RunningClusterRPCFixture())
+
+        images = [make_rpc_boot_image()]
+        clients = {client.ident: client for client in getAllClients()}
+        self.patch_rack(clients[rack_synced.system_id], images)
+        self.patch_rack(clients[rack_syncing.system_id], [], running=True)
+        self.patch_rack(clients[rack_out_of_sync.system_id], [])
+        self.in_sync.side_effect = lambda images: len(images) > 0
+
+        self.assertEqual({
+            rack_synced.system_id: "synced",
+            rack_syncing.system_id: "syncing",
+            rack_out_of_sync.system_id: "out-of-sync",
+        }, get_image_sync_statuses([
+            rack_synced.system_id,
+            rack_syncing.system_id,
+            rack_out_of_sync.system_id,
+        ]))
+
+    def test_returns_unknown_for_racks_that_fail(self):
+        rack = factory.make_RackController()
+        self.useFixture(RunningClusterRPCFixture())
+        client, = getAllClients()
+        callRemote = self.patch(client._conn, "callRemote")
+        callRemote.side_effect = ZeroDivisionError()
+        self.assertEqual(
+            {rack.system_id: "unknown"},
+            get_image_sync_statuses([rack.system_id]))
+
+    def test_asks_only_requested_racks(self):
+        rack = factory.make_RackController()
+        factory.make_RackController()
+        self.useFixture(RunningClusterRPCFixture())
+        for client in getAllClients():
+            self.patch(client._conn, "callRemote").return_value = (
+                succeed({'images': []}))
+        self.in_sync.return_value = True
+        get_image_sync_statuses([rack.system_id])
+        for client in getAllClients():
+            if client.ident == rack.system_id:
+                self.assertThat(client._conn.callRemote, MockCalledOnce())
+            else:
+                self.assertThat(client._conn.callRemote, MockNotCalled())
+
+    def test_does_not_ask_synced_rack_again_until_it_syncs_again(self):
+        rack = factory.make_RackController()
+        self.useFixture(RunningClusterRPCFixture())
+        client, = getAllClients()
+        callRemote = self.patch(client._conn, "callRemote")
+        callRemote.return_value = succeed({'images': []})
+        self.in_sync.return_value = True
+
+        get_image_sync_statuses([rack.system_id])
+        self.assertEqual(
+            {rack.system_id: "synced"},
+            get_image_sync_statuses([rack.system_id]))
+        self.assertThat(callRemote, MockCalledOnce())
+
+        rack.last_image_sync += timedelta(minutes=1)
+        rack.save()
+        get_image_sync_statuses([rack.system_id])
+        self.assertEqual(2, callRemote.call_count)
+
 
 class TestGetBootImagesFor(MAASTransactionServerTestCase):
     """Tests for `get_boot_images_for`."""
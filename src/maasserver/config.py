@@ -55,3 +55,22 @@ class RegionConfiguration(Configuration, metaclass=RegionConfigurationMeta):
         "database_conn_max_age",
         "The lifetime of a database connection, in seconds.",
         Int(if_missing=(5 * 60), accept_python=False, min=0))
+
+    # Boot image download options.
+    image_download_concurrency = ConfigurationOption(
+        "image_download_concurrency",
+        "The number of boot resources to download at once. Increasing this "
+        "might cause high network and database load.",
+        Int(if_missing=2, accept_python=False, min=1))
+    image_download_rate_limit = ConfigurationOption(
+        "image_download_rate_limit",
+        "The combined rate limit for boot resource downloads, in bytes per "
+        "second, or 0 for no limit.",
+        Int(if_missing=0, accept_python=False, min=0))
+
+    # Status message options.
+    status_flush_interval = ConfigurationOption(
+        "status_flush_interval",
+        "How often to write queued status messages from nodes, in seconds. "
+        "Messages that change a node's status are always written at once.",
+        Int(if_missing=60, accept_python=False, min=1))
@@ -6,6 +6,11 @@ Postgres Views
 
 Views are implemented in the database to better encapsulate complex queries,
 and are recreated during the `dbupgrade` process.
+
+Materialized views are tables populated from a view when they are created.
+They are kept up to date by triggers (see `maasserver.triggers.system`), and
+are dropped and recreated along with the views during the `dbupgrade`
+process.
 """
 
 __all__ = [
@@ -18,6 +23,7 @@ from contextlib import closing
 from textwrap import dedent
 
 from django.db import connection
+from maasserver.enum import NODE_STATUS
 from maasserver.utils.orm import transactional
 
 
@@ -28,6 +34,24 @@ def _drop_view_if_exists(view_name):
         cursor.execute(view_sql)
 
 
+def _drop_materialized_view_if_exists(view_name):
+    """Drops the specified materialized view.
+
+    Drops an ordinary view of the same name instead, if there is one.
+    """
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class "
+            "WHERE relname = %s AND pg_table_is_visible(oid);", [view_name])
+        row = cursor.fetchone()
+        if row is None:
+            pass  # Nothing to drop.
+        elif row[0] == "v":
+            cursor.execute("DROP VIEW %s;" % view_name)
+        else:
+            cursor.execute("DROP TABLE %s;" % view_name)
+
+
 def _register_view(view_name, view_sql):
     """Re-registers the specified view."""
     view_sql = dedent("""\
@@ -37,9 +61,21 @@ def _register_view(view_name, view_sql):
         cursor.execute(view_sql)
 
 
-# Note that the `Discovery` model object is backed by this view. Any
-# changes made to this view should be reflected there.
-maasserver_discovery = dedent("""\
+def _register_materialized_view(view_name, source_name, index_sqls):
+    """Recreates and populates the specified materialized view."""
+    _drop_materialized_view_if_exists(view_name)
+    with closing(connection.cursor()) as cursor:
+        cursor.execute("CREATE TABLE %s AS SELECT * FROM %s;" % (
+            view_name, source_name))
+        for index_sql in index_sqls:
+            cursor.execute(index_sql)
+
+
+# Note that the `Discovery` model object is backed by a table materialized
+# from this view; see `maasserver_discovery_indexes`. Any changes made to
+# this view should be reflected in the model, and in the triggers that
+# maintain that table, in `maasserver.triggers.system`.
+maasserver_discovery_source = dedent("""\
     SELECT
         DISTINCT ON (neigh.mac_address, neigh.ip)
         neigh.id AS id, -- Django needs a primary key for the object.
@@ -75,7 +111,15 @@ maasserver_discovery = dedent("""\
         END AS is_external_dhcp,
         subnet.id AS subnet_id,
         subnet.cidr AS subnet_cidr,
-        MASKLEN(subnet.cidr) AS subnet_prefixlen
+        MASKLEN(subnet.cidr) AS subnet_prefixlen,
+        EXISTS (
+            SELECT 1 FROM maasserver_interface known
+            WHERE known.mac_address = neigh.mac_address
+        ) AS is_known_mac,
+        EXISTS (
+            SELECT 1 FROM maasserver_staticipaddress known
+            WHERE known.ip = neigh.ip
+        ) AS is_known_ip
     FROM maasserver_neighbour neigh
     JOIN maasserver_interface iface ON neigh.interface_id = iface.id
     JOIN maasserver_node node ON node.id = iface.node_id
@@ -97,6 +141,59 @@ maasserver_discovery = dedent("""\
         subnet_prefixlen DESC -- We want the best-match CIDR.
     """)
 
+# Indexes for the `maasserver_discovery` table. The partial indexes serve the
+# `by_unknown_*` queries, most recently seen first.
+maasserver_discovery_indexes = (
+    "CREATE UNIQUE INDEX maasserver_discovery__mac_address_ip"
+    "    ON maasserver_discovery (mac_address, ip);",
+    "CREATE UNIQUE INDEX maasserver_discovery__id"
+    "    ON maasserver_discovery (id);",
+    "CREATE INDEX maasserver_discovery__discovery_id"
+    "    ON maasserver_discovery (discovery_id);",
+    "CREATE INDEX maasserver_discovery__ip"
+    "    ON maasserver_discovery (ip);",
+    "CREATE INDEX maasserver_discovery__observer_id"
+    "    ON maasserver_discovery (observer_id);",
+    "CREATE INDEX maasserver_discovery__vlan_id"
+    "    ON maasserver_discovery (vlan_id);",
+    "CREATE INDEX maasserver_discovery__subnet_id"
+    "    ON maasserver_discovery (subnet_id);",
+    "CREATE INDEX maasserver_discovery__last_seen"
+    "    ON maasserver_discovery (last_seen);",
+    "CREATE INDEX maasserver_discovery__unknown_mac"
+    "    ON maasserver_discovery (last_seen)"
+    "    WHERE NOT is_known_mac;",
+    "CREATE INDEX maasserver_discovery__unknown_ip"
+    "    ON maasserver_discovery (last_seen)"
+    "    WHERE NOT is_known_ip;",
+    "CREATE INDEX maasserver_discovery__unknown_ip_and_mac"
+    "    ON maasserver_discovery (last_seen)"
+    "    WHERE NOT is_known_mac AND NOT is_known_ip;",
+)
+
+# The number of deployed and deploying nodes for each operating system, series,
+# and architecture, for the images page. The table materialized from this view
+# is kept up to date by the `sys_deployednodecount_*` triggers, in
+# `maasserver.triggers.system`. Any changes made to this view should be
+# reflected there.
+maasserver_deployednodecount_source = dedent("""\
+    SELECT
+        COALESCE(node.osystem, '') AS osystem,
+        COALESCE(node.distro_series, '') AS distro_series,
+        COALESCE(node.architecture, '') AS architecture,
+        COUNT(*) AS count
+    FROM maasserver_node node
+    WHERE node.status IN (%d, %d)
+    GROUP BY 1, 2, 3
+    """ % (NODE_STATUS.DEPLOYED, NODE_STATUS.DEPLOYING))
+
+# Indexes for the `maasserver_deployednodecount` table.
+maasserver_deployednodecount_indexes = (
+    "CREATE UNIQUE INDEX maasserver_deployednodecount__key"
+    "    ON maasserver_deployednodecount"
+    "    (osystem, distro_series, architecture);",
+)
+
 # Pairs of IP addresses that can route between nodes. In MAAS all addresses in
 # a "space" are mutually routable, so this essentially means finding pairs of
 # IP addresses that are in subnets with the same space ID. Typically this view
@@ -317,7 +414,9 @@ maas_support__ssh_keys__by_user = dedent("""\
 
 # Dictionary of view_name: view_sql tuples which describe the database views.
 _ALL_VIEWS = {
-    "maasserver_discovery": maasserver_discovery,
+    "maasserver_discovery_source": maasserver_discovery_source,
+    "maasserver_deployednodecount_source":
+        maasserver_deployednodecount_source,
     "maasserver_routable_pairs": maasserver_routable_pairs,
     "maas_support__node_overview": maas_support__node_overview,
     "maas_support__device_overview": maas_support__device_overview,
@@ -333,12 +432,25 @@ _ALL_VIEWS = {
     "maas_support__ssh_keys__by_user": maas_support__ssh_keys__by_user,
 }
 
+# Dictionary of view_name: (source_view_name, index_sqls) tuples which
+# describe the materialized views.
+_ALL_MATERIALIZED_VIEWS = {
+    "maasserver_discovery": (
+        "maasserver_discovery_source", maasserver_discovery_indexes),
+    "maasserver_deployednodecount": (
+        "maasserver_deployednodecount_source",
+        maasserver_deployednodecount_indexes),
+}
+
 
 @transactional
 def register_all_views():
     """Register all views into the database."""
     for view_name, view_sql in _ALL_VIEWS.items():
         _register_view(view_name, view_sql)
+    for view_name, (source_name, index_sqls) in (
+            _ALL_MATERIALIZED_VIEWS.items()):
+        _register_materialized_view(view_name, source_name, index_sqls)
 
 
 @transactional
@@ -349,6 +461,8 @@ def drop_all_views():
     schema can be freely changed without worrying about whether or not the
     views depend on the schema.
     """
+    for view_name in _ALL_MATERIALIZED_VIEWS.keys():
+        _drop_materialized_view_if_exists(view_name)
     for view_name in _ALL_VIEWS.keys():
         _drop_view_if_exists(view_name)
 
@@ -12,7 +12,9 @@ from collections import (
     defaultdict,
     namedtuple,
 )
+import hashlib
 from itertools import groupby
+import json
 from operator import itemgetter
 from typing import (
     Iterable,
@@ -43,6 +45,7 @@ from maasserver.models import (
     StaticIPAddress,
     Subnet,
 )
+from maasserver.models.interface import InterfaceRelationship
 from maasserver.rpc import (
     getAllClients,
     getClientFor,
@@ -61,13 +64,18 @@ from provisioningserver.rpc.cluster import (
     ConfigureDHCPv4_V2,
     ConfigureDHCPv6,
     ConfigureDHCPv6_V2,
+    UpdateDHCPv4,
+    UpdateDHCPv6,
     ValidateDHCPv4Config,
     ValidateDHCPv4Config_V2,
     ValidateDHCPv6Config,
     ValidateDHCPv6Config_V2,
 )
 from provisioningserver.rpc.dhcp import downgrade_shared_networks
-from provisioningserver.rpc.exceptions import NoConnectionsAvailable
+from provisioningserver.rpc.exceptions import (
+    DHCPStateMismatch,
+    NoConnectionsAvailable,
+)
 from provisioningserver.utils import typed
 from provisioningserver.utils.text import split_string_list
 from provisioningserver.utils.twisted import (
@@ -295,11 +303,17 @@ def get_ntp_server_addresses_for_rack(rack: RackController) -> dict:
 
 def make_interface_hostname(interface):
     """Return the host decleration name for DHCPD for this `interface`."""
-    interface_name = interface.name.replace(".", "-")
-    if interface.type == INTERFACE_TYPE.UNKNOWN and interface.node is None:
-        return "unknown-%d-%s" % (interface.id, interface_name)
+    return _make_interface_hostname(
+        interface.id, interface.name, interface.type,
+        None if interface.node is None else interface.node.hostname)
+
+
+def _make_interface_hostname(interface_id, name, interface_type, hostname):
+    interface_name = name.replace(".", "-")
+    if interface_type == INTERFACE_TYPE.UNKNOWN and hostname is None:
+        return "unknown-%d-%s" % (interface_id, interface_name)
     else:
-        return "%s-%s" % (interface.node.hostname, interface_name)
+        return "%s-%s" % (hostname, interface_name)
 
 
 def make_dhcp_snippet(dhcp_snippet):
@@ -311,72 +325,88 @@ def make_dhcp_snippet(dhcp_snippet):
     }
 
 
+# The interface fields needed to generate a host entry, as a path from an
+# interface to be used in `values_list`, followed by the field names.
+_HOST_INTERFACE_FIELDS = (
+    "id", "name", "type", "mac_address", "node_id", "node__hostname")
+
+
 def make_hosts_for_subnets(subnets, nodes_dhcp_snippets: list=None):
     """Return list of host entries to create in the DHCP configuration for the
     given `subnets`.
+
+    This issues two queries, however many hosts there are: one for the IP
+    addresses and their interfaces, and one for the parents of any bonds.
     """
     if nodes_dhcp_snippets is None:
         nodes_dhcp_snippets = []
 
-    def get_dhcp_snippets_for_interface(interface):
-        dhcp_snippets = list()
-        for dhcp_snippet in nodes_dhcp_snippets:
-            if dhcp_snippet.node == interface.node:
-                dhcp_snippets.append(make_dhcp_snippet(dhcp_snippet))
-        return dhcp_snippets
+    # Group the snippets by node, rendering each only once.
+    dhcp_snippets_by_node = defaultdict(list)
+    for dhcp_snippet in nodes_dhcp_snippets:
+        dhcp_snippets_by_node[dhcp_snippet.node_id].append(
+            make_dhcp_snippet(dhcp_snippet))
+
+    def make_host(
+            ip, interface_id, name, interface_type, mac_address, node_id,
+            hostname):
+        return {
+            'host': _make_interface_hostname(
+                interface_id, name, interface_type, hostname),
+            'mac': str(mac_address),
+            'ip': str(ip),
+            'dhcp_snippets': list(dhcp_snippets_by_node.get(node_id, ())),
+        }
 
-    sips = StaticIPAddress.objects.filter(
+    # Each IP address with each of its interfaces, in the order that they
+    # were created.
+    rows = StaticIPAddress.objects.filter(
         alloc_type__in=[
             IPADDRESS_TYPE.AUTO,
             IPADDRESS_TYPE.STICKY,
             IPADDRESS_TYPE.USER_RESERVED,
             ],
-        subnet__in=subnets, ip__isnull=False).order_by('id')
+        subnet__in=subnets, ip__isnull=False, interface__isnull=False)
+    rows = rows.order_by('id', 'interface__id').values_list(
+        'ip', *("interface__" + field for field in _HOST_INTERFACE_FIELDS))
+    rows = list(rows)
+
+    # Bond interfaces get all their parent interfaces created as hosts as
+    # well, so find the parents of all the bonds at once.
+    bond_ids = {
+        interface_id
+        for _, interface_id, _, interface_type, *_ in rows
+        if interface_type == INTERFACE_TYPE.BOND
+    }
+    bond_parents = defaultdict(list)
+    if len(bond_ids) > 0:
+        relationships = InterfaceRelationship.objects.filter(
+            child_id__in=bond_ids).order_by('child_id', 'parent_id')
+        relationships = relationships.values_list(
+            'child_id',
+            *("parent__" + field for field in _HOST_INTERFACE_FIELDS))
+        for child_id, *parent in relationships:
+            bond_parents[child_id].append(parent)
+
     hosts = []
     interface_ids = set()
-    for sip in sips:
+    for ip, *interface in rows:
         # Skip blank IP addresses.
-        if sip.ip == '':
+        if ip == '':
             continue
-
-        # Add all interfaces attached to this IP address.
-        for interface in sip.interface_set.order_by('id'):
-            # Only allow an interface to be in hosts once.
-            if interface.id in interface_ids:
-                continue
-            else:
-                interface_ids.add(interface.id)
-
-            # Bond interfaces get all its parent interfaces created as
-            # hosts as well.
-            if interface.type == INTERFACE_TYPE.BOND:
-                for parent in interface.parents.all():
-                    # Only add parents that MAC address is different from
-                    # from the bond.
-                    if parent.mac_address != interface.mac_address:
-                        interface_ids.add(parent.id)
-                        hosts.append({
-                            'host': make_interface_hostname(parent),
-                            'mac': str(parent.mac_address),
-                            'ip': str(sip.ip),
-                            'dhcp_snippets': get_dhcp_snippets_for_interface(
-                                parent),
-                        })
-                hosts.append({
-                    'host': make_interface_hostname(interface),
-                    'mac': str(interface.mac_address),
-                    'ip': str(sip.ip),
-                    'dhcp_snippets': get_dhcp_snippets_for_interface(
-                        interface),
-                })
-            else:
-                hosts.append({
-                    'host': make_interface_hostname(interface),
-                    'mac': str(interface.mac_address),
-                    'ip': str(sip.ip),
-                    'dhcp_snippets': get_dhcp_snippets_for_interface(
-                        interface),
-                })
+        # Only allow an interface to be in hosts once.
+        interface_id, mac_address = interface[0], str(interface[3])
+        if interface_id in interface_ids:
+            continue
+        else:
+            interface_ids.add(interface_id)
+        for parent in bond_parents.get(interface_id, ()):
+            # Only add parents that MAC address is different from
+            # from the bond.
+            if str(parent[3]) != mac_address:
+                interface_ids.add(parent[0])
+                hosts.append(make_host(ip, *parent))
+        hosts.append(make_host(ip, *interface))
     return hosts
 
 
@@ -440,7 +470,7 @@ def make_subnet_config(
         'dhcp_snippets': [
             make_dhcp_snippet(dhcp_snippet)
             for dhcp_snippet in subnets_dhcp_snippets
-            if dhcp_snippet.subnet == subnet
+            if dhcp_snippet.subnet_id == subnet.id
             ],
         }
     if search_list is not None:
@@ -499,10 +529,10 @@ def get_dhcp_configure_for(
 
     subnets_dhcp_snippets = [
         dhcp_snippet for dhcp_snippet in dhcp_snippets
-        if dhcp_snippet.subnet is not None]
+        if dhcp_snippet.subnet_id is not None]
     nodes_dhcp_snippets = [
         dhcp_snippet for dhcp_snippet in dhcp_snippets
-        if dhcp_snippet.node is not None]
+        if dhcp_snippet.node_id is not None]
 
     # Generate the shared network configurations.
     subnet_configs = []
@@ -533,14 +563,14 @@ def get_dhcp_configuration(rack_controller, test_dhcp_snippet=None):
         for vlan in vlans
     }
 
-    # Get the list of all DHCP snippets so we only have to query the database
-    # 1 + (the number of DHCP snippets used in this VLAN) instead of
-    # 1 + (the number of subnets in this VLAN) +
-    #     (the number of nodes in this VLAN)
-    dhcp_snippets = DHCPSnippet.objects.filter(enabled=True)
+    # Get the list of all DHCP snippets, with their values, in one query
+    # instead of 1 + (the number of DHCP snippets used in this VLAN) +
+    # (the number of subnets in this VLAN) + (the number of nodes in this
+    # VLAN). Snippets are matched to subnets and nodes by ID from then on.
+    dhcp_snippets = list(DHCPSnippet.objects.filter(
+        enabled=True).select_related('value'))
     # If we're testing a DHCP Snippet insert it into our list
     if test_dhcp_snippet is not None:
-        dhcp_snippets = list(dhcp_snippets)
         replaced_snippet = False
         # If its an existing DHCPSnippet with its contents being modified
         # replace it with the new values and test
@@ -556,7 +586,7 @@ def get_dhcp_configuration(rack_controller, test_dhcp_snippet=None):
     global_dhcp_snippets = [
         make_dhcp_snippet(dhcp_snippet)
         for dhcp_snippet in dhcp_snippets
-        if dhcp_snippet.node is None and dhcp_snippet.subnet is None
+        if dhcp_snippet.node_id is None and dhcp_snippet.subnet_id is None
         ]
 
     # Configure both DHCPv4 and DHCPv6 on the rack controller.
@@ -671,8 +701,8 @@ def configure_dhcp(rack_controller):
     ipv4_status, ipv6_status = SERVICE_STATUS.UNKNOWN, SERVICE_STATUS.UNKNOWN
 
     try:
-        yield _perform_dhcp_config(
-            client, ConfigureDHCPv4_V2, ConfigureDHCPv4,
+        yield _push_dhcp_config(
+            client, UpdateDHCPv4, ConfigureDHCPv4_V2, ConfigureDHCPv4,
             failover_peers=config.failover_peers_v4, interfaces=interfaces_v4,
             shared_networks=config.shared_networks_v4, hosts=config.hosts_v4,
             global_dhcp_snippets=config.global_dhcp_snippets,
@@ -693,8 +723,8 @@ def configure_dhcp(rack_controller):
                 rack_controller.system_id))
 
     try:
-        yield _perform_dhcp_config(
-            client, ConfigureDHCPv6_V2, ConfigureDHCPv6,
+        yield _push_dhcp_config(
+            client, UpdateDHCPv6, ConfigureDHCPv6_V2, ConfigureDHCPv6,
             failover_peers=config.failover_peers_v6, interfaces=interfaces_v6,
             shared_networks=config.shared_networks_v6, hosts=config.hosts_v6,
             global_dhcp_snippets=config.global_dhcp_snippets,
@@ -733,6 +763,106 @@ def configure_dhcp(rack_controller):
     yield deferToDatabase(update_services)
 
 
+PushedDHCPState = namedtuple("PushedDHCPState", (
+    "version", "shared_networks", "hosts"))
+
+# The DHCP configuration most recently pushed to each rack controller from
+# this process, keyed by (system_id, command), as a `PushedDHCPState`.
+_pushed_dhcp_states = {}
+
+
+def make_pushed_dhcp_state(
+        omapi_key, failover_peers, shared_networks, hosts, interfaces,
+        global_dhcp_snippets):
+    """Return a `PushedDHCPState` for a DHCP configuration.
+
+    The version is a digest of the whole configuration, so every region
+    process gives the same configuration the same version.
+    """
+    shared_networks = {
+        shared_network["name"]: shared_network
+        for shared_network in shared_networks
+    }
+    hosts = {host["mac"]: host for host in hosts}
+    config = json.dumps([
+        omapi_key,
+        sorted(failover_peers, key=itemgetter("name")),
+        sorted(shared_networks.items()),
+        sorted(hosts.items()),
+        sorted(interface["name"] for interface in interfaces),
+        sorted(global_dhcp_snippets, key=itemgetter("name")),
+    ], sort_keys=True, default=str)
+    version = hashlib.sha256(config.encode("utf-8")).hexdigest()
+    return PushedDHCPState(version, shared_networks, hosts)
+
+
+def get_pushed_dhcp_state_changes(previous, state):
+    """Return the changes from `previous` to `state`.
+
+    :return: A dict of the `shared_networks`, `removed_shared_networks`,
+        `hosts`, and `removed_hosts` arguments for `UpdateDHCPv4` and
+        `UpdateDHCPv6`.
+    """
+    return {
+        "shared_networks": [
+            shared_network
+            for name, shared_network in state.shared_networks.items()
+            if previous.shared_networks.get(name) != shared_network
+        ],
+        "removed_shared_networks": [
+            name for name in previous.shared_networks
+            if name not in state.shared_networks
+        ],
+        "hosts": [
+            host for mac, host in state.hosts.items()
+            if previous.hosts.get(mac) != host
+        ],
+        "removed_hosts": [
+            mac for mac in previous.hosts
+            if mac not in state.hosts
+        ],
+    }
+
+
+@asynchronous
+@inlineCallbacks
+def _push_dhcp_config(
+        client, update_command, v2_command, v1_command, **args):
+    """Push a DHCP configuration to the rack controller `client`.
+
+    When the configuration most recently pushed from this process is known,
+    only the shared networks and hosts that have changed since are sent with
+    `update_command`. If the rack controller reports that it now has some
+    other configuration, the whole configuration is sent instead. Rack
+    controllers that do not know `update_command` are sent the whole
+    configuration with `v2_command` or `v1_command`.
+
+    :param args: The arguments for `v2_command`.
+    """
+    key = client.ident, update_command.commandName
+    state = make_pushed_dhcp_state(**args)
+    # Forget the previous state until the rack controller has the new one;
+    # if this fails the rack controller's configuration is unknown.
+    previous = _pushed_dhcp_states.pop(key, None)
+    if previous is not None:
+        changes = get_pushed_dhcp_state_changes(previous, state)
+        try:
+            yield client(
+                update_command, version=state.version,
+                base_version=previous.version, **dict(args, **changes))
+        except (DHCPStateMismatch, amp.UnhandledCommand):
+            previous = None
+    if previous is None:
+        try:
+            yield client(update_command, version=state.version, **args)
+        except amp.UnhandledCommand:
+            yield _perform_dhcp_config(client, v2_command, v1_command, **args)
+            return
+    # A rack controller forgets the configuration of a server it stops.
+    if len(state.shared_networks) > 0:
+        _pushed_dhcp_states[key] = state
+
+
 def validate_dhcp_config(test_dhcp_snippet=None):
     """Validate a DHCPD config with uncommitted values.
 
@@ -102,6 +102,16 @@ def make_DNSPublicationGarbageService():
     return publication.DNSPublicationGarbageService()
 
 
+def make_LargeObjectGarbageService():
+    from maasserver import largeobjects_cleanup
+    return largeobjects_cleanup.LargeObjectGarbageService()
+
+
+def make_LoadMonitorService():
+    from provisioningserver.utils import loadstats
+    return loadstats.LoadMonitorService()
+
+
 def make_StatusMonitorService():
     from maasserver import status_monitor
     return status_monitor.StatusMonitorService()
@@ -133,8 +143,11 @@ def make_RackControllerService(postgresListener, advertisingService):
 
 
 def make_StatusWorkerService(dbtasks):
+    from maasserver.config import RegionConfiguration
     from metadataserver.api_twisted import StatusWorkerService
-    return StatusWorkerService(dbtasks)
+    with RegionConfiguration.open() as config:
+        flush_interval = config.status_flush_interval
+    return StatusWorkerService(dbtasks, flush_interval=flush_interval)
 
 
 def make_ServiceMonitorService(advertisingService):
@@ -163,6 +176,25 @@ def make_ReverseDNSService(postgresListener):
     return ReverseDNSService(postgresListener)
 
 
+def make_ConfigCacheService(postgresListener):
+    from maasserver.regiondservices.config_cache import ConfigCacheService
+    return ConfigCacheService(postgresListener)
+
+
+def make_SubnetAllocationCacheService(postgresListener):
+    from maasserver.regiondservices.allocation_cache import (
+        SubnetAllocationCacheService
+    )
+    return SubnetAllocationCacheService(postgresListener)
+
+
+def make_RackConnectivityService(rpcService, postgresListener):
+    from maasserver.regiondservices.rack_connectivity import (
+        RackConnectivityService
+    )
+    return RackConnectivityService(rpcService, postgresListener)
+
+
 def make_NetworkTimeProtocolService():
     from maasserver.regiondservices import ntp
     return ntp.RegionNetworkTimeProtocolService(reactor)
@@ -272,6 +304,23 @@ class RegionEventLoop:
             "factory": make_DNSPublicationGarbageService,
             "requires": [],
         },
+        "largeobject-cleanup": {
+            "only_on_master": True,
+            "factory": make_LargeObjectGarbageService,
+            "requires": [],
+        },
+        "load-monitor-master": {
+            "only_on_master": True,
+            "factory": make_LoadMonitorService,
+            "requires": [],
+        },
+        "load-monitor-worker": {
+            "only_on_master": False,
+            "factory": make_LoadMonitorService,
+            "requires": [],
+            # The master's monitor covers the all-in-one process.
+            "not_all_in_one": True,
+        },
         "status-monitor": {
             "only_on_master": True,
             "factory": make_StatusMonitorService,
@@ -337,6 +386,35 @@ class RegionEventLoop:
             "factory": make_RackControllerService,
             "requires": ["postgres-listener-worker", "rpc-advertise"],
         },
+        "config-cache-master": {
+            "only_on_master": True,
+            "factory": make_ConfigCacheService,
+            "requires": ["postgres-listener-master"],
+        },
+        "config-cache-worker": {
+            "only_on_master": False,
+            "factory": make_ConfigCacheService,
+            "requires": ["postgres-listener-worker"],
+            # The master's cache service covers the all-in-one process.
+            "not_all_in_one": True,
+        },
+        "allocation-cache-master": {
+            "only_on_master": True,
+            "factory": make_SubnetAllocationCacheService,
+            "requires": ["postgres-listener-master"],
+        },
+        "allocation-cache-worker": {
+            "only_on_master": False,
+            "factory": make_SubnetAllocationCacheService,
+            "requires": ["postgres-listener-worker"],
+            # The master's cache service covers the all-in-one process.
+            "not_all_in_one": True,
+        },
+        "rack-connectivity": {
+            "only_on_master": False,
+            "factory": make_RackConnectivityService,
+            "requires": ["rpc", "postgres-listener-worker"],
+        },
         "ntp": {
             "only_on_master": True,
             "factory": make_NetworkTimeProtocolService,
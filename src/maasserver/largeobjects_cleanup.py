@@ -0,0 +1,93 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Collect orphaned large objects."""
+
+__all__ = [
+    "LargeObjectGarbageService",
+]
+
+from maasserver.models.orphanedlargeobject import OrphanedLargeObject
+from maasserver.utils.converters import human_readable_bytes
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.utils.twisted import (
+    callOut,
+    pause,
+)
+from twisted.application.service import Service
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.task import LoopingCall
+
+
+log = LegacyLogger()
+
+
+class LargeObjectGarbageService(Service):
+    """Periodically unlink orphaned large objects.
+
+    Large objects are recorded as orphaned when their `LargeFile` is deleted;
+    each run also sweeps for orphans that were never recorded. They are then
+    unlinked `batch_size` at a time, each batch in its own transaction, with
+    a pause of `delay` seconds between batches so that collecting the space
+    taken by many boot resources does not starve other database work.
+
+    This runs on its own schedule, independently of importing boot resources.
+    """
+
+    clock = None
+
+    def __init__(self, interval=(60 * 60), batch_size=10, delay=1.0):
+        super().__init__()
+        self.interval = interval
+        self.batch_size = batch_size
+        self.delay = delay
+
+    def startService(self):
+        super().startService()
+        self._loop = LoopingCall(self._tryCollectGarbage)
+        self._loop.clock = reactor if self.clock is None else self.clock
+        self._loopDone = self._loop.start(self.interval, now=True)
+        self._loopDone.addErrback(log.err, "Large object loop failed.")
+
+    def stopService(self):
+        # A collection in progress stops after its current batch.
+        if self._loop.running:
+            self._loop.stop()
+        return self._loopDone.addBoth(
+            callOut, super().stopService)
+
+    def _tryCollectGarbage(self):
+        d = self._collectGarbage()
+        d.addErrback(log.err, "Failure when collecting large objects.")
+        return d
+
+    @inlineCallbacks
+    def _collectGarbage(self):
+        yield deferToDatabase(self._sweep)
+        count, size, more = 0, 0, True
+        while more and self._loop.running:
+            collected, freed, more = yield deferToDatabase(self._collect)
+            count, size = count + collected, size + freed
+            if more:
+                yield pause(self.delay, self._loop.clock)
+        if count != 0:
+            log.msg(
+                "Collected %d orphaned large object(s), freeing %s." % (
+                    count, human_readable_bytes(size)))
+
+    @transactional
+    def _sweep(self):
+        return OrphanedLargeObject.objects.sweep()
+
+    @transactional
+    def _collect(self):
+        """Unlink one batch of orphans.
+
+        :return: A tuple of the number of large objects unlinked, the number
+            of bytes they held, and whether there are more to collect.
+        """
+        count, size = OrphanedLargeObject.objects.collect(self.batch_size)
+        return count, size, OrphanedLargeObject.objects.exists()
@@ -15,6 +15,7 @@ from errno import ENOENT
 from django.db import connections
 from django.db.utils import load_backend
 from provisioningserver.utils.enum import map_enum
+from provisioningserver.utils.events import EventGroup
 from provisioningserver.utils.twisted import (
     callOut,
     suppress,
@@ -78,6 +79,11 @@ class PostgresListenerService(Service, object):
         other times.
     :ivar disconnecting: a :class:`Deferred` while disconnecting, `None`
         at all other times.
+    :ivar events: An :class:`EventGroup` with `connected` and `disconnected`
+        events, fired once channels have been registered on a new connection
+        and when that connection is lost, respectively. Notifications may be
+        missed between the two, so consumers that cache state should discard
+        it when disconnected.
     """
 
     # Seconds to wait to handle new notifications. When the notifications set
@@ -97,6 +103,7 @@ class PostgresListenerService(Service, object):
         self.connecting = None
         self.disconnecting = None
         self.registeredChannels = False
+        self.events = EventGroup("connected", "disconnected")
         self.log = Logger(__name__, self)
 
     def startService(self):
@@ -285,6 +292,7 @@ class PostgresListenerService(Service, object):
 
             def cb_connect(_):
                 self.log.info("Listening for database notifications.")
+                self.events.connected.fire()
 
             def eb_connect(failure):
                 self.log.error(
@@ -342,6 +350,7 @@ class PostgresListenerService(Service, object):
     def connectionLost(self, reason):
         """Reconnect when the connection is lost."""
         self.connection = None
+        self.events.disconnected.fire()
         if reason.check(error.ConnectionDone):
             self.log.debug("Connection closed.")
         elif reason.check(error.ConnectionLost):
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# These support incremental refreshes of the `maasserver_discovery` table,
+# which look up neighbours, mDNS entries, interfaces, and IP addresses by
+# address.
+discovery_indexes = (
+    ("maasserver_neighbour__ip_mac_address",
+     "maasserver_neighbour (ip, mac_address)"),
+    ("maasserver_mdns__ip", "maasserver_mdns (ip)"),
+    ("maasserver_interface__mac_address", "maasserver_interface (mac_address)"),
+    ("maasserver_staticipaddress__ip", "maasserver_staticipaddress (ip)"),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0146_add_rootkey'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX %s ON %s" % (name, columns),
+            "DROP INDEX %s" % name)
+        for name, columns in discovery_indexes
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import (
+    migrations,
+    models,
+)
+import maasserver.models.cleansave
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0147_discovery_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrphanedLargeObject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False)),
+                ('updated', models.DateTimeField(editable=False)),
+                ('oid', models.BigIntegerField(editable=False, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=(maasserver.models.cleansave.CleanSave, models.Model, object),
+        ),
+    ]
@@ -48,6 +48,7 @@ __all__ = [
     'NodeMetadata',
     'NodeGroupToRackController',
     'Notification',
+    'OrphanedLargeObject',
     'OwnerData',
     'PackageRepository',
     'Partition',
@@ -160,6 +161,7 @@ from maasserver.models.node import (
 )
 from maasserver.models.nodemetadata import NodeMetadata
 from maasserver.models.notification import Notification
+from maasserver.models.orphanedlargeobject import OrphanedLargeObject
 from maasserver.models.ownerdata import OwnerData
 from maasserver.models.packagerepository import PackageRepository
 from maasserver.models.partition import Partition
@@ -5,6 +5,7 @@
 
 __all__ = [
     'Config',
+    'ConfigCache',
     ]
 
 from collections import (
@@ -13,14 +14,20 @@ from collections import (
 )
 import copy
 from datetime import timedelta
+from functools import partial
 from socket import gethostname
+import threading
 
+from django.db import transaction
 from django.db.models import (
     CharField,
     Manager,
     Model,
 )
-from django.db.models.signals import post_save
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
 from maasserver import DefaultMeta
 from maasserver.fields import JSONObjectField
 from provisioningserver.drivers.osystem.ubuntu import UbuntuOS
@@ -118,15 +125,181 @@ NetworkDiscoveryConfig = namedtuple(
     'NetworkDiscoveryConfig', ('active', 'passive'))
 
 
+# Marks a config item that does not exist in the database.
+_MISSING = object()
+
+# Marks a config item that is not in the cache.
+_UNCACHED = object()
+
+
+class ConfigCache:
+    """A process-local, read-through cache of `Config` values.
+
+    The cache is disabled until `enable` is called. It must only be enabled
+    while something -- see `ConfigCacheService` -- is listening for changes
+    to the `config` table and calling `invalidate` and `refresh`.
+
+    Every invalidation bumps a generation counter. A value read from the
+    database is only stored by `populate` if the generation has not changed
+    since the read began, and is never allowed to replace an existing entry.
+    Values read by `refresh` -- in a transaction that began after the
+    change was committed -- always replace existing entries. Together these
+    ensure that a value read from an older snapshot cannot stick.
+
+    Config items written in the current thread's transaction bypass the
+    cache until that transaction commits, so that a transaction always sees
+    its own changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._values = {}
+        self._names = {}
+        self._sequences = {}
+        self._generation = 0
+        self.enabled = False
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def enable(self):
+        """Start caching values."""
+        with self._lock:
+            self._clear()
+            self.enabled = True
+
+    def disable(self):
+        """Stop caching values and discard everything cached."""
+        with self._lock:
+            self.enabled = False
+            self._clear()
+
+    def _clear(self):
+        self._values.clear()
+        self._names.clear()
+        self._generation += 1
+
+    def _get_written(self):
+        try:
+            return self._local.written
+        except AttributeError:
+            written = self._local.written = set()
+            return written
+
+    def is_usable(self, name):
+        """Return True if `name` can be served from the cache."""
+        return self.enabled and name not in self._get_written()
+
+    def get(self, name):
+        """Return the cached value for `name`.
+
+        :return: The value, `_MISSING` if the item is known not to exist in
+            the database, or `_UNCACHED` if nothing is cached.
+        """
+        with self._lock:
+            entry = self._values.get(name)
+        if entry is None:
+            return _UNCACHED
+        else:
+            return entry[1]
+
+    def populate(self, name, config_id, value, generation):
+        """Store `value`, read from the database, for `name`.
+
+        :param config_id: The ID of the `Config` row, or `None` if the item
+            does not exist in the database.
+        :param generation: The value of `generation` from before the read.
+        """
+        with self._lock:
+            if not self.enabled or generation != self._generation:
+                return
+            if name in self._values:
+                return
+            self._values[name] = (config_id, copy.deepcopy(value))
+            if config_id is not None:
+                self._names[config_id] = name
+
+    def invalidate(self, config_id):
+        """Invalidate the item with `config_id`, and return a sequence.
+
+        Pass the sequence to `refresh` once the current value has been read
+        from the database.
+        """
+        with self._lock:
+            self._generation += 1
+            sequence = self._sequences.get(config_id, 0) + 1
+            self._sequences[config_id] = sequence
+            name = self._names.pop(config_id, None)
+            if name is None:
+                # This row has not been seen, so it's not known which item
+                # to invalidate; play safe and discard everything.
+                self._values.clear()
+                self._names.clear()
+            else:
+                self._values.pop(name, None)
+            return sequence
+
+    def refresh(self, config_id, sequence, name, value):
+        """Store `value` for `name`, read after invalidating `config_id`.
+
+        If `invalidate` has been called for the same `config_id` since the
+        value was read then this does nothing.
+
+        :param name: The name of the config item, or `None` if the row no
+            longer exists.
+        """
+        with self._lock:
+            if not self.enabled:
+                return
+            if self._sequences.get(config_id) != sequence:
+                return
+            del self._sequences[config_id]
+            self._generation += 1
+            if name is not None:
+                self._values[name] = (config_id, copy.deepcopy(value))
+                self._names[config_id] = name
+
+    def discard(self, name):
+        """Discard any cached value for `name`."""
+        with self._lock:
+            self._generation += 1
+            entry = self._values.pop(name, None)
+            if entry is not None and entry[0] is not None:
+                self._names.pop(entry[0], None)
+
+    def written(self, name):
+        """Record that `name` has been written in this thread.
+
+        Inside a transaction, `name` is not served from the cache in this
+        thread until the transaction commits. If the transaction is rolled
+        back `name` continues to bypass the cache in this thread; this is
+        slower but never wrong.
+        """
+        if transaction.get_connection().in_atomic_block:
+            self._get_written().add(name)
+            transaction.on_commit(partial(self._committed, name))
+        else:
+            self.discard(name)
+
+    def _committed(self, name):
+        self._get_written().discard(name)
+        self.discard(name)
+
+
 class ConfigManager(Manager):
     """Manager for Config model class.
 
     Don't import or instantiate this directly; access as `Config.objects`.
+
+    :ivar cache: A process-wide :class:`ConfigCache`.
     """
 
     def __init__(self):
         super(ConfigManager, self).__init__()
         self._config_changed_connections = defaultdict(set)
+        self.cache = ConfigCache()
 
     def get_config(self, name, default=None):
         """Return the config value corresponding to the given config name.
@@ -141,12 +314,28 @@ class ConfigManager(Manager):
         :return: A config value.
         :raises: Config.MultipleObjectsReturned
         """
+        cache = self.cache
+        if cache.is_usable(name):
+            value = cache.get(name)
+            if value is _MISSING:
+                return copy.deepcopy(DEFAULT_CONFIG.get(name, default))
+            elif value is not _UNCACHED:
+                return copy.deepcopy(value)
+            generation = cache.generation
+        else:
+            generation = None
         try:
-            return self.get(name=name).value
+            config = self.get(name=name)
         except Config.DoesNotExist:
+            if generation is not None:
+                cache.populate(name, None, _MISSING, generation)
             return copy.deepcopy(DEFAULT_CONFIG.get(name, default))
         except Config.MultipleObjectsReturned as error:
-            raise Config.MultipleObjectsReturned("%s (%s)" (error, name))
+            raise Config.MultipleObjectsReturned("%s (%s)" % (error, name))
+        else:
+            if generation is not None:
+                cache.populate(name, config.id, config.value, generation)
+            return config.value
 
     def set_config(self, name, value, endpoint=None, request=None):
         """Set or overwrite a config value.
@@ -205,6 +394,9 @@ class ConfigManager(Manager):
         for connection in self._config_changed_connections[instance.name]:
             connection(sender, instance, created, **kwargs)
 
+    def _config_written(self, sender, instance, **kwargs):
+        self.cache.written(instance.name)
+
     def get_network_discovery_config_from_value(self, value):
         """Given the configuration value for `network_discovery`, return
         a `namedtuple` (`NetworkDiscoveryConfig`) of booleans: (active,
@@ -243,3 +435,7 @@ class Config(Model):
 
 # Connect config manager's _config_changed to Config's post-save signal.
 post_save.connect(Config.objects._config_changed, sender=Config)
+
+# Keep the config cache consistent with writes in this process.
+post_save.connect(Config.objects._config_written, sender=Config)
+post_delete.connect(Config.objects._config_written, sender=Config)
@@ -8,6 +8,7 @@ __all__ = [
 ]
 
 from django.db.models import (
+    BooleanField,
     CharField,
     DateTimeField,
     DO_NOTHING,
@@ -53,21 +54,13 @@ class DiscoveryQueriesMixin(MAASQueriesMixin):
         """Returns a `QuerySet` of discoveries which have a MAC that is unknown
         to MAAS. (That is, is not associated with any known Interface.)
         """
-        # Circular imports
-        from maasserver.models import Interface
-        known_macs = Interface.objects.values_list(
-            'mac_address', flat=True).distinct()
-        return self.exclude(mac_address__in=known_macs)
+        return self.filter(is_known_mac=False)
 
     def by_unknown_ip(self):
         """Returns a `QuerySet` of discoveries which have an IP that is unknown
         to MAAS. (That is, is not associated with any known StaticIPAddress.)
         """
-        # Circular imports
-        from maasserver.models import StaticIPAddress
-        known_ips = StaticIPAddress.objects.exclude(
-            ip__isnull=True).values_list('ip', flat=True)
-        return self.exclude(ip__in=known_ips)
+        return self.filter(is_known_ip=False)
 
     def by_unknown_ip_and_mac(self):
         """Returns a `QuerySet` of discoveries which have a MAC and IP
@@ -144,9 +137,11 @@ class Discovery(CleanSave, ViewModel):
     """A `Discovery` object represents the combined data for a network entity
     that MAAS believes has been discovered.
 
-    Note that this class is backed by the `maasserver_discovery` view. Any
-    updates to this model must be reflected in `maasserver/dbviews.py` under
-    the `maasserver_discovery` view.
+    Note that this class is backed by the `maasserver_discovery` table, which
+    is materialized from the `maasserver_discovery_source` view and kept up to
+    date by triggers. Any updates to this model must be reflected in
+    `maasserver/dbviews.py` under the `maasserver_discovery_source` view, and
+    in the `sys_discovery_*` triggers in `maasserver/triggers/system.py`.
     """
 
     class Meta(DefaultViewMeta):
@@ -229,6 +224,12 @@ class Discovery(CleanSave, ViewModel):
     is_external_dhcp = NullBooleanField(
         blank=True, unique=False, editable=False, null=True)
 
+    # Whether an Interface has this MAC address.
+    is_known_mac = BooleanField(editable=False)
+
+    # Whether a StaticIPAddress has this IP address.
+    is_known_ip = BooleanField(editable=False)
+
     objects = DiscoveryManager()
 
     @property
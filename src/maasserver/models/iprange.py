@@ -20,12 +20,17 @@ from django.db.models import (
     PROTECT,
     QuerySet,
 )
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
 from maasserver.enum import (
     IPRANGE_TYPE,
     IPRANGE_TYPE_CHOICES,
 )
 from maasserver.fields import MAASIPAddressField
 from maasserver.models.cleansave import CleanSave
+from maasserver.models.subnet import Subnet
 from maasserver.models.timestampedmodel import TimestampedModel
 from maasserver.utils.orm import (
     MAASQueriesMixin,
@@ -273,3 +278,8 @@ class IPRange(CleanSave, TimestampedModel):
                 else:
                     self._raise_validation_error(message)
         self._raise_validation_error(message)
+
+
+# Keep the subnet allocation cache consistent with writes in this process.
+post_save.connect(Subnet.objects._allocation_written, sender=IPRange)
+post_delete.connect(Subnet.objects._allocation_written, sender=IPRange)
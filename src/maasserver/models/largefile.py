@@ -21,20 +21,7 @@ from maasserver.fields import (
 )
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.timestampedmodel import TimestampedModel
-from maasserver.utils.orm import (
-    get_one,
-    transactional,
-)
-from maasserver.utils.threads import deferToDatabase
-from provisioningserver.logger import LegacyLogger
-from provisioningserver.utils.twisted import (
-    asynchronous,
-    FOREVER,
-)
-from twisted.internet import reactor
-
-
-log = LegacyLogger()
+from maasserver.utils.orm import get_one
 
 
 class FileStorageManager(Manager):
@@ -157,20 +144,3 @@ class LargeFile(CleanSave, TimestampedModel):
             if getattr(self, link).exists():
                 return
         super(LargeFile, self).delete(*args, **kwargs)
-
-
-@asynchronous(timeout=FOREVER)
-def delete_large_object_content_later(content):
-    """Schedule the content to be unlinked later.
-
-    This prevents the running task from blocking waiting for this task to
-    finish. This can cause blocking and thread starvation inside the reactor
-    threadpool.
-    """
-    def unlink(content):
-        d = deferToDatabase(transactional(content.unlink))
-        d.addErrback(
-            log.err, "Failure deleting large object (oid=%d)." % content.oid)
-        return d
-
-    return reactor.callLater(0, unlink, content)
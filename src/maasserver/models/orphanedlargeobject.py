@@ -0,0 +1,109 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Orphaned large objects, awaiting collection."""
+
+__all__ = [
+    'OrphanedLargeObject',
+]
+
+from django.db import connection
+from django.db.models import (
+    BigIntegerField,
+    Manager,
+)
+from maasserver import DefaultMeta
+from maasserver.fields import LargeObjectFile
+from maasserver.models.cleansave import CleanSave
+from maasserver.models.timestampedmodel import TimestampedModel
+
+
+class OrphanedLargeObjectManager(Manager):
+    """Manager for `OrphanedLargeObject` objects."""
+
+    def record(self, oid):
+        """Record that the large object `oid` is no longer referenced.
+
+        Call this in the same transaction that removes the last reference,
+        so that the large object is collected even if this process dies.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO maasserver_orphanedlargeobject "
+                "(created, updated, oid) VALUES (now(), now(), %s) "
+                "ON CONFLICT (oid) DO NOTHING", [oid])
+
+    def sweep(self):
+        """Record every large object that no `LargeFile` references.
+
+        This finds large objects orphaned without being recorded, like those
+        whose unlink was lost when a region restarted. Only large objects
+        owned by the database user are considered.
+
+        :return: The number of large objects newly recorded.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO maasserver_orphanedlargeobject "
+                "(created, updated, oid) "
+                "SELECT now(), now(), lo.oid "
+                "FROM pg_largeobject_metadata AS lo "
+                "WHERE lo.lomowner = ("
+                "  SELECT oid FROM pg_roles WHERE rolname = current_user) "
+                "AND NOT EXISTS ("
+                "  SELECT 1 FROM maasserver_largefile "
+                "  WHERE content = lo.oid) "
+                "ON CONFLICT (oid) DO NOTHING")
+            return cursor.rowcount
+
+    def collect(self, limit):
+        """Unlink up to `limit` recorded large objects.
+
+        Rows locked by a concurrent collection are skipped. Large objects
+        that are referenced again, or that no longer exist, are forgotten
+        without being unlinked.
+
+        :return: A tuple of the number of large objects unlinked, and the
+            number of bytes they held.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT orphan.id, orphan.oid, "
+                "  EXISTS (SELECT 1 FROM pg_largeobject_metadata "
+                "    WHERE oid = orphan.oid) AND "
+                "  NOT EXISTS (SELECT 1 FROM maasserver_largefile "
+                "    WHERE content = orphan.oid) "
+                "FROM maasserver_orphanedlargeobject AS orphan "
+                "ORDER BY orphan.id LIMIT %s "
+                "FOR UPDATE OF orphan SKIP LOCKED", [limit])
+            orphans = cursor.fetchall()
+        count, size = 0, 0
+        for _, oid, unreferenced in orphans:
+            if unreferenced:
+                content = LargeObjectFile(oid).open("rb")
+                size += content.seek(0, 2)
+                content.unlink()
+                count += 1
+        self.filter(id__in=[orphan_id for orphan_id, _, _ in orphans]).delete()
+        return count, size
+
+
+class OrphanedLargeObject(CleanSave, TimestampedModel):
+    """A large object that is no longer referenced, and can be unlinked.
+
+    Large objects are not removed with the rows that refer to them, and
+    unlinking them can take a while, so they are recorded here and
+    unlinked later, a few at a time.
+
+    :ivar oid: The OID of the large object.
+    """
+
+    class Meta(DefaultMeta):
+        """Needed for South to recognize this model."""
+
+    objects = OrphanedLargeObjectManager()
+
+    oid = BigIntegerField(unique=True, editable=False)
+
+    def __str__(self):
+        return "<OrphanedLargeObject oid=%d>" % self.oid
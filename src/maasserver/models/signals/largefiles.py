@@ -8,11 +8,8 @@ __all__ = [
 ]
 
 from django.db.models.signals import post_delete
-from maasserver.models.largefile import (
-    delete_large_object_content_later,
-    LargeFile,
-)
-from maasserver.utils.orm import post_commit_do
+from maasserver.models.largefile import LargeFile
+from maasserver.models.orphanedlargeobject import OrphanedLargeObject
 from maasserver.utils.signals import SignalsManager
 
 
@@ -24,9 +21,12 @@ def delete_large_object(sender, instance, **kwargs):
 
     This is done using the `post_delete` signal instead of overriding delete
     on `LargeFile`, so it works correctly for both the model and `QuerySet`.
+
+    The large object is recorded as orphaned in the same transaction, and
+    unlinked later by `LargeObjectGarbageService`.
     """
     if instance.content is not None:
-        post_commit_do(delete_large_object_content_later, instance.content)
+        OrphanedLargeObject.objects.record(instance.content.oid)
 
 
 signals.watch(post_delete, delete_large_object, LargeFile)
@@ -194,7 +194,10 @@ class StaticIPAddressManager(Manager):
                 # machinery to take care of this, but instead we'll ask it to
                 # retry with the `address_allocation` lock. We can't take it
                 # here because we're already in a transaction; we need to exit
-                # the transaction, take the lock, and only then try again.
+                # the transaction, take the lock, and only then try again. Any
+                # free ranges cached for the subnet are evidently stale.
+                if subnet is not None:
+                    Subnet.objects.allocation_cache.invalidate(subnet.id)
                 orm.request_transaction_retry(locks.address_allocation)
             else:
                 raise
@@ -8,7 +8,10 @@ __all__ = [
     'Subnet',
 ]
 
+from bisect import insort
+from functools import partial
 from operator import attrgetter
+import threading
 from typing import (
     Iterable,
     Optional,
@@ -20,6 +23,10 @@ from django.core.exceptions import (
     ValidationError,
 )
 from django.core.validators import RegexValidator
+from django.db import (
+    connection,
+    transaction,
+)
 from django.db.models import (
     BooleanField,
     CharField,
@@ -31,6 +38,10 @@ from django.db.models import (
     TextField,
 )
 from django.db.models.query import QuerySet
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
 from maasserver.enum import (
     IPADDRESS_TYPE,
     IPRANGE_TYPE,
@@ -283,6 +294,198 @@ class SubnetQueriesMixin(MAASQueriesMixin):
             return current_q
 
 
+class SubnetAllocationCache:
+    """A process-local cache of the addresses free for allocation in subnets.
+
+    The cache is disabled until `enable` is called. It must only be enabled
+    while something -- see `SubnetAllocationCacheService` -- is listening for
+    changes on the 'sys_ipallocation' channel and calling `taken` and
+    `invalidate`.
+
+    The free addresses of each subnet are held as a list of ``(size, first)``
+    ranges. Sorted this way the next address to allocate -- the first address
+    of the smallest free range, as `Subnet.get_next_ip_for_allocation` would
+    choose -- is always at the front, and taking it only shrinks the front
+    range so the list stays sorted. Allocation does not need to scan.
+
+    Every change to a subnet bumps that subnet's generation. Ranges read from
+    the database are only stored by `populate` if the generation has not
+    changed since the read began. A transaction's snapshot may predate the
+    read, so each notification also carries the ID of the transaction that
+    made the change; ranges are stored only if every change notified for the
+    subnet is visible to the snapshot they were read from.
+
+    Addresses are removed by `take` as soon as they are handed out, so that
+    concurrent allocations in this process do not collide. An allocation may
+    yet be rolled back; its address is then not allocated from the cache
+    again until the subnet is next invalidated. This wastes an address for a
+    while but is never wrong. Subnets whose ranges, static routes, or settings
+    are written in the current thread's transaction bypass the cache until
+    that transaction commits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ranges = {}
+        self._generations = {}
+        self._txids = {}
+        self._epoch = 0
+        self.enabled = False
+
+    def enable(self):
+        """Start caching free ranges."""
+        with self._lock:
+            self._clear()
+            self.enabled = True
+
+    def disable(self):
+        """Stop caching free ranges and discard everything cached."""
+        with self._lock:
+            self.enabled = False
+            self._clear()
+
+    def _clear(self):
+        # Transaction IDs are kept: they still say which snapshots are too
+        # old to populate the cache from once it is enabled again.
+        self._ranges.clear()
+        self._generations.clear()
+        self._epoch += 1
+
+    def _bump(self, subnet_id, txid):
+        self._generations[subnet_id] = self._generations.get(subnet_id, 0) + 1
+        if txid is not None and txid > self._txids.get(subnet_id, 0):
+            self._txids[subnet_id] = txid
+
+    def _get_written(self):
+        try:
+            return self._local.written
+        except AttributeError:
+            written = self._local.written = set()
+            return written
+
+    def is_usable(self, subnet_id):
+        """Return True if `subnet_id` can be allocated from the cache."""
+        return self.enabled and subnet_id not in self._get_written()
+
+    def get_generation(self, subnet_id):
+        """Return the generation of `subnet_id`, to pass to `populate`."""
+        with self._lock:
+            return self._get_generation(subnet_id)
+
+    def _get_generation(self, subnet_id):
+        return self._epoch, self._generations.get(subnet_id, 0)
+
+    def populate(self, subnet_id, free_ranges, generation, horizon):
+        """Store `free_ranges`, read from the database, for `subnet_id`.
+
+        :param free_ranges: A `MAASIPSet` of the free ranges in the subnet.
+        :param generation: The value of `get_generation` from before the read.
+        :param horizon: The oldest transaction ID that may not be visible to
+            the snapshot the ranges were read from; see `get_snapshot_xmin`.
+        """
+        ranges = sorted(
+            (free_range.num_addresses, free_range.first)
+            for free_range in free_ranges)
+        with self._lock:
+            if not self.enabled or subnet_id in self._ranges:
+                return
+            if generation != self._get_generation(subnet_id):
+                return
+            if self._txids.get(subnet_id, 0) >= horizon:
+                return
+            if len(ranges) != 0:
+                self._ranges[subnet_id] = ranges
+
+    def take(self, subnet_id, exclude=frozenset()):
+        """Remove and return the next address to allocate from `subnet_id`.
+
+        :param exclude: Integer addresses that must not be returned. These
+            are in use already, so they are discarded from the cache too.
+        :return: An integer address, or `None` if no free address is cached
+            for `subnet_id`.
+        """
+        with self._lock:
+            ranges = self._ranges.get(subnet_id)
+            if ranges is None:
+                return None
+            address = None
+            while len(ranges) != 0:
+                size, first = ranges[0]
+                if size == 1:
+                    del ranges[0]
+                else:
+                    ranges[0] = (size - 1, first + 1)
+                if first not in exclude:
+                    address = first
+                    break
+            if len(ranges) == 0:
+                del self._ranges[subnet_id]
+            return address
+
+    def taken(self, subnet_id, address, txid=None):
+        """Note that the integer `address` in `subnet_id` is now in use.
+
+        :param txid: The ID of the transaction that took `address`.
+        """
+        with self._lock:
+            self._bump(subnet_id, txid)
+            ranges = self._ranges.get(subnet_id)
+            if ranges is None:
+                return
+            for index, (size, first) in enumerate(ranges):
+                if first <= address < first + size:
+                    break
+            else:
+                return
+            del ranges[index]
+            if address > first:
+                insort(ranges, (address - first, first))
+            if address < first + size - 1:
+                insort(ranges, (first + size - 1 - address, address + 1))
+            if len(ranges) == 0:
+                del self._ranges[subnet_id]
+
+    def invalidate(self, subnet_id, txid=None):
+        """Discard the free ranges cached for `subnet_id`.
+
+        :param txid: The ID of the transaction that changed `subnet_id`.
+        """
+        with self._lock:
+            self._bump(subnet_id, txid)
+            self._ranges.pop(subnet_id, None)
+
+    def written(self, subnet_id):
+        """Record that `subnet_id` has been written in this thread.
+
+        Inside a transaction, `subnet_id` is not allocated from the cache in
+        this thread until the transaction commits. If the transaction is
+        rolled back `subnet_id` continues to bypass the cache in this thread;
+        this is slower but never wrong.
+        """
+        if transaction.get_connection().in_atomic_block:
+            self._get_written().add(subnet_id)
+            transaction.on_commit(partial(self._committed, subnet_id))
+        else:
+            self.invalidate(subnet_id)
+
+    def _committed(self, subnet_id):
+        self._get_written().discard(subnet_id)
+        self.invalidate(subnet_id)
+
+
+def get_snapshot_xmin():
+    """Return the oldest transaction ID not visible to the current snapshot.
+
+    Every transaction with a lower ID committed or rolled back before the
+    snapshot was taken.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        [xmin] = cursor.fetchone()
+    return xmin
+
+
 class SubnetQuerySet(QuerySet, SubnetQueriesMixin):
     """Custom QuerySet which mixes in some additional queries specific to
     subnets. This needs to be a mixin because an identical method is needed on
@@ -291,12 +494,29 @@ class SubnetQuerySet(QuerySet, SubnetQueriesMixin):
 
 
 class SubnetManager(Manager, SubnetQueriesMixin):
-    """Manager for :class:`Subnet` model."""
+    """Manager for :class:`Subnet` model.
+
+    :ivar allocation_cache: A process-wide :class:`SubnetAllocationCache`.
+    """
+
+    def __init__(self):
+        super(SubnetManager, self).__init__()
+        self.allocation_cache = SubnetAllocationCache()
 
     def get_queryset(self):
         queryset = SubnetQuerySet(self.model, using=self._db)
         return queryset
 
+    def _allocation_written(self, sender, instance, **kwargs):
+        if isinstance(instance, Subnet):
+            subnet_id = instance.id
+        elif isinstance(instance, StaticRoute):
+            subnet_id = instance.source_id
+        else:
+            subnet_id = instance.subnet_id
+        if subnet_id is not None:
+            self.allocation_cache.written(subnet_id)
+
     def create_from_cidr(self, cidr, vlan=None):
         """Create a subnet from the given CIDR."""
         name = "subnet-" + str(cidr)
@@ -701,6 +921,20 @@ class Subnet(CleanSave, TimestampedModel):
         """
         if exclude_addresses is None:
             exclude_addresses = []
+        cache = Subnet.objects.allocation_cache
+        generation = None
+        if avoid_observed_neighbours and cache.is_usable(self.id):
+            network = self.get_ipnetwork()
+            exclude = {
+                int(IPAddress(address))
+                for address in exclude_addresses
+                if address in network
+            }
+            address = cache.take(self.id, exclude)
+            if address is not None:
+                return str(IPAddress(address, network.version))
+            generation = cache.get_generation(self.id)
+            horizon = get_snapshot_xmin()
         free_ranges = self.get_ipranges_not_in_use(
             exclude_addresses=exclude_addresses,
             with_neighbours=avoid_observed_neighbours)
@@ -733,6 +967,13 @@ class Subnet(CleanSave, TimestampedModel):
         # from the *smallest* free contiguous range. This way, larger ranges
         # can be preserved in case they need to be used for applications
         # requiring them.
+        if generation is not None:
+            # Remember the free ranges so that the next allocations from this
+            # subnet need not find them again.
+            cache.populate(self.id, free_ranges, generation, horizon)
+            address = cache.take(self.id, exclude)
+            if address is not None:
+                return str(IPAddress(address, network.version))
         free_range = min(free_ranges, key=attrgetter('num_addresses'))
         return str(IPAddress(free_range.first))
 
@@ -906,3 +1147,10 @@ class Subnet(CleanSave, TimestampedModel):
             delete_notification = True
         if notification is not None and delete_notification:
             notification.delete()
+
+
+# Keep the allocation cache consistent with writes in this process.
+post_save.connect(Subnet.objects._allocation_written, sender=Subnet)
+post_delete.connect(Subnet.objects._allocation_written, sender=Subnet)
+post_save.connect(Subnet.objects._allocation_written, sender=StaticRoute)
+post_delete.connect(Subnet.objects._allocation_written, sender=StaticRoute)
@@ -17,9 +17,15 @@ from maasserver.models import (
     signals,
 )
 import maasserver.models.config
-from maasserver.models.config import get_default_config
+from maasserver.models.config import (
+    _MISSING,
+    _UNCACHED,
+    ConfigCache,
+    get_default_config,
+)
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.testcase import MAASTestCase
 from provisioningserver.events import AUDIT
 from testtools.matchers import Is
 
@@ -184,6 +190,141 @@ class ConfigTest(MAASServerTestCase):
         self.assertEqual([], recorder.calls)
 
 
+class ConfigCacheTest(MAASTestCase):
+    """Tests for :class:`ConfigCache`."""
+
+    def make_enabled_cache(self):
+        cache = ConfigCache()
+        cache.enable()
+        return cache
+
+    def test_disabled_by_default(self):
+        cache = ConfigCache()
+        self.assertFalse(cache.is_usable(factory.make_name("name")))
+        cache.populate("name", 1, "value", cache.generation)
+        self.assertIs(_UNCACHED, cache.get("name"))
+
+    def test_populate_stores_copy_of_value(self):
+        cache = self.make_enabled_cache()
+        value = {"key": "value"}
+        cache.populate("name", 1, value, cache.generation)
+        value["key"] = "changed"
+        self.assertEqual({"key": "value"}, cache.get("name"))
+
+    def test_populate_stores_missing(self):
+        cache = self.make_enabled_cache()
+        cache.populate("name", None, _MISSING, cache.generation)
+        self.assertIs(_MISSING, cache.get("name"))
+
+    def test_populate_ignores_values_read_before_invalidation(self):
+        cache = self.make_enabled_cache()
+        generation = cache.generation
+        cache.invalidate(1)
+        cache.populate("name", 1, "value", generation)
+        self.assertIs(_UNCACHED, cache.get("name"))
+
+    def test_populate_does_not_replace_existing_entry(self):
+        cache = self.make_enabled_cache()
+        cache.populate("name", 1, "value", cache.generation)
+        cache.populate("name", 1, "other", cache.generation)
+        self.assertEqual("value", cache.get("name"))
+
+    def test_invalidate_discards_known_item(self):
+        cache = self.make_enabled_cache()
+        cache.populate("name", 1, "value", cache.generation)
+        cache.populate("other", 2, "value", cache.generation)
+        cache.invalidate(1)
+        self.assertIs(_UNCACHED, cache.get("name"))
+        self.assertEqual("value", cache.get("other"))
+
+    def test_invalidate_discards_everything_for_unknown_item(self):
+        cache = self.make_enabled_cache()
+        cache.populate("name", 1, "value", cache.generation)
+        cache.populate("other", None, _MISSING, cache.generation)
+        cache.invalidate(3)
+        self.assertIs(_UNCACHED, cache.get("name"))
+        self.assertIs(_UNCACHED, cache.get("other"))
+
+    def test_refresh_replaces_value_read_from_older_snapshot(self):
+        cache = self.make_enabled_cache()
+        sequence = cache.invalidate(1)
+        # A transaction that started before the change populates the cache
+        # after the invalidation but before the refresh.
+        cache.populate("name", 1, "old", cache.generation)
+        cache.refresh(1, sequence, "name", "new")
+        self.assertEqual("new", cache.get("name"))
+        # Further reads from the older snapshot are ignored.
+        cache.populate("name", 1, "old", cache.generation)
+        self.assertEqual("new", cache.get("name"))
+
+    def test_refresh_ignored_if_superseded(self):
+        cache = self.make_enabled_cache()
+        sequence1 = cache.invalidate(1)
+        sequence2 = cache.invalidate(1)
+        cache.refresh(1, sequence2, "name", "newer")
+        cache.refresh(1, sequence1, "name", "new")
+        self.assertEqual("newer", cache.get("name"))
+
+    def test_refresh_of_deleted_item(self):
+        cache = self.make_enabled_cache()
+        cache.populate("name", 1, "value", cache.generation)
+        sequence = cache.invalidate(1)
+        cache.refresh(1, sequence, None, None)
+        self.assertIs(_UNCACHED, cache.get("name"))
+
+    def test_disable_discards_everything(self):
+        cache = self.make_enabled_cache()
+        cache.populate("name", 1, "value", cache.generation)
+        cache.disable()
+        self.assertIs(_UNCACHED, cache.get("name"))
+        self.assertFalse(cache.is_usable("name"))
+
+
+class ConfigCacheManagerTest(MAASServerTestCase):
+    """Tests for `ConfigManager` when its cache is enabled."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache = ConfigCache()
+        self.cache.enable()
+        self.patch(Config.objects, "cache", self.cache)
+
+    def create_committed_config(self, name, value):
+        Config.objects.create(name=name, value=value)
+        # Simulate the commit of the transaction that created it.
+        self.cache._committed(name)
+
+    def test_get_config_populates_cache(self):
+        self.create_committed_config('name', 'config')
+        self.assertEqual('config', Config.objects.get_config('name'))
+        self.assertEqual('config', self.cache.get('name'))
+
+    def test_get_config_uses_cache(self):
+        self.cache.populate('name', None, 'cached', self.cache.generation)
+        self.assertEqual('cached', Config.objects.get_config('name'))
+
+    def test_get_config_caches_missing_items(self):
+        self.patch(
+            maasserver.models.config, "DEFAULT_CONFIG", {'name': 'default'})
+        self.assertEqual('default', Config.objects.get_config('name'))
+        self.assertIs(_MISSING, self.cache.get('name'))
+        self.assertEqual('default', Config.objects.get_config('name'))
+
+    def test_get_config_returns_copy_of_cached_value(self):
+        self.create_committed_config('name', {'key': 'value'})
+        Config.objects.get_config('name')
+        Config.objects.get_config('name')['key'] = 'changed'
+        self.assertEqual({'key': 'value'}, Config.objects.get_config('name'))
+
+    def test_set_config_is_visible_in_same_transaction(self):
+        Config.objects.set_config('name', 'config1')
+        self.assertEqual('config1', Config.objects.get_config('name'))
+        Config.objects.set_config('name', 'config2')
+        self.assertEqual('config2', Config.objects.get_config('name'))
+        self.assertFalse(self.cache.is_usable('name'))
+        self.assertIs(_UNCACHED, self.cache.get('name'))
+
+
 class SettingConfigTest(MAASServerTestCase):
     """Testing of the :class:`Config` model and setting each option."""
 
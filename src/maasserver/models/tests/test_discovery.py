@@ -5,6 +5,7 @@
 
 __all__ = []
 
+from django.db import connection
 from maasserver.models import (
     Discovery,
     discovery as discovery_module,
@@ -144,6 +145,93 @@ class TestDiscoveryModel(MAASServerTestCase):
         self.assertThat(discovery.hostname, Equals(rdns_hostname))
 
 
+class TestDiscoveryRefresh(MAASServerTestCase):
+    """Tests for the triggers that keep `maasserver_discovery` up to date."""
+
+    def assertMatchesSource(self):
+        query = "SELECT * FROM %s ORDER BY mac_address, ip"
+        with connection.cursor() as cursor:
+            cursor.execute(query % "maasserver_discovery")
+            materialized = cursor.fetchall()
+            cursor.execute(query % "maasserver_discovery_source")
+            source = cursor.fetchall()
+        self.assertEqual(source, materialized)
+
+    def make_Discovery(self, **kwargs):
+        rack = factory.make_RackController()
+        iface = factory.make_Interface(node=rack)
+        return factory.make_Discovery(interface=iface, **kwargs)
+
+    def test__refreshes_when_neighbour_is_observed_again(self):
+        discovery = self.make_Discovery()
+        neighbour = discovery.neighbour
+        neighbour.count += 1
+        neighbour.save()
+        self.assertMatchesSource()
+
+    def test__refreshes_when_neighbour_is_deleted(self):
+        discovery = self.make_Discovery()
+        discovery.neighbour.delete()
+        self.assertThat(Discovery.objects.count(), Equals(0))
+        self.assertMatchesSource()
+
+    def test__refreshes_when_mdns_hostname_changes(self):
+        discovery = self.make_Discovery(hostname="")
+        mdns = factory.make_MDNS(
+            ip=discovery.ip, interface=discovery.observer_interface)
+        self.assertMatchesSource()
+        mdns.hostname = factory.make_hostname()
+        mdns.save()
+        self.assertThat(
+            Discovery.objects.get(id=discovery.id).hostname,
+            Equals(mdns.hostname))
+        mdns.delete()
+        self.assertMatchesSource()
+
+    def test__refreshes_when_observer_changes(self):
+        discovery = self.make_Discovery()
+        observer = discovery.observer
+        observer.hostname = factory.make_name("rack")
+        observer.save()
+        iface = discovery.observer_interface
+        iface.name = factory.make_name("eth")
+        iface.save()
+        self.assertMatchesSource()
+
+    def test__refreshes_when_fabric_is_renamed(self):
+        discovery = self.make_Discovery()
+        fabric = discovery.fabric
+        fabric.name = factory.make_name("fabric")
+        fabric.save()
+        self.assertMatchesSource()
+
+    def test__refreshes_when_subnets_change(self):
+        discovery = self.make_Discovery(ip="10.0.0.1")
+        subnet = factory.make_Subnet(cidr="10.0.0.0/8", vlan=discovery.vlan)
+        self.assertThat(
+            Discovery.objects.get(id=discovery.id).subnet, Equals(subnet))
+        subnet.delete()
+        self.assertThat(
+            Discovery.objects.get(id=discovery.id).subnet, Is(None))
+        self.assertMatchesSource()
+
+    def test__refreshes_when_mac_is_no_longer_known(self):
+        discovery = self.make_Discovery()
+        iface = factory.make_Interface(mac_address=discovery.mac_address)
+        self.assertThat(Discovery.objects.by_unknown_mac().count(), Equals(0))
+        iface.delete()
+        self.assertThat(Discovery.objects.by_unknown_mac().count(), Equals(1))
+        self.assertMatchesSource()
+
+    def test__refreshes_when_ip_is_no_longer_known(self):
+        discovery = self.make_Discovery(ip="10.0.0.1")
+        sip = factory.make_StaticIPAddress(ip=discovery.ip, cidr="10.0.0.0/8")
+        self.assertThat(Discovery.objects.by_unknown_ip().count(), Equals(0))
+        sip.delete()
+        self.assertThat(Discovery.objects.by_unknown_ip().count(), Equals(1))
+        self.assertMatchesSource()
+
+
 class TestDiscoveryManagerClear(MAASServerTestCase):
     """Tests for `DiscoveryManager.clear` """
 
@@ -7,38 +7,12 @@ __all__ = []
 
 from io import BytesIO
 from random import randint
-from unittest.mock import (
-    ANY,
-    call,
-)
 
-from crochet import wait_for
 from django.db import transaction
-from maasserver.fields import LargeObjectFile
-from maasserver.models import (
-    largefile as largefile_module,
-    signals,
-)
+from maasserver.models import OrphanedLargeObject
 from maasserver.models.largefile import LargeFile
 from maasserver.testing.factory import factory
-from maasserver.testing.testcase import (
-    MAASServerTestCase,
-    MAASTransactionServerTestCase,
-)
-from maasserver.utils.orm import post_commit_hooks
-from maastesting.matchers import (
-    MockCalledOnceWith,
-    MockCallsMatch,
-)
-import psycopg2
-from testtools.matchers import (
-    Equals,
-    HasLength,
-    Is,
-    MatchesListwise,
-    MatchesStructure,
-)
-from twisted.internet.task import Clock
+from maasserver.testing.testcase import MAASServerTestCase
 
 
 class TestLargeFileManager(MAASServerTestCase):
@@ -139,65 +113,31 @@ class TestLargeFile(MAASServerTestCase):
         largefile.delete()
         self.assertTrue(LargeFile.objects.filter(id=largefile.id).exists())
 
-    def test_deletes_content_asynchronously(self):
-        self.patch(signals.largefiles, "delete_large_object_content_later")
+    def test_records_content_as_orphaned(self):
         largefile = factory.make_LargeFile()
         self.addCleanup(largefile.content.unlink)
-        with post_commit_hooks:
-            largefile.delete()
-        self.assertThat(
-            signals.largefiles.delete_large_object_content_later,
-            MockCalledOnceWith(largefile.content))
-
-    def test_deletes_content_asynchronously_for_queries_too(self):
-        self.patch(signals.largefiles, "delete_large_object_content_later")
+        largefile.delete()
+        self.assertEqual(
+            [largefile.content.oid],
+            [orphan.oid for orphan in OrphanedLargeObject.objects.all()])
+
+    def test_records_content_as_orphaned_for_queries_too(self):
+        oids = []
         for _ in 1, 2:
             largefile = factory.make_LargeFile()
             self.addCleanup(largefile.content.unlink)
-        with post_commit_hooks:
-            LargeFile.objects.all().delete()
-        self.assertThat(
-            signals.largefiles.delete_large_object_content_later,
-            MockCallsMatch(call(ANY), call(ANY)))
-
-
-class TestDeleteLargeObjectContentLater(MAASTransactionServerTestCase):
+            oids.append(largefile.content.oid)
+        LargeFile.objects.all().delete()
+        self.assertItemsEqual(
+            oids, OrphanedLargeObject.objects.values_list("oid", flat=True))
 
-    def test__schedules_unlink(self):
-        # We're going to capture the delayed call that
-        # delete_large_object_content_later() creates.
-        clock = self.patch(largefile_module, "reactor", Clock())
-
-        with transaction.atomic():
-            largefile = factory.make_LargeFile()
-            oid = largefile.content.oid
-
-        with post_commit_hooks:
-            largefile.delete()
-
-        # Deleting `largefile` resulted in a call being scheduled.
-        delayed_calls = clock.getDelayedCalls()
-        self.assertThat(delayed_calls, HasLength(1))
-        [delayed_call] = delayed_calls
-
-        # It is scheduled to be run on the next iteration of the reactor.
-        self.assertFalse(delayed_call.called)
-        self.assertThat(delayed_call, MatchesStructure(
-            func=MatchesStructure.byEquality(__name__="unlink"),
-            args=MatchesListwise([Is(largefile.content)]),
-            kw=Equals({}), time=Equals(0),
-        ))
-
-        # Call the delayed function ourselves instead of advancing `clock` so
-        # that we can wait for it to complete (it returns a Deferred).
-        func = wait_for(30)(delayed_call.func)  # Wait 30 seconds.
-        func(*delayed_call.args, **delayed_call.kw)
-
-        # The content has been removed from the database.
-        with transaction.atomic():
-            error = self.assertRaises(
-                psycopg2.OperationalError,
-                LargeObjectFile(oid).open, "rb")
-            self.assertDocTestMatches(
-                "ERROR: large object ... does not exist",
-                str(error))
+    def test_does_not_record_content_if_delete_rolls_back(self):
+        largefile = factory.make_LargeFile()
+        try:
+            with transaction.atomic():
+                largefile.delete()
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertFalse(OrphanedLargeObject.objects.exists())
+        self.assertTrue(LargeFile.objects.filter(id=largefile.id).exists())
@@ -0,0 +1,118 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for :class:`OrphanedLargeObject`."""
+
+__all__ = []
+
+from random import randint
+
+from django.db import connection
+from maasserver.fields import LargeObjectFile
+from maasserver.models import OrphanedLargeObject
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.matchers import GreaterThanOrEqual
+from testtools.matchers import LessThan
+
+
+def make_large_object(size=None):
+    """Make a large object of `size` random bytes, and return its OID."""
+    if size is None:
+        size = randint(1, 1000)
+    largeobject = LargeObjectFile()
+    with largeobject.open("wb") as stream:
+        stream.write(factory.make_bytes(size))
+    return largeobject.oid
+
+
+def large_object_exists(oid):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_largeobject_metadata "
+            "WHERE oid = %s)", [oid])
+        return cursor.fetchone()[0]
+
+
+def get_recorded_oids():
+    return set(OrphanedLargeObject.objects.values_list("oid", flat=True))
+
+
+class TestOrphanedLargeObjectManager(MAASServerTestCase):
+
+    def test_record_records_oid(self):
+        oid = make_large_object()
+        OrphanedLargeObject.objects.record(oid)
+        self.assertEqual({oid}, get_recorded_oids())
+
+    def test_record_ignores_oid_already_recorded(self):
+        oid = make_large_object()
+        OrphanedLargeObject.objects.record(oid)
+        OrphanedLargeObject.objects.record(oid)
+        self.assertEqual({oid}, get_recorded_oids())
+
+    def test_sweep_records_unreferenced_large_objects(self):
+        oids = {make_large_object() for _ in range(3)}
+        recorded = OrphanedLargeObject.objects.sweep()
+        self.assertThat(recorded, GreaterThanOrEqual(3))
+        self.assertTrue(oids.issubset(get_recorded_oids()))
+
+    def test_sweep_ignores_referenced_large_objects(self):
+        largefile = factory.make_LargeFile()
+        OrphanedLargeObject.objects.sweep()
+        self.assertNotIn(largefile.content.oid, get_recorded_oids())
+
+    def test_sweep_ignores_large_objects_already_recorded(self):
+        oid = make_large_object()
+        OrphanedLargeObject.objects.record(oid)
+        OrphanedLargeObject.objects.sweep()
+        self.assertEqual(0, OrphanedLargeObject.objects.sweep())
+        self.assertIn(oid, get_recorded_oids())
+
+    def test_collect_unlinks_and_reports_size(self):
+        sizes = [randint(1, 100000) for _ in range(3)]
+        oids = [make_large_object(size) for size in sizes]
+        for oid in oids:
+            OrphanedLargeObject.objects.record(oid)
+        self.assertEqual(
+            (3, sum(sizes)), OrphanedLargeObject.objects.collect(10))
+        self.assertEqual(set(), get_recorded_oids())
+        self.assertFalse(any(large_object_exists(oid) for oid in oids))
+
+    def test_collect_unlinks_no_more_than_limit(self):
+        oids = [make_large_object() for _ in range(5)]
+        for oid in oids:
+            OrphanedLargeObject.objects.record(oid)
+        count, _ = OrphanedLargeObject.objects.collect(2)
+        self.assertEqual(2, count)
+        self.assertEqual(set(oids[2:]), get_recorded_oids())
+        self.assertEqual(
+            [False, False, True, True, True],
+            [large_object_exists(oid) for oid in oids])
+
+    def test_collect_forgets_referenced_large_objects(self):
+        largefile = factory.make_LargeFile()
+        OrphanedLargeObject.objects.record(largefile.content.oid)
+        self.assertEqual((0, 0), OrphanedLargeObject.objects.collect(10))
+        self.assertEqual(set(), get_recorded_oids())
+        self.assertTrue(large_object_exists(largefile.content.oid))
+
+    def test_collect_forgets_missing_large_objects(self):
+        oid = make_large_object()
+        LargeObjectFile(oid).unlink()
+        OrphanedLargeObject.objects.record(oid)
+        self.assertEqual((0, 0), OrphanedLargeObject.objects.collect(10))
+        self.assertEqual(set(), get_recorded_oids())
+
+    def test_collects_many_large_objects_in_batches(self):
+        sizes = [randint(1, 10000) for _ in range(100)]
+        oids = [make_large_object(size) for size in sizes]
+        OrphanedLargeObject.objects.sweep()
+        collected, freed = 0, 0
+        while OrphanedLargeObject.objects.exists():
+            count, size = OrphanedLargeObject.objects.collect(7)
+            self.assertThat(count, LessThan(8))
+            collected, freed = collected + count, freed + size
+        self.assertThat(collected, GreaterThanOrEqual(100))
+        self.assertThat(freed, GreaterThanOrEqual(sum(sizes)))
+        self.assertFalse(any(large_object_exists(oid) for oid in oids))
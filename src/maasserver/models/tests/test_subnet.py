@@ -10,12 +10,15 @@ from datetime import (
     datetime,
     timedelta,
 )
+from functools import partial
 import random
+import threading
 
 from django.core.exceptions import (
     PermissionDenied,
     ValidationError,
 )
+from django.db import connection
 from fixtures import FakeLogger
 from hypothesis import given
 from hypothesis.strategies import integers
@@ -36,6 +39,7 @@ from maasserver.models import (
 from maasserver.models.subnet import (
     create_cidr,
     Subnet,
+    SubnetAllocationCache,
 )
 from maasserver.testing.factory import (
     factory,
@@ -43,12 +47,18 @@ from maasserver.testing.factory import (
     RANDOM_OR_NONE,
 )
 from maasserver.testing.orm import rollback
-from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.testing.testcase import (
+    MAASServerTestCase,
+    MAASTransactionServerTestCase,
+)
 from maasserver.utils.orm import (
     get_one,
     reload_object,
+    transactional,
 )
+from maastesting.djangotestcase import count_queries
 from maastesting.matchers import DocTestMatches
+from maastesting.testcase import MAASTestCase
 from netaddr import (
     AddrFormatError,
     IPAddress,
@@ -57,6 +67,8 @@ from netaddr import (
 from provisioningserver.utils.network import (
     inet_ntop,
     MAASIPRange,
+    MAASIPSet,
+    make_iprange,
 )
 from testtools import ExpectedException
 from testtools.matchers import (
@@ -1197,6 +1209,227 @@ class TestSubnetGetNextIPForAllocation(MAASServerTestCase):
         self.assertThat(ip, Equals("10.0.0.5"))
 
 
+class TestSubnetAllocationCache(MAASTestCase):
+    """Tests for `SubnetAllocationCache`."""
+
+    def make_cache(self):
+        cache = SubnetAllocationCache()
+        cache.enable()
+        return cache
+
+    def populate(self, cache, subnet_id, *ranges, horizon=100):
+        cache.populate(subnet_id, MAASIPSet([
+            make_iprange("10.0.0.%d" % first, "10.0.0.%d" % last)
+            for first, last in ranges
+        ]), cache.get_generation(subnet_id), horizon)
+
+    def take_all(self, cache, subnet_id, exclude=frozenset()):
+        taken = []
+        for address in iter(partial(cache.take, subnet_id, exclude), None):
+            taken.append(IPAddress(address).words[-1])
+        return taken
+
+    def test_disabled_by_default(self):
+        cache = SubnetAllocationCache()
+        self.assertFalse(cache.enabled)
+        self.populate(cache, 1, (1, 6))
+        self.assertIsNone(cache.take(1))
+
+    def test_takes_from_smallest_range_first(self):
+        cache = self.make_cache()
+        self.populate(cache, 1, (1, 3), (5, 6), (8, 9))
+        self.assertEqual([5, 6, 8, 9, 1, 2, 3], self.take_all(cache, 1))
+
+    def test_take_skips_excluded_addresses(self):
+        cache = self.make_cache()
+        self.populate(cache, 1, (1, 4))
+        exclude = {int(IPAddress("10.0.0.1")), int(IPAddress("10.0.0.3"))}
+        self.assertEqual([2, 4], self.take_all(cache, 1, exclude))
+
+    def test_taken_splits_range(self):
+        cache = self.make_cache()
+        self.populate(cache, 1, (1, 9))
+        cache.taken(1, int(IPAddress("10.0.0.5")))
+        self.assertEqual(
+            [1, 2, 3, 4, 6, 7, 8, 9], self.take_all(cache, 1))
+
+    def test_taken_ignores_unknown_addresses(self):
+        cache = self.make_cache()
+        self.populate(cache, 1, (1, 2))
+        cache.taken(1, int(IPAddress("10.0.0.200")))
+        self.assertEqual([1, 2], self.take_all(cache, 1))
+
+    def test_populate_ignores_ranges_read_before_change(self):
+        cache = self.make_cache()
+        generation = cache.get_generation(1)
+        cache.taken(1, int(IPAddress("10.0.0.1")))
+        cache.populate(
+            1, MAASIPSet([make_iprange("10.0.0.1", "10.0.0.2")]),
+            generation, 100)
+        self.assertIsNone(cache.take(1))
+
+    def test_populate_ignores_ranges_read_before_reenabled(self):
+        cache = self.make_cache()
+        generation = cache.get_generation(1)
+        cache.disable()
+        cache.enable()
+        cache.populate(
+            1, MAASIPSet([make_iprange("10.0.0.1", "10.0.0.2")]),
+            generation, 100)
+        self.assertIsNone(cache.take(1))
+
+    def test_populate_ignores_ranges_read_before_notified_change(self):
+        cache = self.make_cache()
+        cache.invalidate(1, 100)
+        self.populate(cache, 1, (1, 2), horizon=100)
+        self.assertIsNone(cache.take(1))
+
+    def test_populate_accepts_ranges_read_after_notified_change(self):
+        cache = self.make_cache()
+        cache.taken(1, int(IPAddress("10.0.0.1")), 99)
+        self.populate(cache, 1, (2, 3), horizon=100)
+        self.assertEqual([2, 3], self.take_all(cache, 1))
+
+    def test_populate_remembers_notified_changes_when_reenabled(self):
+        cache = self.make_cache()
+        cache.invalidate(1, 100)
+        cache.disable()
+        cache.enable()
+        self.populate(cache, 1, (1, 2), horizon=100)
+        self.assertIsNone(cache.take(1))
+
+    def test_populate_does_not_replace_existing_entry(self):
+        cache = self.make_cache()
+        self.populate(cache, 1, (1, 1))
+        self.populate(cache, 1, (5, 6))
+        self.assertEqual([1], self.take_all(cache, 1))
+
+    def test_invalidate_discards_subnet(self):
+        cache = self.make_cache()
+        self.populate(cache, 1, (1, 2))
+        self.populate(cache, 2, (3, 4))
+        cache.invalidate(1)
+        self.assertIsNone(cache.take(1))
+        self.assertEqual([3, 4], self.take_all(cache, 2))
+
+    def test_disable_discards_everything(self):
+        cache = self.make_cache()
+        self.populate(cache, 1, (1, 2))
+        cache.disable()
+        cache.enable()
+        self.assertIsNone(cache.take(1))
+
+
+class TestSubnetGetNextIPForAllocationCached(MAASServerTestCase):
+    """Tests for `Subnet.get_next_ip_for_allocation` with the cache on."""
+
+    def enable_cache(self):
+        # A new cache, because the subnets made by this test have been
+        # written in this transaction so bypass the existing cache.
+        cache = SubnetAllocationCache()
+        cache.enable()
+        self.patch(Subnet.objects, "allocation_cache", cache)
+        return cache
+
+    def test__allocates_as_without_cache(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/29", gateway_ip=None, dns_servers=[])
+        factory.make_StaticIPAddress(ip="10.0.0.4", subnet=subnet)
+        self.enable_cache()
+        # The free ranges are {1, 2, 3} and {5, 6}; the smallest is used up
+        # first, as it would be without the cache.
+        self.assertEqual(
+            ["10.0.0.5", "10.0.0.6", "10.0.0.1", "10.0.0.2"],
+            [subnet.get_next_ip_for_allocation() for _ in range(4)])
+
+    def test__allocates_without_queries_once_cached(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip="10.0.0.1", dns_servers=[])
+        self.enable_cache()
+        self.assertEqual("10.0.0.2", subnet.get_next_ip_for_allocation())
+        queries, ip = count_queries(subnet.get_next_ip_for_allocation)
+        self.assertEqual("10.0.0.3", ip)
+        self.assertEqual(0, queries)
+
+    def test__avoids_excluded_addresses(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/29", gateway_ip=None, dns_servers=[])
+        self.enable_cache()
+        self.assertEqual("10.0.0.1", subnet.get_next_ip_for_allocation())
+        self.assertEqual("10.0.0.3", subnet.get_next_ip_for_allocation(
+            exclude_addresses=["10.0.0.2"]))
+
+    def test__raises_if_no_free_addresses(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/30", gateway_ip="10.0.0.1", dns_servers=[])
+        self.enable_cache()
+        self.assertEqual("10.0.0.2", subnet.get_next_ip_for_allocation())
+        factory.make_StaticIPAddress(ip="10.0.0.2", subnet=subnet)
+        self.assertRaises(
+            StaticIPAddressExhaustion, subnet.get_next_ip_for_allocation)
+
+    def test__bypasses_cache_for_subnet_written_in_transaction(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/29", gateway_ip=None, dns_servers=[])
+        cache = self.enable_cache()
+        self.assertEqual("10.0.0.1", subnet.get_next_ip_for_allocation())
+        factory.make_IPRange(
+            subnet, start_ip="10.0.0.2", end_ip="10.0.0.4",
+            alloc_type=IPRANGE_TYPE.RESERVED)
+        self.assertFalse(cache.is_usable(subnet.id))
+        self.assertEqual("10.0.0.1", subnet.get_next_ip_for_allocation())
+
+
+class TestSubnetGetNextIPForAllocationCachedConcurrently(
+        MAASTransactionServerTestCase):
+    """Tests for the cache with overlapping transactions."""
+
+    def test__does_not_cache_ranges_from_snapshot_before_change(self):
+        cache = SubnetAllocationCache()
+        cache.enable()
+        self.patch(Subnet.objects, "allocation_cache", cache)
+        subnet = transactional(factory.make_Subnet)(
+            cidr="10.0.0.0/29", gateway_ip=None, dns_servers=[])
+
+        snapshot_taken = threading.Event()
+        range_reserved = threading.Event()
+        allocated = []
+
+        @transactional
+        def allocate():
+            # The first query takes this transaction's snapshot.
+            subnet_in_snapshot = Subnet.objects.get(id=subnet.id)
+            snapshot_taken.set()
+            range_reserved.wait(10)
+            allocated.append(subnet_in_snapshot.get_next_ip_for_allocation())
+
+        @transactional
+        def reserve_range():
+            factory.make_IPRange(
+                subnet, start_ip="10.0.0.1", end_ip="10.0.0.5",
+                alloc_type=IPRANGE_TYPE.RESERVED)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT txid_current()")
+                [txid] = cursor.fetchone()
+            return txid
+
+        thread = threading.Thread(target=allocate)
+        thread.start()
+        self.assertTrue(snapshot_taken.wait(10))
+        txid = reserve_range()
+        # The allocation cache service gets this from the notification.
+        cache.invalidate(subnet.id, txid)
+        range_reserved.set()
+        thread.join()
+
+        # The allocation's snapshot does not include the reserved range...
+        self.assertEqual(["10.0.0.1"], allocated)
+        # ... so the free ranges it read were not cached.
+        self.assertIsNone(cache.take(subnet.id))
+        self.assertEqual(
+            "10.0.0.6", transactional(subnet.get_next_ip_for_allocation)())
+
+
 class TestUnmanagedSubnets(MAASServerTestCase):
 
     def test__allocation_uses_reserved_range(self):
@@ -13,6 +13,7 @@ order as they do in `ACTION_CLASSES`.
 """
 
 __all__ = [
+    'BulkNodeAction',
     'compile_node_actions',
 ]
 
@@ -22,6 +23,7 @@ from abc import (
     abstractproperty,
 )
 from collections import OrderedDict
+from itertools import islice
 
 from crochet import TimeoutError
 from django.core.exceptions import ValidationError
@@ -39,17 +41,28 @@ from maasserver.exceptions import (
     NodeActionError,
     StaticIPAddressExhaustion,
 )
-from maasserver.models import Zone
+from maasserver.models import (
+    Machine,
+    Zone,
+)
 from maasserver.node_status import (
     is_failed_status,
     NON_MONITORED_STATUSES,
 )
 from maasserver.preseed import get_curtin_config
-from maasserver.utils.orm import post_commit_do
+from maasserver.utils.orm import (
+    is_retryable_failure,
+    post_commit,
+    post_commit_do,
+    post_commit_hooks,
+    savepoint,
+    transactional,
+)
 from maasserver.utils.osystems import (
     validate_hwe_kernel,
     validate_osystem_and_distro_series,
 )
+from maasserver.utils.threads import deferToDatabase
 from metadataserver.enum import SCRIPT_STATUS
 from provisioningserver.rpc.exceptions import (
     NoConnectionsAvailable,
@@ -57,6 +70,25 @@ from provisioningserver.rpc.exceptions import (
 )
 from provisioningserver.utils.enum import map_enum
 from provisioningserver.utils.shell import ExternalProcessError
+from provisioningserver.utils.twisted import (
+    asynchronous,
+    callOut,
+    suppress,
+)
+from twisted.internet.defer import (
+    CancelledError,
+    DeferredList,
+    DeferredSemaphore,
+    inlineCallbacks,
+)
+from twisted.python.failure import Failure
+
+# Number of machines changed within each transaction by `BulkNodeAction`.
+BULK_ACTION_BATCH_SIZE = 50
+
+# Maximum number of machines for which `BulkNodeAction` will have post-commit
+# tasks, typically power operations, in progress at any one time.
+BULK_ACTION_CONCURRENCY = 20
 
 # All node statuses.
 ALL_STATUSES = set(NODE_STATUS_CHOICES_DICT.keys())
@@ -679,3 +711,208 @@ def compile_node_actions(node, user, request=None, classes=ACTION_CLASSES):
         (action.name, action)
         for action in applicable_actions
         if action.is_permitted())
+
+
+def make_bulk_action_result(system_id, error=None, pending=False):
+    """Return the result of a bulk action for the machine `system_id`.
+
+    :param pending: Whether post-commit tasks for the machine are queued
+        but their outcome is not yet known, in which case "success" is None.
+    """
+    return {
+        "system_id": system_id,
+        "success": None if pending else error is None,
+        "error": error,
+    }
+
+
+class BulkNodeAction:
+    """Perform a node action on many machines at once.
+
+    State changes are made in batches, one transaction per batch, with each
+    machine changed within its own savepoint so that a failure on one does
+    not prevent changes to the others. Post-commit tasks registered by the
+    action for each machine -- power operations, typically -- are held back
+    then dispatched concurrently once the batch commits, instead of one
+    after another. Tasks for any single machine still run in sequence.
+
+    Results are dictionaries as returned by `make_bulk_action_result`. An
+    instance should be used for a single bulk action only.
+    """
+
+    def __init__(
+            self, action_name, user, request=None, extra=None,
+            batch_size=BULK_ACTION_BATCH_SIZE,
+            concurrency=BULK_ACTION_CONCURRENCY, report=None):
+        """Initialize a bulk node action.
+
+        :param action_name: The name of a node action in `ACTIONS_DICT`.
+        :param extra: Keyword arguments for the action's `execute` method.
+        :param report: Optional callable, called in the reactor with each
+            machine's result as it becomes known.
+        """
+        self.action_class = ACTIONS_DICT.get(action_name)
+        if self.action_class is None:
+            raise NodeActionError("%s is not a valid action." % action_name)
+        self.user = user
+        self.request = request
+        self.extra = {} if extra is None else extra
+        self.batch_size = batch_size
+        self.semaphore = DeferredSemaphore(concurrency)
+        self.report = report
+        self.dispatched = []
+
+    @property
+    def permission(self):
+        """The permission required on each machine."""
+        if self.action_class.node_permission is None:
+            return self.action_class.permission
+        else:
+            return self.action_class.node_permission
+
+    def select(self, system_ids=None, nodes=None):
+        """Return the system IDs of machines on which the user may act.
+
+        This is a single query regardless of the number of machines. It must
+        be called within a transaction.
+
+        :param system_ids: Optionally, restrict to these system IDs.
+        :param nodes: Optionally, restrict to this query set of nodes.
+        """
+        machines = Machine.objects.get_nodes(
+            self.user, self.permission, ids=system_ids, from_nodes=nodes)
+        return sorted(machines.values_list("system_id", flat=True))
+
+    def apply(self, system_ids):
+        """Apply the action to the machines with the given `system_ids`.
+
+        This must be called within a transaction. Post-commit tasks for each
+        machine are held back and dispatched once the transaction commits;
+        see `dispatch`. They are cancelled if it does not.
+
+        :return: A list of results for machines for which there is nothing
+            to dispatch, i.e. those that failed, or that are done.
+        """
+        results, pending = [], []
+        machines = Machine.objects.filter(
+            system_id__in=system_ids).order_by("id")
+        for machine in machines:
+            error, hooks = self._apply(machine)
+            if error is None and len(hooks) > 0:
+                pending.append((machine.system_id, hooks))
+            else:
+                results.append(make_bulk_action_result(
+                    machine.system_id, error))
+        missing = set(system_ids).difference(
+            machine.system_id for machine in machines)
+        for system_id in sorted(missing):
+            results.append(make_bulk_action_result(
+                system_id, "Machine not found."))
+        if len(pending) > 0:
+            post_commit().addCallbacks(
+                callOut, self._abandon,
+                callbackArgs=(self.dispatch, pending),
+                errbackArgs=(pending,))
+        return results
+
+    def _apply(self, machine):
+        """Apply the action to `machine` within a savepoint.
+
+        :return: A tuple of an error message, or `None`, and the post-commit
+            hooks registered by the action.
+        """
+        action = self.action_class(machine, self.user, self.request)
+        if not action.is_actionable():
+            return (
+                "%s action is not available for this node." % action.name,
+                ())
+        elif action.inhibition is not None:
+            return action.inhibition, ()
+        try:
+            with post_commit_hooks.detached() as hooks, savepoint():
+                action.execute(**self.extra)
+        except Exception as error:
+            if is_retryable_failure(error):
+                raise  # The whole transaction must be retried.
+            else:
+                return str(error), ()
+        else:
+            return None, hooks
+
+    def dispatch(self, pending):
+        """Run held-back post-commit tasks, concurrently.
+
+        This is called in the reactor once a batch has committed. It does not
+        wait for the tasks to complete; see `execute`.
+
+        :param pending: A list of ``(system_id, hooks)`` tuples.
+        """
+        for system_id, hooks in pending:
+            d = self.semaphore.run(self._fire, hooks)
+            d.addBoth(self._completed, system_id)
+            self.dispatched.append(d)
+
+    @inlineCallbacks
+    def _fire(self, hooks):
+        try:
+            while len(hooks) > 0:
+                hook = hooks.popleft()
+                hook.callback(None)
+                yield hook
+        finally:
+            self._cancel(hooks)
+
+    def _completed(self, result, system_id):
+        if isinstance(result, Failure):
+            result = make_bulk_action_result(
+                system_id, result.getErrorMessage())
+        else:
+            result = make_bulk_action_result(system_id)
+        return self._report(result)
+
+    def _abandon(self, failure, pending):
+        for _, hooks in pending:
+            self._cancel(hooks)
+        return failure
+
+    def _cancel(self, hooks):
+        while len(hooks) > 0:
+            hook = hooks.popleft()
+            hook.addErrback(suppress, CancelledError)
+            hook.cancel()
+
+    def _report(self, result):
+        if self.report is not None:
+            self.report(result)
+        return result
+
+    @asynchronous
+    @inlineCallbacks
+    def execute(self, system_ids=None, nodes=None):
+        """Apply the action to many machines, batch by batch.
+
+        Batches are not held up waiting for the post-commit tasks of earlier
+        batches to complete.
+
+        :param system_ids: Optionally, restrict to these system IDs.
+        :param nodes: Optionally, restrict to this query set of nodes.
+        :return: A `Deferred` that fires with a list of results, one for
+            each machine, once all post-commit tasks have completed.
+        """
+        permitted = yield deferToDatabase(
+            transactional(self.select), system_ids, nodes)
+        results = []
+        if system_ids is not None:
+            for system_id in sorted(set(system_ids).difference(permitted)):
+                results.append(self._report(make_bulk_action_result(
+                    system_id, "Machine not found, or permission denied.")))
+        batches = iter(permitted)
+        batch = list(islice(batches, self.batch_size))
+        while len(batch) > 0:
+            completed = yield deferToDatabase(
+                transactional(self.apply), batch)
+            results.extend(self._report(result) for result in completed)
+            batch = list(islice(batches, self.batch_size))
+        dispatched = yield DeferredList(self.dispatched)
+        results.extend(result for _, result in dispatched)
+        return results
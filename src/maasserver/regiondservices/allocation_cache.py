@@ -0,0 +1,66 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Subnet allocation cache service."""
+
+__all__ = [
+    "SubnetAllocationCacheService",
+]
+
+from maasserver.models.subnet import Subnet
+from netaddr import IPAddress
+from twisted.application.service import Service
+
+
+class SubnetAllocationCacheService(Service):
+    """Keep this process's subnet allocation cache in step with the database.
+
+    The cache is enabled only while the listener is connected, because
+    notifications for the 'sys_ipallocation' channel may be missed otherwise.
+    """
+
+    def __init__(self, postgresListener):
+        super().__init__()
+        self.listener = postgresListener
+        self.cache = Subnet.objects.allocation_cache
+
+    def startService(self):
+        super().startService()
+        self.listener.register("sys_ipallocation", self.consumeAllocation)
+        self.listener.events.connected.registerHandler(
+            self.listenerConnected)
+        self.listener.events.disconnected.registerHandler(
+            self.listenerDisconnected)
+        if self.listener.connected():
+            self.cache.enable()
+
+    def stopService(self):
+        self.listener.events.connected.unregisterHandler(
+            self.listenerConnected)
+        self.listener.events.disconnected.unregisterHandler(
+            self.listenerDisconnected)
+        self.listener.unregister("sys_ipallocation", self.consumeAllocation)
+        self.cache.disable()
+        return super().stopService()
+
+    def listenerConnected(self):
+        """Start caching; anything cached before may be stale."""
+        self.cache.enable()
+
+    def listenerDisconnected(self):
+        """Stop caching; changes will be missed until reconnected."""
+        self.cache.disable()
+
+    def consumeAllocation(self, channel, message):
+        """Called when the free addresses of a subnet change.
+
+        :param message: The subnet ID and the ID of the transaction that
+            changed it, followed by an address if the only change is that the
+            address is now in use.
+        """
+        subnet_id, txid, *address = message.split()
+        if len(address) == 0:
+            self.cache.invalidate(int(subnet_id), int(txid))
+        else:
+            self.cache.taken(
+                int(subnet_id), int(IPAddress(address[0])), int(txid))
@@ -0,0 +1,82 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Config cache service."""
+
+__all__ = [
+    "ConfigCacheService",
+]
+
+from maasserver.models.config import Config
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from provisioningserver.logger import LegacyLogger
+from twisted.application.service import Service
+
+
+log = LegacyLogger()
+
+
+class ConfigCacheService(Service):
+    """Keep this process's `Config` cache in step with the database.
+
+    The cache is enabled only while the listener is connected, because
+    notifications for the `config` channel may be missed otherwise.
+    """
+
+    def __init__(self, postgresListener):
+        super().__init__()
+        self.listener = postgresListener
+        self.cache = Config.objects.cache
+
+    def startService(self):
+        super().startService()
+        self.listener.register("config", self.consumeConfigEvent)
+        self.listener.events.connected.registerHandler(
+            self.listenerConnected)
+        self.listener.events.disconnected.registerHandler(
+            self.listenerDisconnected)
+        if self.listener.connected():
+            self.cache.enable()
+
+    def stopService(self):
+        self.listener.events.connected.unregisterHandler(
+            self.listenerConnected)
+        self.listener.events.disconnected.unregisterHandler(
+            self.listenerDisconnected)
+        self.listener.unregister("config", self.consumeConfigEvent)
+        self.cache.disable()
+        return super().stopService()
+
+    def listenerConnected(self):
+        """Start caching; anything cached before may be stale."""
+        self.cache.enable()
+
+    def listenerDisconnected(self):
+        """Stop caching; changes will be missed until reconnected."""
+        self.cache.disable()
+
+    def consumeConfigEvent(self, action, obj_id):
+        """Called when a `Config` row is created, updated, or deleted.
+
+        :param obj_id: The ID of the `Config` row, as a string.
+        """
+        config_id = int(obj_id)
+        sequence = self.cache.invalidate(config_id)
+        if action == "delete":
+            self.cache.refresh(config_id, sequence, None, None)
+        else:
+            d = deferToDatabase(self.refresh, config_id, sequence)
+            d.addErrback(
+                log.err, "Failed to refresh cached config %r." % obj_id)
+            return d
+
+    @transactional
+    def refresh(self, config_id, sequence):
+        """Reload the `Config` row with `config_id` into the cache."""
+        try:
+            config = Config.objects.get(id=config_id)
+        except Config.DoesNotExist:
+            self.cache.refresh(config_id, sequence, None, None)
+        else:
+            self.cache.refresh(config_id, sequence, config.name, config.value)
@@ -0,0 +1,159 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Rack controller connectivity service."""
+
+__all__ = [
+    "RackConnectivityService",
+]
+
+from maasserver.components import (
+    discard_persistent_error,
+    register_persistent_error,
+)
+from maasserver.enum import COMPONENT
+from maasserver.models.node import RackController
+from maasserver.utils.django_urls import reverse
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from provisioningserver.logger import LegacyLogger
+from twisted.application.service import Service
+from twisted.internet.defer import (
+    DeferredLock,
+    inlineCallbacks,
+)
+
+
+log = LegacyLogger()
+
+
+def get_rack_connectivity_message(disconnected):
+    """Return the persistent error message for `disconnected` racks.
+
+    :param disconnected: The number of disconnected rack controllers.
+    :return: The error message, or `None` if all racks are connected.
+    """
+    if disconnected == 0:
+        return None
+    elif disconnected == 1:
+        message = "One rack controller is not yet connected to the region"
+    else:
+        message = (
+            "%d rack controllers are not yet connected to the region"
+            % disconnected)
+    return (
+        "%s. Visit the <a href=\"%s#/nodes?tab=controllers\">"
+        "rack controllers page</a> for "
+        "more information." % (message, reverse('index')))
+
+
+class RackConnectivityService(Service):
+    """Track which rack controllers are connected to this region process.
+
+    The set of rack controllers known to the database is refreshed when the
+    `controller` notification channel fires, and the set of connected rack
+    controllers is tracked through the connected and disconnected events of
+    the RPC service. The `COMPONENT.RACK_CONTROLLERS` persistent error is
+    only written to the database when the number of disconnected rack
+    controllers changes.
+    """
+
+    def __init__(self, rpcService, postgresListener=None):
+        super().__init__()
+        self.rpcService = rpcService
+        self.listener = postgresListener
+        # System IDs of all rack controllers known to the database.
+        self.racks = frozenset()
+        # The number of disconnected racks last recorded in the database, or
+        # `None` if nothing has yet been recorded by this service.
+        self.recorded = None
+        # Serialises updates so that the last update always wins.
+        self.lock = DeferredLock()
+
+    @inlineCallbacks
+    def startService(self):
+        super().startService()
+        self.rpcService.events.connected.registerHandler(
+            self.rackConnectionChanged)
+        self.rpcService.events.disconnected.registerHandler(
+            self.rackConnectionChanged)
+        if self.listener is not None:
+            self.listener.register('controller', self.consumeControllerEvent)
+        yield self.reloadRacks()
+
+    def stopService(self):
+        if self.listener is not None:
+            self.listener.unregister(
+                'controller', self.consumeControllerEvent)
+        self.rpcService.events.connected.unregisterHandler(
+            self.rackConnectionChanged)
+        self.rpcService.events.disconnected.unregisterHandler(
+            self.rackConnectionChanged)
+        return super().stopService()
+
+    def getConnectedRacks(self):
+        """Return the system IDs of the racks connected to this process."""
+        return {
+            ident
+            for ident, connections in self.rpcService.connections.items()
+            if len(connections) > 0
+        }
+
+    def getDisconnectedRacks(self):
+        """Return the system IDs of the racks not connected to this process.
+        """
+        return self.racks - self.getConnectedRacks()
+
+    def rackConnectionChanged(self, ident):
+        """Called when a rack controller connects or disconnects."""
+        if ident in self.racks:
+            return self.update()
+
+    def consumeControllerEvent(self, action, system_id):
+        """Called when a controller is created, updated, or deleted.
+
+        Updates can convert a region controller into a region and rack
+        controller (or vice versa) without a create or delete notification,
+        so the set of racks is reloaded for every action.
+        """
+        return self.reloadRacks()
+
+    def reloadRacks(self):
+        """Reload the set of rack controllers from the database."""
+        d = deferToDatabase(self._getRackSystemIDs)
+        d.addCallback(self._setRacks)
+        d.addErrback(log.err, "Failed to reload rack controllers.")
+        return d
+
+    @transactional
+    def _getRackSystemIDs(self):
+        return frozenset(
+            RackController.objects.values_list('system_id', flat=True))
+
+    def _setRacks(self, racks):
+        self.racks = racks
+        return self.update()
+
+    def update(self):
+        """Record the connectivity state if it has changed.
+
+        :return: A `Deferred` that fires once the state has been recorded.
+        """
+        d = self.lock.run(self._update)
+        d.addErrback(log.err, "Failed to update rack connectivity.")
+        return d
+
+    @inlineCallbacks
+    def _update(self):
+        disconnected = len(self.getDisconnectedRacks())
+        if disconnected != self.recorded:
+            yield deferToDatabase(self._record, disconnected)
+            self.recorded = disconnected
+
+    @transactional
+    def _record(self, disconnected):
+        message = get_rack_connectivity_message(disconnected)
+        if message is None:
+            discard_persistent_error(COMPONENT.RACK_CONTROLLERS)
+        else:
+            register_persistent_error(COMPONENT.RACK_CONTROLLERS, message)
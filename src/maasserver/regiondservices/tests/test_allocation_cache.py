@@ -0,0 +1,108 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the subnet allocation cache service."""
+
+__all__ = []
+
+from unittest.mock import Mock
+
+from maasserver.models import Subnet
+from maasserver.models.subnet import SubnetAllocationCache
+from maasserver.regiondservices.allocation_cache import (
+    SubnetAllocationCacheService,
+)
+from maastesting.matchers import MockCalledOnceWith
+from maastesting.testcase import MAASTestCase
+from netaddr import IPAddress
+from provisioningserver.utils.events import EventGroup
+from provisioningserver.utils.network import make_iprange
+
+
+def make_listener(connected=True):
+    listener = Mock()
+    listener.connected.return_value = connected
+    listener.events = EventGroup("connected", "disconnected")
+    return listener
+
+
+class TestSubnetAllocationCacheService(MAASTestCase):
+    """Tests for `SubnetAllocationCacheService`."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache = SubnetAllocationCache()
+        self.patch(Subnet.objects, "allocation_cache", self.cache)
+
+    def populate(self, subnet_id, first, last):
+        self.cache.populate(
+            subnet_id, [make_iprange(first, last)],
+            self.cache.get_generation(subnet_id), 100)
+
+    def test__registers_and_unregisters_handlers(self):
+        listener = make_listener()
+        service = SubnetAllocationCacheService(listener)
+        service.startService()
+        self.assertThat(listener.register, MockCalledOnceWith(
+            "sys_ipallocation", service.consumeAllocation))
+        self.assertEqual(
+            {service.listenerConnected}, listener.events.connected.handlers)
+        self.assertEqual(
+            {service.listenerDisconnected},
+            listener.events.disconnected.handlers)
+        service.stopService()
+        self.assertThat(listener.unregister, MockCalledOnceWith(
+            "sys_ipallocation", service.consumeAllocation))
+        self.assertEqual(set(), listener.events.connected.handlers)
+        self.assertEqual(set(), listener.events.disconnected.handlers)
+
+    def test__enables_cache_on_start_when_connected(self):
+        service = SubnetAllocationCacheService(make_listener(connected=True))
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertTrue(self.cache.enabled)
+
+    def test__does_not_enable_cache_on_start_when_disconnected(self):
+        service = SubnetAllocationCacheService(make_listener(connected=False))
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertFalse(self.cache.enabled)
+
+    def test__follows_listener_connection(self):
+        listener = make_listener(connected=False)
+        service = SubnetAllocationCacheService(listener)
+        service.startService()
+        self.addCleanup(service.stopService)
+        listener.events.connected.fire()
+        self.assertTrue(self.cache.enabled)
+        listener.events.disconnected.fire()
+        self.assertFalse(self.cache.enabled)
+
+    def test__consumes_taken_address(self):
+        service = SubnetAllocationCacheService(make_listener())
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.populate(1, "10.0.0.1", "10.0.0.2")
+        service.consumeAllocation("sys_ipallocation", "1 101 10.0.0.1")
+        self.assertEqual(
+            int(IPAddress("10.0.0.2")), self.cache.take(1))
+        self.assertIsNone(self.cache.take(1))
+        # Ranges read from a snapshot that cannot see the change are
+        # not cached.
+        self.populate(1, "10.0.0.1", "10.0.0.2")
+        self.assertIsNone(self.cache.take(1))
+
+    def test__consumes_invalidation(self):
+        service = SubnetAllocationCacheService(make_listener())
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.populate(1, "10.0.0.1", "10.0.0.2")
+        self.populate(2, "10.0.1.1", "10.0.1.2")
+        service.consumeAllocation("sys_ipallocation", "1 101")
+        self.assertIsNone(self.cache.take(1))
+        self.assertEqual(
+            int(IPAddress("10.0.1.1")), self.cache.take(2))
+        # Ranges read from a snapshot that cannot see the change are
+        # not cached.
+        self.populate(1, "10.0.0.1", "10.0.0.2")
+        self.assertIsNone(self.cache.take(1))
@@ -0,0 +1,121 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the config cache service."""
+
+__all__ = []
+
+from unittest.mock import Mock
+
+from crochet import wait_for
+from maasserver.models import Config
+from maasserver.models.config import (
+    _UNCACHED,
+    ConfigCache,
+)
+from maasserver.regiondservices.config_cache import ConfigCacheService
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASTransactionServerTestCase
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from maastesting.matchers import MockCalledOnceWith
+from provisioningserver.utils.events import EventGroup
+from twisted.internet.defer import inlineCallbacks
+
+
+wait_for_reactor = wait_for(30)  # 30 seconds.
+
+
+def make_listener(connected=True):
+    listener = Mock()
+    listener.connected.return_value = connected
+    listener.events = EventGroup("connected", "disconnected")
+    return listener
+
+
+class TestConfigCacheService(MAASTransactionServerTestCase):
+    """Tests for `ConfigCacheService`."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache = ConfigCache()
+        self.patch(Config.objects, "cache", self.cache)
+
+    def test__registers_and_unregisters_handlers(self):
+        listener = make_listener()
+        service = ConfigCacheService(listener)
+        service.startService()
+        self.assertThat(listener.register, MockCalledOnceWith(
+            "config", service.consumeConfigEvent))
+        self.assertEqual(
+            {service.listenerConnected}, listener.events.connected.handlers)
+        self.assertEqual(
+            {service.listenerDisconnected},
+            listener.events.disconnected.handlers)
+        service.stopService()
+        self.assertThat(listener.unregister, MockCalledOnceWith(
+            "config", service.consumeConfigEvent))
+        self.assertEqual(set(), listener.events.connected.handlers)
+        self.assertEqual(set(), listener.events.disconnected.handlers)
+
+    def test__enables_cache_on_start_when_connected(self):
+        service = ConfigCacheService(make_listener(connected=True))
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertTrue(self.cache.enabled)
+
+    def test__does_not_enable_cache_on_start_when_disconnected(self):
+        service = ConfigCacheService(make_listener(connected=False))
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertFalse(self.cache.enabled)
+
+    def test__follows_listener_connection(self):
+        listener = make_listener(connected=False)
+        service = ConfigCacheService(listener)
+        service.startService()
+        self.addCleanup(service.stopService)
+        listener.events.connected.fire()
+        self.assertTrue(self.cache.enabled)
+        listener.events.disconnected.fire()
+        self.assertFalse(self.cache.enabled)
+
+    def test__disables_cache_on_stop(self):
+        service = ConfigCacheService(make_listener())
+        service.startService()
+        service.stopService()
+        self.assertFalse(self.cache.enabled)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__refreshes_updated_config(self):
+        name = factory.make_name("name")
+        config = yield deferToDatabase(
+            transactional(Config.objects.create), name=name, value="old")
+        service = ConfigCacheService(make_listener())
+        service.startService()
+        try:
+            self.cache.populate(name, config.id, "old", self.cache.generation)
+            yield deferToDatabase(
+                transactional(Config.objects.set_config), name, "new")
+            yield service.consumeConfigEvent("update", str(config.id))
+            self.assertEqual("new", self.cache.get(name))
+        finally:
+            service.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__discards_deleted_config(self):
+        name = factory.make_name("name")
+        config = yield deferToDatabase(
+            transactional(Config.objects.create), name=name, value="value")
+        service = ConfigCacheService(make_listener())
+        service.startService()
+        try:
+            self.cache.populate(
+                name, config.id, "value", self.cache.generation)
+            yield deferToDatabase(transactional(config.delete))
+            yield service.consumeConfigEvent("delete", str(config.id))
+            self.assertIs(_UNCACHED, self.cache.get(name))
+        finally:
+            service.stopService()
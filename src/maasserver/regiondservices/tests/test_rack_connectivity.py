@@ -0,0 +1,241 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the rack controller connectivity service."""
+
+__all__ = []
+
+from collections import defaultdict
+from unittest.mock import (
+    ANY,
+    Mock,
+    sentinel,
+)
+
+from crochet import wait_for
+from maasserver.components import (
+    get_persistent_error,
+    register_persistent_error,
+)
+from maasserver.enum import COMPONENT
+from maasserver.regiondservices import (
+    rack_connectivity as rack_connectivity_module,
+)
+from maasserver.regiondservices.rack_connectivity import (
+    get_rack_connectivity_message,
+    RackConnectivityService,
+)
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import (
+    MAASServerTestCase,
+    MAASTransactionServerTestCase,
+)
+from maasserver.utils.django_urls import reverse
+from maasserver.utils.threads import deferToDatabase
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from provisioningserver.utils.events import EventGroup
+from testtools.matchers import Equals
+from twisted.internet.defer import inlineCallbacks
+
+
+wait_for_reactor = wait_for(30)  # 30 seconds.
+
+
+def make_rpc_service():
+    rpc_service = Mock()
+    rpc_service.connections = defaultdict(set)
+    rpc_service.events = EventGroup("connected", "disconnected")
+    return rpc_service
+
+
+def connect(service, ident):
+    """Simulate a connection from `ident`; return the service's update."""
+    service.rpcService.connections[ident].add(sentinel.connection)
+    return service.rackConnectionChanged(ident)
+
+
+def disconnect(service, ident):
+    """Simulate `ident` disconnecting; return the service's update."""
+    service.rpcService.connections[ident].discard(sentinel.connection)
+    return service.rackConnectionChanged(ident)
+
+
+class TestGetRackConnectivityMessage(MAASServerTestCase):
+
+    def test__returns_None_when_all_connected(self):
+        self.assertIsNone(get_rack_connectivity_message(0))
+
+    def test__returns_message_for_one_rack(self):
+        self.assertEqual(
+            "One rack controller is not yet connected to the region. Visit "
+            "the <a href=\"%s#/nodes?tab=controllers\">"
+            "rack controllers page</a> for more "
+            "information." % reverse('index'),
+            get_rack_connectivity_message(1))
+
+    def test__returns_message_for_many_racks(self):
+        self.assertEqual(
+            "2 rack controllers are not yet connected to the region. Visit "
+            "the <a href=\"%s#/nodes?tab=controllers\">"
+            "rack controllers page</a> for more "
+            "information." % reverse('index'),
+            get_rack_connectivity_message(2))
+
+
+class TestRackConnectivityService(MAASTransactionServerTestCase):
+    """Tests for `RackConnectivityService`."""
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__registers_and_unregisters_handlers(self):
+        rpc_service = make_rpc_service()
+        listener = Mock()
+        service = RackConnectivityService(rpc_service, listener)
+        yield service.startService()
+        self.assertThat(listener.register, MockCalledOnceWith(
+            'controller', service.consumeControllerEvent))
+        self.assertEqual(
+            {service.rackConnectionChanged},
+            rpc_service.events.connected.handlers)
+        self.assertEqual(
+            {service.rackConnectionChanged},
+            rpc_service.events.disconnected.handlers)
+        yield service.stopService()
+        self.assertThat(listener.unregister, MockCalledOnceWith(
+            'controller', service.consumeControllerEvent))
+        self.assertEqual(set(), rpc_service.events.connected.handlers)
+        self.assertEqual(set(), rpc_service.events.disconnected.handlers)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__registers_error_on_start_if_racks_are_disconnected(self):
+        yield deferToDatabase(factory.make_RackController)
+        service = RackConnectivityService(make_rpc_service())
+        yield service.startService()
+        try:
+            error = yield deferToDatabase(
+                get_persistent_error, COMPONENT.RACK_CONTROLLERS)
+            self.assertThat(error, Equals(get_rack_connectivity_message(1)))
+        finally:
+            yield service.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__discards_error_on_start_if_racks_are_connected(self):
+        rack = yield deferToDatabase(factory.make_RackController)
+        yield deferToDatabase(
+            register_persistent_error, COMPONENT.RACK_CONTROLLERS,
+            factory.make_name("error"))
+        rpc_service = make_rpc_service()
+        rpc_service.connections[rack.system_id].add(sentinel.connection)
+        service = RackConnectivityService(rpc_service)
+        yield service.startService()
+        try:
+            error = yield deferToDatabase(
+                get_persistent_error, COMPONENT.RACK_CONTROLLERS)
+            self.assertIsNone(error)
+        finally:
+            yield service.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__tracks_connects_and_disconnects(self):
+        racks = yield deferToDatabase(
+            lambda: [factory.make_RackController() for _ in range(3)])
+        rpc_service = make_rpc_service()
+        service = RackConnectivityService(rpc_service)
+        yield service.startService()
+        try:
+            yield connect(service, racks[0].system_id)
+            error = yield deferToDatabase(
+                get_persistent_error, COMPONENT.RACK_CONTROLLERS)
+            self.assertThat(error, Equals(get_rack_connectivity_message(2)))
+            yield connect(service, racks[1].system_id)
+            yield connect(service, racks[2].system_id)
+            error = yield deferToDatabase(
+                get_persistent_error, COMPONENT.RACK_CONTROLLERS)
+            self.assertIsNone(error)
+            yield disconnect(service, racks[1].system_id)
+            error = yield deferToDatabase(
+                get_persistent_error, COMPONENT.RACK_CONTROLLERS)
+            self.assertThat(error, Equals(get_rack_connectivity_message(1)))
+        finally:
+            yield service.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__only_records_transitions(self):
+        racks = yield deferToDatabase(
+            lambda: [factory.make_RackController() for _ in range(2)])
+        rpc_service = make_rpc_service()
+        service = RackConnectivityService(rpc_service)
+        yield service.startService()
+        try:
+            record = self.patch(service, "_record")
+            yield connect(service, racks[0].system_id)
+            self.assertThat(record, MockCalledOnceWith(1))
+            # A second connection from the same rack is not a transition.
+            record.reset_mock()
+            rpc_service.connections[racks[0].system_id].add(
+                sentinel.another_connection)
+            yield service.rackConnectionChanged(racks[0].system_id)
+            self.assertThat(record, MockNotCalled())
+        finally:
+            yield service.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__ignores_connections_from_unknown_racks(self):
+        rpc_service = make_rpc_service()
+        service = RackConnectivityService(rpc_service)
+        yield service.startService()
+        try:
+            update = self.patch(service, "update")
+            ident = factory.make_name("system_id")
+            rpc_service.connections[ident].add(sentinel.connection)
+            rpc_service.events.connected.fire(ident)
+            self.assertThat(update, MockNotCalled())
+        finally:
+            yield service.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__reloads_racks_on_controller_events(self):
+        rpc_service = make_rpc_service()
+        service = RackConnectivityService(rpc_service)
+        yield service.startService()
+        try:
+            rack = yield deferToDatabase(factory.make_RackController)
+            yield service.consumeControllerEvent("create", rack.system_id)
+            self.assertEqual({rack.system_id}, service.racks)
+            error = yield deferToDatabase(
+                get_persistent_error, COMPONENT.RACK_CONTROLLERS)
+            self.assertThat(error, Equals(get_rack_connectivity_message(1)))
+            yield deferToDatabase(rack.delete)
+            yield service.consumeControllerEvent("delete", rack.system_id)
+            self.assertEqual(set(), service.racks)
+            error = yield deferToDatabase(
+                get_persistent_error, COMPONENT.RACK_CONTROLLERS)
+            self.assertIsNone(error)
+        finally:
+            yield service.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__logs_failures_when_recording(self):
+        rack = yield deferToDatabase(factory.make_RackController)
+        rpc_service = make_rpc_service()
+        service = RackConnectivityService(rpc_service)
+        yield service.startService()
+        try:
+            record = self.patch(service, "_record")
+            record.side_effect = factory.make_exception()
+            log = self.patch(rack_connectivity_module, "log")
+            yield connect(service, rack.system_id)
+            self.assertThat(log.err, MockCalledOnceWith(
+                ANY, "Failed to update rack connectivity."))
+        finally:
+            yield service.stopService()
@@ -4,6 +4,7 @@
 """RPC helpers relating to rack controllers."""
 
 __all__ = [
+    "get_boot_image_peers",
     "handle_upgrade",
     "register",
     "update_interfaces",
@@ -27,6 +28,7 @@ from maasserver.models import (
     StaticIPAddress,
 )
 from maasserver.models.timestampedmodel import now
+from maasserver.routablepairs import find_addresses_between_nodes
 from maasserver.utils import synchronised
 from maasserver.utils.orm import (
     transactional,
@@ -269,3 +271,29 @@ def update_last_image_sync(system_id):
     """
     RackController.objects.filter(
         system_id=system_id).update(last_image_sync=now())
+
+
+@synchronous
+@transactional
+def get_boot_image_peers(system_id):
+    """Get the addresses of peers from which a rack can fetch boot images.
+
+    These are the other rack controllers that have synced boot images at
+    least once, with the address on each that is nearest to the given rack
+    controller, nearest first.
+
+    for :py:class:`~provisioningserver.rpc.region.GetBootImagePeers`.
+    """
+    try:
+        rack_controller = RackController.objects.get(system_id=system_id)
+    except RackController.DoesNotExist:
+        raise NoSuchNode.from_system_id(system_id)
+    peer_racks = RackController.objects.exclude(
+        id=rack_controller.id).exclude(last_image_sync=None)
+    addresses = find_addresses_between_nodes({rack_controller}, peer_racks)
+    peers, seen = [], set()
+    for _, _, peer_rack, peer_ip in addresses:
+        if peer_rack not in seen:
+            seen.add(peer_rack)
+            peers.append(str(peer_ip))
+    return {"peers": peers}
@@ -28,6 +28,7 @@ from maasserver import (
     locks,
 )
 from maasserver.bootresources import get_simplestream_endpoint
+from maasserver.clusterrpc.boot_images import rack_boot_images_cache
 from maasserver.enum import SERVICE_STATUS
 from maasserver.models.node import (
     Node,
@@ -309,6 +310,16 @@ class Region(RPCProtocol):
         d.addCallback(lambda args: {})
         return d
 
+    @region.GetBootImagePeers.responder
+    def get_boot_image_peers(self, system_id):
+        """get_boot_image_peers()
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.region.GetBootImagePeers`.
+        """
+        return deferToDatabase(
+            rackcontrollers.get_boot_image_peers, system_id)
+
     @region.UpdateNodePowerState.responder
     def update_node_power_state(self, system_id, power_state):
         """update_node_power_state()
@@ -654,6 +665,10 @@ class RegionServer(Region):
 
             yield self.initResponder(rack_controller)
 
+            # The rack controller may have lost or gained images while it
+            # was disconnected, so ask it again next time.
+            rack_boot_images_cache.discard(self.ident)
+
             # Rack controller is now registered. Log this status.
             log.msg(
                 "Process [%s] - registered rack controller '%s'." % (
@@ -29,6 +29,7 @@ from maasserver.models.interface import PhysicalInterface
 from maasserver.models.timestampedmodel import now
 from maasserver.rpc import rackcontrollers
 from maasserver.rpc.rackcontrollers import (
+    get_boot_image_peers,
     handle_upgrade,
     register,
     report_neighbours,
@@ -43,6 +44,7 @@ from maastesting.matchers import (
     DocTestMatches,
     MockCalledOnceWith,
 )
+from provisioningserver.rpc.exceptions import NoSuchNode
 from testtools.matchers import (
     IsInstance,
     MatchesAll,
@@ -500,3 +502,42 @@ class TestUpdateLastImageSync(MAASServerTestCase):
         update_last_image_sync(rack.system_id)
 
         self.assertEqual(now(), reload_object(rack).last_image_sync)
+
+
+class TestGetBootImagePeers(MAASServerTestCase):
+
+    def make_rack_on_subnet(self, subnet, **kwargs):
+        rack = factory.make_RackController(**kwargs)
+        address = factory.make_StaticIPAddress(
+            interface=factory.make_Interface(node=rack), subnet=subnet)
+        return rack, address
+
+    def test__raises_NoSuchNode_for_unknown_rack(self):
+        self.assertRaises(
+            NoSuchNode, get_boot_image_peers, factory.make_name("system_id"))
+
+    def test__returns_nearest_address_of_synced_peers(self):
+        subnet = factory.make_Subnet()
+        rack, _ = self.make_rack_on_subnet(subnet)
+        peer, peer_address = self.make_rack_on_subnet(
+            subnet, last_image_sync=now())
+        factory.make_StaticIPAddress(
+            interface=factory.make_Interface(node=peer))
+        self.assertEqual(
+            {"peers": [peer_address.ip]},
+            get_boot_image_peers(rack.system_id))
+
+    def test__excludes_peers_that_have_not_synced(self):
+        subnet = factory.make_Subnet()
+        rack, _ = self.make_rack_on_subnet(subnet)
+        self.make_rack_on_subnet(subnet, last_image_sync=None)
+        self.assertEqual(
+            {"peers": []}, get_boot_image_peers(rack.system_id))
+
+    def test__excludes_unroutable_peers(self):
+        rack, _ = self.make_rack_on_subnet(factory.make_Subnet())
+        self.make_rack_on_subnet(
+            factory.make_Subnet(space=factory.make_Space()),
+            last_image_sync=now())
+        self.assertEqual(
+            {"peers": []}, get_boot_image_peers(rack.system_id))
@@ -519,6 +519,23 @@ class TestRegionServer(MAASTransactionServerTestCase):
             mock_addConnectionFor,
             MockCalledOnceWith(rack_controller.system_id, protocol))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_register_discards_cached_boot_images(self):
+        yield self.installFakeRegionAdvertisingService()
+        rack_controller = yield deferToDatabase(factory.make_RackController)
+        protocol = self.make_Region()
+        protocol.transport = MagicMock()
+        cache = self.patch(regionservice, "rack_boot_images_cache")
+        yield call_responder(
+            protocol, RegisterRackController, {
+                "system_id": rack_controller.system_id,
+                "hostname": rack_controller.hostname,
+                "interfaces": {},
+            })
+        self.assertThat(
+            cache.discard, MockCalledOnceWith(rack_controller.system_id))
+
     @wait_for_reactor
     @inlineCallbacks
     def test_register_sets_hosts(self):
@@ -47,6 +47,7 @@ from maasserver.rpc.nodes import (
     get_controller_type,
     get_time_configuration,
 )
+from maasserver.rpc.rackcontrollers import get_boot_image_peers
 from maasserver.rpc.regionservice import Region
 from maasserver.rpc.services import update_services
 from maasserver.security import get_shared_secret
@@ -77,6 +78,7 @@ from provisioningserver.rpc.region import (
     CreateNode,
     GetArchiveMirrors,
     GetBootConfig,
+    GetBootImagePeers,
     GetBootSources,
     GetBootSourcesV2,
     GetControllerType,
@@ -1357,3 +1359,36 @@ class TestRegionProtocol_GetTimeConfiguration(MAASTransactionServerTestCase):
         arguments = {"system_id": factory.make_name("id")}
         d = call_responder(Region(), GetTimeConfiguration, arguments)
         return assert_fails_with(d, NoSuchNode)
+
+
+class TestRegionProtocol_GetBootImagePeers(MAASTransactionServerTestCase):
+
+    def test_get_boot_image_peers_is_registered(self):
+        protocol = Region()
+        responder = protocol.locateResponder(
+            GetBootImagePeers.commandName)
+        self.assertIsNotNone(responder)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_calls_get_boot_image_peers(self):
+        example_response = {
+            "peers": [
+                factory.make_ipv4_address(),
+                factory.make_ipv6_address(),
+            ],
+        }
+        deferToDatabase = self.patch(regionservice, 'deferToDatabase')
+        deferToDatabase.return_value = succeed(example_response)
+        system_id = factory.make_name("id")
+        response = yield call_responder(
+            Region(), GetBootImagePeers, {'system_id': system_id})
+        self.assertThat(response, Equals(example_response))
+        self.assertThat(deferToDatabase, MockCalledOnceWith(
+            get_boot_image_peers, system_id))
+
+    @wait_for_reactor
+    def test_raises_NoSuchNode_when_node_does_not_exist(self):
+        arguments = {"system_id": factory.make_name("id")}
+        d = call_responder(Region(), GetBootImagePeers, arguments)
+        return assert_fails_with(d, NoSuchNode)
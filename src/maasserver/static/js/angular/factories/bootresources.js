@@ -4,15 +4,14 @@
  * MAAS BootResource Manager
  *
  * Manager for the boot resources. This manager is unique from all the other
- * managers because it uses polling instead of having the region push the
- * information.
+ * managers because it loads its data by polling.
  *
  * Why is it polling?
  * The boot resource information is split between the region controller and
- * all rack controllers. The region controller does not cache any information
- * about a rack controllers images it contacts the rack as its source of truth.
- * This means that the client needs to use polling so the region controller
- * can ask each rack controller what is the status of your images.
+ * all rack controllers. The region caches the images on each rack controller
+ * and pushes changes to everything else once the data has been polled, but
+ * whether a rack controller is importing images is only known by asking it.
+ * Polling, at a slow rate, keeps that up to date.
  */
 
 angular.module('MAAS').factory(
@@ -36,7 +35,7 @@ angular.module('MAAS').factory(
 
             // Amount of time in milliseconds the manager should wait to poll
             // for new data.
-            this._pollTimeout = 10000;
+            this._pollTimeout = 60000;
 
             // Amount of time in milliseconds the manager should wait to poll
             // for new data when an error occurs.
@@ -45,6 +44,13 @@ angular.module('MAAS').factory(
             // Amount of time in milliseconds the manager should wait to poll
             // for new data when the retrieved data is empty.
             this._pollEmptyTimeout = 3000;
+
+            // Listen for the changes pushed by the region.
+            var self = this;
+            RegionConnection.registerNotifier("bootresource",
+                function(action, data) {
+                    self.onNotify(action, data);
+                });
         }
 
         // Return the data.
@@ -62,6 +68,39 @@ angular.module('MAAS').factory(
             return this._polling;
         };
 
+        // Apply the changes pushed by the region since the last poll.
+        BootResourcesManager.prototype.onNotify = function(action, changes) {
+            if(!this._loaded || action !== "update") {
+                return;
+            }
+            var self = this;
+            angular.forEach(changes, function(value, key) {
+                if(key !== "resources" && key !== "removed_resources") {
+                    self._data[key] = value;
+                }
+            });
+            var resources = this._data.resources;
+            angular.forEach(changes.resources, function(resource) {
+                var i;
+                for(i = 0; i < resources.length; i++) {
+                    if(resources[i].id === resource.id) {
+                        resources[i] = resource;
+                        return;
+                    }
+                }
+                resources.push(resource);
+            });
+            angular.forEach(changes.removed_resources, function(id) {
+                var i;
+                for(i = 0; i < resources.length; i++) {
+                    if(resources[i].id === id) {
+                        resources.splice(i, 1);
+                        return;
+                    }
+                }
+            });
+        };
+
         // Starts the polling for data.
         BootResourcesManager.prototype.startPolling = function() {
             if(!this._polling) {
@@ -35,7 +35,7 @@ describe("BootResourcesManager", function() {
         expect(BootResourcesManager._data).toEqual({});
         expect(BootResourcesManager._polling).toBe(false);
         expect(BootResourcesManager._nextPromise).toBeNull();
-        expect(BootResourcesManager._pollTimeout).toBe(10000);
+        expect(BootResourcesManager._pollTimeout).toBe(60000);
         expect(BootResourcesManager._pollErrorTimeout).toBe(500);
         expect(BootResourcesManager._pollEmptyTimeout).toBe(3000);
     });
@@ -85,6 +85,53 @@ describe("BootResourcesManager", function() {
         });
     });
 
+    describe("onNotify", function() {
+
+        beforeEach(function() {
+            BootResourcesManager._loaded = true;
+            BootResourcesManager._data.resources = [
+                {id: 1, status: "Queued"},
+                {id: 2, status: "Synced"}
+            ];
+            BootResourcesManager._data.rack_import_running = false;
+        });
+
+        it("applies changed keys", function() {
+            BootResourcesManager.onNotify(
+                "update", {rack_import_running: true});
+            expect(BootResourcesManager._data.rack_import_running).toBe(true);
+        });
+
+        it("replaces changed and adds new resources", function() {
+            BootResourcesManager.onNotify("update", {
+                resources: [
+                    {id: 1, status: "Downloading"},
+                    {id: 3, status: "Queued"}
+                ]
+            });
+            expect(BootResourcesManager._data.resources).toEqual([
+                {id: 1, status: "Downloading"},
+                {id: 2, status: "Synced"},
+                {id: 3, status: "Queued"}
+            ]);
+        });
+
+        it("removes resources", function() {
+            BootResourcesManager.onNotify(
+                "update", {removed_resources: [1]});
+            expect(BootResourcesManager._data.resources).toEqual([
+                {id: 2, status: "Synced"}
+            ]);
+        });
+
+        it("does nothing until loaded", function() {
+            BootResourcesManager._loaded = false;
+            BootResourcesManager.onNotify(
+                "update", {rack_import_running: true});
+            expect(BootResourcesManager._data.rack_import_running).toBe(false);
+        });
+    });
+
     describe("stopPolling", function() {
 
         it("clears _polling and cancels _nextPromise", function() {
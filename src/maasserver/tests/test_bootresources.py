@@ -122,6 +122,7 @@ from testtools.matchers import (
     ContainsAll,
     Equals,
     HasLength,
+    MatchesStructure,
     Not,
 )
 from twisted.application.internet import TimerService
@@ -692,6 +693,13 @@ def make_boot_resource_group_from_product(product):
 
 class TestBootResourceStore(MAASServerTestCase):
 
+    def test_init_reads_download_options_from_configuration(self):
+        self.useFixture(RegionConfigurationFixture(
+            image_download_concurrency=5, image_download_rate_limit=1000))
+        store = BootResourceStore()
+        self.assertEqual(5, store.write_threads)
+        self.assertEqual(1000, store.limiter.rate)
+
     def make_boot_resources(self):
         resources = [
             factory.make_BootResource(rtype=BOOT_RESOURCE_TYPE.SYNCED)
@@ -1553,6 +1561,16 @@ class TestImportImages(MAASTransactionServerTestCase):
             source_url, store, None, None)
         self.assertEqual(1, len(fake_sync.mock_calls))
 
+    def test_download_boot_resources_passes_mirror_to_writer(self):
+        self.patch(bootresources.BootResourceRepoWriter, 'sync')
+        store = BootResourceStore()
+        mirror = factory.make_simple_http_url() + "/"
+        writer = self.patch_autospec(bootresources, "BootResourceRepoWriter")
+        download_boot_resources(
+            mirror + "streams/v1/index.json", store, None, None)
+        self.assertThat(
+            writer, MockCalledOnceWith(store, None, mirror=mirror))
+
     def test_download_boot_resources_passes_user_agent(self):
         self.patch(bootresources.BootResourceRepoWriter, 'sync')
         store = BootResourceStore()
@@ -2241,6 +2259,24 @@ class TestBootResourceRepoWriter(MAASServerTestCase):
         boot_resource_repo_writer.insert_item(data, src, None, pedigree, None)
         self.assertThat(mock_insert, MockNotCalled())
 
+    def test_insert_reads_resumably_from_mirror(self):
+        mirror = factory.make_simple_http_url() + "/"
+        boot_resource_repo_writer = BootResourceRepoWriter(
+            BootResourceStore(), None, mirror=mirror)
+        src, product, version = self.create_ubuntu_simplestream([
+            BOOT_RESOURCE_FILE_TYPE.SQUASHFS_IMAGE,
+        ])
+        data = src['products'][product]['versions'][version]['items'][
+            BOOT_RESOURCE_FILE_TYPE.SQUASHFS_IMAGE]
+        pedigree = (product, version, BOOT_RESOURCE_FILE_TYPE.SQUASHFS_IMAGE)
+        mock_insert = self.patch(boot_resource_repo_writer.store, 'insert')
+        boot_resource_repo_writer.insert_item(data, src, None, pedigree, None)
+        self.assertThat(mock_insert, MockCalledOnceWith(ANY, ANY))
+        [item, reader] = mock_insert.call_args[0]
+        self.assertThat(reader, MatchesStructure.byEquality(
+            url=mirror + data['path'], offset=0,
+            limiter=boot_resource_repo_writer.store.limiter))
+
     def test_insert_prefers_squashfs_over_root_image(self):
         boot_resource_repo_writer = BootResourceRepoWriter(
             BootResourceStore(), None)
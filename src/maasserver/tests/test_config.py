@@ -5,6 +5,8 @@
 
 __all__ = []
 
+import random
+
 import formencode.api
 from maasserver.config import RegionConfiguration
 from maastesting.factory import factory
@@ -62,6 +64,47 @@ class TestRegionConfiguration(MAASTestCase):
         self.assertEqual({"maas_url": example_url}, config.store)
 
 
+class TestRegionConfigurationImageDownloadOptions(MAASTestCase):
+    """Tests for the image download options in `RegionConfiguration`."""
+
+    scenarios = (
+        ("concurrency", {
+            "option": "image_download_concurrency", "default": 2}),
+        ("rate_limit", {
+            "option": "image_download_rate_limit", "default": 0}),
+    )
+
+    def test__default(self):
+        config = RegionConfiguration({})
+        self.assertEqual(self.default, getattr(config, self.option))
+
+    def test__set_and_get(self):
+        config = RegionConfiguration({})
+        example_value = random.randint(1, 1000)
+        setattr(config, self.option, str(example_value))
+        self.assertEqual(example_value, getattr(config, self.option))
+        self.assertEqual({self.option: example_value}, config.store)
+
+
+class TestRegionConfigurationStatusOptions(MAASTestCase):
+    """Tests for the status message options in `RegionConfiguration`."""
+
+    def test__status_flush_interval_defaults_to_60_seconds(self):
+        config = RegionConfiguration({})
+        self.assertEqual(60, config.status_flush_interval)
+
+    def test__status_flush_interval_set_and_get(self):
+        config = RegionConfiguration({})
+        config.status_flush_interval = "5"
+        self.assertEqual(5, config.status_flush_interval)
+        self.assertEqual({"status_flush_interval": 5}, config.store)
+
+    def test__status_flush_interval_must_be_positive(self):
+        config = RegionConfiguration({})
+        with ExpectedException(formencode.api.Invalid):
+            config.status_flush_interval = "0"
+
+
 class TestRegionConfigurationDatabaseOptions(MAASTestCase):
     """Tests for the database options in `RegionConfiguration`."""
 
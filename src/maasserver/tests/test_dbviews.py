@@ -7,9 +7,12 @@ __all__ = []
 
 from django.db import connection
 from maasserver.dbviews import (
+    _ALL_MATERIALIZED_VIEWS,
     _ALL_VIEWS,
+    drop_all_views,
     register_all_views,
 )
+from maasserver.enum import NODE_STATUS
 from maasserver.models.subnet import Subnet
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
@@ -31,6 +34,33 @@ class TestDatabaseViews(MAASServerTestCase):
             with connection.cursor() as cursor:
                 cursor.execute("SELECT * from %s;" % view_name)
 
+    def test_each_materialized_view_can_be_used(self):
+        register_all_views()
+        for view_name in _ALL_MATERIALIZED_VIEWS:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT * from %s;" % view_name)
+
+    def test_materialized_views_are_populated_from_source(self):
+        factory.make_Discovery()
+        factory.make_Node(status=NODE_STATUS.DEPLOYED)
+        drop_all_views()
+        register_all_views()
+        for view_name, (source_name, _) in _ALL_MATERIALIZED_VIEWS.items():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT * from %s;" % view_name)
+                materialized = cursor.fetchall()
+                cursor.execute("SELECT * from %s;" % source_name)
+                self.assertItemsEqual(cursor.fetchall(), materialized)
+                self.assertNotEqual([], materialized)
+
+    def test_drop_all_views_drops_materialized_views_that_were_views(self):
+        drop_all_views()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE VIEW maasserver_discovery AS SELECT 1 AS id;")
+        drop_all_views()
+        register_all_views()
+
 
 class TestRoutablePairs(MAASServerTestCase):
     """Tests for the `maasserver_routable_pairs` view."""
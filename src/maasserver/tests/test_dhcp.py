@@ -7,7 +7,11 @@ __all__ = []
 
 from operator import itemgetter
 import random
-from unittest.mock import ANY
+from unittest.mock import (
+    ANY,
+    call,
+    Mock,
+)
 
 from crochet import wait_for
 from django.core.exceptions import ValidationError
@@ -39,8 +43,13 @@ from maasserver.utils.threads import deferToDatabase
 from maastesting.djangotestcase import count_queries
 from maastesting.matchers import (
     MockCalledOnceWith,
+    MockCallsMatch,
     MockNotCalled,
 )
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
 from maastesting.twisted import (
     always_fail_with,
     always_succeed_with,
@@ -49,19 +58,30 @@ from netaddr import (
     IPAddress,
     IPNetwork,
 )
+from provisioningserver.dhcp.testing.config import (
+    make_failover_peer_config,
+    make_host,
+    make_interface,
+    make_shared_network,
+)
 from provisioningserver.rpc.cluster import (
     ConfigureDHCPv4,
     ConfigureDHCPv4_V2,
     ConfigureDHCPv6,
     ConfigureDHCPv6_V2,
+    UpdateDHCPv4,
     ValidateDHCPv4Config,
     ValidateDHCPv4Config_V2,
     ValidateDHCPv6Config,
     ValidateDHCPv6Config_V2,
 )
 from provisioningserver.rpc.dhcp import downgrade_shared_networks
-from provisioningserver.rpc.exceptions import CannotConfigureDHCP
+from provisioningserver.rpc.exceptions import (
+    CannotConfigureDHCP,
+    DHCPStateMismatch,
+)
 from provisioningserver.utils.twisted import synchronous
+from testtools import ExpectedException
 from testtools.matchers import (
     AllMatch,
     ContainsAll,
@@ -76,6 +96,7 @@ from testtools.matchers import (
 from twisted.internet import defer
 from twisted.internet.defer import inlineCallbacks
 from twisted.internet.threads import deferToThread
+from twisted.protocols import amp
 
 
 wait_for_reactor = wait_for(30)  # 30 seconds.
@@ -1324,6 +1345,45 @@ class TestMakeHostsForSubnet(MAASServerTestCase):
 
         self.assertEqual(expected_hosts, dhcp.make_hosts_for_subnets([subnet]))
 
+    def tests__query_count_is_constant(self):
+        vlan = factory.make_VLAN()
+        subnet = factory.make_Subnet(vlan=vlan)
+
+        def make_hosts(count):
+            for _ in range(count):
+                node = factory.make_Node(interface=False)
+                factory.make_DHCPSnippet(node=node, enabled=True)
+                eth0 = factory.make_Interface(
+                    INTERFACE_TYPE.PHYSICAL, node=node, vlan=vlan)
+                eth1 = factory.make_Interface(
+                    INTERFACE_TYPE.PHYSICAL, node=node, vlan=vlan)
+                bond0 = factory.make_Interface(
+                    INTERFACE_TYPE.BOND, node=node, parents=[eth0, eth1],
+                    vlan=vlan)
+                factory.make_StaticIPAddress(
+                    alloc_type=IPADDRESS_TYPE.STICKY, subnet=subnet,
+                    interface=bond0)
+            return list(DHCPSnippet.objects.select_related('value'))
+
+        dhcp_snippets = make_hosts(3)
+        query_3_count, hosts_3 = count_queries(
+            dhcp.make_hosts_for_subnets, [subnet], dhcp_snippets)
+        dhcp_snippets = make_hosts(3)
+        query_6_count, hosts_6 = count_queries(
+            dhcp.make_hosts_for_subnets, [subnet], dhcp_snippets)
+
+        # Each bond and both its parents are hosts.
+        self.assertEqual((9, 18), (len(hosts_3), len(hosts_6)))
+        # This check is to notify the developer that a change was made that
+        # affects the number of queries performed when performing this
+        # operation. It is important to keep this number as low as possible.
+        self.assertEqual(
+            query_3_count, 2,
+            "Number of queries has changed; make sure this is expected.")
+        self.assertEqual(
+            query_3_count, query_6_count,
+            "Number of queries is not independent to the number of hosts.")
+
 
 class TestMakeFailoverPeerConfig(MAASServerTestCase):
     """Tests for `make_failover_peer_config`."""
@@ -1918,6 +1978,123 @@ class TestConfigureDHCP(MAASTransactionServerTestCase):
         yield deferToDatabase(service_status_updated)
 
 
+class TestPushDHCPConfig(MAASTestCase):
+    """Tests for `_push_dhcp_config`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super().setUp()
+        self.patch(dhcp, "_pushed_dhcp_states", {})
+
+    def make_args(self):
+        return dict(
+            omapi_key=factory.make_name("omapi_key"),
+            failover_peers=[make_failover_peer_config()],
+            shared_networks=[make_shared_network() for _ in range(2)],
+            hosts=[make_host() for _ in range(3)],
+            interfaces=[make_interface()],
+            global_dhcp_snippets=[])
+
+    def make_client(self, *results):
+        client = Mock(ident=factory.make_name("system_id"))
+        client.side_effect = [
+            defer.fail(result) if isinstance(result, Exception)
+            else defer.succeed(result)
+            for result in results
+        ]
+        return client
+
+    def push(self, client, args):
+        return dhcp._push_dhcp_config(
+            client, UpdateDHCPv4, ConfigureDHCPv4_V2, ConfigureDHCPv4,
+            **args)
+
+    @inlineCallbacks
+    def test__pushes_whole_configuration_first(self):
+        args = self.make_args()
+        client = self.make_client({})
+        yield self.push(client, args)
+        version = dhcp.make_pushed_dhcp_state(**args).version
+        self.assertThat(client, MockCalledOnceWith(
+            UpdateDHCPv4, version=version, **args))
+
+    @inlineCallbacks
+    def test__pushes_only_changes_from_pushed_version(self):
+        args = self.make_args()
+        client = self.make_client({}, {})
+        yield self.push(client, args)
+        base_version = dhcp.make_pushed_dhcp_state(**args).version
+        new_args = dict(
+            args, shared_networks=args["shared_networks"][1:],
+            hosts=args["hosts"][1:] + [make_host()])
+        new_args["hosts"][0] = dict(new_args["hosts"][0], ip="10.0.0.1")
+        yield self.push(client, new_args)
+        version = dhcp.make_pushed_dhcp_state(**new_args).version
+        self.assertThat(client, MockCallsMatch(
+            call(UpdateDHCPv4, version=base_version, **args),
+            call(
+                UpdateDHCPv4, version=version, base_version=base_version,
+                **dict(
+                    new_args, shared_networks=[],
+                    removed_shared_networks=[
+                        args["shared_networks"][0]["name"]],
+                    hosts=[new_args["hosts"][0], new_args["hosts"][2]],
+                    removed_hosts=[args["hosts"][0]["mac"]]))))
+
+    @inlineCallbacks
+    def test__pushes_whole_configuration_on_mismatch(self):
+        args = self.make_args()
+        client = self.make_client({}, DHCPStateMismatch(), {})
+        yield self.push(client, args)
+        yield self.push(client, args)
+        version = dhcp.make_pushed_dhcp_state(**args).version
+        self.assertThat(client, MockCallsMatch(
+            call(UpdateDHCPv4, version=version, **args),
+            call(
+                UpdateDHCPv4, version=version, base_version=version,
+                **dict(
+                    args, shared_networks=[], removed_shared_networks=[],
+                    hosts=[], removed_hosts=[])),
+            call(UpdateDHCPv4, version=version, **args)))
+
+    @inlineCallbacks
+    def test__falls_back_to_configure_for_older_racks(self):
+        args = self.make_args()
+        client = self.make_client(amp.UnhandledCommand(), {})
+        yield self.push(client, args)
+        version = dhcp.make_pushed_dhcp_state(**args).version
+        self.assertThat(client, MockCallsMatch(
+            call(UpdateDHCPv4, version=version, **args),
+            call(ConfigureDHCPv4_V2, **args)))
+        self.assertEqual({}, dhcp._pushed_dhcp_states)
+
+    @inlineCallbacks
+    def test__forgets_pushed_version_on_failure(self):
+        args = self.make_args()
+        client = self.make_client({}, CannotConfigureDHCP())
+        yield self.push(client, args)
+        with ExpectedException(CannotConfigureDHCP):
+            yield self.push(client, args)
+        self.assertEqual({}, dhcp._pushed_dhcp_states)
+
+    def test_make_pushed_dhcp_state_version_ignores_order(self):
+        args = self.make_args()
+        reordered = dict(
+            args, shared_networks=args["shared_networks"][::-1],
+            hosts=args["hosts"][::-1])
+        self.assertEqual(
+            dhcp.make_pushed_dhcp_state(**args).version,
+            dhcp.make_pushed_dhcp_state(**reordered).version)
+
+    def test_make_pushed_dhcp_state_version_changes_with_config(self):
+        args = self.make_args()
+        changed = dict(args, hosts=args["hosts"] + [make_host()])
+        self.assertNotEqual(
+            dhcp.make_pushed_dhcp_state(**args).version,
+            dhcp.make_pushed_dhcp_state(**changed).version)
+
+
 class TestValidateDHCPConfig(MAASTransactionServerTestCase):
     """Tests for `validate_dhcp_config`."""
 
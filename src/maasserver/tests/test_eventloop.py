@@ -18,6 +18,7 @@ from maasserver import (
     bootresources,
     eventloop,
     ipc,
+    largeobjects_cleanup,
     nonces_cleanup,
     rack_controller,
     region_controller,
@@ -30,8 +31,14 @@ from maasserver.eventloop import (
     DEFAULT_PORT,
     MAASServices,
 )
-from maasserver.regiondservices import service_monitor_service
+from maasserver.regiondservices import (
+    allocation_cache,
+    config_cache,
+    rack_connectivity,
+    service_monitor_service,
+)
 from maasserver.rpc import regionservice
+from maasserver.testing.config import RegionConfigurationFixture
 from maasserver.testing.eventloop import RegionEventLoopFixture
 from maasserver.testing.listener import FakePostgresListenerService
 from maasserver.testing.testcase import MAASServerTestCase
@@ -44,6 +51,7 @@ from maastesting.factory import factory
 from maastesting.matchers import MockCallsMatch
 from maastesting.testcase import MAASTestCase
 from metadataserver import api_twisted
+from provisioningserver.utils import loadstats
 from provisioningserver.utils.twisted import asynchronous
 from testtools.matchers import (
     Equals,
@@ -340,6 +348,33 @@ class TestFactories(MAASTestCase):
         self.assertTrue(
             eventloop.loop.factories["nonce-cleanup"]["only_on_master"])
 
+    def test_make_LargeObjectGarbageService(self):
+        service = eventloop.make_LargeObjectGarbageService()
+        self.assertThat(service, IsInstance(
+            largeobjects_cleanup.LargeObjectGarbageService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_LargeObjectGarbageService,
+            eventloop.loop.factories["largeobject-cleanup"]["factory"])
+        self.assertTrue(
+            eventloop.loop.factories["largeobject-cleanup"]["only_on_master"])
+
+    def test_make_LoadMonitorService(self):
+        service = eventloop.make_LoadMonitorService()
+        self.assertThat(service, IsInstance(loadstats.LoadMonitorService))
+        # It is registered as a factory in RegionEventLoop, for the master
+        # and for workers, but not twice in the all-in-one process.
+        factories = eventloop.loop.factories
+        self.assertIs(
+            eventloop.make_LoadMonitorService,
+            factories["load-monitor-master"]["factory"])
+        self.assertTrue(factories["load-monitor-master"]["only_on_master"])
+        self.assertIs(
+            eventloop.make_LoadMonitorService,
+            factories["load-monitor-worker"]["factory"])
+        self.assertFalse(factories["load-monitor-worker"]["only_on_master"])
+        self.assertTrue(factories["load-monitor-worker"]["not_all_in_one"])
+
     def test_make_StatusMonitorService(self):
         service = eventloop.make_StatusMonitorService()
         self.assertThat(service, IsInstance(
@@ -413,6 +448,79 @@ class TestFactories(MAASTestCase):
         self.assertFalse(
             eventloop.loop.factories["rack-controller"]["only_on_master"])
 
+    def test_make_ConfigCacheService(self):
+        service = eventloop.make_ConfigCacheService(
+            FakePostgresListenerService())
+        self.assertThat(service, IsInstance(
+            config_cache.ConfigCacheService))
+        # It is registered as a factory in RegionEventLoop for both the
+        # master and the workers.
+        self.assertIs(
+            eventloop.make_ConfigCacheService,
+            eventloop.loop.factories["config-cache-master"]["factory"])
+        self.assertIs(
+            eventloop.make_ConfigCacheService,
+            eventloop.loop.factories["config-cache-worker"]["factory"])
+        # Each has a dependency on the postgres-listener in its process.
+        self.assertEquals(
+            ["postgres-listener-master"],
+            eventloop.loop.factories["config-cache-master"]["requires"])
+        self.assertTrue(
+            eventloop.loop.factories["config-cache-master"]["only_on_master"])
+        self.assertEquals(
+            ["postgres-listener-worker"],
+            eventloop.loop.factories["config-cache-worker"]["requires"])
+        self.assertFalse(
+            eventloop.loop.factories["config-cache-worker"]["only_on_master"])
+        # The cache is shared, so only one service runs in all-in-one.
+        self.assertTrue(
+            eventloop.loop.factories["config-cache-worker"]["not_all_in_one"])
+
+    def test_make_SubnetAllocationCacheService(self):
+        service = eventloop.make_SubnetAllocationCacheService(
+            FakePostgresListenerService())
+        self.assertThat(service, IsInstance(
+            allocation_cache.SubnetAllocationCacheService))
+        # It is registered as a factory in RegionEventLoop for both the
+        # master and the workers.
+        factories = eventloop.loop.factories
+        self.assertIs(
+            eventloop.make_SubnetAllocationCacheService,
+            factories["allocation-cache-master"]["factory"])
+        self.assertIs(
+            eventloop.make_SubnetAllocationCacheService,
+            factories["allocation-cache-worker"]["factory"])
+        # Each has a dependency on the postgres-listener in its process.
+        self.assertEquals(
+            ["postgres-listener-master"],
+            factories["allocation-cache-master"]["requires"])
+        self.assertTrue(
+            factories["allocation-cache-master"]["only_on_master"])
+        self.assertEquals(
+            ["postgres-listener-worker"],
+            factories["allocation-cache-worker"]["requires"])
+        self.assertFalse(
+            factories["allocation-cache-worker"]["only_on_master"])
+        # The cache is shared, so only one service runs in all-in-one.
+        self.assertTrue(
+            factories["allocation-cache-worker"]["not_all_in_one"])
+
+    def test_make_RackConnectivityService(self):
+        service = eventloop.make_RackConnectivityService(
+            sentinel.rpc, FakePostgresListenerService())
+        self.assertThat(service, IsInstance(
+            rack_connectivity.RackConnectivityService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_RackConnectivityService,
+            eventloop.loop.factories["rack-connectivity"]["factory"])
+        # Has a dependency of rpc and postgres-listener.
+        self.assertEquals(
+            ["rpc", "postgres-listener-worker"],
+            eventloop.loop.factories["rack-connectivity"]["requires"])
+        self.assertFalse(
+            eventloop.loop.factories["rack-connectivity"]["only_on_master"])
+
     def test_make_ServiceMonitorService(self):
         service = eventloop.make_ServiceMonitorService(
             sentinel.rpc_advertise)
@@ -430,10 +538,13 @@ class TestFactories(MAASTestCase):
             eventloop.loop.factories["service-monitor"]["only_on_master"])
 
     def test_make_StatusWorkerService(self):
+        self.useFixture(RegionConfigurationFixture(status_flush_interval=5))
         service = eventloop.make_StatusWorkerService(
             sentinel.dbtasks)
         self.assertThat(service, IsInstance(
             api_twisted.StatusWorkerService))
+        # The flush interval is read from the region's configuration.
+        self.assertEqual(5, service.step)
         # It is registered as a factory in RegionEventLoop.
         self.assertIs(
             eventloop.make_StatusWorkerService,
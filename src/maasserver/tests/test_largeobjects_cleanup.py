@@ -0,0 +1,144 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.largeobjects_cleanup`."""
+
+__all__ = []
+
+from unittest.mock import call
+
+from crochet import wait_for
+from django.db import connection
+from maasserver import largeobjects_cleanup
+from maasserver.largeobjects_cleanup import LargeObjectGarbageService
+from maasserver.models import OrphanedLargeObject
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASTransactionServerTestCase
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from maastesting.matchers import (
+    DocTestMatches,
+    MockCallsMatch,
+)
+from maastesting.runtest import MAASCrochetRunTest
+from maastesting.testcase import MAASTestCase
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.utils.twisted import pause
+from twisted.internet.defer import (
+    fail,
+    inlineCallbacks,
+    succeed,
+)
+from twisted.internet.task import Clock
+
+
+class TestLargeObjectGarbageService(MAASTestCase):
+    """Tests for `LargeObjectGarbageService`."""
+
+    run_tests_with = MAASCrochetRunTest
+
+    def make_service(self, *results):
+        deferToDatabase = self.patch(largeobjects_cleanup, "deferToDatabase")
+        deferToDatabase.side_effect = [succeed(result) for result in results]
+        service = LargeObjectGarbageService(
+            interval=3600, batch_size=10, delay=2.0)
+        service.clock = Clock()
+        return service, deferToDatabase
+
+    def test_sweeps_and_collects_on_start(self):
+        service, deferToDatabase = self.make_service(0, (0, 0, False))
+        service.startService()
+        self.assertTrue(service._loop.running)
+        self.assertThat(deferToDatabase, MockCallsMatch(
+            call(service._sweep), call(service._collect)))
+        service.stopService()
+        self.assertFalse(service.running)
+        self.assertFalse(service._loop.running)
+
+    def test_pauses_between_batches(self):
+        service, deferToDatabase = self.make_service(
+            2, (10, 1500, True), (3, 500, False))
+        with TwistedLoggerFixture() as logger:
+            service.startService()
+            self.assertEqual(2, deferToDatabase.call_count)
+            service.clock.advance(1.9)
+            self.assertEqual(2, deferToDatabase.call_count)
+            service.clock.advance(0.1)
+            self.assertEqual(3, deferToDatabase.call_count)
+            service.stopService()
+        self.assertThat(logger.output, DocTestMatches(
+            "Collected 13 orphaned large object(s), freeing 2.0 kB."))
+
+    def test_logs_nothing_when_nothing_collected(self):
+        service, _ = self.make_service(0, (0, 0, False))
+        with TwistedLoggerFixture() as logger:
+            service.startService()
+            service.stopService()
+        self.assertEqual("", logger.output)
+
+    def test_stops_collecting_when_stopped(self):
+        service, deferToDatabase = self.make_service(0, (10, 1500, True))
+        service.startService()
+        d = service.stopService()
+        service.clock.advance(service.delay)
+        self.assertTrue(d.called)
+        self.assertEqual(2, deferToDatabase.call_count)
+
+    def test_failures_are_logged(self):
+        deferToDatabase = self.patch(largeobjects_cleanup, "deferToDatabase")
+        deferToDatabase.return_value = fail(factory.make_exception())
+        service = LargeObjectGarbageService()
+        service.clock = Clock()
+        with TwistedLoggerFixture() as logger:
+            service.startService()
+            service.stopService()
+        self.assertThat(logger.output, DocTestMatches(
+            """\
+            Failure when collecting large objects.
+            Traceback (most recent call last):...
+            Failure: maastesting.factory.TestException#...
+            """))
+        self.assertFalse(service.running)
+
+
+class TestLargeObjectGarbageServiceWithDatabase(
+        MAASTransactionServerTestCase):
+    """Tests for `LargeObjectGarbageService` with the database."""
+
+    run_tests_with = MAASCrochetRunTest
+
+    @transactional
+    def makeOrphans(self, count):
+        largefiles = [factory.make_LargeFile() for _ in range(count)]
+        for largefile in largefiles:
+            largefile.delete()
+        # Half are orphaned without being recorded, as if their unlink was
+        # lost when a region restarted.
+        OrphanedLargeObject.objects.filter(
+            oid__in=[largefile.content.oid for largefile in largefiles[::2]]
+        ).delete()
+        return [largefile.content.oid for largefile in largefiles]
+
+    @transactional
+    def countLargeObjects(self, oids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_largeobject_metadata "
+                "WHERE oid = ANY(%s)", [oids])
+            return cursor.fetchone()[0]
+
+    @transactional
+    def hasOrphans(self):
+        return OrphanedLargeObject.objects.exists()
+
+    @wait_for(30.0)
+    @inlineCallbacks
+    def test_collects_orphaned_large_objects(self):
+        oids = yield deferToDatabase(self.makeOrphans, 50)
+        service = LargeObjectGarbageService(batch_size=4, delay=0.0)
+        yield service.startService()
+        while (yield deferToDatabase(self.hasOrphans)):
+            yield pause(0.1)
+        yield service.stopService()
+        count = yield deferToDatabase(self.countLargeObjects, oids)
+        self.assertEqual(0, count)
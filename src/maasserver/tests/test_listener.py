@@ -228,6 +228,29 @@ class TestPostgresListenerService(MAASServerTestCase):
         finally:
             yield listener.stopService()
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__tryConnection_fires_connected_event(self):
+        listener = PostgresListenerService()
+        connected = MagicMock()
+        listener.events.connected.registerHandler(connected)
+
+        yield listener.tryConnection()
+        try:
+            self.assertThat(connected, MockCalledOnceWith())
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    def test__connectionLost_fires_disconnected_event(self):
+        listener = PostgresListenerService()
+        disconnected = MagicMock()
+        listener.events.disconnected.registerHandler(disconnected)
+
+        listener.connectionLost(Failure(error.ConnectionDone()))
+
+        self.assertThat(disconnected, MockCalledOnceWith())
+
     @wait_for_reactor
     @inlineCallbacks
     def test__tryConnection_logs_error(self):
@@ -6,8 +6,12 @@
 __all__ = []
 
 import random
-from unittest.mock import ANY
+from unittest.mock import (
+    ANY,
+    Mock,
+)
 
+from crochet import wait_for
 from django.db import transaction
 from maasserver import locks
 from maasserver.clusterrpc.boot_images import RackControllersImporter
@@ -33,6 +37,7 @@ from maasserver.node_action import (
     Abort,
     Acquire,
     ACTION_CLASSES,
+    BulkNodeAction,
     Commission,
     compile_node_actions,
     Delete,
@@ -41,6 +46,7 @@ from maasserver.node_action import (
     ImportImages,
     Lock,
     MarkBroken,
+    make_bulk_action_result,
     MarkFixed,
     NodeAction,
     OverrideFailedTesting,
@@ -70,9 +76,11 @@ from maasserver.testing.testcase import (
 )
 from maasserver.utils.orm import (
     post_commit,
+    post_commit_do,
     post_commit_hooks,
     reload_object,
 )
+from maasserver.utils.threads import deferToDatabase
 from maastesting.matchers import (
     MockCalledOnce,
     MockCalledOnceWith,
@@ -85,7 +93,10 @@ from metadataserver.enum import (
 from netaddr import IPNetwork
 from provisioningserver.utils.shell import ExternalProcessError
 from testtools.matchers import Equals
+from twisted.internet.defer import inlineCallbacks
+
 
+wait_for_reactor = wait_for(30)  # 30 seconds.
 
 ALL_STATUSES = list(NODE_STATUS_CHOICES_DICT)
 
@@ -1333,3 +1344,172 @@ class TestActionsErrorHandling(MAASServerTestCase):
             get_error_message_for_exception(
                 action.node.stop_rescue_mode.side_effect),
             str(exception))
+
+
+class FakeBulkNodeAction(FakeNodeAction):
+    name = "fake-bulk"
+    permission = NODE_PERMISSION.EDIT
+    node_permission = NODE_PERMISSION.EDIT
+
+    def execute(self, hostname=None, fail_ids=(), powered=None):
+        if hostname is not None:
+            self.node.hostname = hostname
+            self.node.save()
+        if self.node.system_id in fail_ids:
+            raise NodeActionError("Failed: %s" % self.node.system_id)
+        if powered is not None:
+            post_commit_do(powered.append, self.node.system_id)
+
+
+class BulkNodeActionTestMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.patch(node_action_module, "ACTIONS_DICT", {
+            FakeBulkNodeAction.name: FakeBulkNodeAction,
+        })
+
+    def make_machines(self, count=3, **kwargs):
+        return [factory.make_Machine(**kwargs) for _ in range(count)]
+
+
+class TestBulkNodeAction(BulkNodeActionTestMixin, MAASServerTestCase):
+
+    def test__rejects_unknown_action(self):
+        self.assertRaises(
+            NodeActionError, BulkNodeAction,
+            factory.make_name("action"), factory.make_User())
+
+    def test__select_returns_permitted_machines_only(self):
+        user = factory.make_User()
+        owned = self.make_machines(owner=user)
+        self.make_machines(owner=factory.make_User())
+        bulk = BulkNodeAction(FakeBulkNodeAction.name, user)
+        self.assertEqual(
+            sorted(machine.system_id for machine in owned), bulk.select())
+
+    def test__select_restricts_to_system_ids(self):
+        user = factory.make_admin()
+        machines = self.make_machines()
+        bulk = BulkNodeAction(FakeBulkNodeAction.name, user)
+        self.assertEqual(
+            [machines[0].system_id], bulk.select([machines[0].system_id]))
+
+    def test__apply_reports_failures_and_continues(self):
+        user = factory.make_admin()
+        machines = self.make_machines()
+        bad = machines[1]
+        bulk = BulkNodeAction(
+            FakeBulkNodeAction.name, user,
+            extra={"fail_ids": [bad.system_id]})
+        results = bulk.apply([machine.system_id for machine in machines])
+        self.assertEqual([
+            make_bulk_action_result(machines[0].system_id),
+            make_bulk_action_result(
+                bad.system_id, "Failed: %s" % bad.system_id),
+            make_bulk_action_result(machines[2].system_id),
+        ], results)
+
+    def test__apply_rolls_back_failed_machine(self):
+        user = factory.make_admin()
+        machine = factory.make_Machine()
+        bulk = BulkNodeAction(
+            FakeBulkNodeAction.name, user, extra={
+                "hostname": factory.make_name("host"),
+                "fail_ids": [machine.system_id]})
+        bulk.apply([machine.system_id])
+        self.assertEqual(machine.hostname, reload_object(machine).hostname)
+
+    def test__apply_reports_unactionable_machines(self):
+        user = factory.make_admin()
+        machine = factory.make_Machine(locked=True)
+        bulk = BulkNodeAction(FakeBulkNodeAction.name, user)
+        self.assertEqual([
+            make_bulk_action_result(
+                machine.system_id,
+                "fake-bulk action is not available for this node."),
+        ], bulk.apply([machine.system_id]))
+
+    def test__apply_reports_missing_machines(self):
+        user = factory.make_admin()
+        system_id = factory.make_name("system_id")
+        bulk = BulkNodeAction(FakeBulkNodeAction.name, user)
+        self.assertEqual(
+            [make_bulk_action_result(system_id, "Machine not found.")],
+            bulk.apply([system_id]))
+
+    def test__apply_holds_back_post_commit_tasks_in_one_hook(self):
+        user = factory.make_admin()
+        machines = self.make_machines()
+        powered = []
+        bulk = BulkNodeAction(
+            FakeBulkNodeAction.name, user, extra={"powered": powered})
+        results = bulk.apply([machine.system_id for machine in machines])
+        # Results for these machines are not known until dispatched.
+        self.assertEqual([], results)
+        self.assertEqual(1, len(post_commit_hooks.hooks))
+        post_commit_hooks.fire()
+        self.assertItemsEqual(
+            [machine.system_id for machine in machines], powered)
+        self.assertEqual(len(machines), len(bulk.dispatched))
+
+    def test__apply_cancels_held_back_tasks_on_reset(self):
+        user = factory.make_admin()
+        machines = self.make_machines()
+        powered = []
+        bulk = BulkNodeAction(
+            FakeBulkNodeAction.name, user, extra={"powered": powered})
+        bulk.apply([machine.system_id for machine in machines])
+        post_commit_hooks.reset()
+        self.assertEqual([], powered)
+        self.assertEqual([], bulk.dispatched)
+
+
+class TestBulkNodeActionExecute(
+        BulkNodeActionTestMixin, MAASTransactionServerTestCase):
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__applies_action_in_batches_and_reports_results(self):
+        user = yield deferToDatabase(factory.make_admin)
+        machines = yield deferToDatabase(self.make_machines, 5)
+        system_ids = sorted(machine.system_id for machine in machines)
+        powered, report = [], Mock()
+        bulk = BulkNodeAction(
+            FakeBulkNodeAction.name, user, extra={"powered": powered},
+            batch_size=2, report=report)
+        apply = self.patch(bulk, "apply", Mock(side_effect=bulk.apply))
+        results = yield bulk.execute(system_ids)
+        self.assertEqual(3, apply.call_count)
+        self.assertItemsEqual(system_ids, powered)
+        self.assertItemsEqual(
+            [make_bulk_action_result(system_id) for system_id in system_ids],
+            results)
+        self.assertEqual(5, report.call_count)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__reports_unpermitted_machines(self):
+        user = yield deferToDatabase(factory.make_User)
+        machine = yield deferToDatabase(
+            lambda: factory.make_Machine(owner=factory.make_User()))
+        bulk = BulkNodeAction(FakeBulkNodeAction.name, user)
+        results = yield bulk.execute([machine.system_id])
+        self.assertEqual([
+            make_bulk_action_result(
+                machine.system_id, "Machine not found, or permission denied."),
+        ], results)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__reports_failed_post_commit_tasks(self):
+        user = yield deferToDatabase(factory.make_admin)
+        machine = yield deferToDatabase(factory.make_Machine)
+        powered = Mock()
+        powered.append.side_effect = factory.make_exception("power failed")
+        bulk = BulkNodeAction(
+            FakeBulkNodeAction.name, user, extra={"powered": powered})
+        results = yield bulk.execute([machine.system_id])
+        self.assertEqual([
+            make_bulk_action_result(machine.system_id, "power failed"),
+        ], results)
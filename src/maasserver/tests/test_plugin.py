@@ -105,8 +105,12 @@ class TestRegionWorkerServiceMaker(TestServiceMaker):
         service = service_maker.makeService(options)
         self.assertIsInstance(service, MultiService)
         expected_services = [
+            "allocation-cache-worker",
+            "config-cache-worker",
             "database-tasks",
+            "load-monitor-worker",
             "postgres-listener-worker",
+            "rack-connectivity",
             "rack-controller",
             "rpc",
             "rpc-advertise",
@@ -169,9 +173,13 @@ class TestRegionMasterServiceMaker(TestServiceMaker):
         service = service_maker.makeService(options)
         self.assertIsInstance(service, MultiService)
         expected_services = [
+            "allocation-cache-master",
+            "config-cache-master",
+            "load-monitor-master",
             "region-controller",
             "nonce-cleanup",
             "dns-publication-cleanup",
+            "largeobject-cleanup",
             "status-monitor",
             "stats",
             "import-resources",
@@ -243,8 +251,11 @@ class TestRegionAllInOneServiceMaker(TestServiceMaker):
         self.assertIsInstance(service, MultiService)
         expected_services = [
             # Worker services.
+            # "allocation-cache-worker",  Prevented in all-in-one.
+            # "config-cache-worker",  Prevented in all-in-one.
             "database-tasks",
             "postgres-listener-worker",
+            "rack-connectivity",
             "rack-controller",
             "rpc",
             "rpc-advertise",
@@ -253,9 +264,13 @@ class TestRegionAllInOneServiceMaker(TestServiceMaker):
             "web",
             "ipc-worker",
             # Master services.
+            "allocation-cache-master",
+            "config-cache-master",
+            "load-monitor-master",
             "region-controller",
             "nonce-cleanup",
             "dns-publication-cleanup",
+            "largeobject-cleanup",
             "status-monitor",
             "stats",
             "import-resources",
@@ -15,6 +15,7 @@ __all__ = [
 
 from textwrap import dedent
 
+from maasserver.enum import NODE_STATUS
 from maasserver.models.dnspublication import zone_serial
 from maasserver.triggers import (
     register_procedure,
@@ -1616,6 +1617,526 @@ PEER_PROXY_CONFIG_UPDATE = dedent("""\
     """)
 
 
+# Helper that recomputes the row of the `maasserver_discovery` table for
+# a MAC and IP address pair from the `maasserver_discovery_source` view.
+DISCOVERY_REFRESH = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_refresh(
+      refresh_mac macaddr, refresh_ip inet)
+    RETURNS void as $$
+    BEGIN
+      DELETE FROM maasserver_discovery
+      WHERE mac_address = refresh_mac AND ip = refresh_ip;
+      INSERT INTO maasserver_discovery
+      SELECT * FROM maasserver_discovery_source
+      WHERE mac_address = refresh_mac AND ip = refresh_ip;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Helper that recomputes the rows of the `maasserver_discovery` table for
+# an IP address, for example when its hostname changes.
+DISCOVERY_REFRESH_IP = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_refresh_ip(refresh_ip inet)
+    RETURNS void as $$
+    BEGIN
+      DELETE FROM maasserver_discovery
+      WHERE ip = refresh_ip;
+      INSERT INTO maasserver_discovery
+      SELECT * FROM maasserver_discovery_source
+      WHERE ip = refresh_ip;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Helper that recomputes the rows of the `maasserver_discovery` table that
+# could be within the given subnet.
+DISCOVERY_REFRESH_SUBNET = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_refresh_subnet(
+      refresh_vlan_id integer, refresh_cidr cidr)
+    RETURNS void as $$
+    DECLARE
+      discovery RECORD;
+    BEGIN
+      FOR discovery IN (
+        SELECT mac_address, ip
+        FROM maasserver_discovery
+        WHERE vlan_id = refresh_vlan_id AND ip << refresh_cidr)
+      LOOP
+        PERFORM sys_discovery_refresh(discovery.mac_address, discovery.ip);
+      END LOOP;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Helper that updates whether discoveries with the given MAC address are
+# known to MAAS, i.e. whether any interface has that MAC address.
+DISCOVERY_KNOWN_MAC = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_known_mac(known_mac macaddr)
+    RETURNS void as $$
+    BEGIN
+      UPDATE maasserver_discovery
+      SET is_known_mac = EXISTS (
+        SELECT 1 FROM maasserver_interface
+        WHERE mac_address = known_mac)
+      WHERE mac_address = known_mac;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Helper that updates whether discoveries with the given IP address are
+# known to MAAS, i.e. whether any static IP address has that address.
+DISCOVERY_KNOWN_IP = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_known_ip(known_ip inet)
+    RETURNS void as $$
+    BEGIN
+      UPDATE maasserver_discovery
+      SET is_known_ip = EXISTS (
+        SELECT 1 FROM maasserver_staticipaddress
+        WHERE ip = known_ip)
+      WHERE ip = known_ip;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a neighbour is observed for the first time.
+DISCOVERY_NEIGHBOUR_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_neighbour_insert()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh(NEW.mac_address, NEW.ip);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a neighbour is observed again, or is otherwise changed.
+DISCOVERY_NEIGHBOUR_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_neighbour_update()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh(NEW.mac_address, NEW.ip);
+      IF (OLD.mac_address IS DISTINCT FROM NEW.mac_address OR
+          OLD.ip IS DISTINCT FROM NEW.ip) THEN
+        PERFORM sys_discovery_refresh(OLD.mac_address, OLD.ip);
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a neighbour is deleted.
+DISCOVERY_NEIGHBOUR_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_neighbour_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh(OLD.mac_address, OLD.ip);
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when an mDNS or reverse-DNS entry is created. These are shared
+# by the `maasserver_mdns` and `maasserver_rdns` tables.
+DISCOVERY_DNS_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_dns_insert()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_ip(NEW.ip);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when an mDNS or reverse-DNS entry is updated.
+DISCOVERY_DNS_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_dns_update()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_ip(NEW.ip);
+      IF OLD.ip IS DISTINCT FROM NEW.ip THEN
+        PERFORM sys_discovery_refresh_ip(OLD.ip);
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when an mDNS or reverse-DNS entry is deleted.
+DISCOVERY_DNS_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_dns_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_ip(OLD.ip);
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when an interface is created. Discoveries with its MAC address
+# are now known.
+DISCOVERY_INTERFACE_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_interface_insert()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_known_mac(NEW.mac_address);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when the name, VLAN, node, or MAC address of an interface
+# changes. The former three are recorded against discoveries observed on
+# the interface.
+DISCOVERY_INTERFACE_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_interface_update()
+    RETURNS trigger as $$
+    DECLARE
+      neighbour RECORD;
+    BEGIN
+      IF OLD.mac_address IS DISTINCT FROM NEW.mac_address THEN
+        PERFORM sys_discovery_known_mac(OLD.mac_address);
+        PERFORM sys_discovery_known_mac(NEW.mac_address);
+      END IF;
+      IF (OLD.name != NEW.name OR
+          OLD.vlan_id IS DISTINCT FROM NEW.vlan_id OR
+          OLD.node_id IS DISTINCT FROM NEW.node_id) THEN
+        FOR neighbour IN (
+          SELECT DISTINCT mac_address, ip
+          FROM maasserver_neighbour
+          WHERE interface_id = NEW.id)
+        LOOP
+          PERFORM sys_discovery_refresh(neighbour.mac_address, neighbour.ip);
+        END LOOP;
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when an interface is deleted. Discoveries with its MAC address
+# may no longer be known.
+DISCOVERY_INTERFACE_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_interface_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_known_mac(OLD.mac_address);
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a static IP address is created.
+DISCOVERY_STATICIPADDRESS_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_staticipaddress_insert()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_known_ip(NEW.ip);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when the address of a static IP address changes.
+DISCOVERY_STATICIPADDRESS_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_staticipaddress_update()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_known_ip(OLD.ip);
+      PERFORM sys_discovery_known_ip(NEW.ip);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a static IP address is deleted.
+DISCOVERY_STATICIPADDRESS_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_staticipaddress_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_known_ip(OLD.ip);
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when the hostname of a node changes.
+DISCOVERY_NODE_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_node_update()
+    RETURNS trigger as $$
+    BEGIN
+      UPDATE maasserver_discovery
+      SET observer_hostname = NEW.hostname
+      WHERE observer_id = NEW.id;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when the fabric or external DHCP server of a VLAN changes.
+DISCOVERY_VLAN_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_vlan_update()
+    RETURNS trigger as $$
+    BEGIN
+      UPDATE maasserver_discovery AS discovery
+      SET
+        is_external_dhcp = COALESCE(discovery.ip = NEW.external_dhcp, FALSE),
+        fabric_id = fabric.id,
+        fabric_name = fabric.name
+      FROM maasserver_fabric AS fabric
+      WHERE discovery.vlan_id = NEW.id AND fabric.id = NEW.fabric_id;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when the name of a fabric changes.
+DISCOVERY_FABRIC_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_fabric_update()
+    RETURNS trigger as $$
+    BEGIN
+      UPDATE maasserver_discovery
+      SET fabric_name = NEW.name
+      WHERE fabric_id = NEW.id;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a subnet is created.
+DISCOVERY_SUBNET_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_subnet_insert()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_subnet(NEW.vlan_id, NEW.cidr);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when the CIDR or VLAN of a subnet changes.
+DISCOVERY_SUBNET_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_subnet_update()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_subnet(OLD.vlan_id, OLD.cidr);
+      PERFORM sys_discovery_refresh_subnet(NEW.vlan_id, NEW.cidr);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a subnet is deleted.
+DISCOVERY_SUBNET_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_subnet_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_subnet(OLD.vlan_id, OLD.cidr);
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+# Helper that adds `delta` to the number of deployed nodes for an operating
+# system, series, and architecture in the `maasserver_deployednodecount`
+# table, removing the row once it reaches zero. The images page is told of
+# the change through the 'bootresource' websocket channel.
+DEPLOYEDNODECOUNT_ADD = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_deployednodecount_add(
+      count_osystem text, count_distro_series text, count_architecture text,
+      delta integer)
+    RETURNS void as $$
+    BEGIN
+      count_osystem := COALESCE(count_osystem, '');
+      count_distro_series := COALESCE(count_distro_series, '');
+      count_architecture := COALESCE(count_architecture, '');
+      UPDATE maasserver_deployednodecount
+      SET count = count + delta
+      WHERE osystem = count_osystem
+        AND distro_series = count_distro_series
+        AND architecture = count_architecture;
+      IF NOT FOUND THEN
+        INSERT INTO maasserver_deployednodecount
+          (osystem, distro_series, architecture, count)
+        VALUES
+          (count_osystem, count_distro_series, count_architecture, delta);
+      END IF;
+      DELETE FROM maasserver_deployednodecount
+      WHERE osystem = count_osystem
+        AND distro_series = count_distro_series
+        AND architecture = count_architecture
+        AND count <= 0;
+      PERFORM pg_notify('bootresource_update', 'nodes');
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a node is created.
+DEPLOYEDNODECOUNT_NODE_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_deployednodecount_node_insert()
+    RETURNS trigger as $$
+    BEGIN
+      IF NEW.status IN ({deployed}, {deploying}) THEN
+        PERFORM sys_deployednodecount_add(
+          NEW.osystem, NEW.distro_series, NEW.architecture, 1);
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """.format(
+    deployed=NODE_STATUS.DEPLOYED, deploying=NODE_STATUS.DEPLOYING))
+
+# Triggered when the status, operating system, series, or architecture of a
+# node changes.
+DEPLOYEDNODECOUNT_NODE_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_deployednodecount_node_update()
+    RETURNS trigger as $$
+    BEGIN
+      IF OLD.status IN ({deployed}, {deploying}) THEN
+        PERFORM sys_deployednodecount_add(
+          OLD.osystem, OLD.distro_series, OLD.architecture, -1);
+      END IF;
+      IF NEW.status IN ({deployed}, {deploying}) THEN
+        PERFORM sys_deployednodecount_add(
+          NEW.osystem, NEW.distro_series, NEW.architecture, 1);
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """.format(
+    deployed=NODE_STATUS.DEPLOYED, deploying=NODE_STATUS.DEPLOYING))
+
+# Triggered when a node is deleted.
+DEPLOYEDNODECOUNT_NODE_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_deployednodecount_node_delete()
+    RETURNS trigger as $$
+    BEGIN
+      IF OLD.status IN ({deployed}, {deploying}) THEN
+        PERFORM sys_deployednodecount_add(
+          OLD.osystem, OLD.distro_series, OLD.architecture, -1);
+      END IF;
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """.format(
+    deployed=NODE_STATUS.DEPLOYED, deploying=NODE_STATUS.DEPLOYING))
+
+
+# Helper that tells region processes that the free addresses of a subnet
+# have changed, on the 'sys_ipallocation' channel. The payload is the subnet
+# ID and the ID of the transaction making the change, followed by `ip` when
+# the only change is that `ip` is now in use. Without `ip`, anything cached
+# for the subnet must be discarded.
+IPALLOCATION_NOTIFY = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_ipallocation_notify(
+      subnet_id integer, ip inet)
+    RETURNS void as $$
+    DECLARE
+      change text;
+    BEGIN
+      IF subnet_id IS NULL THEN
+        RETURN;
+      END IF;
+      change := subnet_id::text || ' ' || txid_current()::text;
+      IF ip IS NULL THEN
+        PERFORM pg_notify('sys_ipallocation', change);
+      ELSE
+        PERFORM pg_notify('sys_ipallocation', change || ' ' || host(ip));
+      END IF;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+# Triggered when a static IP address is inserted.
+IPALLOCATION_STATICIPADDRESS_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_ipallocation_staticipaddress_insert()
+    RETURNS trigger as $$
+    BEGIN
+      IF NEW.ip IS NOT NULL THEN
+        PERFORM sys_ipallocation_notify(NEW.subnet_id, NEW.ip);
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+# Triggered when the address or subnet of a static IP address changes.
+IPALLOCATION_STATICIPADDRESS_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_ipallocation_staticipaddress_update()
+    RETURNS trigger as $$
+    BEGIN
+      IF OLD.ip IS NOT NULL THEN
+        PERFORM sys_ipallocation_notify(OLD.subnet_id, NULL);
+      END IF;
+      IF NEW.ip IS NOT NULL THEN
+        PERFORM sys_ipallocation_notify(NEW.subnet_id, NEW.ip);
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+# Triggered when a static IP address is deleted.
+IPALLOCATION_STATICIPADDRESS_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_ipallocation_staticipaddress_delete()
+    RETURNS trigger as $$
+    BEGIN
+      IF OLD.ip IS NOT NULL THEN
+        PERFORM sys_ipallocation_notify(OLD.subnet_id, NULL);
+      END IF;
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+# Triggered when a neighbour is observed at a new address, which is avoided
+# when allocating from every subnet containing it.
+IPALLOCATION_NEIGHBOUR = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_ipallocation_neighbour_%s()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_ipallocation_notify(subnet.id, NEW.ip)
+      FROM maasserver_subnet AS subnet
+      WHERE NEW.ip << subnet.cidr;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+IPALLOCATION_NEIGHBOUR_INSERT = IPALLOCATION_NEIGHBOUR % "insert"
+IPALLOCATION_NEIGHBOUR_UPDATE = IPALLOCATION_NEIGHBOUR % "update"
+
+
+def render_sys_ipallocation_procedure(proc_name, column, event):
+    """Render a database procedure with name `proc_name` that discards the
+    free addresses cached for the subnet referenced by `column`.
+
+    :param column: The column holding the subnet ID.
+    :param event: The trigger event: "insert", "update", or "delete".
+    """
+    rows = {
+        "insert": ["NEW"],
+        "update": ["OLD", "NEW"],
+        "delete": ["OLD"],
+    }[event]
+    return dedent("""\
+        CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$
+        BEGIN
+        %s
+          RETURN %s;
+        END;
+        $$ LANGUAGE plpgsql;
+        """) % (
+        proc_name,
+        "\n".join(
+            "  PERFORM sys_ipallocation_notify(%s.%s, NULL);" % (row, column)
+            for row in rows),
+        rows[-1])
+
+
 def render_sys_proxy_procedure(proc_name, on_delete=False):
     """Render a database procedure with name `proc_name` that notifies that a
     proxy update is needed.
@@ -1876,3 +2397,144 @@ def register_system_triggers():
     register_trigger(
         "maasserver_config", "sys_proxy_config_use_peer_proxy_update",
         "update")
+
+    # Discovery
+
+    register_procedure(DISCOVERY_REFRESH)
+    register_procedure(DISCOVERY_REFRESH_IP)
+    register_procedure(DISCOVERY_REFRESH_SUBNET)
+    register_procedure(DISCOVERY_KNOWN_MAC)
+    register_procedure(DISCOVERY_KNOWN_IP)
+
+    # - Neighbour
+    register_procedure(DISCOVERY_NEIGHBOUR_INSERT)
+    register_trigger(
+        "maasserver_neighbour", "sys_discovery_neighbour_insert", "insert")
+    register_procedure(DISCOVERY_NEIGHBOUR_UPDATE)
+    register_trigger(
+        "maasserver_neighbour", "sys_discovery_neighbour_update", "update")
+    register_procedure(DISCOVERY_NEIGHBOUR_DELETE)
+    register_trigger(
+        "maasserver_neighbour", "sys_discovery_neighbour_delete", "delete")
+
+    # - mDNS and RDNS
+    register_procedure(DISCOVERY_DNS_INSERT)
+    register_procedure(DISCOVERY_DNS_UPDATE)
+    register_procedure(DISCOVERY_DNS_DELETE)
+    for table in ("maasserver_mdns", "maasserver_rdns"):
+        register_trigger(table, "sys_discovery_dns_insert", "insert")
+        register_trigger(table, "sys_discovery_dns_update", "update")
+        register_trigger(table, "sys_discovery_dns_delete", "delete")
+
+    # - Interface
+    register_procedure(DISCOVERY_INTERFACE_INSERT)
+    register_trigger(
+        "maasserver_interface", "sys_discovery_interface_insert", "insert")
+    register_procedure(DISCOVERY_INTERFACE_UPDATE)
+    register_trigger(
+        "maasserver_interface", "sys_discovery_interface_update", "update",
+        fields=["name", "vlan_id", "node_id", "mac_address"])
+    register_procedure(DISCOVERY_INTERFACE_DELETE)
+    register_trigger(
+        "maasserver_interface", "sys_discovery_interface_delete", "delete")
+
+    # - StaticIPAddress
+    register_procedure(DISCOVERY_STATICIPADDRESS_INSERT)
+    register_trigger(
+        "maasserver_staticipaddress",
+        "sys_discovery_staticipaddress_insert", "insert")
+    register_procedure(DISCOVERY_STATICIPADDRESS_UPDATE)
+    register_trigger(
+        "maasserver_staticipaddress",
+        "sys_discovery_staticipaddress_update", "update", fields=["ip"])
+    register_procedure(DISCOVERY_STATICIPADDRESS_DELETE)
+    register_trigger(
+        "maasserver_staticipaddress",
+        "sys_discovery_staticipaddress_delete", "delete")
+
+    # - Node
+    register_procedure(DISCOVERY_NODE_UPDATE)
+    register_trigger(
+        "maasserver_node", "sys_discovery_node_update", "update",
+        fields=["hostname"])
+
+    # - VLAN
+    register_procedure(DISCOVERY_VLAN_UPDATE)
+    register_trigger(
+        "maasserver_vlan", "sys_discovery_vlan_update", "update",
+        fields=["external_dhcp", "fabric_id"])
+
+    # - Fabric
+    register_procedure(DISCOVERY_FABRIC_UPDATE)
+    register_trigger(
+        "maasserver_fabric", "sys_discovery_fabric_update", "update",
+        fields=["name"])
+
+    # - Subnet
+    register_procedure(DISCOVERY_SUBNET_INSERT)
+    register_trigger(
+        "maasserver_subnet", "sys_discovery_subnet_insert", "insert")
+    register_procedure(DISCOVERY_SUBNET_UPDATE)
+    register_trigger(
+        "maasserver_subnet", "sys_discovery_subnet_update", "update",
+        fields=["cidr", "vlan_id"])
+    register_procedure(DISCOVERY_SUBNET_DELETE)
+    register_trigger(
+        "maasserver_subnet", "sys_discovery_subnet_delete", "delete")
+
+    # Deployed node counts
+    register_procedure(DEPLOYEDNODECOUNT_ADD)
+    register_procedure(DEPLOYEDNODECOUNT_NODE_INSERT)
+    register_trigger(
+        "maasserver_node", "sys_deployednodecount_node_insert", "insert")
+    register_procedure(DEPLOYEDNODECOUNT_NODE_UPDATE)
+    register_trigger(
+        "maasserver_node", "sys_deployednodecount_node_update", "update",
+        fields=["status", "osystem", "distro_series", "architecture"])
+    register_procedure(DEPLOYEDNODECOUNT_NODE_DELETE)
+    register_trigger(
+        "maasserver_node", "sys_deployednodecount_node_delete", "delete")
+
+    # Subnet allocation cache
+    register_procedure(IPALLOCATION_NOTIFY)
+
+    # - StaticIPAddress
+    register_procedure(IPALLOCATION_STATICIPADDRESS_INSERT)
+    register_trigger(
+        "maasserver_staticipaddress",
+        "sys_ipallocation_staticipaddress_insert", "insert")
+    register_procedure(IPALLOCATION_STATICIPADDRESS_UPDATE)
+    register_trigger(
+        "maasserver_staticipaddress",
+        "sys_ipallocation_staticipaddress_update", "update",
+        fields=["ip", "subnet_id"])
+    register_procedure(IPALLOCATION_STATICIPADDRESS_DELETE)
+    register_trigger(
+        "maasserver_staticipaddress",
+        "sys_ipallocation_staticipaddress_delete", "delete")
+
+    # - Neighbour
+    register_procedure(IPALLOCATION_NEIGHBOUR_INSERT)
+    register_trigger(
+        "maasserver_neighbour", "sys_ipallocation_neighbour_insert",
+        "insert")
+    register_procedure(IPALLOCATION_NEIGHBOUR_UPDATE)
+    register_trigger(
+        "maasserver_neighbour", "sys_ipallocation_neighbour_update",
+        "update", fields=["ip"])
+
+    # - IPRange, StaticRoute, and Subnet
+    for table, column, events, fields in (
+            ("iprange", "subnet_id", ("insert", "update", "delete"),
+             ["subnet_id", "type", "start_ip", "end_ip"]),
+            ("staticroute", "source_id", ("insert", "update", "delete"),
+             ["source_id", "gateway_ip"]),
+            ("subnet", "id", ("update", "delete"),
+             ["cidr", "gateway_ip", "dns_servers", "managed"])):
+        for event in events:
+            proc_name = "sys_ipallocation_%s_%s" % (table, event)
+            register_procedure(
+                render_sys_ipallocation_procedure(proc_name, column, event))
+            register_trigger(
+                "maasserver_%s" % table, proc_name, event,
+                fields=fields if event == "update" else None)
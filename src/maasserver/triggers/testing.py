@@ -31,6 +31,7 @@ from maasserver.models.filesystem import Filesystem
 from maasserver.models.filesystemgroup import FilesystemGroup
 from maasserver.models.interface import Interface
 from maasserver.models.iprange import IPRange
+from maasserver.models.largefile import LargeFile
 from maasserver.models.node import (
     Node,
     RackController,
@@ -786,6 +787,16 @@ class TransactionalHelpersMixin:
         config.value = value
         config.save()
 
+    @transactional
+    def create_boot_resource_file(self):
+        resource = factory.make_BootResource()
+        resource_set = factory.make_BootResourceSet(resource)
+        return factory.make_boot_resource_file_with_content(resource_set)
+
+    @transactional
+    def update_largefile(self, id, params):
+        return apply_update_to_model(LargeFile, id, params)
+
 
 class DNSHelpersMixin:
     """Helper to get the zone serial and to assert it was incremented."""
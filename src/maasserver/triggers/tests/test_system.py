@@ -61,6 +61,43 @@ class TestTriggers(MAASServerTestCase):
             "subnet_sys_proxy_subnet_insert",
             "subnet_sys_proxy_subnet_update",
             "subnet_sys_proxy_subnet_delete",
+            "neighbour_sys_discovery_neighbour_insert",
+            "neighbour_sys_discovery_neighbour_update",
+            "neighbour_sys_discovery_neighbour_delete",
+            "mdns_sys_discovery_dns_insert",
+            "mdns_sys_discovery_dns_update",
+            "mdns_sys_discovery_dns_delete",
+            "rdns_sys_discovery_dns_insert",
+            "rdns_sys_discovery_dns_update",
+            "rdns_sys_discovery_dns_delete",
+            "interface_sys_discovery_interface_insert",
+            "interface_sys_discovery_interface_update",
+            "interface_sys_discovery_interface_delete",
+            "staticipaddress_sys_discovery_staticipaddress_insert",
+            "staticipaddress_sys_discovery_staticipaddress_update",
+            "staticipaddress_sys_discovery_staticipaddress_delete",
+            "node_sys_discovery_node_update",
+            "vlan_sys_discovery_vlan_update",
+            "fabric_sys_discovery_fabric_update",
+            "subnet_sys_discovery_subnet_insert",
+            "subnet_sys_discovery_subnet_update",
+            "subnet_sys_discovery_subnet_delete",
+            "node_sys_deployednodecount_node_insert",
+            "node_sys_deployednodecount_node_update",
+            "node_sys_deployednodecount_node_delete",
+            "staticipaddress_sys_ipallocation_staticipaddress_insert",
+            "staticipaddress_sys_ipallocation_staticipaddress_update",
+            "staticipaddress_sys_ipallocation_staticipaddress_delete",
+            "neighbour_sys_ipallocation_neighbour_insert",
+            "neighbour_sys_ipallocation_neighbour_update",
+            "iprange_sys_ipallocation_iprange_insert",
+            "iprange_sys_ipallocation_iprange_update",
+            "iprange_sys_ipallocation_iprange_delete",
+            "staticroute_sys_ipallocation_staticroute_insert",
+            "staticroute_sys_ipallocation_staticroute_update",
+            "staticroute_sys_ipallocation_staticroute_delete",
+            "subnet_sys_ipallocation_subnet_update",
+            "subnet_sys_ipallocation_subnet_delete",
             ]
         sql, args = psql_array(triggers, sql_type="text")
         with closing(connection.cursor()) as cursor:
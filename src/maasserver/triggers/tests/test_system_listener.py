@@ -12,6 +12,7 @@ from datetime import (
 )
 import json
 import random
+import re
 
 from crochet import wait_for
 from django.db import connection as db_connection
@@ -43,7 +44,11 @@ from maasserver.utils.threads import deferToDatabase
 from netaddr import IPAddress
 from provisioningserver.utils.twisted import DeferredValue
 from testtools import ExpectedException
-from testtools.matchers import Equals
+from testtools.matchers import (
+    Equals,
+    MatchesListwise,
+    MatchesRegex,
+)
 from twisted.internet.defer import (
     CancelledError,
     DeferredList,
@@ -4321,3 +4326,98 @@ class TestProxyListener(
             yield dv.get(timeout=2)
         finally:
             yield listener.stopService()
+
+
+class TestIPAllocationListener(
+        MAASTransactionServerTestCase, TransactionalHelpersMixin):
+    """End-to-end test for the subnet allocation cache triggers code."""
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_address_for_staticipaddress_insert(self):
+        yield deferToDatabase(register_system_triggers)
+        subnet = yield deferToDatabase(self.create_subnet)
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_ipallocation", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            sip = yield deferToDatabase(
+                self.create_staticipaddress, {"subnet": subnet})
+            args = yield dv.get(timeout=2)
+            self.assertThat(args, MatchesListwise([
+                Equals("sys_ipallocation"),
+                MatchesRegex(
+                    r"%d \d+ %s$" % (subnet.id, re.escape(sip.ip))),
+            ]))
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_subnet_for_staticipaddress_delete(self):
+        yield deferToDatabase(register_system_triggers)
+        subnet = yield deferToDatabase(self.create_subnet)
+        sip = yield deferToDatabase(
+            self.create_staticipaddress, {"subnet": subnet})
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_ipallocation", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(self.delete_staticipaddress, sip.id)
+            args = yield dv.get(timeout=2)
+            self.assertThat(args, MatchesListwise([
+                Equals("sys_ipallocation"),
+                MatchesRegex(r"%d \d+$" % subnet.id),
+            ]))
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_subnet_for_iprange_insert(self):
+        yield deferToDatabase(register_system_triggers)
+        subnet = yield deferToDatabase(
+            self.create_subnet, {"cidr": "10.0.0.0/24"})
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_ipallocation", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(self.create_iprange, {
+                "subnet": subnet, "start_ip": "10.0.0.100",
+                "end_ip": "10.0.0.150"})
+            args = yield dv.get(timeout=2)
+            self.assertThat(args, MatchesListwise([
+                Equals("sys_ipallocation"),
+                MatchesRegex(r"%d \d+$" % subnet.id),
+            ]))
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_subnet_for_subnet_gateway_ip_update(self):
+        yield deferToDatabase(register_system_triggers)
+        subnet = yield deferToDatabase(
+            self.create_subnet, {"cidr": "10.0.0.0/24"})
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_ipallocation", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(self.update_subnet, subnet.id, {
+                "gateway_ip": "10.0.0.254",
+            })
+            args = yield dv.get(timeout=2)
+            self.assertThat(args, MatchesListwise([
+                Equals("sys_ipallocation"),
+                MatchesRegex(r"%d \d+$" % subnet.id),
+            ]))
+        finally:
+            yield listener.stopService()
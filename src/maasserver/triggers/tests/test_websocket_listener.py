@@ -11,10 +11,12 @@ import random
 from unittest import skip
 
 from crochet import wait_for
+from django.utils import timezone
 from maasserver.enum import (
     BMC_TYPE,
     IPADDRESS_TYPE,
     IPRANGE_TYPE,
+    NODE_STATUS,
     NODE_TYPE,
 )
 from maasserver.listener import PostgresListenerService
@@ -26,6 +28,7 @@ from maasserver.models.partition import MIN_PARTITION_SIZE
 from maasserver.models.switch import Switch
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASTransactionServerTestCase
+from maasserver.triggers.system import register_system_triggers
 from maasserver.triggers.testing import TransactionalHelpersMixin
 from maasserver.triggers.websocket import register_websocket_triggers
 from maasserver.utils.orm import transactional
@@ -4041,3 +4044,78 @@ class TestScriptListener(
             self.assertEqual(('delete', '%s' % script.id), dv.value)
         finally:
             yield listener.stopService()
+
+
+class TestBootResourceListener(
+        MAASTransactionServerTestCase, TransactionalHelpersMixin):
+    """End-to-end test of both the listeners code and the triggers that
+    notify the images page."""
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__calls_handler_on_new_image(self):
+        yield deferToDatabase(register_websocket_triggers)
+        listener = self.make_listener_without_delay()
+        dv = DeferredValue()
+        listener.register("bootresource", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(self.create_boot_resource_file)
+            yield dv.get(timeout=2)
+            self.assertEqual(('update', 'images'), dv.value)
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__calls_handler_on_download_progress(self):
+        yield deferToDatabase(register_websocket_triggers)
+        listener = self.make_listener_without_delay()
+        dv = DeferredValue()
+        listener.register("bootresource", lambda *args: dv.set(args))
+        rfile = yield deferToDatabase(self.create_boot_resource_file)
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.update_largefile, rfile.largefile_id, {'size': 0})
+            yield dv.get(timeout=2)
+            self.assertEqual(('update', 'images'), dv.value)
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__calls_handler_on_rack_image_sync(self):
+        yield deferToDatabase(register_websocket_triggers)
+        listener = self.make_listener_without_delay()
+        dv = DeferredValue()
+        listener.register("bootresource", lambda *args: dv.set(args))
+        rack = yield deferToDatabase(self.create_rack_controller)
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.update_rack_controller, rack.id,
+                {'last_image_sync': timezone.now()})
+            yield dv.get(timeout=2)
+            self.assertEqual(('update', 'racks'), dv.value)
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__calls_handler_on_deployed_node_count_change(self):
+        yield deferToDatabase(register_system_triggers)
+        listener = self.make_listener_without_delay()
+        dv = DeferredValue()
+        listener.register("bootresource", lambda *args: dv.set(args))
+        node = yield deferToDatabase(
+            self.create_node, {'status': NODE_STATUS.ALLOCATED})
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.update_node, node.system_id,
+                {'status': NODE_STATUS.DEPLOYING})
+            yield dv.get(timeout=2)
+            self.assertEqual(('update', 'nodes'), dv.value)
+        finally:
+            yield listener.stopService()
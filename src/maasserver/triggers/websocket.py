@@ -1959,3 +1959,34 @@ def register_websocket_triggers():
         render_notification_procedure(
             'script_delete_notify', 'script_delete', 'OLD.id'))
     register_triggers('metadataserver_script', 'script')
+
+    # Boot resources page. Changes to the region's images, the image
+    # sources, or the images synced to rack controllers all notify the one
+    # 'bootresource' channel. Changes to the deployed node counts notify it
+    # from `sys_deployednodecount_add`.
+    for payload, tables in (
+            ('images', (
+                'maasserver_bootresource', 'maasserver_bootresourceset',
+                'maasserver_bootresourcefile')),
+            ('sources', (
+                'maasserver_bootsource', 'maasserver_bootsourceselection',
+                'maasserver_bootsourcecache'))):
+        for event in ('create', 'update', 'delete'):
+            register_procedure(
+                render_notification_procedure(
+                    'bootresource_%s_%s_notify' % (payload, event),
+                    'bootresource_update', "'%s'" % payload))
+        for table in tables:
+            register_triggers(table, 'bootresource_%s' % payload)
+    # Download progress of the region's images.
+    register_trigger(
+        "maasserver_largefile", "bootresource_images_update_notify",
+        "update", fields=['size'])
+    # Rack controllers that have finished importing images.
+    register_procedure(
+        render_notification_procedure(
+            'bootresource_racks_update_notify', 'bootresource_update',
+            "'racks'"))
+    register_trigger(
+        "maasserver_node", "bootresource_racks_update_notify", "update",
+        fields=['last_image_sync'])
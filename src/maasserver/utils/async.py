@@ -201,6 +201,27 @@ class DeferredHooks(threading.local):
         finally:
             self.hooks = saved
 
+    @contextmanager
+    def detached(self):
+        """Context manager that diverts hooks added within it.
+
+        Yields a new, empty, `deque` into which hooks added within the
+        context are collected. These hooks are not fired or reset along with
+        the other hooks; that is the responsibility of the caller.
+
+        If the context exits with an exception the collected hooks are
+        cancelled. In either case the saved hooks are restored.
+        """
+        saved = self.hooks
+        self.hooks = detached = deque()
+        try:
+            yield detached
+        except:
+            self.reset()
+            raise
+        finally:
+            self.hooks = saved
+
     @synchronous
     def fire(self):
         """Fire all hooks in sequence, in the reactor.
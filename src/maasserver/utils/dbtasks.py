@@ -15,6 +15,7 @@ __all__ = [
 
 from maasserver.utils.threads import deferToDatabase
 from provisioningserver.logger import LegacyLogger
+from provisioningserver.utils.loadstats import load_statistics
 from provisioningserver.utils.twisted import (
     asynchronous,
     FOREVER,
@@ -123,6 +124,10 @@ class DatabaseTasksService(Service, object):
         self.queue.put(task)
         return done
 
+    def getBacklog(self):
+        """Return the number of tasks waiting to run."""
+        return len(self.queue.pending)
+
     @asynchronous(timeout=FOREVER)
     def startService(self):
         """Open the queue and start processing database tasks.
@@ -132,6 +137,8 @@ class DatabaseTasksService(Service, object):
         super(DatabaseTasksService, self).startService()
         self.queue.size = None  # Open queue to puts.
         self.coop = cooperate(self._generateTasks())
+        load_statistics.register_gauge(
+            "database_tasks_backlog", self.getBacklog)
 
     @asynchronous(timeout=FOREVER)
     def stopService(self):
@@ -140,6 +147,7 @@ class DatabaseTasksService(Service, object):
         :return: :class:`Deferred` which fires once all tasks have been run.
         """
         super(DatabaseTasksService, self).stopService()
+        load_statistics.unregister_gauge("database_tasks_backlog")
         # Feed the cooperative task so that it can shutdown.
         self.queue.put(self.sentinel)  # See _generateTasks.
         self.queue.size = 0  # Now close queue to puts.
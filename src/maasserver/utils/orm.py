@@ -12,6 +12,7 @@ __all__ = [
     'get_exception_class',
     'get_first',
     'get_one',
+    'get_retry_reason',
     'in_transaction',
     'is_deadlock_failure',
     'is_retryable_failure',
@@ -73,6 +74,10 @@ from maasserver.exceptions import (
     MAASAPIForbidden,
 )
 from maasserver.utils.async import DeferredHooks
+from maasserver.utils.retrystats import (
+    RETRY_REASON,
+    retry_statistics,
+)
 from provisioningserver.utils import flatten
 from provisioningserver.utils.backoff import (
     exponential_growth,
@@ -488,7 +493,7 @@ def request_transaction_retry(*extra_contexts):
     """
     assert retry_context.active, "Retry context not active."
     retry_context.stack.add_pending_contexts(extra_contexts)
-    raise RetryTransaction()
+    raise RetryTransaction(*extra_contexts)
 
 
 def is_retryable_failure(exception):
@@ -507,6 +512,26 @@ def is_retryable_failure(exception):
     )
 
 
+def get_retry_reason(exception):
+    """Return the `RETRY_REASON` for `exception`, or `None`.
+
+    :param exception: An instance of :class:`RetryTransaction`, or of
+        :class:`DatabaseError` or one of its subclasses.
+    """
+    if isinstance(exception, RetryTransaction):
+        return RETRY_REASON.REQUESTED
+    elif is_serialization_failure(exception):
+        return RETRY_REASON.SERIALIZATION_FAILURE
+    elif is_deadlock_failure(exception):
+        return RETRY_REASON.DEADLOCK
+    elif is_unique_violation(exception):
+        return RETRY_REASON.UNIQUE_VIOLATION
+    elif is_foreign_key_violation(exception):
+        return RETRY_REASON.FOREIGN_KEY_VIOLATION
+    else:
+        return None
+
+
 def gen_retry_intervals(base=0.01, rate=2.5, maximum=10.0):
     """Generate retry intervals based on an exponential series.
 
@@ -550,32 +575,51 @@ def retry_on_retryable_failure(func, reset=noop):
         with a retryable failure it will *not* be called. If an attempt
         fails with a non-retryable failure, it will *not* be called.
 
+    Attempts and retries are counted in `retry_statistics` under the
+    qualified name of `func`.
     """
+    name = "%s.%s" % (
+        getattr(func, "__module__", None),
+        getattr(func, "__qualname__", getattr(func, "__name__", None)))
+
+    def retry(error, intervals):
+        pause = next(intervals)
+        locks = error.args if isinstance(error, RetryTransaction) else ()
+        retry_statistics.record_retry(
+            name, get_retry_reason(error), pause, locks)
+        reset()  # Which may do nothing.
+        sleep(pause)
+
     @wraps(func)
     def retrier(*args, **kwargs):
         with retry_context:
             intervals = gen_retry_intervals()
-            for _ in range(9):
+            for attempt in range(1, 10):
                 retry_context.prepare()
+                retry_statistics.record_attempt(name, attempt)
                 try:
                     return func(*args, **kwargs)
-                except RetryTransaction:
-                    reset()  # Which may do nothing.
-                    sleep(next(intervals))
+                except RetryTransaction as error:
+                    retry(error, intervals)
                 except DatabaseError as error:
                     if is_retryable_failure(error):
-                        reset()  # Which may do nothing.
-                        sleep(next(intervals))
+                        retry(error, intervals)
                     else:
                         raise
             else:
                 retry_context.prepare()
+                retry_statistics.record_attempt(name, 10)
                 try:
                     return func(*args, **kwargs)
                 except RetryTransaction:
+                    retry_statistics.record_failure(name)
                     raise TooManyRetries(
                         "This transaction has already been attempted "
                         "multiple times; giving up.")
+                except DatabaseError as error:
+                    if is_retryable_failure(error):
+                        retry_statistics.record_failure(name)
+                    raise
     return retrier
 
 
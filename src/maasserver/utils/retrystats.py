@@ -0,0 +1,172 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Statistics about transactions that are retried.
+
+Views, RPC responders, and database tasks all run in transactions that are
+retried when they fail with a serialization failure, a deadlock, and so on.
+This counts, per view or function, how often that happens, why, and how
+long is spent waiting between attempts.
+"""
+
+__all__ = [
+    "RETRY_REASON",
+    "retry_statistics",
+    "RetryStatistics",
+]
+
+from collections import (
+    Counter,
+    defaultdict,
+)
+import threading
+
+
+class RETRY_REASON:
+    """Reasons for retrying a transaction."""
+
+    SERIALIZATION_FAILURE = "serialization_failure"
+    DEADLOCK = "deadlock"
+    UNIQUE_VIOLATION = "unique_violation"
+    FOREIGN_KEY_VIOLATION = "foreign_key_violation"
+    REQUESTED = "requested"
+    UNKNOWN = "unknown"
+
+
+def describe_lock(context):
+    """Describe a context that was requested for the next attempt.
+
+    These are typically database locks; they are described by their type
+    and object ID, e.g. "DatabaseLock(7)".
+    """
+    objid = getattr(context, "objid", None)
+    if objid is None:
+        return type(context).__name__
+    else:
+        return "%s(%d)" % (type(context).__name__, objid)
+
+
+class RetryStatistics:
+    """Thread-safe counters for retried transactions in this process.
+
+    Each set of counters is keyed on a name, usually a view name or the
+    qualified name of a transactional function.
+    """
+
+    def __init__(self):
+        super(RetryStatistics, self).__init__()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard all statistics gathered so far."""
+        with self._lock:
+            self._calls = Counter()
+            self._attempts = Counter()
+            self._failures = Counter()
+            self._backoff = Counter()
+            self._retries = defaultdict(Counter)
+            self._locks = defaultdict(Counter)
+
+    def record_attempt(self, name, attempt):
+        """Record that `name` has been attempted.
+
+        :param attempt: The number of this attempt, starting at 1.
+        """
+        with self._lock:
+            if attempt == 1:
+                self._calls[name] += 1
+            self._attempts[name] += 1
+
+    def record_retry(self, name, reason, pause, locks=()):
+        """Record that an attempt of `name` failed and will be retried.
+
+        :param reason: One of `RETRY_REASON`, or `None` if unknown.
+        :param pause: The number of seconds to wait before the next attempt.
+        :param locks: Contexts to be entered before the next attempt.
+        """
+        if reason is None:
+            reason = RETRY_REASON.UNKNOWN
+        with self._lock:
+            self._retries[name][reason] += 1
+            self._backoff[name] += pause
+            for lock in locks:
+                self._locks[name][describe_lock(lock)] += 1
+
+    def record_failure(self, name):
+        """Record that `name` was abandoned after too many attempts."""
+        with self._lock:
+            self._failures[name] += 1
+
+    def get_statistics(self):
+        """Return the statistics gathered so far.
+
+        :return: A dict keyed by name. Each value is a dict with the number
+            of calls, attempts, and failures (calls abandoned after too many
+            attempts), the seconds spent in back-off, and the number of
+            retries by reason, and locks requested, by lock.
+        """
+        with self._lock:
+            return {
+                name: {
+                    "calls": self._calls[name],
+                    "attempts": self._attempts[name],
+                    "failures": self._failures[name],
+                    "backoff_seconds": self._backoff[name],
+                    "retries": dict(self._retries[name]),
+                    "locks": dict(self._locks[name]),
+                }
+                for name in self._attempts
+            }
+
+    def render_prometheus(self):
+        """Render the statistics in the Prometheus text exposition format."""
+        statistics = self.get_statistics()
+        lines = []
+
+        def render(metric, kind, doc, samples):
+            lines.append("# HELP maas_transaction_%s %s" % (metric, doc))
+            lines.append("# TYPE maas_transaction_%s %s" % (metric, kind))
+            for labels, sample in samples:
+                lines.append("maas_transaction_%s{%s} %s" % (
+                    metric, ",".join(
+                        '%s="%s"' % (label, escape_label(value))
+                        for label, value in labels), sample))
+
+        names = sorted(statistics)
+        for metric in "calls", "attempts", "failures":
+            render(
+                "%s_total" % metric, "counter",
+                "Transactional %s." % metric, (
+                    ((("name", name),), statistics[name][metric])
+                    for name in names))
+        render(
+            "backoff_seconds_total", "counter",
+            "Seconds spent waiting before retrying.", (
+                ((("name", name),),
+                 "%f" % statistics[name]["backoff_seconds"])
+                for name in names))
+        render(
+            "retries_total", "counter", "Retries, by reason.", (
+                ((("name", name), ("reason", reason)), count)
+                for name in names
+                for reason, count in sorted(
+                    statistics[name]["retries"].items())))
+        render(
+            "retry_locks_total", "counter",
+            "Locks requested for the next attempt.", (
+                ((("name", name), ("lock", lock)), count)
+                for name in names
+                for lock, count in sorted(
+                    statistics[name]["locks"].items())))
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text exposition format."""
+    return str(value).replace(
+        "\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# The statistics for this process.
+retry_statistics = RetryStatistics()
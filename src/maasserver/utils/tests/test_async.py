@@ -341,3 +341,32 @@ class TestDeferredHooks(MAASTestCase, PostCommitHooksTestMixin):
                 raise exception_type()
 
         self.expectThat(list(dhooks.hooks), Equals([d1]))
+
+    def test__detached_collects_new_hooks_separately(self):
+        d1 = Deferred()
+        d2 = Deferred()
+        dhooks = DeferredHooks()
+        dhooks.add(d1)
+
+        with dhooks.detached() as detached:
+            dhooks.add(d2)
+
+        self.expectThat(list(dhooks.hooks), Equals([d1]))
+        self.expectThat(list(detached), Equals([d2]))
+
+    def test__detached_cancels_new_hooks_on_dirty_exit(self):
+        d1 = Deferred()
+        d2 = Deferred()
+        dhooks = DeferredHooks()
+        dhooks.add(d1)
+
+        exception_type = factory.make_exception_type()
+        with ExpectedException(exception_type):
+            with dhooks.detached() as detached:
+                dhooks.add(d2)
+                raise exception_type()
+
+        self.expectThat(list(dhooks.hooks), Equals([d1]))
+        self.expectThat(list(detached), Equals([]))
+        # The hook was cancelled, but CancelledError is suppressed.
+        self.assertIsNone(extract_result(d2))
@@ -19,6 +19,7 @@ from maasserver.utils.orm import transactional
 from maastesting.factory import factory
 from maastesting.testcase import MAASTestCase
 from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.utils.loadstats import load_statistics
 from testtools.matchers import (
     Equals,
     HasLength,
@@ -182,6 +183,27 @@ class TestDatabaseTaskService(MAASTestCase):
 
         self.assertThat(things, Equals([]))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__reports_backlog_while_running(self):
+        service = DatabaseTasksService()
+        yield service.startService()
+        try:
+            event = threading.Event()
+            service.deferTask(event.wait)
+            service.addTask(noop)
+            service.addTask(noop)
+            gauges = load_statistics.get_statistics()["gauges"]
+            self.assertThat(
+                gauges["database_tasks_backlog"], MatchesAny(
+                    Equals(2), Equals(3)))
+        finally:
+            event.set()
+            yield service.stopService()
+        self.assertNotIn(
+            "database_tasks_backlog",
+            load_statistics.get_statistics()["gauges"])
+
     def test__sync_task_fires_with_service(self):
         service = DatabaseTasksService()
         service.startService()
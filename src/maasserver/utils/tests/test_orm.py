@@ -31,6 +31,7 @@ from django.db.utils import (
     IntegrityError,
     OperationalError,
 )
+from maasserver import locks
 from maasserver.models import Node
 from maasserver.testing.testcase import (
     MAASServerTestCase,
@@ -53,6 +54,7 @@ from maasserver.utils.orm import (
     get_psycopg2_foreign_key_violation_exception,
     get_psycopg2_serialization_exception,
     get_psycopg2_unique_violation_exception,
+    get_retry_reason,
     in_transaction,
     is_deadlock_failure,
     is_foreign_key_violation,
@@ -69,6 +71,10 @@ from maasserver.utils.orm import (
     TotallyDisconnected,
     validate_in_transaction,
 )
+from maasserver.utils.retrystats import (
+    RETRY_REASON,
+    retry_statistics,
+)
 from maastesting.doubles import StubContext
 from maastesting.factory import factory
 from maastesting.matchers import (
@@ -95,6 +101,7 @@ from psycopg2.errorcodes import (
 from testtools import ExpectedException
 from testtools.matchers import (
     AllMatch,
+    ContainsDict,
     Equals,
     Is,
     IsInstance,
@@ -536,6 +543,34 @@ class TestIsRetryableFailure(MAASTestCase):
         self.assertFalse(is_retryable_failure(error))
 
 
+class TestGetRetryReason(MAASTestCase):
+    """Tests for `get_retry_reason`."""
+
+    scenarios = (
+        ("requested", dict(
+            make_error=orm.RetryTransaction,
+            reason=RETRY_REASON.REQUESTED)),
+        ("serialization", dict(
+            make_error=orm.make_serialization_failure,
+            reason=RETRY_REASON.SERIALIZATION_FAILURE)),
+        ("deadlock", dict(
+            make_error=orm.make_deadlock_failure,
+            reason=RETRY_REASON.DEADLOCK)),
+        ("unique", dict(
+            make_error=orm.make_unique_violation,
+            reason=RETRY_REASON.UNIQUE_VIOLATION)),
+        ("foreign-key", dict(
+            make_error=orm.make_foreign_key_violation,
+            reason=RETRY_REASON.FOREIGN_KEY_VIOLATION)),
+        ("other", dict(
+            make_error=factory.make_exception,
+            reason=None)),
+    )
+
+    def test__returns_reason(self):
+        self.assertEqual(self.reason, get_retry_reason(self.make_error()))
+
+
 class TestRetryOnRetryableFailure(SerializationFailureTestCase, NoSleepMixin):
 
     def make_mock_function(self):
@@ -688,6 +723,44 @@ class TestRetryOnRetryableFailure(SerializationFailureTestCase, NoSleepMixin):
         expected.reverse()
         self.assertThat(exited, Equals(expected))
 
+    def test_records_statistics(self):
+        self.addCleanup(retry_statistics.reset)
+        function = self.make_mock_function()
+        function.side_effect = [
+            orm.make_deadlock_failure(),
+            orm.RetryTransaction(locks.dns),
+            sentinel.result,
+        ]
+        function_wrapped = retry_on_retryable_failure(function)
+        self.assertEqual(sentinel.result, function_wrapped())
+        name = "%s.%s" % (function.__module__, function.__name__)
+        statistics = retry_statistics.get_statistics()[name]
+        self.assertThat(statistics, ContainsDict({
+            "calls": Equals(1),
+            "attempts": Equals(3),
+            "failures": Equals(0),
+            "retries": Equals({
+                RETRY_REASON.DEADLOCK: 1,
+                RETRY_REASON.REQUESTED: 1,
+            }),
+            "locks": Equals({"DatabaseLock(%d)" % locks.dns.objid: 1}),
+        }))
+
+    def test_records_failure_after_too_many_attempts(self):
+        self.addCleanup(retry_statistics.reset)
+        function = self.make_mock_function()
+        function.side_effect = orm.make_serialization_failure()
+        function_wrapped = retry_on_retryable_failure(function)
+        self.assertRaises(OperationalError, function_wrapped)
+        name = "%s.%s" % (function.__module__, function.__name__)
+        statistics = retry_statistics.get_statistics()[name]
+        self.assertThat(statistics, ContainsDict({
+            "calls": Equals(1),
+            "attempts": Equals(10),
+            "failures": Equals(1),
+            "retries": Equals({RETRY_REASON.SERIALIZATION_FAILURE: 9}),
+        }))
+
 
 class TestMakeSerializationFailure(MAASTestCase):
     """Tests for `make_serialization_failure`."""
@@ -0,0 +1,89 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.utils.retrystats`."""
+
+__all__ = []
+
+from maasserver import locks
+from maasserver.utils.retrystats import (
+    describe_lock,
+    RETRY_REASON,
+    RetryStatistics,
+)
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+
+
+class TestDescribeLock(MAASTestCase):
+    """Tests for `describe_lock`."""
+
+    def test__describes_database_lock(self):
+        self.assertEqual(
+            "DatabaseLock(%d)" % locks.dns.objid, describe_lock(locks.dns))
+
+    def test__describes_other_context_by_type(self):
+        self.assertEqual("object", describe_lock(object()))
+
+
+class TestRetryStatistics(MAASTestCase):
+    """Tests for `RetryStatistics`."""
+
+    def test__starts_empty(self):
+        self.assertEqual({}, RetryStatistics().get_statistics())
+
+    def test__counts_calls_attempts_and_failures(self):
+        statistics = RetryStatistics()
+        name = factory.make_name("name")
+        for attempt in 1, 2, 3:
+            statistics.record_attempt(name, attempt)
+        statistics.record_attempt(name, 1)
+        statistics.record_failure(name)
+        self.assertEqual({
+            "calls": 2,
+            "attempts": 4,
+            "failures": 1,
+            "backoff_seconds": 0,
+            "retries": {},
+            "locks": {},
+        }, statistics.get_statistics()[name])
+
+    def test__counts_retries_backoff_and_locks(self):
+        statistics = RetryStatistics()
+        name = factory.make_name("name")
+        statistics.record_attempt(name, 1)
+        statistics.record_retry(name, RETRY_REASON.DEADLOCK, 0.25)
+        statistics.record_retry(
+            name, RETRY_REASON.REQUESTED, 0.5, [locks.dns])
+        statistics.record_retry(name, None, 0.25)
+        results = statistics.get_statistics()[name]
+        self.assertEqual(1.0, results["backoff_seconds"])
+        self.assertEqual({
+            RETRY_REASON.DEADLOCK: 1,
+            RETRY_REASON.REQUESTED: 1,
+            RETRY_REASON.UNKNOWN: 1,
+        }, results["retries"])
+        self.assertEqual(
+            {describe_lock(locks.dns): 1}, results["locks"])
+
+    def test__reset_discards_statistics(self):
+        statistics = RetryStatistics()
+        statistics.record_attempt(factory.make_name("name"), 1)
+        statistics.reset()
+        self.assertEqual({}, statistics.get_statistics())
+
+    def test__renders_prometheus_text(self):
+        statistics = RetryStatistics()
+        statistics.record_attempt('a "view"', 1)
+        statistics.record_retry('a "view"', RETRY_REASON.DEADLOCK, 0.5)
+        lines = statistics.render_prometheus().splitlines()
+        self.assertIn(
+            "# TYPE maas_transaction_calls_total counter", lines)
+        self.assertIn(
+            'maas_transaction_calls_total{name="a \\"view\\""} 1', lines)
+        self.assertIn(
+            'maas_transaction_backoff_seconds_total{name="a \\"view\\""} '
+            '0.500000', lines)
+        self.assertIn(
+            'maas_transaction_retries_total{name="a \\"view\\"",'
+            'reason="deadlock"} 1', lines)
@@ -48,6 +48,10 @@ from maasserver.utils.orm import (
     retry_context,
     validate_in_transaction,
 )
+from maasserver.utils.retrystats import (
+    RETRY_REASON,
+    retry_statistics,
+)
 from maasserver.utils.views import HttpResponseConflict
 from maastesting.matchers import (
     DocTestMatches,
@@ -60,6 +64,7 @@ from piston3.authentication import initialize_server_request
 from piston3.models import Nonce
 from testtools.matchers import (
     Contains,
+    ContainsDict,
     Equals,
     HasLength,
     Is,
@@ -483,6 +488,38 @@ class TestWebApplicationHandler(SerializationFailureTestCase):
             MockCalledOnceWith(request, 2, ANY))
         self.expectThat(reset_request, MockCalledOnceWith(request))
 
+    def test__get_response_records_retry_statistics(self):
+        retry_statistics.reset()
+        self.addCleanup(retry_statistics.reset)
+        handler = views.WebApplicationHandler(3)
+        errors = iter((make_deadlock_failure(), make_deadlock_failure()))
+
+        def set_retry(request):
+            response = HttpResponse()
+            handler._WebApplicationHandler__retry.add(response)
+            handler._WebApplicationHandler__retry_errors[response] = next(
+                errors, None)
+            return response
+
+        get_response = self.patch(WSGIHandler, "get_response")
+        get_response.side_effect = set_retry
+
+        reset_request = self.patch_autospec(views, "reset_request")
+        reset_request.side_effect = lambda request: request
+
+        request = make_request()
+        request.path = factory.make_name("path")
+        handler.get_response(request)
+
+        # The request did not resolve to a view.
+        statistics = retry_statistics.get_statistics()["unresolved"]
+        self.assertThat(statistics, ContainsDict({
+            "calls": Equals(1),
+            "attempts": Equals(3),
+            "failures": Equals(1),
+            "retries": Equals({RETRY_REASON.DEADLOCK: 2}),
+        }))
+
     def test__get_response_up_calls_in_transaction(self):
         handler = views.WebApplicationHandler(2)
 
@@ -12,7 +12,10 @@ from itertools import count
 import logging
 import sys
 from time import sleep
-from weakref import WeakSet
+from weakref import (
+    WeakKeyDictionary,
+    WeakSet,
+)
 
 from django.core import signals
 from django.core.handlers.wsgi import WSGIHandler
@@ -22,11 +25,13 @@ from maasserver.exceptions import MAASAPIException
 from maasserver.utils.django_urls import get_resolver
 from maasserver.utils.orm import (
     gen_retry_intervals,
+    get_retry_reason,
     is_retryable_failure,
     post_commit_hooks,
     retry_context,
     RetryTransaction,
 )
+from maasserver.utils.retrystats import retry_statistics
 from piston3.authentication import initialize_server_request
 from piston3.models import Nonce
 from piston3.oauth import OAuthError
@@ -99,6 +104,19 @@ def reset_request(request):
     return request.__class__(request.environ)
 
 
+def get_view_name(request):
+    """Return the name of the view that handled `request`.
+
+    Paths are not used because they often contain object IDs. Requests that
+    did not resolve to a view are counted together.
+    """
+    resolver_match = getattr(request, "resolver_match", None)
+    if resolver_match is None:
+        return "unresolved"
+    else:
+        return resolver_match.view_name
+
+
 def request_headers(request):
     """Return a dict with headers from a request.
 
@@ -140,6 +158,10 @@ class WebApplicationHandler(WSGIHandler):
         no longer be considered for a retry.
     :ivar __retry: A weak set containing responses that have been generated as
         a result of a retryable failure.
+    :ivar __retry_errors: A weak mapping from those responses to the
+        retryable failures that caused them.
+
+    Attempts and retries are counted in `retry_statistics` by view name.
     """
 
     def __init__(self, attempts=10, timeout=90.0):
@@ -148,6 +170,7 @@ class WebApplicationHandler(WSGIHandler):
         self.__retry_attempts = attempts
         self.__retry_timeout = timeout
         self.__retry = WeakSet()
+        self.__retry_errors = WeakKeyDictionary()
 
     def handle_uncaught_exception(self, request, resolver, exc_info):
         """Override `BaseHandler.handle_uncaught_exception`.
@@ -162,8 +185,10 @@ class WebApplicationHandler(WSGIHandler):
         exc_type, exc_value, exc_traceback = exc_info
         if isinstance(exc_value, RetryTransaction):
             self.__retry.add(response)
+            self.__retry_errors[response] = exc_value
         elif is_retryable_failure(exc_value):
             self.__retry.add(response)
+            self.__retry_errors[response] = exc_value
         elif isinstance(exc_value, MAASAPIException):
             return exc_value.make_http_response()
         else:
@@ -243,16 +268,24 @@ class WebApplicationHandler(WSGIHandler):
             for attempt in count(1):
                 retry_context.prepare()
                 response = get_response(request)
+                view_name = get_view_name(request)
+                retry_statistics.record_attempt(view_name, attempt)
                 if response in retry_set:
                     elapsed, remaining, wait = next(retry_details)
                     if attempt == retry_attempts or wait == 0:
                         # Time's up: this was the final attempt.
+                        retry_statistics.record_failure(view_name)
                         log_final_failed_attempt(request, attempt, elapsed)
                         conflict_response = HttpResponseConflict(response)
                         conflict_response.render()
                         return conflict_response
                     else:
                         # We'll retry after a brief interlude.
+                        error = self.__retry_errors.get(response)
+                        retry_statistics.record_retry(
+                            view_name, get_retry_reason(error), wait,
+                            error.args if isinstance(
+                                error, RetryTransaction) else ())
                         log_failed_attempt(
                             request, attempt, elapsed, remaining, wait)
                         delete_oauth_nonce(request)
@@ -156,9 +156,13 @@ class Handler(metaclass=HandlerMetaclass):
 
     """
 
-    def __init__(self, user, cache):
+    def __init__(self, user, cache, notify=None):
         self.user = user
         self.cache = cache
+        # Optional callable, taking an action and data, that sends a
+        # notification to the client outside of any response. Handlers
+        # must not rely on it being set.
+        self.notify = notify
         # Holds a set of all pks that the client has loaded and has on their
         # end of the connection. This is used to inform the client of the
         # correct notifications based on what items the client has.
@@ -8,10 +8,12 @@ __all__ = [
     ]
 
 from collections import defaultdict
+from contextlib import closing
 import json
 
 from distro_info import UbuntuDistroInfo
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.db.models import Q
 from maasserver.bootresources import (
     import_resources,
@@ -27,10 +29,7 @@ from maasserver.clusterrpc.boot_images import (
     is_import_boot_images_running,
 )
 from maasserver.clusterrpc.osystems import get_os_release_title
-from maasserver.enum import (
-    BOOT_RESOURCE_TYPE,
-    NODE_STATUS,
-)
+from maasserver.enum import BOOT_RESOURCE_TYPE
 from maasserver.models import (
     BootResource,
     BootSource,
@@ -38,7 +37,6 @@ from maasserver.models import (
     BootSourceSelection,
     Config,
     LargeFile,
-    Node,
 )
 from maasserver.utils import get_maas_user_agent
 from maasserver.utils.converters import human_readable_bytes
@@ -70,6 +68,10 @@ from twisted.internet.defer import Deferred
 
 log = LegacyLogger()
 
+# Whether rack controllers are importing images is shown from an answer up to
+# this many seconds old, rather than asking every rack controller each time.
+RACK_IMPORT_RUNNING_MAX_AGE = 10
+
 
 def get_distro_series_info_row(series):
     """Returns the distro series row information from python-distro-info.
@@ -94,6 +96,56 @@ def format_ubuntu_distro_series(series):
     return row['version']
 
 
+def get_deployed_node_counts():
+    """Return the number of deployed and deploying nodes.
+
+    The counts are maintained by triggers in the
+    `maasserver_deployednodecount` table.
+
+    :return: A dict mapping (osystem, distro_series, architecture) to the
+        number of nodes. Unset values are empty strings.
+    """
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(
+            "SELECT osystem, distro_series, architecture, count "
+            "FROM maasserver_deployednodecount")
+        return {
+            (osystem, distro_series, architecture): count
+            for osystem, distro_series, architecture, count in cursor
+        }
+
+
+def diff_summary(previous, summary):
+    """Return what has changed between two summaries of the images page.
+
+    :return: A dict holding each top-level key of `summary` whose value has
+        changed, except that `resources` only holds the resources that are
+        new or have changed, and `removed_resources` the IDs of resources
+        that are gone.
+    """
+    changes = {
+        key: value
+        for key, value in summary.items()
+        if key != 'resources' and previous.get(key) != value
+    }
+    previous_resources = {
+        resource['id']: resource
+        for resource in previous['resources']
+    }
+    resources = [
+        resource
+        for resource in summary['resources']
+        if previous_resources.get(resource['id']) != resource
+    ]
+    if len(resources) != 0:
+        changes['resources'] = resources
+    removed = set(previous_resources).difference(
+        resource['id'] for resource in summary['resources'])
+    if len(removed) != 0:
+        changes['removed_resources'] = sorted(removed)
+    return changes
+
+
 class BootResourceHandler(Handler):
 
     class Meta:
@@ -106,6 +158,9 @@ class BootResourceHandler(Handler):
             'fetch',
             'delete_image',
         ]
+        listen_channels = [
+            'bootresource',
+        ]
 
     def format_ubuntu_sources(self):
         """Return formatted Ubuntu sources."""
@@ -321,10 +376,13 @@ class BootResourceHandler(Handler):
             })
         return images
 
-    def node_has_architecture_for_resource(self, node, resource):
-        """Return True if node is the same architecture as resource."""
+    def node_architecture_supports_resource(self, architecture, resource):
+        """Return True if nodes of `architecture` can use resource."""
         arch, _ = resource.split_arch()
-        node_arch, node_subarch = node.split_arch()
+        if architecture == '':
+            node_arch, node_subarch = '', ''
+        else:
+            node_arch, node_subarch = architecture.split('/')
         return arch == node_arch and resource.supports_subarch(node_subarch)
 
     def get_number_of_nodes_deployed_for(self, resource):
@@ -336,22 +394,18 @@ class BootResourceHandler(Handler):
         else:
             osystem, distro_series = resource.name.split('/')
 
-        # Count the number of nodes with same os/release and architecture.
-        count = 0
-        for node in self.nodes.filter(
-                osystem=osystem, distro_series=distro_series):
-            if self.node_has_architecture_for_resource(node, resource):
-                count += 1
-
-        # Any node that is deployed without osystem and distro_series,
-        # will be using the defaults.
+        # Count the nodes with same os/release. Any node that is deployed
+        # without osystem and distro_series, will be using the defaults.
+        releases = {(osystem, distro_series)}
         if (self.default_osystem == osystem and
                 self.default_distro_series == distro_series):
-            for node in self.nodes.filter(
-                    osystem="", distro_series=""):
-                if self.node_has_architecture_for_resource(node, resource):
-                    count += 1
-        return count
+            releases.add(('', ''))
+        return sum(
+            count
+            for (node_osystem, node_distro_series, architecture), count in (
+                self.node_counts.items())
+            if (node_osystem, node_distro_series) in releases and
+            self.node_architecture_supports_resource(architecture, resource))
 
     def pick_latest_datetime(self, time, other_time):
         """Return the datetime that is the latest."""
@@ -503,14 +557,8 @@ class BootResourceHandler(Handler):
             for _, group in resource_group.items()
             ]
 
-    def poll(self, params):
-        """Polling method that the websocket client calls.
-
-        Since boot resource information is split between the region and the
-        rack controllers the websocket uses a polling method to get the
-        updated information. Pushing the information at the moment is not
-        possible as no rack information is cached on the region side.
-        """
+    def get_summary(self):
+        """Return everything shown on the images page."""
         try:
             sources, releases, arches = get_os_info_from_boot_sources('ubuntu')
             self.connection_error = False
@@ -523,26 +571,19 @@ class BootResourceHandler(Handler):
             self.ubuntu_releases = set()
             self.ubuntu_arches = set()
 
-        # Load all the nodes, so its not done on every call
-        # to the method get_number_of_nodes_deployed_for.
-        # XXX Danilo 2017-06-29: this used to also do
-        #   .only('osystem', 'distro_series')
-        # but that caused "RecursionError: maximum recursion depth exceeded
-        # while calling a Python object" errors with Django 1.11 in
-        #   maasserver.websockets.handlers.tests.test_bootresource
-        # tests.  Since we are filtering on status field which is not in
-        # "only" anyway, I don't think we ever had the benefit of prefetching
-        # only those two fields.
-        self.nodes = Node.objects.filter(
-            status__in=[NODE_STATUS.DEPLOYED, NODE_STATUS.DEPLOYING])
+        # Load the deployed node counts, so its not done on every call to
+        # the method get_number_of_nodes_deployed_for.
+        self.node_counts = get_deployed_node_counts()
         self.default_osystem = Config.objects.get_config(
             'default_osystem')
         self.default_distro_series = Config.objects.get_config(
             'default_distro_series')
 
         # Load list of boot resources that currently exist on all racks.
+        # These are cached until a rack controller next finishes importing.
         rack_images = get_common_available_boot_images()
-        self.racks_syncing = is_import_boot_images_running()
+        self.racks_syncing = is_import_boot_images_running(
+            max_age=RACK_IMPORT_RUNNING_MAX_AGE)
         self.rack_resources = (
             BootResource.objects.get_resources_matching_boot_images(
                 rack_images))
@@ -571,7 +612,7 @@ class BootResourceHandler(Handler):
             arches=self.format_ubuntu_arches(),
             commissioning_series=commissioning_series,
         )
-        data = dict(
+        return dict(
             connection_error=self.connection_error,
             region_import_running=is_import_resources_running(),
             rack_import_running=self.racks_syncing,
@@ -580,8 +621,38 @@ class BootResourceHandler(Handler):
             ubuntu_core_images=self.format_ubuntu_core_images(),
             other_images=self.format_other_images(),
             )
+
+    def poll(self, params):
+        """Polling method that the websocket client calls.
+
+        Returns everything shown on the images page. Once a client has
+        polled, changes are pushed to it as they happen; see `on_listen`.
+        Whether rack controllers are importing images is not pushed, so
+        clients still poll, but only occasionally.
+        """
+        data = self.get_summary()
+        self.cache['summary'] = data
         return json.dumps(data)
 
+    def on_listen(self, channel, action, pk):
+        """Called by the protocol when the 'bootresource' channel fires.
+
+        The region's images, the image sources, the deployed node counts, or
+        the images on a rack controller have changed. Clients that have
+        polled are sent the changes since they last heard; see
+        `diff_summary`.
+        """
+        previous = self.cache.get('summary')
+        if previous is None:
+            return None
+        summary = self.get_summary()
+        self.cache['summary'] = summary
+        changes = diff_summary(previous, summary)
+        if len(changes) == 0:
+            return None
+        else:
+            return (self._meta.handler_name, "update", changes)
+
     def get_bootsource(self, params, from_db=False):
         source_type = params.get('source_type', 'custom')
         if source_type == 'maas.io':
@@ -7,6 +7,7 @@ __all__ = [
     "ControllerHandler",
     ]
 
+from maasserver.clusterrpc.boot_images import get_image_sync_statuses
 from maasserver.enum import NODE_PERMISSION
 from maasserver.forms import ControllerForm
 from maasserver.models.node import (
@@ -118,15 +119,22 @@ class ControllerHandler(MachineHandler):
         return data
 
     def check_images(self, params):
-        """Get the image sync statuses of requested controllers."""
-        result = {}
+        """Get the image sync statuses of requested controllers.
+
+        All the rack controllers are asked at once, so that the controllers
+        page waits for the slowest of them, not for all of them in turn.
+        """
+        system_ids = []
         for node in [self.get_object(param) for param in params]:
-            # We use a RackController method; without the cast, it's a Node.
+            # Without the cast, it's a Node.
             node = node.as_rack_controller()
             if isinstance(node, RackController):
-                result[node.system_id] = node.get_image_sync_status().replace(
-                    "-", " ").title()
-        return result
+                system_ids.append(node.system_id)
+        statuses = get_image_sync_statuses(system_ids)
+        return {
+            system_id: status.replace("-", " ").title()
+            for system_id, status in statuses.items()
+        }
 
     def dehydrate_show_os_info(self, obj):
         """Always show the OS information for controllers in the UI."""
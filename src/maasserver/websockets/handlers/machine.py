@@ -64,7 +64,10 @@ from maasserver.models.node import (
 )
 from maasserver.models.partition import Partition
 from maasserver.models.subnet import Subnet
-from maasserver.node_action import compile_node_actions
+from maasserver.node_action import (
+    BulkNodeAction,
+    compile_node_actions,
+)
 from maasserver.utils.orm import (
     reload_object,
     transactional,
@@ -87,12 +90,29 @@ from metadataserver.models import ScriptResult
 from metadataserver.models.scriptset import get_status_from_qs
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc.exceptions import UnknownPowerType
-from provisioningserver.utils.twisted import asynchronous
+from provisioningserver.utils.twisted import (
+    asynchronous,
+    FOREVER,
+)
+from twisted.internet.defer import inlineCallbacks
 
 
 log = LegacyLogger()
 
 
+# Filters accepted by `MachineHandler.bulk_action`, mapped to lookups. Each
+# takes a list of values, any of which may match.
+BULK_ACTION_FILTERS = {
+    "hostname": "hostname__in",
+    "domain": "domain__name__in",
+    "zone": "zone__name__in",
+    "pool": "pool__name__in",
+    "status": "status__in",
+    "owner": "owner__username__in",
+    "tags": "tags__name__in",
+}
+
+
 class MachineHandler(NodeHandler):
 
     class Meta(NodeHandler.Meta):
@@ -104,6 +124,7 @@ class MachineHandler(NodeHandler):
             'create',
             'update',
             'action',
+            'bulk_action',
             'set_active',
             'check_power',
             'create_physical',
@@ -742,6 +763,44 @@ class MachineHandler(NodeHandler):
         extra_params = params.get("extra", {})
         return action.execute(**extra_params)
 
+    @asynchronous(timeout=FOREVER)
+    @inlineCallbacks
+    def bulk_action(self, params):
+        """Perform the action on many machines at once.
+
+        Machines are selected by `system_ids`, a list, or by `filter`, a dict
+        with keys from `BULK_ACTION_FILTERS`. The result of each machine is
+        also sent to the client in a notification as soon as it is known.
+
+        :return: A list of results, one for each machine.
+        """
+        bulk = BulkNodeAction(
+            params.get("action"), self.user, extra=params.get("extra", {}),
+            report=self._notify_bulk_action_result)
+        if "system_ids" in params:
+            results = yield bulk.execute(system_ids=params["system_ids"])
+        elif "filter" in params:
+            results = yield bulk.execute(
+                nodes=self._filter_bulk_action(params["filter"]))
+        else:
+            raise HandlerError("Either system_ids or filter is required.")
+        return results
+
+    def _filter_bulk_action(self, filters):
+        """Return the machines matching `filters`."""
+        unknown = set(filters).difference(BULK_ACTION_FILTERS)
+        if len(unknown) > 0:
+            raise HandlerError(
+                "Unknown filter(s): %s." % ", ".join(sorted(unknown)))
+        return Machine.objects.filter(**{
+            BULK_ACTION_FILTERS[name]: values
+            for name, values in filters.items()
+        }).distinct()
+
+    def _notify_bulk_action_result(self, result):
+        if self.notify is not None:
+            self.notify("bulk_action", result)
+
     def _create_link_on_interface(self, interface, params):
         """Create a link on a new interface."""
         mode = params.get("mode", None)
@@ -43,6 +43,7 @@ from maastesting.matchers import (
     MockCalledOnce,
     MockCalledOnceWith,
 )
+from maastesting.testcase import MAASTestCase
 from provisioningserver.config import (
     DEFAULT_IMAGES_URL,
     DEFAULT_KEYRINGS_PATH,
@@ -710,6 +711,172 @@ class TestBootResourcePoll(MAASServerTestCase, PatchOSInfoMixin):
         json_obj = json.loads(response)
         self.assertEquals(title, json_obj['resources'][0]['title'])
 
+    def test_passes_max_age_to_is_import_boot_images_running(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {})
+        mock_running = self.patch(
+            bootresource, 'is_import_boot_images_running')
+        mock_running.return_value = False
+        handler.poll({})
+        self.assertThat(mock_running, MockCalledOnceWith(
+            max_age=bootresource.RACK_IMPORT_RUNNING_MAX_AGE))
+
+    def test_remembers_summary_for_notifications(self):
+        owner = factory.make_admin()
+        cache = {}
+        handler = BootResourceHandler(owner, cache)
+        response = handler.poll({})
+        self.assertEqual(json.loads(response), cache['summary'])
+
+
+class TestGetDeployedNodeCounts(MAASServerTestCase):
+    """Tests for `get_deployed_node_counts`."""
+
+    def make_key(self):
+        return (
+            factory.make_name('os'), factory.make_name('series'),
+            '%s/%s' % (
+                factory.make_name('arch'), factory.make_name('subarch')))
+
+    def make_node(self, key, status=NODE_STATUS.DEPLOYED):
+        osystem, distro_series, architecture = key
+        return factory.make_Node(
+            status=status, osystem=osystem, distro_series=distro_series,
+            architecture=architecture)
+
+    def test__counts_deployed_and_deploying_nodes(self):
+        key = self.make_key()
+        self.make_node(key, NODE_STATUS.DEPLOYED)
+        self.make_node(key, NODE_STATUS.DEPLOYING)
+        self.make_node(key, NODE_STATUS.READY)
+        self.assertEqual(2, bootresource.get_deployed_node_counts()[key])
+
+    def test__follows_status_changes(self):
+        key = self.make_key()
+        node = self.make_node(key, NODE_STATUS.DEPLOYING)
+        node.status = NODE_STATUS.FAILED_DEPLOYMENT
+        node.save()
+        self.assertNotIn(key, bootresource.get_deployed_node_counts())
+
+    def test__follows_release_changes(self):
+        key = self.make_key()
+        node = self.make_node(key)
+        other_key = (factory.make_name('os'), key[1], key[2])
+        node.osystem = other_key[0]
+        node.save()
+        counts = bootresource.get_deployed_node_counts()
+        self.assertNotIn(key, counts)
+        self.assertEqual(1, counts[other_key])
+
+    def test__follows_deletes(self):
+        key = self.make_key()
+        self.make_node(key)
+        self.make_node(key).delete()
+        self.assertEqual(1, bootresource.get_deployed_node_counts()[key])
+
+
+class TestDiffSummary(MAASTestCase):
+    """Tests for `diff_summary`."""
+
+    def make_summary(self, resources=()):
+        return {
+            'rack_import_running': False,
+            'resources': [dict(resource) for resource in resources],
+        }
+
+    def test__returns_nothing_when_unchanged(self):
+        resources = [{'id': 1, 'status': 'Synced'}]
+        self.assertEqual({}, bootresource.diff_summary(
+            self.make_summary(resources), self.make_summary(resources)))
+
+    def test__returns_changed_keys(self):
+        previous = self.make_summary()
+        summary = self.make_summary()
+        summary['rack_import_running'] = True
+        self.assertEqual(
+            {'rack_import_running': True},
+            bootresource.diff_summary(previous, summary))
+
+    def test__returns_changed_and_new_resources(self):
+        previous = self.make_summary([
+            {'id': 1, 'status': 'Queued'},
+            {'id': 2, 'status': 'Synced'},
+        ])
+        summary = self.make_summary([
+            {'id': 1, 'status': 'Downloading'},
+            {'id': 2, 'status': 'Synced'},
+            {'id': 3, 'status': 'Queued'},
+        ])
+        self.assertEqual({
+            'resources': [
+                {'id': 1, 'status': 'Downloading'},
+                {'id': 3, 'status': 'Queued'},
+            ],
+        }, bootresource.diff_summary(previous, summary))
+
+    def test__returns_removed_resources(self):
+        previous = self.make_summary([
+            {'id': 1, 'status': 'Synced'},
+            {'id': 2, 'status': 'Synced'},
+        ])
+        summary = self.make_summary([{'id': 2, 'status': 'Synced'}])
+        self.assertEqual(
+            {'removed_resources': [1]},
+            bootresource.diff_summary(previous, summary))
+
+
+class TestBootResourceOnListen(MAASServerTestCase, PatchOSInfoMixin):
+
+    def setUp(self):
+        super(TestBootResourceOnListen, self).setUp()
+        # Disable boot source cache signals.
+        self.addCleanup(bootsources.signals.enable)
+        bootsources.signals.disable()
+
+    def test__returns_None_until_polled(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {})
+        self.assertIsNone(
+            handler.on_listen('bootresource', 'update', 'images'))
+
+    def test__returns_None_when_nothing_changed(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {})
+        factory.make_usable_boot_resource()
+        handler.poll({})
+        self.assertIsNone(
+            handler.on_listen('bootresource', 'update', 'images'))
+
+    def test__returns_changes_since_poll(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {})
+        factory.make_usable_boot_resource()
+        handler.poll({})
+        resource = factory.make_usable_boot_resource()
+        name, action, changes = handler.on_listen(
+            'bootresource', 'update', 'images')
+        self.assertEqual(('bootresource', 'update'), (name, action))
+        self.assertEqual(
+            [resource.id],
+            [json_resource['id'] for json_resource in changes['resources']])
+        # Later notifications only send later changes.
+        self.assertIsNone(
+            handler.on_listen('bootresource', 'update', 'images'))
+
+    def test__returns_changed_node_counts(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {})
+        resource = factory.make_usable_boot_resource(
+            rtype=BOOT_RESOURCE_TYPE.SYNCED)
+        handler.poll({})
+        os_name, series = resource.name.split('/')
+        factory.make_Node(
+            status=NODE_STATUS.DEPLOYED,
+            osystem=os_name, distro_series=series,
+            architecture=resource.architecture)
+        _, _, changes = handler.on_listen('bootresource', 'update', 'nodes')
+        self.assertEqual(1, changes['resources'][0]['numberOfNodes'])
+
 
 class TestBootResourceStopImport(MAASTransactionServerTestCase):
 
@@ -11,7 +11,9 @@ from maasserver.models import ControllerInfo
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.websockets.base import dehydrate_datetime
+from maasserver.websockets.handlers import controller as controller_module
 from maasserver.websockets.handlers.controller import ControllerHandler
+from maastesting.matchers import MockCalledOnceWith
 from testscenarios import multiply_scenarios
 from testtools.matchers import (
     ContainsDict,
@@ -91,6 +93,29 @@ class TestControllerHandler(MAASServerTestCase):
             node1.system_id: "Unknown",
             node2.system_id: "Unknown"}, data)
 
+    def test_check_images_asks_all_racks_at_once(self):
+        owner = factory.make_admin()
+        handler = ControllerHandler(owner, {})
+        node1 = factory.make_RackController(owner=owner)
+        node2 = factory.make_RackController(owner=owner)
+        region = factory.make_RegionController()
+        get_image_sync_statuses = self.patch(
+            controller_module, "get_image_sync_statuses")
+        get_image_sync_statuses.return_value = {
+            node1.system_id: "synced",
+            node2.system_id: "out-of-sync",
+        }
+        data = handler.check_images([
+            {"system_id": node1.system_id},
+            {"system_id": node2.system_id},
+            {"system_id": region.system_id}])
+        self.assertEqual({
+            node1.system_id: "Synced",
+            node2.system_id: "Out Of Sync"}, data)
+        self.assertThat(
+            get_image_sync_statuses,
+            MockCalledOnceWith([node1.system_id, node2.system_id]))
+
     def test_dehydrate_show_os_info_returns_true(self):
         owner = factory.make_admin()
         rack = factory.make_RackController()
@@ -10,7 +10,10 @@ import logging
 from operator import itemgetter
 import random
 import re
-from unittest.mock import ANY
+from unittest.mock import (
+    ANY,
+    Mock,
+)
 
 from crochet import wait_for
 from django.core.exceptions import ValidationError
@@ -57,7 +60,10 @@ from maasserver.models.partition import (
     Partition,
     PARTITION_ALIGNMENT_SIZE,
 )
-from maasserver.node_action import compile_node_actions
+from maasserver.node_action import (
+    compile_node_actions,
+    make_bulk_action_result,
+)
 import maasserver.node_action as node_action_module
 from maasserver.testing.architecture import make_usable_architecture
 from maasserver.testing.factory import factory
@@ -3211,6 +3217,72 @@ class TestMachineHandlerCheckPower(MAASTransactionServerTestCase):
                 ANY, "Failed to update power state of machine."))
 
 
+class TestMachineHandlerBulkAction(MAASTransactionServerTestCase):
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__performs_action_on_system_ids(self):
+        admin = yield deferToDatabase(transactional(factory.make_admin))
+        zone = yield deferToDatabase(transactional(factory.make_Zone))
+        machines = yield deferToDatabase(transactional(
+            lambda: [factory.make_Machine() for _ in range(3)]))
+        system_ids = [machine.system_id for machine in machines]
+        notify = Mock()
+        handler = MachineHandler(admin, {}, notify)
+        results = yield handler.bulk_action({
+            "action": "set-zone",
+            "extra": {"zone_id": zone.id},
+            "system_ids": system_ids,
+        })
+        self.assertItemsEqual(
+            [make_bulk_action_result(system_id) for system_id in system_ids],
+            results)
+        self.assertItemsEqual(
+            [(("bulk_action", result), {}) for result in results],
+            notify.call_args_list)
+        zones = yield deferToDatabase(transactional(lambda: {
+            reload_object(machine).zone for machine in machines}))
+        self.assertEqual({zone}, zones)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__performs_action_on_filtered_machines(self):
+        admin = yield deferToDatabase(transactional(factory.make_admin))
+        zone = yield deferToDatabase(transactional(factory.make_Zone))
+        machine, other = yield deferToDatabase(transactional(
+            lambda: [factory.make_Machine() for _ in range(2)]))
+        handler = MachineHandler(admin, {})
+        results = yield handler.bulk_action({
+            "action": "set-zone",
+            "extra": {"zone_id": zone.id},
+            "filter": {"hostname": [machine.hostname]},
+        })
+        self.assertEqual(
+            [make_bulk_action_result(machine.system_id)], results)
+        other_zone = yield deferToDatabase(
+            transactional(lambda: reload_object(other).zone))
+        self.assertNotEqual(zone, other_zone)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__rejects_unknown_filters(self):
+        admin = yield deferToDatabase(transactional(factory.make_admin))
+        handler = MachineHandler(admin, {})
+        with ExpectedException(HandlerError):
+            yield handler.bulk_action({
+                "action": "set-zone",
+                "filter": {factory.make_name("filter"): []},
+            })
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__requires_system_ids_or_filter(self):
+        admin = yield deferToDatabase(transactional(factory.make_admin))
+        handler = MachineHandler(admin, {})
+        with ExpectedException(HandlerError):
+            yield handler.bulk_action({"action": "set-zone"})
+
+
 class TestMachineHandlerMountSpecial(MAASServerTestCase):
     """Tests for MachineHandler.mount_special."""
 
@@ -352,7 +352,8 @@ class WebSocketProtocol(Protocol):
         """Return an initialised instance of `handler_class`."""
         handler_name = handler_class._meta.handler_name
         handler_cache = self.cache.setdefault(handler_name, {})
-        return handler_class(self.user, handler_cache)
+        return handler_class(
+            self.user, handler_cache, partial(self.sendNotify, handler_name))
 
 
 class WebSocketFactory(Factory):
@@ -690,6 +690,7 @@ class MakeProtocolFactoryMixin:
         return protocol, factory
 
 ALL_NOTIFIERS = (
+    "bootresource",
     "config",
     "controller",
     "device",
@@ -140,10 +140,10 @@ class HTTPServerFixture(Fixture):
     Files are served from the current working directory and below.
     """
 
-    def __init__(self, host="localhost", port=0):
+    def __init__(self, host="localhost", port=0,
+                 handler=SilentHTTPRequestHandler):
         super(HTTPServerFixture, self).__init__()
-        self.server = ThreadingHTTPServer(
-            (host, port), SilentHTTPRequestHandler)
+        self.server = ThreadingHTTPServer((host, port), handler)
 
     @property
     def url(self):
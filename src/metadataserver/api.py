@@ -186,9 +186,8 @@ def check_version(version):
         raise UnknownMetadataVersion("Unknown metadata version: %s" % version)
 
 
-def add_event_to_node_event_log(
-        node, origin, action, description, result=None, created=None):
-    """Add an entry to the node's event log."""
+def get_node_event_type_name(node, result=None):
+    """Return the name of the event type for a status message from `node`."""
     if node.status == NODE_STATUS.COMMISSIONING:
         if result in ['SUCCESS', None]:
             type_name = EVENT_TYPES.NODE_COMMISSIONING_EVENT
@@ -212,7 +211,13 @@ def add_event_to_node_event_log(
         type_name = EVENT_TYPES.REQUEST_CONTROLLER_REFRESH
     else:
         type_name = EVENT_TYPES.NODE_STATUS_EVENT
+    return type_name
+
 
+def add_event_to_node_event_log(
+        node, origin, action, description, result=None, created=None):
+    """Add an entry to the node's event log."""
+    type_name = get_node_event_type_name(node, result)
     event_details = EVENT_DETAILS[type_name]
     return Event.objects.register_event_and_event_type(
         type_name, type_level=event_details.level,
@@ -10,11 +10,14 @@ from datetime import datetime
 import json
 
 from django.db import DatabaseError
+from django.db.models import Q
 from maasserver.api.utils import extract_oauth_key_from_auth_header
 from maasserver.enum import (
     NODE_STATUS,
     NODE_TYPE,
 )
+from maasserver.models.event import Event
+from maasserver.models.eventtype import EventType
 from maasserver.models.node import Node
 from maasserver.models.timestampedmodel import now
 from maasserver.preseed import CURTIN_INSTALL_LOG
@@ -28,6 +31,7 @@ from maasserver.utils.threads import deferToDatabase
 from metadataserver import logger
 from metadataserver.api import (
     add_event_to_node_event_log,
+    get_node_event_type_name,
     process_file,
 )
 from metadataserver.enum import SCRIPT_STATUS
@@ -35,10 +39,18 @@ from metadataserver.models import (
     NodeKey,
     ScriptSet,
 )
+from provisioningserver.events import EVENT_DETAILS
 from provisioningserver.logger import LegacyLogger
-from provisioningserver.utils.twisted import deferred
+from provisioningserver.utils.twisted import (
+    callOut,
+    deferred,
+)
 from twisted.application.internet import TimerService
 from twisted.internet import reactor
+from twisted.internet.defer import (
+    Deferred,
+    succeed,
+)
 from twisted.web.resource import Resource
 from twisted.web.server import NOT_DONE_YET
 
@@ -182,25 +194,73 @@ class StatusHandlerResource(Resource):
 
 
 class StatusWorkerService(TimerService, object):
-    """Service to update nodes from recieved status messages."""
-
-    check_interval = 60  # Every second.
-
-    def __init__(self, dbtasks, clock=reactor):
-        # Call self._tryUpdateNodes() every self.check_interval.
+    """Service to update nodes from recieved status messages.
+
+    Messages that need no more than an event in the node's event log are
+    queued, and the queue is flushed every `flush_interval` seconds. Each
+    flush writes the messages from up to `batch_size` nodes in a single
+    transaction, with one insert for all the events and one update of the
+    `last_ping` of all the script sets.
+
+    Messages from any one node are always written in the order they were
+    received: a message that must be processed immediately first waits for
+    the node's earlier messages to be written.
+    """
+
+    # The default number of seconds between flushes of the queue. This can
+    # be changed with `status_flush_interval` in regiond.conf.
+    flush_interval = 60
+
+    # The number of nodes whose messages are written in one transaction.
+    batch_size = 100
+
+    # The script set of which `last_ping` is updated, by node status.
+    script_set_statuses = {
+        NODE_STATUS.COMMISSIONING: 'current_commissioning_script_set_id',
+        NODE_STATUS.TESTING: 'current_testing_script_set_id',
+        NODE_STATUS.DEPLOYING: 'current_installation_script_set_id',
+    }
+
+    def __init__(self, dbtasks, clock=reactor, flush_interval=None):
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        # Call self._tryUpdateNodes() every self.flush_interval.
         super(StatusWorkerService, self).__init__(
-            self.check_interval, self._tryUpdateNodes)
+            self.flush_interval, self._tryUpdateNodes)
         self.dbtasks = dbtasks
         self.clock = clock
         self.queue = defaultdict(list)
+        # Callers waiting for the current flush, by authorization.
+        self.flushing = {}
 
     def _tryUpdateNodes(self):
         if len(self.queue) != 0:
             queue, self.queue = self.queue, defaultdict(list)
+            self.flushing = {authorization: [] for authorization in queue}
             d = deferToDatabase(self._preProcessQueue, queue)
             d.addCallback(self._processMessagesLater)
             d.addErrback(log.err, "Failed to process node status messages.")
+            d.addBoth(callOut, self._flushed)
+            return d
+
+    def _flushed(self):
+        """Release callers waiting for the current flush."""
+        flushing, self.flushing = self.flushing, {}
+        for waiters in flushing.values():
+            for waiter in waiters:
+                waiter.callback(None)
+
+    def _waitForFlush(self, authorization):
+        """Wait until messages already flushed for `authorization` are written.
+
+        :return: A `Deferred` that fires with `None`.
+        """
+        if authorization in self.flushing:
+            d = Deferred()
+            self.flushing[authorization].append(d)
             return d
+        else:
+            return succeed(None)
 
     @transactional
     def _preProcessQueue(self, queue):
@@ -217,12 +277,101 @@ class StatusWorkerService(TimerService, object):
         ]
 
     def _processMessagesLater(self, tasks):
-        # Move all messages on the queue off onto the database tasks queue.
-        # We're not going to wait for them to be processed because we can't /
-        # don't apply back-pressure to those systems that are producing these
-        # messages anyway.
+        # Move all messages on the queue off onto the database tasks queue in
+        # one go. We don't apply back-pressure to those systems that are
+        # producing these messages, but we do wait for them to be written
+        # before flushing again, so that each flush is written in order.
+        if len(tasks) != 0:
+            return self.dbtasks.deferTask(self._processBatches, tasks)
+
+    def _processBatches(self, tasks):
+        # Push the messages into the database, `batch_size` nodes at a time.
+        # This should be called in a non-reactor thread with a pre-existing
+        # connection (e.g. via deferToDatabase).
+        if in_transaction():
+            raise TransactionManagementError(
+                "_processBatches must be called from "
+                "outside of a transaction.")
+        else:
+            for start in range(0, len(tasks), self.batch_size):
+                batch = tasks[start:start + self.batch_size]
+                try:
+                    self._processBatch(batch)
+                except:
+                    log.err(
+                        None, "Failed to process status messages in bulk; "
+                        "processing them one at a time.")
+                    for node, messages in batch:
+                        self._processMessages(node, messages)
+
+    @transactional
+    def _processBatch(self, tasks):
+        """Write queued messages from many nodes.
+
+        Queued messages have no files, and do not change the node's status,
+        so each results only in an event in the node's event log.
+
+        :param tasks: A list of (node, messages) tuples.
+        """
+        # Validate that the nodes still exist since this is a new transaction;
+        # messages for nodes that have been deleted are dropped.
+        nodes = Node.objects.in_bulk([node.id for node, _ in tasks])
+        event_types = {}
+        events = []
         for node, messages in tasks:
-            self.dbtasks.addTask(self._processMessages, node, messages)
+            node = nodes.get(node.id)
+            if node is not None:
+                events.extend(
+                    self._makeEvent(node, message, event_types)
+                    for message in messages)
+        Event.objects.bulk_create(events)
+        self._updateLastPings(nodes.values())
+
+    def _makeEvent(self, node, message, event_types):
+        """Return an unsaved `Event` for `message` from `node`.
+
+        :param event_types: A dict of `EventType`s by name, used to look up
+            each event type only once per batch.
+        """
+        type_name = get_node_event_type_name(node, message.get('result'))
+        event_type = event_types.get(type_name)
+        if event_type is None:
+            event_details = EVENT_DETAILS[type_name]
+            event_type = event_types[type_name] = EventType.objects.register(
+                type_name, event_details.description, event_details.level)
+        return Event(
+            type=event_type, node=node, action=message['name'],
+            description="'%s' %s" % (
+                message['origin'], message['description']),
+            created=message['timestamp'], updated=message['timestamp'])
+
+    def _updateLastPings(self, nodes):
+        """Update the last ping of the current script sets of `nodes`.
+
+        This is the bulk equivalent of `_updateLastPing`.
+        """
+        script_set_ids = set()
+        for node in nodes:
+            script_set_property = self.script_set_statuses.get(node.status)
+            if script_set_property is not None:
+                script_set_id = getattr(node, script_set_property)
+                if script_set_id is not None:
+                    script_set_ids.add(script_set_id)
+        if len(script_set_ids) == 0:
+            return
+        try:
+            script_set_ids = list(
+                ScriptSet.objects.select_for_update(nowait=True).filter(
+                    id__in=script_set_ids).order_by('id').values_list(
+                    'id', flat=True))
+        except DatabaseError:
+            # select_for_update(nowait=True) failed instantly. Raise error so
+            # @transactional will retry the whole operation.
+            raise make_serialization_failure()
+        current_time = now()
+        ScriptSet.objects.filter(id__in=script_set_ids).filter(
+            Q(last_ping=None) | Q(last_ping__lt=current_time)).update(
+            last_ping=current_time)
 
     def _processMessages(self, node, messages):
         # Push the messages into the database, recording them for this node.
@@ -264,12 +413,7 @@ class StatusWorkerService(TimerService, object):
         Update the last ping in any status which uses a script_set whenever a
         node in that status contacts us.
         """
-        script_set_statuses = {
-            NODE_STATUS.COMMISSIONING: 'current_commissioning_script_set_id',
-            NODE_STATUS.TESTING: 'current_testing_script_set_id',
-            NODE_STATUS.DEPLOYING: 'current_installation_script_set_id',
-        }
-        script_set_property = script_set_statuses.get(node.status)
+        script_set_property = self.script_set_statuses.get(node.status)
         if script_set_property is not None:
             script_set_id = getattr(node, script_set_property)
             if script_set_id is not None:
@@ -408,7 +552,7 @@ class StatusWorkerService(TimerService, object):
         """Top-level events do not have slashes in their names."""
         return '/' not in activity_name
 
-    def _processMessageNow(self, authorization, message):
+    def _processMessageNow(self, authorization, message, queued=()):
         # This should be called in a non-reactor thread with a pre-existing
         # connection (e.g. via deferToDatabase).
         if in_transaction():
@@ -424,6 +568,9 @@ class StatusWorkerService(TimerService, object):
                 # owner cleared or changed and this message cannot be saved.
                 return None
             else:
+                if len(queued) != 0:
+                    # Write messages that were queued before this one first.
+                    self._processBatches([(node, queued)])
                 self._processMessage(node, message)
                 self._updateLastPing(node, message)
 
@@ -451,8 +598,13 @@ class StatusWorkerService(TimerService, object):
             message['event_type'] == 'finish')
         has_files = len(message.get('files', [])) > 0
         if is_starting_event or is_final_event or has_files:
-            d = deferToDatabase(
-                self._processMessageNow, authorization, message)
+            # Earlier messages from this node may be queued, or may be being
+            # written by the current flush. Those must be written first.
+            queued = self.queue.pop(authorization, [])
+            d = self._waitForFlush(authorization)
+            d.addCallback(
+                lambda _: deferToDatabase(
+                    self._processMessageNow, authorization, message, queued))
             d.addErrback(
                 log.err, "Failed to process status message instantly.")
             return d
@@ -15,8 +15,12 @@ import logging
 import math
 import re
 
+from django.db import connection
 from lxml import etree
-from maasserver.enum import NODE_METADATA
+from maasserver.enum import (
+    IPADDRESS_TYPE,
+    NODE_METADATA,
+)
 from maasserver.models import Fabric
 from maasserver.models.blockdevice import MIN_BLOCK_DEVICE_SIZE
 from maasserver.models.interface import (
@@ -25,6 +29,7 @@ from maasserver.models.interface import (
 )
 from maasserver.models.nodemetadata import NodeMetadata
 from maasserver.models.physicalblockdevice import PhysicalBlockDevice
+from maasserver.models.staticipaddress import StaticIPAddress
 from maasserver.models.switch import Switch
 from maasserver.models.tag import Tag
 from maasserver.utils.orm import get_one
@@ -168,6 +173,19 @@ def update_node_network_information(node, output, exit_status):
     current_interfaces = set()
     extended_nic_info = parse_lshw_nic_info(node)
 
+    # Look up all the reported interfaces at once, by MAC.
+    existing_interfaces = {
+        str(interface.mac_address).lower(): interface
+        for interface in PhysicalInterface.objects.filter(
+            mac_address__in=[
+                link['mac'] for link in ip_addr_info.values()
+                if link.get('mac') is not None
+            ]).select_related('node')
+    }
+    # Interfaces without addresses, of which the discovered addresses are
+    # removed in one go.
+    interfaces_without_ips = []
+
     for link in ip_addr_info.values():
         link_mac = link.get('mac')
         # Ignore loopback interfaces.
@@ -180,10 +198,11 @@ def update_node_network_information(node, output, exit_status):
         else:
             ifname = link['name']
             extra_info = extended_nic_info.get(link_mac, {})
-            try:
-                interface = PhysicalInterface.objects.get(
-                    mac_address=link_mac)
-                update_fields = []
+            interface = existing_interfaces.get(link_mac.lower())
+            if interface is None:
+                interface = _create_default_physical_interface(
+                    node, ifname, link_mac, **extra_info)
+            else:
                 if interface.node is not None and interface.node != node:
                     logger.warning(
                         "Interface with MAC %s moved from node %s to %s. "
@@ -207,19 +226,25 @@ def update_node_network_information(node, output, exit_status):
                     if update_fields:
                         interface.save(
                             update_fields=['updated', *update_fields])
-            except PhysicalInterface.DoesNotExist:
-                interface = _create_default_physical_interface(
-                    node, ifname, link_mac, **extra_info)
 
             current_interfaces.add(interface)
             ips = link.get('inet', []) + link.get('inet6', [])
-            interface.update_ip_addresses(ips)
+            if len(ips) == 0:
+                interfaces_without_ips.append(interface)
+            else:
+                interface.update_ip_addresses(ips)
             if 'NO-CARRIER' in link.get('flags', []):
                 # This interface is now disconnected.
                 if interface.vlan is not None:
                     interface.vlan = None
                     interface.save(update_fields=['vlan', 'updated'])
 
+    # This is what `update_ip_addresses` does when given no addresses.
+    if len(interfaces_without_ips) != 0:
+        StaticIPAddress.objects.filter(
+            interface__in=interfaces_without_ips,
+            alloc_type=IPADDRESS_TYPE.DISCOVERED).delete()
+
     for iface in Interface.objects.filter(node=node):
         if iface not in current_interfaces:
             iface.delete()
@@ -481,8 +506,14 @@ def update_node_physical_block_devices(node, output, exit_status):
         blockdevs = json.loads(output.decode("ascii"))
     except ValueError as e:
         raise ValueError(e.message + ': ' + output)
+
+    # Work out what has changed in memory first, then write only that: the
+    # devices that are unchanged, usually all of them, are not written.
     previous_block_devices = list(
         PhysicalBlockDevice.objects.filter(node=node).all())
+    existing_block_devices = list(previous_block_devices)
+    updated_block_devices = []
+    new_block_devices = []
     for block_info in blockdevs:
         # Skip the read-only devices. We keep them in the output for
         # the user to view but they do not get an entry in the database.
@@ -498,19 +529,16 @@ def update_node_physical_block_devices(node, output, exit_status):
             # is a virtual disk, so it's unlikely that the ID_PATH would work.)
             id_path = block_info["PATH"]
         size = int(block_info["SIZE"])
-        block_size = int(block_info["BLOCK_SIZE"])
-        firmware_version = block_info.get("FIRMWARE_VERSION")
-        tags = get_tags_from_block_info(block_info)
-
-        # First check if there is an existing device with the same name.
-        # If so, we need to rename it. Its name will be changed back later,
-        # when we loop around to it.
-        existing = PhysicalBlockDevice.objects.filter(
-            node=node, name=name).all()
-        for device in existing:
-            # Use the device ID to ensure a unique temporary name.
-            device.name = "%s.%d" % (device.name, device.id)
-            device.save(update_fields=['name'])
+        fields = {
+            "name": name,
+            "model": model,
+            "serial": serial,
+            "id_path": id_path,
+            "size": size,
+            "block_size": int(block_info["BLOCK_SIZE"]),
+            "firmware_version": block_info.get("FIRMWARE_VERSION"),
+            "tags": get_tags_from_block_info(block_info),
+        }
 
         block_device = get_matching_block_device(
             previous_block_devices, serial, id_path)
@@ -519,15 +547,7 @@ def update_node_physical_block_devices(node, output, exit_status):
             # ID doesn't change and if its set to the boot_disk that FK will
             # not need to be updated.
             previous_block_devices.remove(block_device)
-            block_device.name = name
-            block_device.model = model
-            block_device.serial = serial
-            block_device.id_path = id_path
-            block_device.size = size
-            block_device.block_size = block_size
-            block_device.firmware_version = firmware_version
-            block_device.tags = tags
-            block_device.save()
+            updated_block_devices.append((block_device, fields))
         else:
             # MAAS doesn't allow disks smaller than 4MiB so skip them
             if size <= MIN_BLOCK_DEVICE_SIZE:
@@ -536,17 +556,46 @@ def update_node_physical_block_devices(node, output, exit_status):
             if id_path.startswith('/dev/loop'):
                 continue
             # New block device. Create it on the node.
-            PhysicalBlockDevice.objects.create(
-                node=node,
-                name=name,
-                id_path=id_path,
-                size=size,
-                block_size=block_size,
-                tags=tags,
-                model=model,
-                serial=serial,
-                firmware_version=firmware_version,
-                )
+            new_block_devices.append(PhysicalBlockDevice(node=node, **fields))
+
+    # Any existing device with a name that another device is about to take,
+    # including devices about to be removed, is first renamed out of the way
+    # in a single query. Use the device ID to ensure a unique temporary name.
+    wanted_names = {
+        fields["name"] for _, fields in updated_block_devices}
+    wanted_names.update(
+        block_device.name for block_device in new_block_devices)
+    final_names = {
+        block_device.id: fields["name"]
+        for block_device, fields in updated_block_devices
+    }
+    renamed_block_devices = [
+        block_device for block_device in existing_block_devices
+        if block_device.name in wanted_names and
+        final_names.get(block_device.id) != block_device.name
+    ]
+    if len(renamed_block_devices) != 0:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE maasserver_blockdevice "
+                "SET name = name || '.' || id WHERE id = ANY(%s)",
+                [[block_device.id for block_device in renamed_block_devices]])
+        for block_device in renamed_block_devices:
+            block_device.name = "%s.%d" % (block_device.name, block_device.id)
+
+    for block_device, fields in updated_block_devices:
+        changed = False
+        for field, value in fields.items():
+            if getattr(block_device, field) != value:
+                setattr(block_device, field, value)
+                changed = True
+        if changed:
+            block_device.save()
+
+    # PhysicalBlockDevice is a multi-table model, so it cannot be created
+    # with bulk_create.
+    for block_device in new_block_devices:
+        block_device.save()
 
     # Clear boot_disk if it is being removed.
     boot_disk = node.boot_disk
@@ -28,6 +28,7 @@ from maasserver.models.vlan import VLAN
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils.orm import reload_object
+from maastesting.djangotestcase import count_queries
 from maastesting.testcase import MAASTestCase
 from metadataserver.builtin_scripts.hooks import (
     add_switch,
@@ -1321,6 +1322,41 @@ class TestUpdateNodePhysicalBlockDevices(MAASServerTestCase):
                 'model': device['MODEL'],
             }}}, script_result.parameters)
 
+    def test__swaps_names_of_existing_devices(self):
+        node = factory.make_Node()
+        sda = self.make_block_device(name='sda')
+        sdb = self.make_block_device(name='sdb')
+        json_output = json.dumps([sda, sdb]).encode('utf-8')
+        update_node_physical_block_devices(node, json_output, 0)
+        devices = {
+            device.serial: device.id
+            for device in PhysicalBlockDevice.objects.filter(node=node)
+        }
+
+        sda['NAME'], sdb['NAME'] = 'sdb', 'sda'
+        json_output = json.dumps([sda, sdb]).encode('utf-8')
+        update_node_physical_block_devices(node, json_output, 0)
+
+        self.assertItemsEqual(
+            [(devices[sda['SERIAL']], 'sdb'), (devices[sdb['SERIAL']], 'sda')],
+            PhysicalBlockDevice.objects.filter(
+                node=node).values_list('id', 'name'))
+
+    def test__does_not_write_unchanged_devices(self):
+
+        def count_update_queries(count):
+            node = factory.make_Node()
+            devices = [
+                self.make_block_device(name='sd%d' % i) for i in range(count)]
+            json_output = json.dumps(devices).encode('utf-8')
+            update_node_physical_block_devices(node, json_output, 0)
+            num_queries, _ = count_queries(
+                update_node_physical_block_devices, node, json_output, 0)
+            return num_queries
+
+        # Commissioning again costs the same no matter how many disks.
+        self.assertEqual(count_update_queries(6), count_update_queries(60))
+
 
 class TestUpdateNodeNetworkInterfaceTags(MAASServerTestCase):
     """Test the update_node_network_interface_tags function using data from
@@ -1806,3 +1842,27 @@ class TestUpdateNodeNetworkInformation(MAASServerTestCase):
         node_interfaces = Interface.objects.filter(node=node)
         all_macs = [interface.mac_address for interface in node_interfaces]
         self.assertNotIn(SWITCH_OPENBMC_MAC, all_macs)
+
+    def test__updates_many_interfaces_in_constant_queries(self):
+
+        def make_ip_addr_output(count):
+            lines = []
+            for index in range(count):
+                lines.append(
+                    "%d: eth%d: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 "
+                    "state UP" % (index + 2, index))
+                lines.append(
+                    "    link/ether %s brd ff:ff:ff:ff:ff:ff" % (
+                        factory.make_mac_address()))
+            return "\n".join(lines).encode("ascii")
+
+        def count_update_queries(count):
+            node = factory.make_Node()
+            output = make_ip_addr_output(count)
+            update_node_network_information(node, output, 0)
+            num_queries, _ = count_queries(
+                update_node_network_information, node, output, 0)
+            return num_queries
+
+        # Commissioning again costs the same no matter how many NICs.
+        self.assertEqual(count_update_queries(2), count_update_queries(20))
@@ -36,11 +36,15 @@ from maasserver.utils.orm import (
 )
 from maasserver.utils.threads import deferToDatabase
 from maastesting.matchers import (
+    IsFiredDeferred,
+    IsUnfiredDeferred,
+    MockCalledOnce,
     MockCalledOnceWith,
     MockCallsMatch,
     MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
+from maastesting.twisted import TwistedLoggerFixture
 from metadataserver import api
 from metadataserver.api_twisted import (
     StatusHandlerResource,
@@ -48,6 +52,7 @@ from metadataserver.api_twisted import (
 )
 from metadataserver.enum import SCRIPT_STATUS
 from metadataserver.models import NodeKey
+from provisioningserver.events import EVENT_TYPES
 from testtools import ExpectedException
 from testtools.matchers import (
     Equals,
@@ -55,6 +60,7 @@ from testtools.matchers import (
     MatchesSetwise,
 )
 from twisted.internet.defer import (
+    Deferred,
     inlineCallbacks,
     succeed,
 )
@@ -190,6 +196,10 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
         self.assertEqual(60, worker.step)
         self.assertEqual((worker._tryUpdateNodes, tuple(), {}), worker.call)
 
+    def test__init__with_flush_interval(self):
+        worker = StatusWorkerService(sentinel.dbtasks, flush_interval=5)
+        self.assertEqual(5, worker.step)
+
     def test__tryUpdateNodes_returns_None_when_empty_queue(self):
         worker = StatusWorkerService(sentinel.dbtasks)
         self.assertIsNone(worker._tryUpdateNodes())
@@ -206,21 +216,39 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
             for node, _ in nodes_with_tokens
         }
         dbtasks = Mock()
-        dbtasks.addTask = Mock()
+        dbtasks.deferTask.return_value = succeed(None)
         worker = StatusWorkerService(dbtasks)
         for node, token in nodes_with_tokens:
             for message in node_messages[node]:
                 worker.queueMessage(token.key, message)
         yield worker._tryUpdateNodes()
-        call_args = [
-            (call_arg[0][1], call_arg[0][2])
-            for call_arg in dbtasks.addTask.call_args_list
-        ]
-        self.assertThat(call_args, MatchesSetwise(*[
+        # All nodes are sent in a single database task.
+        self.assertThat(dbtasks.deferTask, MockCalledOnce())
+        func, tasks = dbtasks.deferTask.call_args[0]
+        self.assertEqual(worker._processBatches, func)
+        self.assertThat(tasks, MatchesSetwise(*[
             MatchesListwise([Equals(node), Equals(messages)])
             for node, messages in node_messages.items()
         ]))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__tryUpdateNodes_releases_waiters_once_written(self):
+        nodes_with_tokens = yield deferToDatabase(self.make_nodes_with_tokens)
+        node, token = nodes_with_tokens[0]
+        dbtasks = Mock()
+        written = Deferred()
+        dbtasks.deferTask.return_value = written
+        worker = StatusWorkerService(dbtasks)
+        worker.queueMessage(token.key, self.make_message())
+        flushed = worker._tryUpdateNodes()
+        waiting = worker._waitForFlush(token.key)
+        self.assertThat(waiting, IsUnfiredDeferred())
+        written.callback(None)
+        yield flushed
+        self.assertThat(waiting, IsFiredDeferred())
+        self.assertEqual({}, worker.flushing)
+
     @wait_for_reactor
     @inlineCallbacks
     def test__processMessages_fails_when_in_transaction(self):
@@ -239,6 +267,50 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
                 transactional(worker._processMessageNow),
                 sentinel.node, sentinel.message)
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__processBatches_fails_when_in_transaction(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        with ExpectedException(TransactionManagementError):
+            yield deferToDatabase(
+                transactional(worker._processBatches),
+                [(sentinel.node, [sentinel.message])])
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__processBatches_processes_batch_size_nodes_at_a_time(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker.batch_size = 2
+        mock_processBatch = self.patch(worker, "_processBatch")
+        tasks = [
+            (sentinel.node1, [sentinel.message1]),
+            (sentinel.node2, [sentinel.message2]),
+            (sentinel.node3, [sentinel.message3]),
+        ]
+        yield deferToDatabase(worker._processBatches, tasks)
+        self.assertThat(
+            mock_processBatch,
+            MockCallsMatch(call(tasks[:2]), call(tasks[2:])))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__processBatches_processes_failed_batch_one_at_a_time(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        self.patch(worker, "_processBatch").side_effect = (
+            factory.make_exception())
+        mock_processMessages = self.patch(worker, "_processMessages")
+        tasks = [
+            (sentinel.node1, [sentinel.message1]),
+            (sentinel.node2, [sentinel.message2]),
+        ]
+        with TwistedLoggerFixture():
+            yield deferToDatabase(worker._processBatches, tasks)
+        self.assertThat(
+            mock_processMessages,
+            MockCallsMatch(
+                call(sentinel.node1, [sentinel.message1]),
+                call(sentinel.node2, [sentinel.message2])))
+
     @wait_for_reactor
     @inlineCallbacks
     def test__processMessages_doesnt_call_when_node_deleted(self):
@@ -314,6 +386,46 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
             mock_processMessage,
             MockCalledOnceWith(node, message))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_queueMessages_writes_queued_messages_before_instant_msg(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        written = []
+        self.patch(worker, "_processBatches").side_effect = (
+            lambda tasks: written.extend(tasks))
+        self.patch(worker, "_processMessage").side_effect = (
+            lambda node, message: written.append((node, message)))
+        self.patch(worker, "_updateLastPing")
+        queued_message = self.make_message()
+        message = self.make_message()
+        message['event_type'] = 'finish'
+        nodes_with_tokens = yield deferToDatabase(self.make_nodes_with_tokens)
+        node, token = nodes_with_tokens[0]
+        yield worker.queueMessage(token.key, queued_message)
+        yield worker.queueMessage(token.key, message)
+        self.assertEqual(
+            [(node, [queued_message]), (node, message)], written)
+        self.assertEqual({}, worker.queue)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_queueMessages_waits_for_flush_before_instant_msg(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        mock_processMessage = self.patch(worker, "_processMessage")
+        self.patch(worker, "_updateLastPing")
+        message = self.make_message()
+        message['event_type'] = 'finish'
+        nodes_with_tokens = yield deferToDatabase(self.make_nodes_with_tokens)
+        node, token = nodes_with_tokens[0]
+        # Earlier messages from this node are being written.
+        worker.flushing = {token.key: []}
+        d = worker.queueMessage(token.key, message)
+        self.assertThat(mock_processMessage, MockNotCalled())
+        worker._flushed()
+        yield d
+        self.assertThat(
+            mock_processMessage, MockCalledOnceWith(node, message))
+
     @wait_for_reactor
     @inlineCallbacks
     def test_queueMessages_handled_invalid_nodekey_with_instant_msg(self):
@@ -900,6 +1012,72 @@ class TestStatusWorkerService(MAASServerTestCase):
             script_set = script_set_statuses.get(node.status)
             self.assertIsNotNone(script_set.last_ping)
 
+    def test_process_batch_adds_events_in_order(self):
+        node = factory.make_Node(status=NODE_STATUS.COMMISSIONING)
+        messages = [
+            {
+                'event_type': 'progress',
+                'origin': 'cloud-init',
+                'name': factory.make_name('name'),
+                'description': factory.make_name('description'),
+                'timestamp': datetime.utcnow(),
+            }
+            for _ in range(3)
+        ]
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker._processBatch([(node, messages)])
+        events = Event.objects.filter(node=node).order_by('id')
+        self.assertEqual(
+            [
+                (message['name'], "'cloud-init' %s" % message['description'])
+                for message in messages
+            ],
+            [(event.action, event.description) for event in events])
+        self.assertEqual(
+            [EVENT_TYPES.NODE_COMMISSIONING_EVENT] * 3,
+            [event.type.name for event in events])
+
+    def test_process_batch_skips_deleted_nodes(self):
+        node = factory.make_Node()
+        deleted_node = factory.make_Node()
+        deleted_node.delete()
+        payload = {
+            'event_type': 'progress',
+            'origin': 'curtin',
+            'name': 'test',
+            'description': 'testing',
+            'timestamp': datetime.utcnow(),
+        }
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker._processBatch([(deleted_node, [payload]), (node, [payload])])
+        self.assertEqual(1, Event.objects.filter(node=node).count())
+        self.assertEqual(1, Event.objects.filter(action='test').count())
+
+    def test_process_batch_updates_script_status_last_ping(self):
+        nodes = [
+            factory.make_Node(status=status, with_empty_script_sets=True)
+            for status in (
+                NODE_STATUS.COMMISSIONING,
+                NODE_STATUS.TESTING,
+                NODE_STATUS.DEPLOYING)
+        ]
+        payload = {
+            'event_type': 'progress',
+            'origin': 'curtin',
+            'name': 'test',
+            'description': 'testing',
+            'timestamp': datetime.utcnow(),
+        }
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker._processBatch([(node, [payload]) for node in nodes])
+        script_sets = [
+            nodes[0].current_commissioning_script_set,
+            nodes[1].current_testing_script_set,
+            nodes[2].current_installation_script_set,
+        ]
+        for script_set in script_sets:
+            self.assertIsNotNone(reload_object(script_set).last_ping)
+
     def test_captures_installation_start(self):
         node = factory.make_Node(
             status=NODE_STATUS.DEPLOYING, with_empty_script_sets=True)
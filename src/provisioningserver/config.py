@@ -127,6 +127,7 @@ import sqlite3
 from threading import RLock
 from time import time
 import traceback
+from types import MappingProxyType
 
 from formencode import (
     ForEach,
@@ -469,6 +470,11 @@ class ConfigurationFile:
     got to use this.
     """
 
+    # Parsed configuration files, keyed by path, with the inode, size, and
+    # modification time of the file when it was parsed.
+    _snapshots = {}
+    _snapshots_lock = RLock()
+
     def __init__(self, path, *, mutable=False):
         super(ConfigurationFile, self).__init__()
         self.config = {}
@@ -539,19 +545,41 @@ class ConfigurationFile:
     def open(cls, path: str):
         """Open a configuration file read-only.
 
-        This avoids all the locking that happens in `open_for_update`. However,
-        it will create the configuration file if it does not yet exist.
+        This avoids all the locking that happens in `open_for_update`, and
+        uses a snapshot of the configuration that is shared with other
+        readers until the file changes; see `get_snapshot`.
 
         **Note** that this returns a context manager which will DISCARD
         changes to the configuration on exit.
         """
-        # Ensure `path` exists...
-        touch(path)
-        # before loading it in.
         configfile = cls(path, mutable=False)
-        configfile.load()
+        configfile.config = cls.get_snapshot(path)
         yield configfile
 
+    @classmethod
+    def get_snapshot(cls, path):
+        """Return a read-only snapshot of the configuration in `path`.
+
+        The file is parsed again only if its inode, size, or modification
+        time has changed since the last snapshot was taken; `save` replaces
+        the file atomically, so the inode changes with every update. This
+        will create the configuration file if it does not yet exist.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            touch(path)
+            stat = os.stat(path)
+        key = stat.st_ino, stat.st_size, stat.st_mtime_ns
+        with cls._snapshots_lock:
+            snapshot = cls._snapshots.get(path)
+            if snapshot is None or snapshot[0] != key:
+                configfile = cls(path, mutable=False)
+                configfile.load()
+                snapshot = key, MappingProxyType(configfile.config)
+                cls._snapshots[path] = snapshot
+            return snapshot[1]
+
     @classmethod
     @contextmanager
     @typed
@@ -776,6 +804,17 @@ class ClusterConfiguration(Configuration, metaclass=ClusterConfigurationMeta):
             accept_python=True, if_missing=get_tentative_data_path(
                 "/var/lib/maas/boot-resources/current")))
 
+    # Boot image download options.
+    image_download_concurrency = ConfigurationOption(
+        "image_download_concurrency",
+        "The number of boot resources to download at once.",
+        Number(min=1, if_missing=4))
+    image_download_rate_limit = ConfigurationOption(
+        "image_download_rate_limit",
+        "The combined rate limit for boot resource downloads, in bytes per "
+        "second, or 0 for no limit.",
+        Number(min=0, if_missing=0))
+
     # GRUB options.
 
     @property
@@ -28,7 +28,20 @@ from provisioningserver.drivers.power import (
 )
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils import shell
+from provisioningserver.utils.ipmi import (
+    CHASSIS_CONTROL,
+    IPMIAuthError,
+    ipmi_client,
+    IPMIError,
+    IPMITimeout,
+)
 from provisioningserver.utils.network import find_ip_via_arp
+from provisioningserver.utils.twisted import asynchronous
+from twisted.internet.defer import (
+    inlineCallbacks,
+    returnValue,
+)
+from twisted.internet.threads import deferToThread
 
 
 IPMI_CONFIG = """\
@@ -289,11 +302,84 @@ class IPMIPowerDriver(PowerDriver):
         return self._issue_ipmipower_command(
             ipmipower_command, power_change, power_address)
 
+    @staticmethod
+    @inlineCallbacks
+    def _issue_ipmi_session_command(session, power_change, power_off_mode):
+        """Issue a command over a native IPMI 2.0 session."""
+        if power_change in ("on", "off"):
+            try:
+                yield session.setBootDevicePXE()
+            except IPMIAuthError:
+                raise
+            except IPMIError as error:
+                # As with ipmi-chassis-config, some BMCs fail here but still
+                # power on just fine.
+                maaslog.warning(
+                    "Failed to change the boot order to PXE %s: %s" % (
+                        session.host, error))
+        if power_change == 'on':
+            state = yield session.getPowerState()
+            yield session.chassisControl(
+                CHASSIS_CONTROL.POWER_CYCLE if state == 'on'
+                else CHASSIS_CONTROL.POWER_UP)
+        elif power_change == 'off':
+            yield session.chassisControl(
+                CHASSIS_CONTROL.SOFT_SHUTDOWN if power_off_mode == 'soft'
+                else CHASSIS_CONTROL.POWER_DOWN)
+        elif power_change == 'query':
+            state = yield session.getPowerState()
+            returnValue(state)
+
+    @inlineCallbacks
+    def _issue_ipmi_command_natively(self, power_change, **context):
+        """Issue command to the BMC in-process, for the given system.
+
+        Only IPMI 2.0 is spoken natively. Otherwise, or if the BMC does not
+        understand, fall back to the FreeIPMI tools in a thread.
+        """
+        power_address = context.get('power_address')
+        power_user = context.get('power_user')
+        power_pass = context.get('power_pass')
+        power_driver = context.get('power_driver')
+        mac_address = context.get('mac_address')
+        if (is_power_parameter_set(power_driver) and
+                power_driver != IPMI_DRIVER.LAN_2_0):
+            result = yield deferToThread(
+                self._issue_ipmi_command, power_change, **context)
+            returnValue(result)
+
+        if (is_power_parameter_set(mac_address) and not
+                is_power_parameter_set(power_address)):
+            power_address = yield deferToThread(
+                find_ip_via_arp, mac_address)
+
+        session = ipmi_client.getSession(
+            power_address, power_user or "", power_pass or "")
+        try:
+            result = yield self._issue_ipmi_session_command(
+                session, power_change, context.get('power_off_mode'))
+        except IPMIAuthError as error:
+            raise PowerAuthError(
+                "IPMI authentication with %s failed: %s.  Check BMC "
+                "configuration and try again." % (power_address, error))
+        except IPMITimeout:
+            raise PowerConnError(IPMI_ERRORS['connection timeout']['message'])
+        except IPMIError as error:
+            maaslog.warning(
+                "Native IPMI 2.0 with %s failed (%s); falling back to "
+                "ipmipower." % (power_address, error))
+            result = yield deferToThread(
+                self._issue_ipmi_command, power_change, **context)
+        returnValue(result)
+
+    @asynchronous
     def power_on(self, system_id, context):
-        self._issue_ipmi_command('on', **context)
+        return self._issue_ipmi_command_natively('on', **context)
 
+    @asynchronous
     def power_off(self, system_id, context):
-        self._issue_ipmi_command('off', **context)
+        return self._issue_ipmi_command_natively('off', **context)
 
+    @asynchronous
     def power_query(self, system_id, context):
-        return self._issue_ipmi_command('query', **context)
+        return self._issue_ipmi_command_natively('query', **context)
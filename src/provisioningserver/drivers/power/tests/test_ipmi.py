@@ -10,6 +10,7 @@ from subprocess import PIPE
 from unittest.mock import (
     ANY,
     call,
+    Mock,
     sentinel,
 )
 
@@ -17,26 +18,44 @@ from maastesting.factory import factory
 from maastesting.matchers import (
     MockCalledOnceWith,
     MockCallsMatch,
+    MockNotCalled,
 )
+from maastesting.runtest import MAASTwistedRunTest
 from maastesting.testcase import MAASTestCase
 from provisioningserver.drivers.power import (
     ipmi as ipmi_module,
     PowerAuthError,
+    PowerConnError,
     PowerError,
 )
 from provisioningserver.drivers.power.ipmi import (
     IPMI_CONFIG,
+    IPMI_DRIVER,
     IPMI_ERRORS,
     IPMIPowerDriver,
 )
+from provisioningserver.utils.ipmi import (
+    CHASSIS_CONTROL,
+    IPMIAuthError,
+    IPMIError,
+    IPMITimeout,
+)
 from provisioningserver.utils.shell import (
     get_env_with_locale,
     has_command_available,
 )
+from provisioningserver.utils.twisted import IAsynchronous
 from testtools.matchers import (
     Contains,
     Equals,
 )
+from testtools.testcase import ExpectedException
+from twisted.internet.defer import (
+    fail,
+    inlineCallbacks,
+    maybeDeferred,
+    succeed,
+)
 
 
 def make_context():
@@ -292,35 +311,137 @@ class TestIPMIPowerDriver(MAASTestCase):
                 stderr=PIPE, env=env))
         self.expectThat(result, Equals('other'))
 
-    def test_power_on_calls__issue_ipmi_command(self):
-        context = make_context()
-        ipmi_power_driver = IPMIPowerDriver()
-        _issue_ipmi_command_mock = self.patch(
-            ipmi_power_driver, '_issue_ipmi_command')
-        system_id = factory.make_name('system_id')
-        ipmi_power_driver.power_on(system_id, context)
 
-        self.assertThat(
-            _issue_ipmi_command_mock, MockCalledOnceWith('on', **context))
+class TestIPMIPowerDriverNatively(MAASTestCase):
+    """Tests for the in-process IPMI 2.0 path of `IPMIPowerDriver`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
 
-    def test_power_off_calls__issue_ipmi_command(self):
+    def setUp(self):
+        super(TestIPMIPowerDriverNatively, self).setUp()
+        self.session = Mock()
+        self.session.host = factory.make_ipv4_address()
+        self.session.setBootDevicePXE.return_value = succeed(None)
+        self.session.chassisControl.return_value = succeed(None)
+        self.session.getPowerState.return_value = succeed("off")
+        self.ipmi_client = self.patch(ipmi_module, "ipmi_client")
+        self.ipmi_client.getSession.return_value = self.session
+        self.patch(ipmi_module, "deferToThread", maybeDeferred)
+        self.driver = IPMIPowerDriver()
+        self._issue_ipmi_command = self.patch(
+            self.driver, "_issue_ipmi_command")
+
+    def make_context(self, **kwargs):
         context = make_context()
-        ipmi_power_driver = IPMIPowerDriver()
-        _issue_ipmi_command_mock = self.patch(
-            ipmi_power_driver, '_issue_ipmi_command')
-        system_id = factory.make_name('system_id')
-        ipmi_power_driver.power_off(system_id, context)
+        context['power_driver'] = IPMI_DRIVER.LAN_2_0
+        context.update(kwargs)
+        return context
+
+    def test_power_query_is_asynchronous(self):
+        self.assertTrue(IAsynchronous.providedBy(self.driver.power_query))
+
+    @inlineCallbacks
+    def test_power_query_returns_state(self):
+        context = self.make_context()
+        self.session.getPowerState.return_value = succeed("on")
+        state = yield self.driver.power_query(sentinel.system_id, context)
+        self.assertEqual("on", state)
+        self.assertThat(
+            self.ipmi_client.getSession, MockCalledOnceWith(
+                context['power_address'], context['power_user'],
+                context['power_pass']))
+        self.assertThat(self.session.setBootDevicePXE, MockNotCalled())
+        self.assertThat(self._issue_ipmi_command, MockNotCalled())
+
+    @inlineCallbacks
+    def test_power_on_sets_pxe_and_powers_up(self):
+        yield self.driver.power_on(sentinel.system_id, self.make_context())
+        self.assertThat(
+            self.session.setBootDevicePXE, MockCalledOnceWith())
+        self.assertThat(
+            self.session.chassisControl,
+            MockCalledOnceWith(CHASSIS_CONTROL.POWER_UP))
 
+    @inlineCallbacks
+    def test_power_on_cycles_if_already_on(self):
+        self.session.getPowerState.return_value = succeed("on")
+        yield self.driver.power_on(sentinel.system_id, self.make_context())
         self.assertThat(
-            _issue_ipmi_command_mock, MockCalledOnceWith('off', **context))
+            self.session.chassisControl,
+            MockCalledOnceWith(CHASSIS_CONTROL.POWER_CYCLE))
+
+    @inlineCallbacks
+    def test_power_on_tolerates_boot_option_failure(self):
+        self.session.setBootDevicePXE.return_value = fail(
+            IPMIError("boom"))
+        maaslog = self.patch(ipmi_module, "maaslog")
+        yield self.driver.power_on(sentinel.system_id, self.make_context())
+        self.assertThat(maaslog.warning, MockCalledOnceWith(ANY))
+        self.assertThat(
+            self.session.chassisControl,
+            MockCalledOnceWith(CHASSIS_CONTROL.POWER_UP))
 
-    def test_power_query_calls__issue_ipmi_command(self):
-        context = make_context()
-        ipmi_power_driver = IPMIPowerDriver()
-        _issue_ipmi_command_mock = self.patch(
-            ipmi_power_driver, '_issue_ipmi_command')
-        system_id = factory.make_name('system_id')
-        ipmi_power_driver.power_query(system_id, context)
+    @inlineCallbacks
+    def test_power_off_soft_mode(self):
+        context = self.make_context(power_off_mode='soft')
+        yield self.driver.power_off(sentinel.system_id, context)
+        self.assertThat(
+            self.session.chassisControl,
+            MockCalledOnceWith(CHASSIS_CONTROL.SOFT_SHUTDOWN))
+
+    @inlineCallbacks
+    def test_power_off_hard_by_default(self):
+        yield self.driver.power_off(sentinel.system_id, self.make_context())
+        self.assertThat(
+            self.session.chassisControl,
+            MockCalledOnceWith(CHASSIS_CONTROL.POWER_DOWN))
 
+    @inlineCallbacks
+    def test_finds_power_address_from_mac_address(self):
+        ip_address = factory.make_ipv4_address()
+        find_ip_via_arp = self.patch(ipmi_module, 'find_ip_via_arp')
+        find_ip_via_arp.return_value = ip_address
+        context = self.make_context(
+            mac_address=factory.make_mac_address(), power_address="")
+        yield self.driver.power_query(sentinel.system_id, context)
+        self.assertThat(
+            self.ipmi_client.getSession, MockCalledOnceWith(
+                ip_address, context['power_user'], context['power_pass']))
+
+    @inlineCallbacks
+    def test_raises_power_auth_error(self):
+        self.session.getPowerState.return_value = fail(
+            IPMIAuthError("password invalid"))
+        with ExpectedException(PowerAuthError):
+            yield self.driver.power_query(
+                sentinel.system_id, self.make_context())
+        self.assertThat(self._issue_ipmi_command, MockNotCalled())
+
+    @inlineCallbacks
+    def test_raises_power_conn_error_on_timeout(self):
+        self.session.getPowerState.return_value = fail(IPMITimeout())
+        with ExpectedException(PowerConnError):
+            yield self.driver.power_query(
+                sentinel.system_id, self.make_context())
+        self.assertThat(self._issue_ipmi_command, MockNotCalled())
+
+    @inlineCallbacks
+    def test_falls_back_to_ipmipower_on_error(self):
+        self.patch(ipmi_module, "maaslog")
+        self.session.getPowerState.return_value = fail(IPMIError())
+        self._issue_ipmi_command.return_value = "off"
+        context = self.make_context()
+        state = yield self.driver.power_query(sentinel.system_id, context)
+        self.assertEqual("off", state)
+        self.assertThat(
+            self._issue_ipmi_command, MockCalledOnceWith('query', **context))
+
+    @inlineCallbacks
+    def test_uses_ipmipower_for_ipmi_1_5(self):
+        self._issue_ipmi_command.return_value = "on"
+        context = self.make_context(power_driver=IPMI_DRIVER.LAN)
+        state = yield self.driver.power_query(sentinel.system_id, context)
+        self.assertEqual("on", state)
         self.assertThat(
-            _issue_ipmi_command_mock, MockCalledOnceWith('query', **context))
+            self._issue_ipmi_command, MockCalledOnceWith('query', **context))
+        self.assertThat(self.ipmi_client.getSession, MockNotCalled())
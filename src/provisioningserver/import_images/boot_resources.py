@@ -23,6 +23,7 @@ from provisioningserver.events import (
     try_send_rack_event,
 )
 from provisioningserver.import_images.cleanup import (
+    cleanup_snapshots,
     cleanup_snapshots_and_cache,
 )
 from provisioningserver.import_images.download_descriptions import (
@@ -135,11 +136,13 @@ def parse_sources(sources_yaml):
     return BootSources.parse(StringIO(sources_yaml))
 
 
-def import_images(sources):
+def import_images(sources, peers=()):
     """Import images.  Callable from the command line.
 
     :param config: An iterable of dicts representing the sources from
         which boot images will be downloaded.
+    :param peers: Optional URLs of the caches of peer rack controllers, from
+        which files are fetched in preference to the sources.
     """
     if len(sources) == 0:
         msg = "Can't import: region did not provide a source."
@@ -153,6 +156,8 @@ def import_images(sources):
 
     with ClusterConfiguration.open() as config:
         storage = FilePath(config.tftp_root).parent().path
+        concurrency = config.image_download_concurrency
+        rate_limit = config.image_download_rate_limit
 
     with tempdir('keyrings') as keyrings_path:
         # XXX: Band-aid to ensure that the keyring_data is bytes. Future task:
@@ -194,16 +199,18 @@ def import_images(sources):
 
         try:
             snapshot_path = download_all_boot_resources(
-                sources, storage, product_mapping)
+                sources, storage, product_mapping, peers=peers,
+                concurrency=concurrency, rate_limit=rate_limit)
         except Exception as e:
             try_send_rack_event(
                 EVENT_TYPES.RACK_IMPORT_ERROR,
                 "Unable to import boot images: %s" % e)
             maaslog.error(
-                "Unable to import boot images; cleaning up failed snapshot "
-                "and cache.")
-            # Cleanup snapshots and cache since download failed.
-            cleanup_snapshots_and_cache(storage)
+                "Unable to import boot images; cleaning up failed snapshot.")
+            # Cleanup snapshots since download failed. The cache is kept so
+            # that the next import can resume where this one stopped; it is
+            # cleaned up after the next successful import.
+            cleanup_snapshots(storage)
             raise
 
     maaslog.info("Writing boot image metadata.")
@@ -10,13 +10,20 @@ __all__ = [
 from datetime import datetime
 import os.path
 import tarfile
+from urllib.parse import urljoin
 
+from provisioningserver.import_images.download_scheduler import (
+    download_file,
+    DownloadProgress,
+    DownloadScheduler,
+)
 from provisioningserver.import_images.helpers import (
     get_os_from_product,
     get_signing_policy,
     maaslog,
 )
 from provisioningserver.logger import LegacyLogger
+from simplestreams.contentsource import UrlContentSource
 from simplestreams.mirrors import (
     BasicMirrorWriter,
     UrlMirrorReader,
@@ -61,6 +68,58 @@ def insert_file(store, name, tag, checksums, size, content_source):
     return [(store._fullpath(tag), name)]
 
 
+def insert_file_from_peers(store, name, tag, checksums, size, peers):
+    """Insert a file into `store` from a peer rack controller, if possible.
+
+    Rack controllers serve the files in their caches by SHA256 (see
+    `BootResourceCache`), so the file is requested by its tag from each
+    peer in turn. The store verifies the checksums of what it receives.
+
+    :param peers: URLs of the caches of peer rack controllers, most
+        preferred first.
+    :return: True if the file was inserted from a peer, otherwise False.
+    """
+    for peer in peers:
+        url = urljoin(peer, tag)
+        try:
+            store.insert(
+                tag, UrlContentSource(url), checksums, mutable=False,
+                size=size)
+        except Exception as error:
+            maaslog.debug(
+                "Could not fetch %s (tag=%s) from %s: %s",
+                name, tag, peer, error)
+        else:
+            maaslog.debug("Inserted %s (tag=%s) from %s.", name, tag, peer)
+            return True
+    return False
+
+
+def find_extracted_files(store, tag):
+    """Find the files in `store` already extracted from the archive `tag`.
+
+    :return: A list of tuples of (path, logical name), as for
+        `extract_archive_tar`.
+    """
+    extracted_files = []
+    cache_dir = store._fullpath('')
+    # Check if the archive has already been extracted. This is done by scanning
+    # the cache directory for files containing the given tag. Since the tag is
+    # the SHA256 this will always be unique and if files are added/removed from
+    # the archive we'll get a new tag.
+    for root, dirs, files in os.walk(cache_dir):
+        for f in files:
+            if f.endswith(tag):
+                # Strip out the tag
+                filename = f[:-(len(tag) + 1)]
+                if root != cache_dir:
+                    filename = os.path.join(root[len(cache_dir):], filename)
+                # Give full path to cached file
+                filepath = os.path.join(root, f)
+                extracted_files.append((filepath, filename))
+    return extracted_files
+
+
 def extract_archive_tar(store, name, tag, checksums, size, content_source):
     """Extract an archive.tar.xz into `store`.
 
@@ -82,22 +141,7 @@ def extract_archive_tar(store, name, tag, checksums, size, content_source):
         managed by `store` and has a filename based on `tag`, not logical name.
     """
     maaslog.debug("Inserting archive %s (tag=%s, size=%s).", name, tag, size)
-    extracted_files = []
-    cache_dir = store._fullpath('')
-    # Check if the archive has already been extracted. This is done by scanning
-    # the cache directory for files containing the given tag. Since the tag is
-    # the SHA256 this will always be unique and if files are added/removed from
-    # the archive we'll get a new tag.
-    for root, dirs, files in os.walk(cache_dir):
-        for f in files:
-            if f.endswith(tag):
-                # Strip out the tag
-                filename = f[:-(len(tag) + 1)]
-                if root != cache_dir:
-                    filename = os.path.join(root[len(cache_dir):], filename)
-                # Give full path to cached file
-                filepath = os.path.join(root, f)
-                extracted_files.append((filepath, filename))
+    extracted_files = find_extracted_files(store, tag)
 
     # If no files with the given tag were found we need to extract them.
     if extracted_files == []:
@@ -179,12 +223,27 @@ class RepoWriter(BasicMirrorWriter):
         should be stored.
     :ivar product_mapping: A `ProductMapping` describing the desired boot
         resources.
+    :ivar peers: URLs of the caches of peer rack controllers from which
+        files are fetched in preference to the upstream repo.
+    :ivar scheduler: An optional `DownloadScheduler`. When given, items are
+        downloaded concurrently and linked into the snapshot by `finish`.
+    :ivar mirror: The URL of the upstream repo's mirror. When given, items
+        are downloaded from it directly so that interrupted downloads can be
+        resumed.
     """
 
-    def __init__(self, root_path, store, product_mapping):
+    def __init__(
+            self, root_path, store, product_mapping, peers=(),
+            scheduler=None, mirror=None):
         self.root_path = root_path
         self.store = store
         self.product_mapping = product_mapping
+        self.peers = peers
+        self.scheduler = scheduler
+        self.mirror = mirror
+        # Scheduled fetches by tag, and the items waiting to be linked.
+        self._fetches = {}
+        self._pending = []
         super(RepoWriter, self).__init__(config={
             # Only download the latest version. Without this all versions
             # will be downloaded from simplestreams.
@@ -208,15 +267,79 @@ class RepoWriter(BasicMirrorWriter):
         checksums = item_checksums(data)
         tag = checksums['sha256']
         size = data['size']
+        if self.scheduler is None:
+            links = self.fetch_item(
+                item, tag, checksums, size, contentsource)
+            self.link_item(item, links)
+        else:
+            # The same file can appear in several products; only fetch it
+            # once, otherwise concurrent downloads would clash.
+            fetch = self._fetches.get(tag)
+            if fetch is None:
+                fetch = self._fetches[tag] = self.scheduler.submit(
+                    self.fetch_item, item, tag, checksums, size,
+                    contentsource)
+            self._pending.append((item, fetch))
+
+    def finish(self):
+        """Wait for scheduled downloads, then link them into the snapshot.
+
+        Items are linked in the order in which they were inserted, as they
+        would have been without a scheduler.
+        """
+        pending, self._pending = self._pending, []
+        self._fetches = {}
+        if self.scheduler is not None:
+            self.scheduler.wait()
+        for item, fetch in pending:
+            links = fetch.result()
+            if item['ftype'] != 'archive.tar.xz':
+                filename = os.path.basename(item['path'])
+                links = [(path, filename) for path, _ in links]
+            self.link_item(item, links)
+
+    def fetch_item(self, item, tag, checksums, size, contentsource):
+        """Fetch an item into the store.
+
+        :return: A list of (path, logical name) tuples for `link_item`.
+        """
         ftype = item['ftype']
         filename = os.path.basename(item['path'])
         if ftype == 'archive.tar.xz':
-            links = extract_archive_tar(
+            if (self.mirror is not None and
+                    len(find_extracted_files(self.store, tag)) == 0):
+                self.download_item(item, tag, checksums, size)
+            return extract_archive_tar(
                 self.store, filename, tag, checksums, size, contentsource)
         else:
-            links = insert_file(
+            # Peers remove archives once they've been extracted, so only try
+            # peers for plain files.
+            peers = self.peers
+            mirror = self.mirror
+            if (len(peers) != 0 or mirror is not None) and not os.path.isfile(
+                    self.store._fullpath(tag)):
+                inserted = insert_file_from_peers(
+                    self.store, filename, tag, checksums, size, peers)
+                if not inserted and mirror is not None:
+                    self.download_item(item, tag, checksums, size)
+            return insert_file(
                 self.store, filename, tag, checksums, size, contentsource)
 
+    def download_item(self, item, tag, checksums, size):
+        """Download an item from the mirror into the store, resumably.
+
+        Once downloaded the item is in the store under `tag`, so inserting
+        it into the store afterwards does not download it again.
+        """
+        url = self.mirror.rstrip('/') + '/' + item['path'].lstrip('/')
+        progress = DownloadProgress(os.path.basename(item['path']), size)
+        limiter = None if self.scheduler is None else self.scheduler.limiter
+        download_file(
+            url, self.store._fullpath(tag), checksums, size,
+            limiter=limiter, progress=progress)
+
+    def link_item(self, item, links):
+        """Link an item's files from the store into the snapshot."""
         osystem = get_os_from_product(item)
 
         # link_resources creates a hardlink for every subarch. Every Ubuntu
@@ -255,7 +378,7 @@ class RepoWriter(BasicMirrorWriter):
 
 
 def download_boot_resources(path, store, snapshot_path, product_mapping,
-                            keyring_file=None):
+                            keyring_file=None, peers=(), scheduler=None):
     """Download boot resources for one simplestreams source.
 
     :param path: The Simplestreams URL for this source.
@@ -267,13 +390,23 @@ def download_boot_resources(path, store, snapshot_path, product_mapping,
         downloaded.
     :param keyring_file: Optional path to a keyring file for verifying
         signatures.
+    :param peers: Optional URLs of the caches of peer rack controllers.
+    :param scheduler: Optional `DownloadScheduler` with which to download
+        items concurrently and resumably.
     """
     maaslog.info("Downloading boot resources from %s", path)
-    writer = RepoWriter(snapshot_path, store, product_mapping)
     (mirror, rpath) = path_from_mirror_url(path, None)
+    if scheduler is None:
+        writer = RepoWriter(
+            snapshot_path, store, product_mapping, peers=peers)
+    else:
+        writer = RepoWriter(
+            snapshot_path, store, product_mapping, peers=peers,
+            scheduler=scheduler, mirror=mirror)
     policy = get_signing_policy(rpath, keyring_file)
     reader = UrlMirrorReader(mirror, policy=policy)
     writer.sync(reader, rpath)
+    writer.finish()
 
 
 def compose_snapshot_path(storage_path):
@@ -292,7 +425,8 @@ def compose_snapshot_path(storage_path):
 
 
 def download_all_boot_resources(
-        sources, storage_path, product_mapping, store=None):
+        sources, storage_path, product_mapping, store=None, peers=(),
+        concurrency=1, rate_limit=None):
     """Download the actual boot resources.
 
     Local copies of boot resources are downloaded into a "cache" directory.
@@ -312,6 +446,11 @@ def download_all_boot_resources(
     :param product_mapping: A `ProductMapping` describing the resources to be
         downloaded.
     :param store: A `FileStore` instance. Used only for testing.
+    :param peers: Optional URLs of the caches of peer rack controllers, from
+        which files are fetched in preference to the sources.
+    :param concurrency: The number of items to download at once.
+    :param rate_limit: Optional cap, in bytes per second, on the combined
+        rate of all downloads.
     :return: Path to the snapshot directory.
     """
     storage_path = os.path.abspath(storage_path)
@@ -321,12 +460,16 @@ def download_all_boot_resources(
     if store is None:
         cache_path = os.path.join(storage_path, 'cache')
         store = FileStore(cache_path)
-    # XXX jtv 2014-04-11: FileStore now also takes an argument called
-    # complete_callback, which can be used for progress reporting.
-
-    for source in sources:
-        download_boot_resources(
-            source['url'], store, snapshot_path, product_mapping,
-            keyring_file=source.get('keyring')),
+    # Progress is reported per item by the scheduler's downloads, rather
+    # than through FileStore's complete_callback.
+    scheduler = DownloadScheduler(concurrency, rate_limit)
+    try:
+        for source in sources:
+            download_boot_resources(
+                source['url'], store, snapshot_path, product_mapping,
+                keyring_file=source.get('keyring'), peers=peers,
+                scheduler=scheduler)
+    finally:
+        scheduler.shutdown()
 
     return snapshot_path
@@ -0,0 +1,277 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Concurrent, resumable, and rate-limited downloads of boot resources."""
+
+__all__ = [
+    "BandwidthLimiter",
+    "ChecksumMismatch",
+    "download_file",
+    "DownloadProgress",
+    "DownloadScheduler",
+    "ResumableUrlReader",
+    ]
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import http.client
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from provisioningserver.import_images.helpers import maaslog
+from simplestreams.util import checksummer
+
+
+# Read at 1MiB per chunk.
+READ_SIZE = 1024 * 1024
+
+
+class ChecksumMismatch(Exception):
+    """Raised when downloaded content does not match its checksum."""
+
+
+class BandwidthLimiter:
+    """Limit the combined rate of downloads across threads.
+
+    Each call to `consume` reserves time for the given number of bytes after
+    any time already reserved, then sleeps until its reservation is up. This
+    keeps the average rate of all callers together at or below `rate`.
+
+    :ivar rate: The maximum rate in bytes per second, or `None` or 0 for no
+        limit.
+    """
+
+    def __init__(self, rate=None, clock=time.monotonic, sleep=time.sleep):
+        super(BandwidthLimiter, self).__init__()
+        self.rate = rate
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._reserved_until = None
+
+    def consume(self, nbytes):
+        """Account for `nbytes` transferred, sleeping to stay under the cap."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = self.clock()
+            if self._reserved_until is None or self._reserved_until < now:
+                self._reserved_until = now
+            self._reserved_until += nbytes / self.rate
+            delay = self._reserved_until - now
+        if delay > 0:
+            self.sleep(delay)
+
+
+class DownloadProgress:
+    """Report the progress of downloading one item to the log.
+
+    :ivar step: Report each time another `step` percent has been downloaded.
+    """
+
+    step = 10
+
+    def __init__(self, name, size):
+        super(DownloadProgress, self).__init__()
+        self.name = name
+        self.size = size
+        self.downloaded = 0
+        self._reported = 0
+
+    def resume(self, offset):
+        """Note that the download is resuming from `offset` bytes."""
+        self.downloaded = offset
+        if offset != 0:
+            maaslog.info(
+                "Resuming download of %s at %d of %s bytes.",
+                self.name, offset, self.size)
+        if self.size:
+            percent = offset * 100 // self.size
+            self._reported = percent - percent % self.step
+
+    def update(self, nbytes):
+        """Note that another `nbytes` have been downloaded."""
+        self.downloaded += nbytes
+        if self.size:
+            percent = self.downloaded * 100 // self.size
+            if percent >= self._reported + self.step:
+                self._reported = percent - percent % self.step
+                maaslog.info(
+                    "Downloaded %d%% of %s (%d of %d bytes).", percent,
+                    self.name, self.downloaded, self.size)
+
+
+class ResumableUrlReader:
+    """A file-like reader for a URL that resumes after transient failures.
+
+    When a connection fails part way through, the request is made again with
+    a ``Range`` header asking for the remainder. Servers that ignore ``Range``
+    send everything again, so the part already read is skipped.
+
+    :ivar offset: The position in the content of the next read. This may be
+        set before the first read to start part way through.
+    """
+
+    # Errors that are worth retrying.
+    transient_errors = (
+        OSError, http.client.HTTPException, urllib.error.URLError)
+
+    def __init__(
+            self, url, offset=0, limiter=None, progress=None,
+            user_agent=None, retries=5, timeout=60):
+        super(ResumableUrlReader, self).__init__()
+        self.url = url
+        self.offset = offset
+        self.limiter = limiter
+        self.progress = progress
+        self.user_agent = user_agent
+        self.retries = retries
+        self.timeout = timeout
+        self._response = None
+
+    def _open(self):
+        request = urllib.request.Request(self.url)
+        if self.user_agent is not None:
+            request.add_header("User-Agent", self.user_agent)
+        if self.offset != 0:
+            request.add_header("Range", "bytes=%d-" % self.offset)
+        response = urllib.request.urlopen(request, timeout=self.timeout)
+        if self.offset != 0 and response.status != 206:
+            # The server ignored the range; skip what has already been read.
+            remaining = self.offset
+            while remaining > 0:
+                skipped = len(response.read(min(remaining, READ_SIZE)))
+                if skipped == 0:
+                    break
+                remaining -= skipped
+        return response
+
+    def read(self, size=-1):
+        failures = 0
+        while True:
+            try:
+                if self._response is None:
+                    self._response = self._open()
+                buf = self._response.read(size)
+            except urllib.error.HTTPError as error:
+                if error.code == 416:
+                    # Requested range not satisfiable: nothing more to read.
+                    return b""
+                raise
+            except self.transient_errors as error:
+                self.close()
+                failures += 1
+                if failures > self.retries:
+                    raise
+                maaslog.warning(
+                    "Download of %s interrupted at %d bytes (%s); "
+                    "resuming.", self.url, self.offset, error)
+                time.sleep(min(2 ** failures, 30))
+            else:
+                break
+        self.offset += len(buf)
+        if self.limiter is not None:
+            self.limiter.consume(len(buf))
+        if self.progress is not None:
+            self.progress.update(len(buf))
+        return buf
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def download_file(
+        url, path, checksums, size=None, limiter=None, progress=None,
+        user_agent=None):
+    """Download `url` to `path`, resuming an earlier partial download.
+
+    Content is written to `path` with a ".part" suffix, and renamed to `path`
+    once complete and checked. An interrupted download leaves the partial
+    file in place so that the next attempt continues from where it stopped.
+
+    :param checksums: A simplestreams checksums dict for the content.
+    :param size: The expected size of the content, if known.
+    :param limiter: An optional `BandwidthLimiter`.
+    :param progress: An optional `DownloadProgress`.
+    :raise ChecksumMismatch: If the downloaded content is corrupt. The
+        partial file is removed so the next attempt starts from scratch.
+    """
+    partial_path = path + ".part"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cksum = checksummer(checksums)
+    offset = 0
+    if os.path.isfile(partial_path):
+        if size is not None and os.path.getsize(partial_path) > size:
+            os.remove(partial_path)
+        else:
+            with open(partial_path, "rb") as stream:
+                for buf in iter(partial(stream.read, READ_SIZE), b""):
+                    cksum.update(buf)
+                    offset += len(buf)
+    if progress is not None:
+        progress.resume(offset)
+    if size is None or offset < size:
+        reader = ResumableUrlReader(
+            url, offset=offset, limiter=limiter, progress=progress,
+            user_agent=user_agent)
+        with reader, open(partial_path, "ab") as stream:
+            for buf in iter(partial(reader.read, READ_SIZE), b""):
+                stream.write(buf)
+                cksum.update(buf)
+    if not cksum.check():
+        os.remove(partial_path)
+        raise ChecksumMismatch(
+            "Download of %s failed: unexpected %s %s (expected %s)." % (
+                url, cksum.algorithm, cksum.hexdigest(), cksum.expected))
+    os.rename(partial_path, path)
+
+
+class DownloadScheduler:
+    """Run downloads concurrently, sharing a bandwidth limit.
+
+    :ivar limiter: The `BandwidthLimiter` shared by all downloads.
+    """
+
+    def __init__(self, concurrency=1, rate_limit=None):
+        super(DownloadScheduler, self).__init__()
+        self.limiter = BandwidthLimiter(rate_limit)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._futures = []
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule `func` to run in a download thread.
+
+        :return: A `concurrent.futures.Future`.
+        """
+        future = self._executor.submit(func, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """Wait for all scheduled downloads to finish.
+
+        A failed download does not stop the others, so that they can keep
+        their progress for next time.
+
+        :raise: The first error of any download, after all have finished.
+        """
+        futures, self._futures = self._futures, []
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def shutdown(self):
+        """Stop the download threads once scheduled downloads finish."""
+        self._executor.shutdown(wait=True)
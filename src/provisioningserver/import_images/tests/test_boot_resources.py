@@ -26,6 +26,7 @@ from maastesting.matchers import (
     MockCalledOnce,
     MockCalledWith,
     MockCallsMatch,
+    MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
 from maastesting.utils import age_file
@@ -631,7 +632,7 @@ class TestImportImages(MAASTestCase):
             ],
         self.assertFalse(boot_resources.import_images(sources))
 
-    def test__cleans_up_on_failure(self):
+    def test__cleans_up_snapshots_but_keeps_cache_on_failure(self):
         # Stop import_images() from actually doing anything.
         self.patch(boot_resources, 'maaslog')
         fake_download_all_image_descriptions = self.patch(
@@ -645,6 +646,8 @@ class TestImportImages(MAASTestCase):
         self.patch(
             boot_resources, 'download_all_boot_resources'
             ).side_effect = Exception
+        fake_cleanup_snapshots = self.patch(
+            boot_resources, 'cleanup_snapshots')
         fake_cleanup_snapshots_and_cache = self.patch(
             boot_resources, 'cleanup_snapshots_and_cache')
 
@@ -666,7 +669,9 @@ class TestImportImages(MAASTestCase):
             ],
         self.assertRaises(
             Exception, boot_resources.import_images, sources)
-        self.assertThat(fake_cleanup_snapshots_and_cache, MockCalledOnce())
+        self.assertThat(fake_cleanup_snapshots, MockCalledOnce())
+        # The cache is kept so that the next import can resume.
+        self.assertThat(fake_cleanup_snapshots_and_cache, MockNotCalled())
 
     def test__runs_import_and_returns_true(self):
         # Stop import_images() from actually doing anything.
@@ -14,6 +14,7 @@ from unittest import mock
 
 from maastesting.factory import factory
 from maastesting.matchers import (
+    MockCalledOnce,
     MockCalledOnceWith,
     MockCalledWith,
     MockNotCalled,
@@ -21,6 +22,9 @@ from maastesting.matchers import (
 from maastesting.testcase import MAASTestCase
 from provisioningserver.config import DEFAULT_IMAGES_URL
 from provisioningserver.import_images import download_resources
+from provisioningserver.import_images.download_scheduler import (
+    DownloadScheduler,
+)
 from provisioningserver.import_images.product_mapping import ProductMapping
 from provisioningserver.utils.fs import tempdir
 from simplestreams.contentsource import ChecksummingContentSource
@@ -72,7 +76,21 @@ class TestDownloadAllBootResources(MAASTestCase):
             fake,
             MockCalledWith(
                 source['url'], file_store, snapshot_path, product_mapping,
-                keyring_file=source['keyring']))
+                keyring_file=source['keyring'], peers=(),
+                scheduler=mock.ANY))
+
+    def test_passes_peers_to_download_boot_resources(self):
+        storage_path = self.make_dir()
+        source = {'url': 'http://example.com'}
+        peers = ["http://%s:5248/cache/" % factory.make_ipv4_address()]
+        fake = self.patch(download_resources, 'download_boot_resources')
+        download_resources.download_all_boot_resources(
+            sources=[source], storage_path=storage_path,
+            product_mapping=ProductMapping(), peers=peers)
+        self.assertThat(
+            fake, MockCalledWith(
+                source['url'], mock.ANY, mock.ANY, mock.ANY,
+                keyring_file=None, peers=peers, scheduler=mock.ANY))
 
 
 class TestDownloadBootResources(MAASTestCase):
@@ -179,6 +197,40 @@ class TestExtractArchiveTar(MAASTestCase):
                     self.assertIn(expected_cached_file, cached_files)
 
 
+class TestInsertFileFromPeers(MAASTestCase):
+    """Tests for `insert_file_from_peers`."""
+
+    def test_inserts_from_first_peer_that_has_file(self):
+        store = mock.Mock()
+        store.insert.side_effect = [OSError("no such file"), None]
+        tag = factory.make_name('sha256')
+        checksums = {'sha256': tag}
+        size = random.randint(2, 2**16)
+        peers = ["http://10.0.0.1:5248/cache/", "http://10.0.0.2:5248/cache/"]
+        self.assertTrue(download_resources.insert_file_from_peers(
+            store, 'root-tgz', tag, checksums, size, peers))
+        self.assertEqual(
+            ["http://10.0.0.1:5248/cache/" + tag,
+             "http://10.0.0.2:5248/cache/" + tag],
+            [call[0][1].url for call in store.insert.call_args_list])
+        self.assertThat(
+            store.insert, MockCalledWith(
+                tag, mock.ANY, checksums, mutable=False, size=size))
+
+    def test_returns_False_when_no_peer_has_file(self):
+        store = mock.Mock()
+        store.insert.side_effect = OSError("no such file")
+        self.assertFalse(download_resources.insert_file_from_peers(
+            store, 'root-tgz', factory.make_name('sha256'), {}, 1,
+            ["http://10.0.0.1:5248/cache/"]))
+
+    def test_returns_False_without_peers(self):
+        store = mock.Mock()
+        self.assertFalse(download_resources.insert_file_from_peers(
+            store, 'root-tgz', factory.make_name('sha256'), {}, 1, []))
+        self.assertThat(store.insert, MockNotCalled())
+
+
 class TestRepoWriter(MAASTestCase):
     """Tests for `RepoWriter`."""
 
@@ -261,6 +313,100 @@ class TestRepoWriter(MAASTestCase):
                 label=product['label'], subarches={subarch},
                 bootloader_type=None))
 
+    def test_inserts_file_from_peers_before_source(self):
+        product_mapping = ProductMapping()
+        subarch = factory.make_name('subarch')
+        product = self.make_product(subarch=subarch)
+        product_mapping.add(product, subarch)
+        store = FileStore(self.make_dir())
+        peers = ["http://10.0.0.1:5248/cache/"]
+        repo_writer = download_resources.RepoWriter(
+            None, store, product_mapping, peers=peers)
+        self.patch(
+            download_resources, 'products_exdata').return_value = product
+        mock_from_peers = self.patch(
+            download_resources, 'insert_file_from_peers')
+        mock_insert_file = self.patch(download_resources, 'insert_file')
+        self.patch(download_resources, 'link_resources')
+        repo_writer.insert_item(product, None, None, None, None)
+        self.assertThat(
+            mock_from_peers,
+            MockCalledOnceWith(
+                store, os.path.basename(product['path']), product['sha256'],
+                {'sha256': product['sha256']}, product['size'], peers))
+        # insert_file still links the file into the snapshot; it does not
+        # download again when the peer has already provided the file.
+        self.assertThat(mock_insert_file, MockCalledOnceWith(
+            store, os.path.basename(product['path']), product['sha256'],
+            {'sha256': product['sha256']}, product['size'], None))
+
+    def test_schedules_fetches_and_links_on_finish(self):
+        product_mapping = ProductMapping()
+        subarch = factory.make_name('subarch')
+        product = self.make_product(subarch=subarch)
+        product_mapping.add(product, subarch)
+        scheduler = DownloadScheduler()
+        self.addCleanup(scheduler.shutdown)
+        repo_writer = download_resources.RepoWriter(
+            None, None, product_mapping, scheduler=scheduler)
+        self.patch(
+            download_resources, 'products_exdata').return_value = product
+        mock_insert_file = self.patch(download_resources, 'insert_file')
+        mock_insert_file.return_value = [
+            (factory.make_name('path'), factory.make_name('name'))]
+        mock_link_resources = self.patch(download_resources, 'link_resources')
+        # The same file is inserted twice, but only fetched once.
+        repo_writer.insert_item(product, None, None, None, None)
+        repo_writer.insert_item(product, None, None, None, None)
+        self.assertThat(mock_link_resources, MockNotCalled())
+        repo_writer.finish()
+        self.assertThat(mock_insert_file, MockCalledOnce())
+        self.assertEqual(2, mock_link_resources.call_count)
+        [(path, _)] = mock_insert_file.return_value
+        self.assertThat(
+            mock_link_resources,
+            MockCalledWith(
+                snapshot_path=None,
+                links=[(path, os.path.basename(product['path']))],
+                osystem=product['os'], arch=product['arch'],
+                release=product['release'], label=product['label'],
+                subarches={subarch}, bootloader_type=None))
+
+    def test_downloads_file_from_mirror(self):
+        product = self.make_product()
+        store = FileStore(self.make_dir())
+        mirror = 'http://example.com/images/'
+        scheduler = DownloadScheduler()
+        self.addCleanup(scheduler.shutdown)
+        repo_writer = download_resources.RepoWriter(
+            None, store, ProductMapping(), scheduler=scheduler,
+            mirror=mirror)
+        mock_download_file = self.patch(download_resources, 'download_file')
+        self.patch(download_resources, 'insert_file')
+        checksums = {'sha256': product['sha256']}
+        repo_writer.fetch_item(
+            product, product['sha256'], checksums, product['size'], None)
+        self.assertThat(
+            mock_download_file,
+            MockCalledOnceWith(
+                mirror + product['path'].lstrip('/'),
+                store._fullpath(product['sha256']), checksums,
+                product['size'], limiter=scheduler.limiter,
+                progress=mock.ANY))
+
+    def test_does_not_download_file_already_in_store(self):
+        product = self.make_product()
+        store = FileStore(self.make_dir())
+        factory.make_file(store._fullpath(''), product['sha256'])
+        repo_writer = download_resources.RepoWriter(
+            None, store, ProductMapping(), mirror='http://example.com/')
+        mock_download_file = self.patch(download_resources, 'download_file')
+        self.patch(download_resources, 'insert_file')
+        repo_writer.fetch_item(
+            product, product['sha256'], {'sha256': product['sha256']},
+            product['size'], None)
+        self.assertThat(mock_download_file, MockNotCalled())
+
     def test_inserts_rolling_links(self):
         product_mapping = ProductMapping()
         product = self.make_product(subarch='hwe-16.04', rolling=True)
@@ -0,0 +1,286 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.import_images.download_scheduler`."""
+
+__all__ = []
+
+import hashlib
+import io
+import os
+from unittest.mock import Mock
+
+from maastesting.factory import factory
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+from provisioningserver.import_images import download_scheduler
+from provisioningserver.import_images.download_scheduler import (
+    BandwidthLimiter,
+    ChecksumMismatch,
+    download_file,
+    DownloadProgress,
+    DownloadScheduler,
+    ResumableUrlReader,
+)
+
+
+def read_bytes(path):
+    with open(path, "rb") as stream:
+        return stream.read()
+
+
+class FakeResponse:
+    """A fake HTTP response, optionally failing after `fail_after` bytes."""
+
+    def __init__(self, content, status=200, fail_after=None):
+        self.stream = io.BytesIO(content)
+        self.status = status
+        self.fail_after = fail_after
+
+    def read(self, size=-1):
+        if self.fail_after is not None:
+            if self.stream.tell() >= self.fail_after:
+                raise ConnectionResetError()
+            if size < 0 or self.stream.tell() + size > self.fail_after:
+                size = self.fail_after - self.stream.tell()
+        return self.stream.read(size)
+
+    def close(self):
+        pass
+
+
+class FakeServer:
+    """Serves `content`, honouring ``Range`` headers if `ranges` is set."""
+
+    def __init__(self, content, ranges=True, failures=()):
+        self.content = content
+        self.ranges = ranges
+        self.failures = list(failures)
+        self.requests = []
+
+    def __call__(self, request, timeout=None):
+        self.requests.append(request)
+        fail_after = self.failures.pop(0) if self.failures else None
+        header = request.get_header("Range")
+        if header is None or not self.ranges:
+            return FakeResponse(self.content, 200, fail_after)
+        offset = int(header[len("bytes="):-1])
+        if fail_after is not None:
+            fail_after -= offset
+        return FakeResponse(self.content[offset:], 206, fail_after)
+
+
+class TestBandwidthLimiter(MAASTestCase):
+
+    def test__does_not_sleep_without_rate(self):
+        sleep = Mock()
+        limiter = BandwidthLimiter(None, clock=lambda: 0, sleep=sleep)
+        limiter.consume(1000)
+        self.assertThat(sleep, MockNotCalled())
+
+    def test__sleeps_to_stay_under_rate(self):
+        sleep = Mock()
+        limiter = BandwidthLimiter(100, clock=lambda: 10.0, sleep=sleep)
+        limiter.consume(50)
+        self.assertThat(sleep, MockCalledOnceWith(0.5))
+        # A second caller waits for the first caller's reservation too.
+        limiter.consume(50)
+        sleep.assert_called_with(1.0)
+
+    def test__does_not_carry_idle_time_forward(self):
+        now = [0.0]
+        sleep = Mock()
+        limiter = BandwidthLimiter(100, clock=lambda: now[0], sleep=sleep)
+        limiter.consume(100)
+        now[0] = 60.0
+        limiter.consume(100)
+        sleep.assert_called_with(1.0)
+
+
+class TestDownloadProgress(MAASTestCase):
+
+    def test__reports_each_step(self):
+        maaslog = self.patch(download_scheduler, "maaslog")
+        progress = DownloadProgress("root-tgz", 100)
+        for _ in range(25):
+            progress.update(4)
+        self.assertEqual(10, maaslog.info.call_count)
+        self.assertEqual(100, progress.downloaded)
+
+    def test__resume_reports_from_offset(self):
+        maaslog = self.patch(download_scheduler, "maaslog")
+        progress = DownloadProgress("root-tgz", 100)
+        progress.resume(55)
+        self.assertThat(maaslog.info, MockCalledOnceWith(
+            "Resuming download of %s at %d of %s bytes.",
+            "root-tgz", 55, 100))
+        progress.update(4)
+        self.assertEqual(1, maaslog.info.call_count)
+        progress.update(1)
+        self.assertEqual(2, maaslog.info.call_count)
+
+
+class TestResumableUrlReader(MAASTestCase):
+
+    def setUp(self):
+        super(TestResumableUrlReader, self).setUp()
+        self.patch(download_scheduler.time, "sleep")
+        self.patch(download_scheduler, "maaslog")
+
+    def read_all(self, reader):
+        return b"".join(iter(lambda: reader.read(7), b""))
+
+    def test__reads_content(self):
+        content = factory.make_bytes(100)
+        server = FakeServer(content)
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        self.assertEqual(content, self.read_all(
+            ResumableUrlReader(factory.make_simple_http_url())))
+        self.assertIsNone(server.requests[0].get_header("Range"))
+
+    def test__resumes_with_range_after_failure(self):
+        content = factory.make_bytes(100)
+        server = FakeServer(content, failures=[40])
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        self.assertEqual(content, self.read_all(
+            ResumableUrlReader(factory.make_simple_http_url())))
+        self.assertEqual(
+            [None, "bytes=40-"],
+            [request.get_header("Range") for request in server.requests])
+
+    def test__skips_content_when_server_ignores_range(self):
+        content = factory.make_bytes(100)
+        server = FakeServer(content, ranges=False, failures=[40])
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        self.assertEqual(content, self.read_all(
+            ResumableUrlReader(factory.make_simple_http_url())))
+
+    def test__starts_from_offset(self):
+        content = factory.make_bytes(100)
+        server = FakeServer(content)
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        self.assertEqual(content[30:], self.read_all(
+            ResumableUrlReader(factory.make_simple_http_url(), offset=30)))
+
+    def test__gives_up_after_retries(self):
+        server = FakeServer(factory.make_bytes(100), failures=[0, 0, 0])
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        reader = ResumableUrlReader(
+            factory.make_simple_http_url(), retries=2)
+        self.assertRaises(ConnectionResetError, reader.read, 10)
+
+    def test__updates_limiter_and_progress(self):
+        content = factory.make_bytes(100)
+        self.patch(
+            download_scheduler.urllib.request, "urlopen", FakeServer(content))
+        limiter = Mock()
+        progress = Mock()
+        reader = ResumableUrlReader(
+            factory.make_simple_http_url(), limiter=limiter,
+            progress=progress)
+        reader.read(10)
+        self.assertThat(limiter.consume, MockCalledOnceWith(10))
+        self.assertThat(progress.update, MockCalledOnceWith(10))
+
+
+class TestDownloadFile(MAASTestCase):
+
+    def setUp(self):
+        super(TestDownloadFile, self).setUp()
+        self.patch(download_scheduler.time, "sleep")
+        self.patch(download_scheduler, "maaslog")
+
+    def make_content(self):
+        content = factory.make_bytes(100)
+        checksums = {"sha256": hashlib.sha256(content).hexdigest()}
+        return content, checksums
+
+    def test__downloads_to_path(self):
+        content, checksums = self.make_content()
+        server = FakeServer(content)
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        path = os.path.join(self.make_dir(), "cache", checksums["sha256"])
+        download_file(
+            factory.make_simple_http_url(), path, checksums, len(content))
+        self.assertEqual(content, read_bytes(path))
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test__resumes_partial_download(self):
+        content, checksums = self.make_content()
+        server = FakeServer(content)
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        path = os.path.join(self.make_dir(), checksums["sha256"])
+        with open(path + ".part", "wb") as stream:
+            stream.write(content[:60])
+        download_file(
+            factory.make_simple_http_url(), path, checksums, len(content))
+        self.assertEqual(content, read_bytes(path))
+        self.assertEqual("bytes=60-", server.requests[0].get_header("Range"))
+
+    def test__does_not_download_when_partial_file_is_complete(self):
+        content, checksums = self.make_content()
+        server = FakeServer(content)
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        path = os.path.join(self.make_dir(), checksums["sha256"])
+        with open(path + ".part", "wb") as stream:
+            stream.write(content)
+        download_file(
+            factory.make_simple_http_url(), path, checksums, len(content))
+        self.assertEqual(content, read_bytes(path))
+        self.assertEqual([], server.requests)
+
+    def test__removes_corrupt_download(self):
+        content, checksums = self.make_content()
+        server = FakeServer(content)
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        path = os.path.join(self.make_dir(), checksums["sha256"])
+        with open(path + ".part", "wb") as stream:
+            stream.write(factory.make_bytes(60))
+        self.assertRaises(
+            ChecksumMismatch, download_file, factory.make_simple_http_url(),
+            path, checksums, len(content))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test__keeps_partial_download_on_failure(self):
+        content, checksums = self.make_content()
+        # The first attempt fails after 40 bytes, then every retry fails.
+        server = FakeServer(content, failures=[40] * 6)
+        self.patch(download_scheduler.urllib.request, "urlopen", server)
+        path = os.path.join(self.make_dir(), checksums["sha256"])
+        self.assertRaises(
+            ConnectionResetError, download_file,
+            factory.make_simple_http_url(), path, checksums, len(content))
+        self.assertEqual(content[:40], read_bytes(path + ".part"))
+
+
+class TestDownloadScheduler(MAASTestCase):
+
+    def test__runs_submitted_functions(self):
+        scheduler = DownloadScheduler(concurrency=2)
+        self.addCleanup(scheduler.shutdown)
+        futures = [scheduler.submit(pow, 2, n) for n in range(5)]
+        scheduler.wait()
+        self.assertEqual(
+            [1, 2, 4, 8, 16], [future.result() for future in futures])
+
+    def test__wait_raises_first_error_after_all_finish(self):
+        scheduler = DownloadScheduler(concurrency=2)
+        self.addCleanup(scheduler.shutdown)
+        error = factory.make_exception()
+        func = Mock(side_effect=error)
+        later = scheduler.submit(pow, 2, 3)
+        scheduler.submit(func)
+        scheduler.submit(func)
+        raised = self.assertRaises(type(error), scheduler.wait)
+        self.assertIs(error, raised)
+        self.assertEqual(8, later.result())
+        self.assertEqual(2, func.call_count)
+
+    def test__shares_limiter(self):
+        scheduler = DownloadScheduler(rate_limit=1234)
+        self.addCleanup(scheduler.shutdown)
+        self.assertEqual(1234, scheduler.limiter.rate)
@@ -327,14 +327,20 @@ def fix_twisted_internet_tcp():
 
 
 def augment_twisted_deferToThreadPool():
-    """Wrap every function deferred to a thread in `synchronous`."""
+    """Wrap every function deferred to a thread in `synchronous`.
+
+    Each function is also instrumented so that `load_statistics` records how
+    long it waits for, and runs in, the thread-pool.
+    """
     from twisted.internet import threads
     from twisted.internet.threads import deferToThreadPool
+    from provisioningserver.utils.loadstats import load_statistics
     from provisioningserver.utils.twisted import ISynchronous, synchronous
 
     def new_deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
         """Variant of Twisted's that wraps all functions in `synchronous`."""
         func = f if ISynchronous.providedBy(f) else synchronous(f)
+        func = load_statistics.instrument(threadpool, func)
         return deferToThreadPool(reactor, threadpool, func, *args, **kwargs)
 
     if threads.deferToThreadPool.__module__ != __name__:
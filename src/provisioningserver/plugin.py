@@ -43,9 +43,9 @@ class ProvisioningServiceMaker:
 
     def _makeImageService(self, resource_root):
         from provisioningserver.rackdservices.image import (
-            BootImageEndpointService)
+            BootImageEndpointService, IMAGE_SERVICE_PORT)
         from twisted.internet.endpoints import AdoptedStreamServerEndpoint
-        port = 5248  # config["port"]
+        port = IMAGE_SERVICE_PORT  # config["port"]
         # Make a socket with SO_REUSEPORT set so that we can run multiple we
         # applications. This is easier to do from outside of Twisted as there's
         # not yet official support for setting socket options.
@@ -162,6 +162,12 @@ class ProvisioningServiceMaker:
         ntp_service.setName("ntp")
         return ntp_service
 
+    def _makeLoadMonitorService(self):
+        from provisioningserver.utils.loadstats import LoadMonitorService
+        load_monitor = LoadMonitorService()
+        load_monitor.setName("load_monitor")
+        return load_monitor
+
     def _makeServices(self, tftp_root, tftp_port, clock=reactor):
         # Several services need to make use of the RPC service.
         rpc_service = self._makeRPCService()
@@ -174,6 +180,7 @@ class ProvisioningServiceMaker:
         yield self._makeServiceMonitorService(rpc_service)
         yield self._makeImageDownloadService(rpc_service, tftp_root)
         yield self._makeNetworkTimeProtocolService(rpc_service)
+        yield self._makeLoadMonitorService()
         # The following are network-accessible services.
         yield self._makeImageService(tftp_root)
         yield self._makeTFTPService(tftp_root, tftp_port, rpc_service)
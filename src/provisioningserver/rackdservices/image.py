@@ -1,18 +1,55 @@
-# Copyright 2015 Canonical Ltd.  This software is licensed under the
+# Copyright 2015-2018 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 """Twisted Application Plugin for the MAAS Boot Image server"""
 
 __all__ = [
     "BootImageEndpointService",
+    "BootResourceCache",
+    "IMAGE_SERVICE_PORT",
     ]
 
+import os
+import re
+
 from provisioningserver.utils.twisted import reducedWebLogFormatter
 from twisted.application.internet import StreamServerEndpointService
-from twisted.web.resource import Resource
+from twisted.web.resource import (
+    NoResource,
+    Resource,
+)
 from twisted.web.server import Site
 from twisted.web.static import File
 
+# The port on which the boot image server listens.
+IMAGE_SERVICE_PORT = 5248
+
+# Files in the cache are named by their SHA256 digest.
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BootResourceCache(Resource):
+    """Serve files from the boot resources cache by their SHA256.
+
+    Peer rack controllers fetch boot resources from here rather than from
+    the region when they can. Only complete files, named by their digest,
+    are served; directories and partially written files are not.
+    """
+
+    def __init__(self, cache_root):
+        super(BootResourceCache, self).__init__()
+        self.cache_root = cache_root
+
+    def getChild(self, name, request):
+        name = name.decode("ascii", "replace")
+        if SHA256_RE.match(name) is None:
+            return NoResource()
+        path = os.path.join(self.cache_root, name)
+        if os.path.isfile(path):
+            return File(path)
+        else:
+            return NoResource()
+
 
 class BootImageEndpointService(StreamServerEndpointService):
     """Service for serving images to the TFTP server via HTTP
@@ -29,5 +66,8 @@ class BootImageEndpointService(StreamServerEndpointService):
         """
         resource = Resource()
         resource.putChild(b'images', File(resource_root))
+        cache_root = os.path.join(
+            os.path.dirname(resource_root.rstrip("/")), "cache")
+        resource.putChild(b'cache', BootResourceCache(cache_root))
         self.site = Site(resource, logFormatter=reducedWebLogFormatter)
         super(BootImageEndpointService, self).__init__(endpoint, self.site)
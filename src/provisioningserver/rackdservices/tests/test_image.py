@@ -0,0 +1,48 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.rackdservices.image`."""
+
+__all__ = []
+
+import hashlib
+import os
+
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+from provisioningserver.rackdservices.image import BootResourceCache
+from twisted.python.filepath import FilePath
+from twisted.web.resource import NoResource
+
+
+class TestBootResourceCache(MAASTestCase):
+    """Tests for `BootResourceCache`."""
+
+    def make_cached_file(self, cache_root):
+        content = factory.make_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        factory.make_file(cache_root, digest, content)
+        return digest
+
+    def test__serves_cached_file_by_sha256(self):
+        cache_root = self.make_dir()
+        digest = self.make_cached_file(cache_root)
+        resource = BootResourceCache(cache_root)
+        child = resource.getChild(digest.encode("ascii"), request=None)
+        self.assertEqual(
+            FilePath(os.path.join(cache_root, digest)), child)
+
+    def test__does_not_serve_missing_file(self):
+        resource = BootResourceCache(self.make_dir())
+        digest = hashlib.sha256(factory.make_bytes()).hexdigest()
+        child = resource.getChild(digest.encode("ascii"), request=None)
+        self.assertIsInstance(child, NoResource)
+
+    def test__does_not_serve_other_names(self):
+        cache_root = self.make_dir()
+        factory.make_file(cache_root, "root-tgz")
+        os.mkdir(os.path.join(cache_root, "a" * 64))
+        resource = BootResourceCache(cache_root)
+        for name in b"root-tgz", b"..", b"a" * 64:
+            self.assertIsInstance(
+                resource.getChild(name, request=None), NoResource)
@@ -159,8 +159,8 @@ class TestPeriodicImageDownloadService(MAASTestCase):
         service.startService()
         self.assertThat(
             deferToThread, MockCalledOnceWith(
-                _run_import, sentinel.sources, http_proxy=http_proxy,
-                https_proxy=https_proxy))
+                _run_import, sentinel.sources, peers=[],
+                http_proxy=http_proxy, https_proxy=https_proxy))
 
     def test_no_download_if_no_rpc_connections(self):
         rpc_client = Mock()
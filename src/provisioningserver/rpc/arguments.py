@@ -6,6 +6,7 @@
 __all__ = [
     "Bytes",
     "Choice",
+    "Chunked",
     "IPAddress",
     "IPNetwork",
     "ParsedURL",
@@ -13,6 +14,7 @@ __all__ = [
 ]
 
 import collections
+from itertools import count
 import json
 import urllib.parse
 import zlib
@@ -167,6 +169,79 @@ class CompressedAmpList(AmpList):
         return fromStringProto(zlib.decompress(inString), proto)
 
 
+def _chunkName(name, index):
+    """Return the name of the `index`th chunk of the argument `name`."""
+    if index == 0:
+        return name
+    else:
+        return b"%s.%d" % (name, index)
+
+
+class Chunked(amp.Argument):
+    """Split the serialised form of another argument into chunks on the wire.
+
+    AMP limits each value in a box to 64 KiB, but not the number of values
+    in a box. When the wrapped argument's serialised form fits in a single
+    value it is sent exactly as if it were not wrapped. Otherwise it is sent
+    in sequence as the values of ``name``, ``name.1``, ``name.2``, and so on,
+    and put back together at the receiving end.
+
+    Peers that predate this will see only the first chunk, so only wrap
+    existing arguments whose values would not have fit anyway.
+    """
+
+    # The maximum size of a serialised argument, in bytes. This bounds the
+    # memory that each chunked argument can use at either end.
+    max_length = 16 * (2 ** 20)  # 16MiB
+
+    def __init__(self, argument, max_length=None):
+        """Create a chunked argument.
+
+        :param argument: The argument to chunk, an `amp.Argument`. Whether
+            it is optional is honoured.
+        :param max_length: Override `max_length`.
+        """
+        super(Chunked, self).__init__(optional=argument.optional)
+        self.argument = argument
+        if max_length is not None:
+            self.max_length = max_length
+
+    def toStringProto(self, inObject, proto):
+        return self.argument.toStringProto(inObject, proto)
+
+    def fromStringProto(self, inString, proto):
+        return self.argument.fromStringProto(inString, proto)
+
+    def toBox(self, name, strings, objects, proto):
+        super(Chunked, self).toBox(name, strings, objects, proto)
+        value = strings.get(name)
+        if value is None or len(value) <= amp.MAX_VALUE_LENGTH:
+            return
+        elif len(value) > self.max_length:
+            raise amp.TooLong(False, True, value, name)
+        else:
+            chunks = range(0, len(value), amp.MAX_VALUE_LENGTH)
+            for index, start in enumerate(chunks):
+                strings[_chunkName(name, index)] = (
+                    value[start:start + amp.MAX_VALUE_LENGTH])
+
+    def fromBox(self, name, strings, objects, proto):
+        if name in strings and _chunkName(name, 1) in strings:
+            chunks, length = [], 0
+            for index in count():
+                chunk = strings.pop(_chunkName(name, index), None)
+                if chunk is None:
+                    break
+                length += len(chunk)
+                if length > self.max_length:
+                    raise ValueError(
+                        "Chunked argument %r is longer than %d bytes." % (
+                            name, self.max_length))
+                chunks.append(chunk)
+            strings[name] = b"".join(chunks)
+        super(Chunked, self).fromBox(name, strings, objects, proto)
+
+
 class IPAddress(amp.Argument):
     """Encode a `netaddr.IPAddress` object on the wire."""
 
@@ -18,7 +18,11 @@ from provisioningserver.config import ClusterConfiguration
 from provisioningserver.import_images import boot_resources
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc import getRegionClient
-from provisioningserver.rpc.region import UpdateLastImageSync
+from provisioningserver.rackdservices.image import IMAGE_SERVICE_PORT
+from provisioningserver.rpc.region import (
+    GetBootImagePeers,
+    UpdateLastImageSync,
+)
 from provisioningserver.utils.env import (
     environment_variables,
     get_maas_id,
@@ -95,11 +99,43 @@ def fix_sources_for_cluster(sources):
     return sources
 
 
+def get_boot_image_peers():
+    """Ask the region for peer rack controllers to fetch boot images from.
+
+    :return: :class:`Deferred` that fires with a list of URLs for the boot
+        resource caches of peer rack controllers, nearest first. This list
+        is empty if the region cannot be asked or does not know of any.
+    """
+    def make_cache_url(ip):
+        if ":" in ip:
+            ip = "[%s]" % ip
+        return "http://%s:%d/cache/" % (ip, IMAGE_SERVICE_PORT)
+
+    def no_peers(failure):
+        log.msg(
+            "Not fetching boot images from peer rack controllers: %s"
+            % failure.getErrorMessage())
+        return []
+
+    try:
+        client = getRegionClient()
+    except:
+        d = fail()
+    else:
+        d = client(GetBootImagePeers, system_id=get_maas_id())
+        d.addCallback(
+            lambda response: list(map(make_cache_url, response["peers"])))
+    return d.addErrback(no_peers)
+
+
 @synchronous
-def _run_import(sources, http_proxy=None, https_proxy=None):
+def _run_import(sources, http_proxy=None, https_proxy=None, peers=()):
     """Run the import.
 
     This is function is synchronous so it must be called with deferToThread.
+
+    :param peers: URLs of the boot resource caches of peer rack controllers
+        to try before downloading from `sources`.
     """
     # Fix the sources to download from the IP address defined in the cluster
     # configuration, instead of the URL that the region asked it to use.
@@ -114,9 +150,10 @@ def _run_import(sources, http_proxy=None, https_proxy=None):
     # Communication to the sources and loopback should not go through proxy.
     no_proxy_hosts = ["localhost", "::ffff:127.0.0.1", "127.0.0.1", "::1"]
     no_proxy_hosts += list(get_hosts_from_sources(sources))
+    no_proxy_hosts += [urlparse(peer).hostname for peer in peers]
     variables['no_proxy'] = ','.join(no_proxy_hosts)
     with environment_variables(variables):
-        imported = boot_resources.import_images(sources)
+        imported = boot_resources.import_images(sources, peers=peers)
 
     # Update the boot images cache so `list_boot_images` returns the
     # correct information.
@@ -142,7 +179,9 @@ def _import_boot_images(sources, http_proxy=None, https_proxy=None):
     Helper for `import_boot_images`.
     """
     proxies = dict(http_proxy=http_proxy, https_proxy=https_proxy)
-    imported = yield deferToThread(_run_import, sources, **proxies)
+    peers = yield get_boot_image_peers()
+    imported = yield deferToThread(
+        _run_import, sources, peers=peers, **proxies)
     if imported:
         yield touch_last_image_sync_timestamp().addErrback(
             log.err, "Failure touching last image sync timestamp.")
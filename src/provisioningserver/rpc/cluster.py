@@ -27,6 +27,8 @@ __all__ = [
     "PowerOn",
     "PowerQuery",
     "ScanNetworks",
+    "UpdateDHCPv4",
+    "UpdateDHCPv6",
     "ValidateDHCPv4Config",
     "ValidateDHCPv4Config_V2",
     "ValidateDHCPv6Config",
@@ -42,6 +44,7 @@ from provisioningserver.rpc.arguments import (
     AmpList,
     AmpRequestedMachine,
     Bytes,
+    Chunked,
     CompressedAmpList,
     IPAddress,
     IPNetwork,
@@ -87,7 +90,7 @@ class ListBootImagesV2(amp.Command):
 
     arguments = []
     response = [
-        (b"images", CompressedAmpList(
+        (b"images", Chunked(CompressedAmpList(
             [(b"osystem", amp.Unicode()),
              (b"architecture", amp.Unicode()),
              (b"subarchitecture", amp.Unicode()),
@@ -95,7 +98,7 @@ class ListBootImagesV2(amp.Command):
              (b"label", amp.Unicode()),
              (b"purpose", amp.Unicode()),
              (b"xinstall_type", amp.Unicode()),
-             (b"xinstall_path", amp.Unicode())]))
+             (b"xinstall_path", amp.Unicode())])))
     ]
     errors = []
 
@@ -391,7 +394,7 @@ class _ConfigureDHCP_V2(amp.Command):
             (b"address", amp.Unicode()),
             (b"peer_address", amp.Unicode()),
             ])),
-        (b"shared_networks", CompressedAmpList([
+        (b"shared_networks", Chunked(CompressedAmpList([
             (b"name", amp.Unicode()),
             (b"subnets", AmpList([
                 (b"subnet", amp.Unicode()),
@@ -414,8 +417,8 @@ class _ConfigureDHCP_V2(amp.Command):
                     (b"value", amp.Unicode()),
                     ], optional=True)),
             ])),
-        ])),
-        (b"hosts", CompressedAmpList([
+        ]))),
+        (b"hosts", Chunked(CompressedAmpList([
             (b"host", amp.Unicode()),
             (b"mac", amp.Unicode()),
             (b"ip", amp.Unicode()),
@@ -424,20 +427,47 @@ class _ConfigureDHCP_V2(amp.Command):
                 (b"description", amp.Unicode(optional=True)),
                 (b"value", amp.Unicode()),
                 ], optional=True)),
-            ])),
+            ]))),
         (b"interfaces", AmpList([
             (b"name", amp.Unicode()),
             ])),
-        (b"global_dhcp_snippets", CompressedAmpList([
+        (b"global_dhcp_snippets", Chunked(CompressedAmpList([
             (b"name", amp.Unicode()),
             (b"description", amp.Unicode(optional=True)),
             (b"value", amp.Unicode()),
-            ], optional=True)),
+            ], optional=True))),
         ]
     response = []
     errors = {exceptions.CannotConfigureDHCP: b"CannotConfigureDHCP"}
 
 
+class _UpdateDHCP(amp.Command):
+    """Update the configuration of a DHCP server.
+
+    Without `base_version`, this takes the same arguments as
+    `_ConfigureDHCP_V2` and replaces the whole configuration. With it, the
+    configuration known as `base_version` is updated: `shared_networks` and
+    `hosts` hold only the shared networks and hosts that have been added or
+    changed since, and `removed_shared_networks` and `removed_hosts` name
+    those that have been removed. Either way, the new configuration is then
+    known as `version`.
+
+    :since: 2.4
+    """
+    arguments = _ConfigureDHCP_V2.arguments + [
+        (b"version", amp.Unicode()),
+        (b"base_version", amp.Unicode(optional=True)),
+        (b"removed_shared_networks", amp.ListOf(
+            amp.Unicode(), optional=True)),
+        (b"removed_hosts", amp.ListOf(amp.Unicode(), optional=True)),
+    ]
+    response = []
+    errors = {
+        exceptions.CannotConfigureDHCP: b"CannotConfigureDHCP",
+        exceptions.DHCPStateMismatch: b"DHCPStateMismatch",
+    }
+
+
 class _ValidateDHCPConfig(_ConfigureDHCP):
     """Validate the configure the DHCPv4 server.
 
@@ -482,6 +512,13 @@ class ConfigureDHCPv4_V2(_ConfigureDHCP_V2):
     """
 
 
+class UpdateDHCPv4(_UpdateDHCP):
+    """Update the configuration of the DHCPv4 server.
+
+    :since: 2.4
+    """
+
+
 class ValidateDHCPv4Config(_ValidateDHCPConfig):
     """Validate the configure the DHCPv4 server.
 
@@ -510,6 +547,13 @@ class ConfigureDHCPv6_V2(_ConfigureDHCP_V2):
     """
 
 
+class UpdateDHCPv6(_UpdateDHCP):
+    """Update the configuration of the DHCPv6 server.
+
+    :since: 2.4
+    """
+
+
 class ValidateDHCPv6Config(_ValidateDHCPConfig):
     """Configure the DHCPv6 server.
 
@@ -445,6 +445,19 @@ class Cluster(RPCProtocol):
         d.addCallback(lambda _: {})
         return d
 
+    @cluster.UpdateDHCPv4.responder
+    def update_dhcpv4(
+            self, omapi_key, failover_peers, shared_networks, hosts,
+            interfaces, version, global_dhcp_snippets=None, base_version=None,
+            removed_shared_networks=None, removed_hosts=None):
+        server = dhcp.DHCPv4Server(omapi_key)
+        d = concurrency.dhcp.run(
+            dhcp.update, server, version, base_version,
+            failover_peers, shared_networks, removed_shared_networks,
+            hosts, removed_hosts, interfaces, global_dhcp_snippets)
+        d.addCallback(lambda _: {})
+        return d
+
     @cluster.ValidateDHCPv4Config.responder
     def validate_dhcpv4_config(
             self, omapi_key, failover_peers, shared_networks,
@@ -487,6 +500,19 @@ class Cluster(RPCProtocol):
         d.addCallback(lambda _: {})
         return d
 
+    @cluster.UpdateDHCPv6.responder
+    def update_dhcpv6(
+            self, omapi_key, failover_peers, shared_networks, hosts,
+            interfaces, version, global_dhcp_snippets=None, base_version=None,
+            removed_shared_networks=None, removed_hosts=None):
+        server = dhcp.DHCPv6Server(omapi_key)
+        d = concurrency.dhcp.run(
+            dhcp.update, server, version, base_version,
+            failover_peers, shared_networks, removed_shared_networks,
+            hosts, removed_hosts, interfaces, global_dhcp_snippets)
+        d.addCallback(lambda _: {})
+        return d
+
     @cluster.ValidateDHCPv6Config.responder
     def validate_dhcpv6_config(
             self, omapi_key, failover_peers, shared_networks,
@@ -8,6 +8,7 @@ __all__ = [
     "DHCPv4Server",
     "DHCPv6Server",
     "downgrade_shared_networks",
+    "update",
     "upgrade_shared_networks",
 ]
 
@@ -30,6 +31,7 @@ from provisioningserver.rpc.exceptions import (
     CannotCreateHostMap,
     CannotModifyHostMap,
     CannotRemoveHostMap,
+    DHCPStateMismatch,
 )
 from provisioningserver.service_monitor import service_monitor
 from provisioningserver.utils.fs import (
@@ -70,15 +72,21 @@ DHCPStateBase = namedtuple("DHCPStateBase", [
     "hosts",
     "interfaces",
     "global_dhcp_snippets",
+    "version",
 ])
 
 
 class DHCPState(DHCPStateBase):
-    """Holds the current known state of the DHCP server."""
+    """Holds the current known state of the DHCP server.
+
+    The region names each configuration it sends with a version, so that it
+    can later send only what has changed since.
+    """
 
     def __new__(
             cls, omapi_key, failover_peers,
-            shared_networks, hosts, interfaces, global_dhcp_snippets):
+            shared_networks, hosts, interfaces, global_dhcp_snippets,
+            version=None):
         failover_peers = sorted(failover_peers, key=itemgetter("name"))
         shared_networks = sorted(shared_networks, key=itemgetter("name"))
         hosts = {
@@ -97,7 +105,8 @@ class DHCPState(DHCPStateBase):
             failover_peers=failover_peers,
             shared_networks=shared_networks,
             hosts=hosts, interfaces=interfaces,
-            global_dhcp_snippets=global_dhcp_snippets)
+            global_dhcp_snippets=global_dhcp_snippets,
+            version=version)
 
     def requires_restart(self, other_state):
         """Return True when this state differs from `other_state` enough to
@@ -136,6 +145,32 @@ class DHCPState(DHCPStateBase):
                 remove.append(host)
         return remove, add, modify
 
+    def apply_changes(
+            self, shared_networks, removed_shared_networks, hosts,
+            removed_hosts):
+        """Return the shared networks and hosts of this state, changed.
+
+        :param shared_networks: Shared networks to add or replace, by name.
+        :param removed_shared_networks: Names of shared networks to remove.
+        :param hosts: Hosts to add or replace, by MAC address.
+        :param removed_hosts: MAC addresses of hosts to remove.
+        :return: A tuple of lists of shared networks and hosts.
+        """
+        all_shared_networks = {
+            shared_network["name"]: shared_network
+            for shared_network in self.shared_networks
+        }
+        for name in removed_shared_networks:
+            all_shared_networks.pop(name, None)
+        for shared_network in shared_networks:
+            all_shared_networks[shared_network["name"]] = shared_network
+        all_hosts = self.hosts.copy()
+        for mac in removed_hosts:
+            all_hosts.pop(mac, None)
+        for host in hosts:
+            all_hosts[host["mac"]] = host
+        return list(all_shared_networks.values()), list(all_hosts.values())
+
     def get_config(self, server):
         """Return the configuration for `server`."""
         dhcpd_config = get_config(
@@ -261,7 +296,7 @@ def _catch_service_error(server, action, call, *args, **kwargs):
 @inlineCallbacks
 def configure(
         server, failover_peers, shared_networks, hosts, interfaces,
-        global_dhcp_snippets=None):
+        global_dhcp_snippets=None, version=None):
     """Configure the DHCPv6/DHCPv4 server, and restart it as appropriate.
 
     This method is not safe to call concurrently. The clusterserver ensures
@@ -277,6 +312,7 @@ def configure(
         contain a list of hosts the DHCP should statically.
     :param interfaces: List of interfaces that DHCP should use.
     :param global_dhcp_snippets: List of all global DHCP snippets
+    :param version: The version of this configuration, if known.
     """
     stopping = len(shared_networks) == 0
 
@@ -299,7 +335,7 @@ def configure(
         # Get the new state for the DHCP server.
         new_state = DHCPState(
             server.omapi_key, failover_peers, shared_networks,
-            hosts, interfaces, global_dhcp_snippets)
+            hosts, interfaces, global_dhcp_snippets, version)
 
         # Always write the config, that way its always up-to-date. Even if
         # we are not going to restart the services. This makes sure that even
@@ -359,6 +395,52 @@ def configure(
         _current_server_state[server.dhcp_service] = new_state
 
 
+@asynchronous
+def update(
+        server, version, base_version, failover_peers, shared_networks,
+        removed_shared_networks, hosts, removed_hosts, interfaces,
+        global_dhcp_snippets=None):
+    """Update the DHCPv6/DHCPv4 server to the configuration `version`.
+
+    Without `base_version` this is the same as `configure`. Otherwise the
+    shared networks and hosts are changes to the configuration `base_version`,
+    which must be the configuration of the server.
+
+    This method is not safe to call concurrently. The clusterserver ensures
+    that this method is not called concurrently.
+
+    :param server: A `DHCPServer` instance.
+    :param version: The version of the new configuration.
+    :param base_version: The version of the configuration that is changed,
+        or `None` if the whole configuration is given.
+    :param failover_peers: See `configure`.
+    :param shared_networks: See `configure`, or the shared networks that
+        have been added or changed since `base_version`.
+    :param removed_shared_networks: The names of the shared networks that
+        have been removed since `base_version`.
+    :param hosts: See `configure`, or the hosts that have been added or
+        changed since `base_version`.
+    :param removed_hosts: The MAC addresses of the hosts that have been
+        removed since `base_version`.
+    :param interfaces: See `configure`.
+    :param global_dhcp_snippets: See `configure`.
+    :raise DHCPStateMismatch: If the server does not have the configuration
+        `base_version`.
+    """
+    if base_version is not None:
+        current_state = _current_server_state.get(server.dhcp_service, None)
+        if current_state is None or current_state.version != base_version:
+            raise DHCPStateMismatch(
+                "%s server does not have configuration %s." % (
+                    server.descriptive_name, base_version))
+        shared_networks, hosts = current_state.apply_changes(
+            shared_networks, removed_shared_networks or [],
+            hosts, removed_hosts or [])
+    return configure(
+        server, failover_peers, shared_networks, hosts, interfaces,
+        global_dhcp_snippets, version=version)
+
+
 def _parse_dhcpd_errors(error_str):
     """Parse the output of dhcpd -t -cf <file> into a list of dictionaries
 
@@ -12,6 +12,7 @@ __all__ = [
     "CannotRegisterCluster",
     "CannotRemoveHostMap",
     "CommissionNodeFailed",
+    "DHCPStateMismatch",
     "NoConnectionsAvailable",
     "NodeAlreadyExists",
     "NodeStateViolation",
@@ -89,6 +90,10 @@ class CannotConfigureDHCP(Exception):
     """Failure while configuring a DHCP server."""
 
 
+class DHCPStateMismatch(Exception):
+    """The DHCP server is not configured as a change expected it to be."""
+
+
 class CannotCreateHostMap(Exception):
     """The host map could not be created."""
 
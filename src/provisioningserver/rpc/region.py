@@ -12,6 +12,7 @@ __all__ = [
     "CreateNode",
     "GetArchiveMirrors",
     "GetBootConfig",
+    "GetBootImagePeers",
     "GetBootSources",
     "GetBootSourcesV2",
     "GetControllerType",
@@ -38,6 +39,7 @@ __all__ = [
 from provisioningserver.rpc.arguments import (
     AmpList,
     Bytes,
+    Chunked,
     ParsedURL,
     StructureAsJSON,
 )
@@ -298,6 +300,25 @@ class UpdateLastImageSync(amp.Command):
     errors = []
 
 
+class GetBootImagePeers(amp.Command):
+    """Get the addresses of peer rack controllers to fetch boot images from.
+
+    :since: 2.4
+    """
+
+    arguments = [
+        # A rack controller's system_id.
+        (b"system_id", amp.Unicode()),
+    ]
+    response = [
+        # IP addresses, most preferred first.
+        (b"peers", amp.ListOf(amp.Unicode())),
+    ]
+    errors = {
+        NoSuchNode: b"NoSuchNode",
+    }
+
+
 class UpdateNodePowerState(amp.Command):
     """Update Node Power State.
 
@@ -464,8 +485,8 @@ class UpdateInterfaces(amp.Command):
 
     arguments = [
         (b'system_id', amp.Unicode()),
-        (b'interfaces', StructureAsJSON()),
-        (b'topology_hints', StructureAsJSON(optional=True)),
+        (b'interfaces', Chunked(StructureAsJSON())),
+        (b'topology_hints', Chunked(StructureAsJSON(optional=True))),
     ]
     response = []
     errors = []
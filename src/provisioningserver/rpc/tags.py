@@ -9,8 +9,8 @@ __all__ = [
 
 from apiclient.maas_client import (
     MAASClient,
-    MAASDispatcher,
     MAASOAuth,
+    MAASPooledDispatcher,
 )
 from provisioningserver.config import ClusterConfiguration
 from provisioningserver.tags import process_node_tags
@@ -31,10 +31,16 @@ def evaluate_tag(
     """
     with ClusterConfiguration.open() as config:
         maas_url = config.maas_url
+    # Details are fetched and tags updated one request after another, so
+    # keep one connection open to the region for all of them.
+    dispatcher = MAASPooledDispatcher(maxsize=1)
     client = MAASClient(
-        auth=MAASOAuth(*credentials), dispatcher=MAASDispatcher(),
+        auth=MAASOAuth(*credentials), dispatcher=dispatcher,
         base_url=maas_url)
-    process_node_tags(
-        rack_id=system_id, nodes=nodes,
-        tag_name=tag_name, tag_definition=tag_definition,
-        tag_nsmap=tag_nsmap, client=client)
+    try:
+        process_node_tags(
+            rack_id=system_id, nodes=nodes,
+            tag_name=tag_name, tag_definition=tag_definition,
+            tag_nsmap=tag_nsmap, client=client)
+    finally:
+        dispatcher.close()
@@ -28,6 +28,7 @@ from testtools.matchers import (
     HasLength,
     IsInstance,
     LessThan,
+    Not,
 )
 from twisted.protocols import amp
 
@@ -160,6 +161,69 @@ class TestCompressedAmpList(MAASTestCase):
             LessThan(2 ** 16))
 
 
+class TestChunked(MAASTestCase):
+
+    def make_argument(self, **kwargs):
+        return arguments.Chunked(arguments.Bytes(), **kwargs)
+
+    def round_trip(self, argument, example):
+        strings = {}
+        argument.toBox(b"thing", strings, {"thing": example}, proto=None)
+        objects = {}
+        argument.fromBox(b"thing", dict(strings), objects, proto=None)
+        return strings, objects
+
+    def test_round_trip_as_single_value_when_it_fits(self):
+        argument = self.make_argument()
+        example = factory.make_bytes(amp.MAX_VALUE_LENGTH)
+        strings, objects = self.round_trip(argument, example)
+        self.assertEqual({b"thing": example}, strings)
+        self.assertEqual({"thing": example}, objects)
+
+    def test_round_trip_as_chunks_when_it_does_not_fit(self):
+        argument = self.make_argument()
+        example = factory.make_bytes((amp.MAX_VALUE_LENGTH * 2) + 1)
+        strings, objects = self.round_trip(argument, example)
+        self.assertItemsEqual(
+            [b"thing", b"thing.1", b"thing.2"], list(strings))
+        self.assertThat(strings[b"thing.2"], HasLength(1))
+        self.assertEqual({"thing": example}, objects)
+
+    def test_round_trip_optional(self):
+        argument = arguments.Chunked(arguments.Bytes(optional=True))
+        strings, objects = self.round_trip(argument, None)
+        self.assertEqual({}, strings)
+        self.assertEqual({"thing": None}, objects)
+
+    def test_round_trip_compressed_amp_list(self):
+        argument = arguments.Chunked(arguments.CompressedAmpList(
+            [("ip", amp.Unicode()), ("mac", amp.Unicode())]))
+        # These do not compress to less than 64k.
+        leases = [
+            {"ip": factory.make_ipv4_address(),
+             "mac": factory.make_mac_address()}
+            for _ in range(10000)
+        ]
+        strings, objects = self.round_trip(argument, leases)
+        self.assertThat(strings, Not(HasLength(1)))
+        self.assertEqual({"thing": leases}, objects)
+
+    def test_error_when_sending_more_than_max_length(self):
+        argument = self.make_argument(max_length=amp.MAX_VALUE_LENGTH + 1)
+        example = factory.make_bytes(amp.MAX_VALUE_LENGTH + 2)
+        with ExpectedException(amp.TooLong):
+            self.round_trip(argument, example)
+
+    def test_error_when_receiving_more_than_max_length(self):
+        example = factory.make_bytes(amp.MAX_VALUE_LENGTH + 2)
+        strings = {}
+        self.make_argument().toBox(
+            b"thing", strings, {"thing": example}, proto=None)
+        argument = self.make_argument(max_length=amp.MAX_VALUE_LENGTH + 1)
+        with ExpectedException(ValueError, ".* longer than 65536 bytes"):
+            argument.fromBox(b"thing", strings, {}, proto=None)
+
+
 class TestIPAddress(MAASTestCase):
 
     argument = arguments.IPAddress()
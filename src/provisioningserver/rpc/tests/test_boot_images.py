@@ -37,7 +37,11 @@ from provisioningserver.rpc.boot_images import (
     list_boot_images,
     reload_boot_images,
 )
-from provisioningserver.rpc.region import UpdateLastImageSync
+from provisioningserver.rpc.exceptions import NoConnectionsAvailable
+from provisioningserver.rpc.region import (
+    GetBootImagePeers,
+    UpdateLastImageSync,
+)
 from provisioningserver.rpc.testing import MockLiveClusterToRegionRPCFixture
 from provisioningserver.testing.config import (
     BootSourcesFixture,
@@ -50,10 +54,12 @@ from testtools.matchers import (
 )
 from twisted.internet import defer
 from twisted.internet.defer import (
+    fail,
     inlineCallbacks,
     succeed,
 )
 from twisted.internet.task import Clock
+from twisted.protocols.amp import UnhandledCommand
 
 
 def make_sources():
@@ -257,7 +263,22 @@ class TestRunImport(MAASTestCase):
         fake = self.patch(boot_resources, 'import_images')
         sources, _ = make_sources()
         _run_import(sources=sources)
-        self.assertThat(fake, MockCalledOnceWith(sources))
+        self.assertThat(fake, MockCalledOnceWith(sources, peers=()))
+
+    def test__run_import_passes_peers(self):
+        fake = self.patch(boot_resources, 'import_images')
+        sources, _ = make_sources()
+        peers = ["http://10.0.0.1:5248/cache/"]
+        _run_import(sources=sources, peers=peers)
+        self.assertThat(fake, MockCalledOnceWith(sources, peers=peers))
+
+    def test__run_import_sets_proxy_for_peers(self):
+        fake = self.patch_boot_resources_function()
+        _run_import(sources=[], peers=[
+            "http://10.0.0.1:5248/cache/", "http://[fd00::1]:5248/cache/"])
+        self.assertEqual(
+            fake.env['no_proxy'],
+            "localhost,::ffff:127.0.0.1,127.0.0.1,::1,10.0.0.1,fd00::1")
 
     def test__run_import_calls_reload_boot_images(self):
         fake_reload = self.patch(boot_images, 'reload_boot_images')
@@ -288,7 +309,7 @@ class TestImportBootImages(MAASTestCase):
         yield import_boot_images(sentinel.sources)
         self.assertThat(
             deferToThread, MockCalledOnceWith(
-                _run_import, sentinel.sources,
+                _run_import, sentinel.sources, peers=[],
                 http_proxy=None, https_proxy=None))
 
     def test__takes_lock_when_running(self):
@@ -309,11 +330,14 @@ class TestImportBootImages(MAASTestCase):
         get_maas_id = self.patch(boot_images, "get_maas_id")
         get_maas_id.return_value = factory.make_string()
         getRegionClient = self.patch(boot_images, "getRegionClient")
+        self.patch(boot_images, "get_boot_image_peers").return_value = (
+            succeed([]))
         _run_import = self.patch_autospec(boot_images, '_run_import')
         _run_import.return_value = True
         yield boot_images._import_boot_images(sentinel.sources)
         self.assertThat(
-            _run_import, MockCalledOnceWith(sentinel.sources, None, None))
+            _run_import, MockCalledOnceWith(
+                sentinel.sources, None, None, []))
         self.assertThat(getRegionClient, MockCalledOnceWith())
         self.assertThat(get_maas_id, MockCalledOnceWith())
         client = getRegionClient.return_value
@@ -326,11 +350,14 @@ class TestImportBootImages(MAASTestCase):
         get_maas_id = self.patch(boot_images, "get_maas_id")
         get_maas_id.return_value = factory.make_string()
         getRegionClient = self.patch(boot_images, "getRegionClient")
+        self.patch(boot_images, "get_boot_image_peers").return_value = (
+            succeed([]))
         _run_import = self.patch_autospec(boot_images, '_run_import')
         _run_import.return_value = False
         yield boot_images._import_boot_images(sentinel.sources)
         self.assertThat(
-            _run_import, MockCalledOnceWith(sentinel.sources, None, None))
+            _run_import, MockCalledOnceWith(
+                sentinel.sources, None, None, []))
         self.assertThat(getRegionClient, MockNotCalled())
         self.assertThat(get_maas_id, MockNotCalled())
 
@@ -350,7 +377,7 @@ class TestImportBootImages(MAASTestCase):
         yield boot_images.import_boot_images(sources)
         self.assertThat(
             boot_resources.import_images,
-            MockCalledOnceWith(sources))
+            MockCalledOnceWith(sources, peers=[]))
         self.assertThat(
             protocol.UpdateLastImageSync,
             MockCalledOnceWith(protocol, system_id=get_maas_id()))
@@ -369,12 +396,47 @@ class TestImportBootImages(MAASTestCase):
         yield boot_images.import_boot_images(sources)
         self.assertThat(
             boot_resources.import_images,
-            MockCalledOnceWith(sources))
+            MockCalledOnceWith(sources, peers=[]))
         self.assertThat(
             protocol.UpdateLastImageSync,
             MockNotCalled())
 
 
+class TestGetBootImagePeers(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    @inlineCallbacks
+    def test__returns_cache_urls_of_peers(self):
+        get_maas_id = self.patch(boot_images, "get_maas_id")
+        get_maas_id.return_value = factory.make_string()
+        client = self.patch(boot_images, "getRegionClient").return_value
+        client.return_value = succeed(
+            {"peers": ["10.0.0.1", "fd00::1"]})
+        peers = yield boot_images.get_boot_image_peers()
+        self.assertEqual(
+            ["http://10.0.0.1:5248/cache/", "http://[fd00::1]:5248/cache/"],
+            peers)
+        self.assertThat(
+            client, MockCalledOnceWith(
+                GetBootImagePeers, system_id=get_maas_id()))
+
+    @inlineCallbacks
+    def test__returns_no_peers_without_region_connection(self):
+        self.patch(boot_images, "getRegionClient").side_effect = (
+            NoConnectionsAvailable())
+        peers = yield boot_images.get_boot_image_peers()
+        self.assertEqual([], peers)
+
+    @inlineCallbacks
+    def test__returns_no_peers_if_region_does_not_respond(self):
+        self.patch(boot_images, "get_maas_id")
+        client = self.patch(boot_images, "getRegionClient").return_value
+        client.return_value = fail(UnhandledCommand())
+        peers = yield boot_images.get_boot_image_peers()
+        self.assertEqual([], peers)
+
+
 class TestIsImportBootImagesRunning(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
@@ -2043,6 +2043,75 @@ class TestClusterProtocol_ConfigureDHCP(MAASTestCase):
                 })
 
 
+class TestClusterProtocol_UpdateDHCP(MAASTestCase):
+
+    scenarios = (
+        ("DHCPv4", {
+            "dhcp_server": (dhcp, "DHCPv4Server"),
+            "command": cluster.UpdateDHCPv4,
+        }),
+        ("DHCPv6", {
+            "dhcp_server": (dhcp, "DHCPv6Server"),
+            "command": cluster.UpdateDHCPv6,
+        }),
+    )
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test__is_registered(self):
+        self.assertIsNotNone(
+            Cluster().locateResponder(self.command.commandName))
+
+    @inlineCallbacks
+    def test__executes_update_dhcp(self):
+        DHCPServer = self.patch_autospec(*self.dhcp_server)
+        update = self.patch_autospec(dhcp, "update")
+
+        omapi_key = factory.make_name('key')
+        failover_peers = [make_failover_peer_config()]
+        shared_networks = [make_shared_network()]
+        shared_networks = fix_shared_networks_failover(
+            shared_networks, failover_peers)
+        removed_shared_networks = [factory.make_name("vlan")]
+        hosts = [make_host()]
+        removed_hosts = [factory.make_mac_address()]
+        interfaces = [make_interface()]
+
+        yield call_responder(Cluster(), self.command, {
+            'omapi_key': omapi_key,
+            'version': "v2",
+            'base_version': "v1",
+            'failover_peers': failover_peers,
+            'shared_networks': shared_networks,
+            'removed_shared_networks': removed_shared_networks,
+            'hosts': hosts,
+            'removed_hosts': removed_hosts,
+            'interfaces': interfaces,
+            })
+
+        self.assertThat(DHCPServer, MockCalledOnceWith(omapi_key))
+        self.assertThat(update, MockCalledOnceWith(
+            DHCPServer.return_value, "v2", "v1", failover_peers,
+            shared_networks, removed_shared_networks, hosts, removed_hosts,
+            interfaces, None))
+
+    @inlineCallbacks
+    def test__propagates_DHCPStateMismatch(self):
+        update = self.patch_autospec(dhcp, "update")
+        update.side_effect = exceptions.DHCPStateMismatch("v0")
+
+        with ExpectedException(exceptions.DHCPStateMismatch):
+            yield call_responder(Cluster(), self.command, {
+                'omapi_key': factory.make_name('key'),
+                'version': "v2",
+                'base_version': "v1",
+                'failover_peers': [],
+                'shared_networks': [],
+                'hosts': [],
+                'interfaces': [],
+                })
+
+
 class TestClusterProtocol_ValidateDHCP(MAASTestCase):
 
     scenarios = (
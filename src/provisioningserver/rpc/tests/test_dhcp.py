@@ -298,6 +298,34 @@ class TestDHCPState(MAASTestCase):
                 global_dhcp_snippets=sorted(
                     global_dhcp_snippets, key=itemgetter("name"))))
 
+    def test_requires_restart_ignores_version(self):
+        args = self.make_args()
+        state = dhcp.DHCPState(*args, version=factory.make_name("version"))
+        new_state = dhcp.DHCPState(
+            *copy.deepcopy(args), version=factory.make_name("version"))
+        self.assertFalse(new_state.requires_restart(state))
+
+    def test_apply_changes_adds_replaces_and_removes(self):
+        (omapi_key, failover_peers, shared_networks, hosts, interfaces,
+         global_dhcp_snippets) = self.make_args()
+        state = dhcp.DHCPState(
+            omapi_key, failover_peers, shared_networks, hosts, interfaces,
+            global_dhcp_snippets)
+        changed_shared_network = make_shared_network(
+            name=shared_networks[1]["name"])
+        new_shared_network = make_shared_network()
+        changed_host = make_host(mac_address=hosts[1]["mac"])
+        new_host = make_host()
+        observed_shared_networks, observed_hosts = state.apply_changes(
+            [changed_shared_network, new_shared_network],
+            [shared_networks[0]["name"]],
+            [changed_host, new_host], [hosts[0]["mac"]])
+        self.assertItemsEqual(
+            [changed_shared_network, shared_networks[2], new_shared_network],
+            observed_shared_networks)
+        self.assertItemsEqual(
+            [changed_host, hosts[2], new_host], observed_hosts)
+
 
 class TestRemoveHostMap(MAASTestCase):
 
@@ -1002,6 +1030,77 @@ class TestConfigureDHCP(MAASTestCase):
             "DHCP is on strike today", logger.output)
 
 
+class TestUpdateDHCP(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestUpdateDHCP, self).setUp()
+        # The dhcp server states are global so we clean them after each test.
+        self.addCleanup(dhcp._current_server_state.clear)
+        self.server = dhcp.DHCPv4Server(factory.make_name("omapi_key"))
+
+    def set_current_state(self, version):
+        failover_peers = [make_failover_peer_config()]
+        shared_networks = fix_shared_networks_failover(
+            [make_shared_network() for _ in range(2)], failover_peers)
+        hosts = [make_host() for _ in range(2)]
+        interfaces = [make_interface()]
+        state = dhcp.DHCPState(
+            self.server.omapi_key, failover_peers, shared_networks, hosts,
+            interfaces, [], version)
+        dhcp._current_server_state[self.server.dhcp_service] = state
+        return state
+
+    @inlineCallbacks
+    def test__configures_whole_configuration_without_base_version(self):
+        configure = self.patch_autospec(dhcp, "configure")
+        failover_peers = [make_failover_peer_config()]
+        shared_networks = [make_shared_network()]
+        hosts = [make_host()]
+        interfaces = [make_interface()]
+        yield dhcp.update(
+            self.server, "v2", None, failover_peers, shared_networks, None,
+            hosts, None, interfaces, [])
+        self.assertThat(configure, MockCalledOnceWith(
+            self.server, failover_peers, shared_networks, hosts, interfaces,
+            [], version="v2"))
+
+    @inlineCallbacks
+    def test__applies_changes_to_base_version(self):
+        configure = self.patch_autospec(dhcp, "configure")
+        state = self.set_current_state("v1")
+        new_shared_network = make_shared_network()
+        new_host = make_host()
+        yield dhcp.update(
+            self.server, "v2", "v1", state.failover_peers,
+            [new_shared_network], [state.shared_networks[0]["name"]],
+            [new_host], [], [make_interface()], [])
+        self.assertThat(configure, MockCalledOnceWith(
+            self.server, state.failover_peers, ANY, ANY, ANY, [],
+            version="v2"))
+        _, _, shared_networks, hosts, _, _ = configure.call_args[0]
+        self.assertItemsEqual(
+            [state.shared_networks[1], new_shared_network], shared_networks)
+        self.assertItemsEqual(
+            list(state.hosts.values()) + [new_host], hosts)
+
+    def test__raises_DHCPStateMismatch_for_other_version(self):
+        configure = self.patch_autospec(dhcp, "configure")
+        self.set_current_state("v1")
+        self.assertRaises(
+            exceptions.DHCPStateMismatch, dhcp.update,
+            self.server, "v3", "v2", [], [], [], [], [], [], [])
+        self.assertThat(configure, MockNotCalled())
+
+    def test__raises_DHCPStateMismatch_without_state(self):
+        configure = self.patch_autospec(dhcp, "configure")
+        self.assertRaises(
+            exceptions.DHCPStateMismatch, dhcp.update,
+            self.server, "v2", "v1", [], [], [], [], [], [], [])
+        self.assertThat(configure, MockNotCalled())
+
+
 class TestValidateDHCP(MAASTestCase):
 
     scenarios = (
@@ -12,8 +12,8 @@ from unittest.mock import (
 
 from apiclient.maas_client import (
     MAASClient,
-    MAASDispatcher,
     MAASOAuth,
+    MAASPooledDispatcher,
 )
 from maastesting.factory import factory
 from maastesting.matchers import MockCalledOnceWith
@@ -60,7 +60,7 @@ class TestEvaluateTag(MAASTestCase):
         client = tags.process_node_tags.call_args[1]["client"]
         self.assertIsInstance(client, MAASClient)
         self.assertEqual(self.mock_url, client.url)
-        self.assertIsInstance(client.dispatcher, MAASDispatcher)
+        self.assertIsInstance(client.dispatcher, MAASPooledDispatcher)
         self.assertIsInstance(client.auth, MAASOAuth)
         self.assertThat(tags.MAASOAuth, MockCalledOnceWith(
             consumer_key, resource_token, resource_secret))
@@ -544,6 +544,54 @@ class TestConfigurationFile(MAASTestCase):
             "ConfigurationFile(%r)" % config_file))
 
 
+class TestConfigurationFileSnapshots(MAASTestCase):
+    """Tests for `ConfigurationFile` snapshots."""
+
+    def test_open_shares_snapshot_while_file_is_unchanged(self):
+        config_file = os.path.join(self.make_dir(), "config")
+        with ConfigurationFile.open_for_update(config_file) as config:
+            config["alice"] = 1234
+        loaded = []
+        load = ConfigurationFile.load
+
+        def record_load(configfile):
+            loaded.append(configfile.path)
+            return load(configfile)
+
+        self.patch(ConfigurationFile, "load", record_load)
+        with ConfigurationFile.open(config_file) as config1:
+            self.assertEqual(1234, config1["alice"])
+        with ConfigurationFile.open(config_file) as config2:
+            self.assertEqual(1234, config2["alice"])
+        self.assertEqual([config_file], loaded)
+        self.assertIs(config1.config, config2.config)
+
+    def test_open_reloads_after_update(self):
+        config_file = os.path.join(self.make_dir(), "config")
+        with ConfigurationFile.open(config_file) as config:
+            self.assertRaises(KeyError, lambda: config["alice"])
+        with ConfigurationFile.open_for_update(config_file) as config:
+            config["alice"] = 1234
+        with ConfigurationFile.open(config_file) as config:
+            self.assertEqual(1234, config["alice"])
+
+    def test_open_reloads_after_file_is_replaced(self):
+        config_file = os.path.join(self.make_dir(), "config")
+        with ConfigurationFile.open(config_file) as config:
+            self.assertEqual({}, config.config)
+        other_file = os.path.join(self.make_dir(), "other")
+        with open(other_file, "w") as fd:
+            yaml.safe_dump({"alice": 1234}, stream=fd)
+        os.rename(other_file, config_file)
+        with ConfigurationFile.open(config_file) as config:
+            self.assertEqual(1234, config["alice"])
+
+    def test_snapshot_is_read_only(self):
+        config_file = os.path.join(self.make_dir(), "config")
+        snapshot = ConfigurationFile.get_snapshot(config_file)
+        self.assertRaises(TypeError, setitem, snapshot, "alice", 1234)
+
+
 class TestConfigurationFileMutability(MAASTestCase):
     """Tests for `ConfigurationFile` mutability."""
 
@@ -633,6 +681,32 @@ class TestClusterConfiguration(MAASTestCase):
         # It's also stored in the configuration database.
         self.assertEqual({"tftp_port": example_port}, config.store)
 
+    def test_default_image_download_concurrency(self):
+        config = ClusterConfiguration({})
+        self.assertEqual(4, config.image_download_concurrency)
+
+    def test_set_and_get_image_download_concurrency(self):
+        config = ClusterConfiguration({})
+        config.image_download_concurrency = "8"
+        self.assertEqual(8, config.image_download_concurrency)
+        self.assertEqual({"image_download_concurrency": 8}, config.store)
+
+    def test_image_download_concurrency_must_be_positive(self):
+        config = ClusterConfiguration({})
+        with ExpectedException(formencode.api.Invalid):
+            config.image_download_concurrency = 0
+
+    def test_default_image_download_rate_limit(self):
+        config = ClusterConfiguration({})
+        self.assertEqual(0, config.image_download_rate_limit)
+
+    def test_set_and_get_image_download_rate_limit(self):
+        config = ClusterConfiguration({})
+        config.image_download_rate_limit = "1048576"
+        self.assertEqual(1048576, config.image_download_rate_limit)
+        self.assertEqual(
+            {"image_download_rate_limit": 1048576}, config.store)
+
     def test_default_tftp_root(self):
         # The default tftp_root is calculated relative to MAAS_ROOT at module
         # import time, so we need to recreate that value.
@@ -5,6 +5,8 @@
 
 __all__ = []
 
+import os
+
 import crochet
 from maastesting.matchers import MockCalledOnceWith
 from maastesting.testcase import (
@@ -24,7 +26,10 @@ from provisioningserver.plugin import (
 from provisioningserver.rackdservices.dhcp_probe_service import (
     DHCPProbeService,
 )
-from provisioningserver.rackdservices.image import BootImageEndpointService
+from provisioningserver.rackdservices.image import (
+    BootImageEndpointService,
+    BootResourceCache,
+)
 from provisioningserver.rackdservices.image_download_service import (
     ImageDownloadService,
 )
@@ -46,6 +51,7 @@ from provisioningserver.rackdservices.tftp import (
 )
 from provisioningserver.rackdservices.tftp_offload import TFTPOffloadService
 from provisioningserver.testing.config import ClusterConfigurationFixture
+from provisioningserver.utils.loadstats import LoadMonitorService
 from provisioningserver.utils.twisted import reducedWebLogFormatter
 from testtools.matchers import (
     AfterPreprocessing,
@@ -106,7 +112,7 @@ class TestProvisioningServiceMaker(MAASTestCase):
         expected_services = [
             "dhcp_probe", "networks_monitor", "image_download",
             "lease_socket_service", "node_monitor", "ntp", "rpc", "tftp",
-            "image_service", "service_monitor",
+            "image_service", "service_monitor", "load_monitor",
             ]
         self.assertThat(service.namedServices, KeysEqual(*expected_services))
         self.assertEqual(
@@ -156,6 +162,13 @@ class TestProvisioningServiceMaker(MAASTestCase):
         node_monitor = service.getServiceNamed("node_monitor")
         self.assertIsInstance(node_monitor, NodePowerMonitorService)
 
+    def test_load_monitor_service(self):
+        options = Options()
+        service_maker = ProvisioningServiceMaker("Harry", "Hill")
+        service = service_maker.makeService(options, clock=None)
+        load_monitor = service.getServiceNamed("load_monitor")
+        self.assertIsInstance(load_monitor, LoadMonitorService)
+
     def test_networks_monitor_service(self):
         options = Options()
         service_maker = ProvisioningServiceMaker("Spike", "Milligan")
@@ -219,6 +232,21 @@ class TestProvisioningServiceMaker(MAASTestCase):
 
         self.assertEqual(resource_root, root)
 
+    def test_image_service_serves_cache(self):
+        options = Options()
+        service_maker = ProvisioningServiceMaker("Harry", "Hill")
+        service = service_maker.makeService(options, clock=None)
+        image_service = service.getServiceNamed("image_service")
+        resource = image_service.site.resource
+        cache = resource.getChildWithDefault(b"cache", request=None)
+        self.assertThat(cache, IsInstance(BootResourceCache))
+
+        with ClusterConfiguration.open() as config:
+            cache_root = os.path.join(
+                os.path.dirname(config.tftp_root.rstrip("/")), "cache")
+
+        self.assertEqual(cache_root, cache.cache_root)
+
     def test_lease_socket_service(self):
         options = Options()
         service_maker = ProvisioningServiceMaker("Harry", "Hill")
@@ -6,6 +6,7 @@
 __all__ = [
     "ARP",
     "add_arguments",
+    "get_arp_bindings_from_frame",
     "run"
 ]
 
@@ -13,6 +14,7 @@ from collections import namedtuple
 from datetime import datetime
 import json
 import os
+import socket
 import stat
 import struct
 import subprocess
@@ -27,7 +29,9 @@ from provisioningserver.path import get_path
 from provisioningserver.utils import sudo
 from provisioningserver.utils.ethernet import (
     Ethernet,
+    ETHERNET_HEADER_LEN,
     ETHERTYPE,
+    VLAN_HEADER_LEN,
 )
 from provisioningserver.utils.network import (
     bytes_to_int,
@@ -62,6 +66,13 @@ ARPPacket = namedtuple('ARPPacket', (
 
 SIZEOF_ARP_PACKET = 28
 
+# The (Ethernet, IPv4) subset of the above, to be unpacked in place.
+ETHERNET_IPV4_ARP_PACKET = struct.Struct('!HHBBH6s4s6s4s')
+ETHERTYPE_ARP = 0x0806
+ETHERTYPE_VLAN = 0x8100
+NULL_IP = bytes(4)
+NULL_MAC = bytes(6)
+
 
 class ARP_OPERATION:
     """Enumeration to represent ARP operation types."""
@@ -233,6 +244,52 @@ class ARP:
         out.write("\n")
 
 
+def get_arp_bindings_from_frame(frame, vid=None):
+    """Yields each (vid, ip, mac) binding found in the given Ethernet frame.
+
+    This is a lightweight equivalent of decoding the frame with `Ethernet`,
+    then `ARP`, then calling `ARP.bindings()`. The frame is unpacked in place,
+    and the IP and MAC are yielded as strings, so this is suitable for use on
+    every frame captured from a busy network.
+
+    :param frame: The bytes of the Ethernet frame; a `memoryview` is fine.
+    :param vid: The 802.1q VLAN ID (VID) reported out-of-band, e.g. when the
+        NIC has stripped the tag. A tag found in the frame takes precedence.
+    """
+    if len(frame) < ETHERNET_HEADER_LEN:
+        return
+    ethertype, = struct.unpack_from('!H', frame, 12)
+    offset = ETHERNET_HEADER_LEN
+    if ethertype == ETHERTYPE_VLAN:
+        if len(frame) < ETHERNET_HEADER_LEN + VLAN_HEADER_LEN:
+            return
+        tci, ethertype = struct.unpack_from('!HH', frame, offset)
+        # The VLAN is the lower 12 bits; the upper 4 bits are for QoS.
+        vid = tci & 0xFFF
+        offset += VLAN_HEADER_LEN
+    if ethertype != ETHERTYPE_ARP:
+        return
+    if len(frame) - offset < SIZEOF_ARP_PACKET:
+        return
+    (hardware_type, protocol, hardware_length, protocol_length, operation,
+     sender_mac, sender_ip, target_mac, target_ip) = (
+        ETHERNET_IPV4_ARP_PACKET.unpack_from(frame, offset))
+    # Only (Ethernet MAC, IPv4) bindings are supported; see `ARP.is_valid`.
+    if (hardware_type != 1 or protocol != 0x800 or
+            hardware_length != 6 or protocol_length != 4):
+        return
+    if operation == ARP_OPERATION.REQUEST:
+        bindings = ((sender_ip, sender_mac),)
+    elif operation == ARP_OPERATION.REPLY:
+        bindings = ((sender_ip, sender_mac), (target_ip, target_mac))
+    else:
+        return
+    for ip, mac in bindings:
+        if ip != NULL_IP and mac != NULL_MAC:
+            yield vid, socket.inet_ntoa(ip), ':'.join(
+                '%02x' % octet for octet in mac)
+
+
 def update_bindings_and_get_event(bindings, vid, ip, mac, time):
     """Update the specified bindings dictionary and returns a dictionary if the
     information resulted in an update to the bindings. (otherwise, returns
@@ -0,0 +1,166 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Utilities for capturing packets with Linux AF_PACKET sockets.
+
+This allows MAAS to observe traffic without spawning `tcpdump`, provided
+that the process has the CAP_NET_RAW capability.
+"""
+
+__all__ = [
+    "ARP_FILTER",
+    "is_packet_capture_available",
+    "open_packet_socket",
+    "PacketSocketReader",
+    "read_pcap_frames",
+]
+
+import ctypes
+import socket
+import struct
+
+from provisioningserver.utils.pcap import PCAP
+
+# From <linux/if_ether.h>: capture every protocol.
+ETH_P_ALL = 0x0003
+
+# From <linux/socket.h> and <linux/if_packet.h>.
+SOL_PACKET = 263
+PACKET_AUXDATA = 8
+
+# From <asm-generic/socket.h>.
+SO_ATTACH_FILTER = 26
+
+# From <linux/if_packet.h>: struct tpacket_auxdata.
+TPACKET_AUXDATA = 'IIIHHHH'
+SIZEOF_TPACKET_AUXDATA = struct.calcsize(TPACKET_AUXDATA)
+TP_STATUS_VLAN_VALID = 1 << 4
+
+# Large enough for the Ethernet, 802.1q, and ARP headers.
+SNAPLEN = 96
+
+# Classic BPF equivalent of the `tcpdump` filter "arp or (vlan and arp)",
+# as (code, jt, jf, k) tuples. When the NIC strips the 802.1q tag it is
+# reported in the auxiliary data instead, and the first test matches.
+ARP_FILTER = (
+    (0x28, 0, 0, 12),  # ldh [12]
+    (0x15, 3, 0, 0x0806),  # jeq #ETH_P_ARP, accept
+    (0x15, 0, 3, 0x8100),  # jeq #ETH_P_8021Q, next, drop
+    (0x28, 0, 0, 16),  # ldh [16]
+    (0x15, 0, 1, 0x0806),  # jeq #ETH_P_ARP, accept, drop
+    (0x06, 0, 0, SNAPLEN),  # accept: ret #SNAPLEN
+    (0x06, 0, 0, 0),  # drop: ret #0
+)
+
+
+def attach_filter(sock, program):
+    """Attach the classic BPF `program` to `sock`.
+
+    :param program: A sequence of (code, jt, jf, k) tuples.
+    """
+    instructions = b''.join(
+        struct.pack('HBBI', *instruction) for instruction in program)
+    buf = ctypes.create_string_buffer(instructions, len(instructions))
+    # struct sock_fprog { unsigned short len; struct sock_filter *filter; }
+    fprog = struct.pack('HP', len(program), ctypes.addressof(buf))
+    # The kernel copies the program, so `buf` need not outlive this call.
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def open_packet_socket(program=ARP_FILTER):
+    """Open a non-blocking AF_PACKET socket on all interfaces.
+
+    Frames that `program` accepts are received from every interface; the
+    name of the receiving interface is reported with each frame. Auxiliary
+    data is enabled, so that 802.1q tags stripped by the NIC are reported.
+
+    :raise PermissionError: If this process lacks CAP_NET_RAW.
+    """
+    sock = socket.socket(
+        socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    try:
+        attach_filter(sock, program)
+        sock.setsockopt(SOL_PACKET, PACKET_AUXDATA, 1)
+        sock.setblocking(False)
+    except:
+        sock.close()
+        raise
+    return sock
+
+
+def is_packet_capture_available():
+    """Return True if this process can open AF_PACKET sockets."""
+    try:
+        sock = socket.socket(
+            socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    except OSError:
+        return False
+    else:
+        sock.close()
+        return True
+
+
+def get_vid_from_auxdata(ancdata):
+    """Return the VID the NIC stripped from a frame, or None if untagged.
+
+    :param ancdata: The ancillary data returned by `socket.recvmsg_into`.
+    """
+    for level, kind, data in ancdata:
+        if level == SOL_PACKET and kind == PACKET_AUXDATA:
+            if len(data) < SIZEOF_TPACKET_AUXDATA:
+                return None
+            status, _, _, _, _, tci, _ = struct.unpack_from(
+                TPACKET_AUXDATA, data)
+            # Older kernels don't set TP_STATUS_VLAN_VALID, but nor do they
+            # report a non-zero TCI for untagged frames.
+            if status & TP_STATUS_VLAN_VALID or tci != 0:
+                return tci & 0xFFF
+            else:
+                return None
+    return None
+
+
+class PacketSocketReader:
+    """Read batches of frames from a socket from `open_packet_socket`.
+
+    A single buffer is reused for every frame, so frames are presented as
+    `memoryview` slices that are only valid until the next frame is read.
+    """
+
+    # The number of frames to read before yielding to the reactor.
+    batch_size = 64
+
+    def __init__(self, sock):
+        super().__init__()
+        self.sock = sock
+        self.buffer = bytearray(SNAPLEN)
+        self.view = memoryview(self.buffer)
+        self.ancbufsize = socket.CMSG_SPACE(SIZEOF_TPACKET_AUXDATA)
+
+    def read(self):
+        """Yield (ifname, frame, vid) for each frame waiting in the socket.
+
+        Stops when no more frames are waiting, or after `batch_size` frames.
+        """
+        for _ in range(self.batch_size):
+            try:
+                nbytes, ancdata, _, address = self.sock.recvmsg_into(
+                    (self.buffer,), self.ancbufsize)
+            except (BlockingIOError, InterruptedError):
+                break
+            yield address[0], self.view[:nbytes], get_vid_from_auxdata(
+                ancdata)
+
+
+def read_pcap_frames(stream):
+    """Yield (time, frame) for each frame in the PCAP `stream`.
+
+    This is the replay counterpart of `PacketSocketReader`, used to feed
+    recorded traffic through the same decoding path.
+
+    :raise EOFError: If the stream is empty.
+    :raise PCAPError: If the stream is not valid PCAP.
+    """
+    pcap = PCAP(stream)
+    for header, packet in pcap:
+        yield header.timestamp_seconds, memoryview(packet)
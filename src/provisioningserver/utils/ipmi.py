@@ -0,0 +1,640 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""An asynchronous IPMI 2.0 (RMCP+) client.
+
+This speaks just enough IPMI over LAN to establish sessions with BMCs, and
+to query and control the chassis power, without spawning FreeIPMI tools.
+All BMCs are reached through one UDP port, sessions are reused between
+requests to the same BMC, and retransmission is done in the reactor.
+
+Only cipher suite 3 (RAKP-HMAC-SHA1, HMAC-SHA1-96, and AES-CBC-128) is
+supported. This is the default for `ipmipower`, and is supported by nearly
+all IPMI 2.0 BMCs.
+"""
+
+__all__ = [
+    "CHASSIS_CONTROL",
+    "IPMIAuthError",
+    "IPMIClient",
+    "ipmi_client",
+    "IPMIError",
+    "IPMITimeout",
+]
+
+import hashlib
+import hmac
+from ipaddress import ip_address
+import os
+import random
+import struct
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import (
+    algorithms,
+    Cipher,
+    modes,
+)
+from provisioningserver.logger import LegacyLogger
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    CancelledError,
+    Deferred,
+    DeferredList,
+    DeferredLock,
+    inlineCallbacks,
+    maybeDeferred,
+    returnValue,
+    succeed,
+)
+from twisted.internet.protocol import DatagramProtocol
+
+
+log = LegacyLogger()
+
+
+IPMI_PORT = 623
+
+# RMCP header: version 1.0, reserved, no RMCP ACK, class IPMI.
+RMCP_HEADER = b"\x06\x00\xff\x07"
+
+AUTHTYPE_RMCPPLUS = 0x06
+
+PAYLOAD_ENCRYPTED = 0x80
+PAYLOAD_AUTHENTICATED = 0x40
+
+# Integrity pad and authentication code lengths for HMAC-SHA1-96.
+INTEGRITY_NEXT_HEADER = 0x07
+INTEGRITY_LENGTH = 12
+
+# Addresses of the BMC and of remote console software in IPMI messages.
+BMC_ADDRESS = 0x20
+SOFTWARE_ID = 0x81
+
+# Look up the user by name alone in RAKP 1, not by name and privilege.
+NAME_ONLY_LOOKUP = 0x10
+
+# The algorithms proposed in an open session request; cipher suite 3.
+CIPHER_SUITE_3 = bytes((
+    0x00, 0x00, 0x00, 0x08, 0x01, 0x00, 0x00, 0x00,  # RAKP-HMAC-SHA1.
+    0x01, 0x00, 0x00, 0x08, 0x01, 0x00, 0x00, 0x00,  # HMAC-SHA1-96.
+    0x02, 0x00, 0x00, 0x08, 0x01, 0x00, 0x00, 0x00,  # AES-CBC-128.
+))
+
+
+class PAYLOAD_TYPE:
+    """RMCP+ payload types."""
+
+    IPMI = 0x00
+    OPEN_SESSION_REQUEST = 0x10
+    OPEN_SESSION_RESPONSE = 0x11
+    RAKP_1 = 0x12
+    RAKP_2 = 0x13
+    RAKP_3 = 0x14
+    RAKP_4 = 0x15
+
+
+class PRIVILEGE:
+    """IPMI privilege levels."""
+
+    USER = 0x02
+    OPERATOR = 0x03
+    ADMINISTRATOR = 0x04
+
+
+class NETFN:
+    """IPMI network functions, for requests."""
+
+    CHASSIS = 0x00
+    APP = 0x06
+
+
+class COMMAND:
+    """IPMI commands."""
+
+    GET_CHASSIS_STATUS = 0x01
+    CHASSIS_CONTROL = 0x02
+    SET_SYSTEM_BOOT_OPTIONS = 0x08
+    SET_SESSION_PRIVILEGE_LEVEL = 0x3B
+    CLOSE_SESSION = 0x3C
+
+
+class CHASSIS_CONTROL:
+    """Actions for the Chassis Control command."""
+
+    POWER_DOWN = 0x00
+    POWER_UP = 0x01
+    POWER_CYCLE = 0x02
+    HARD_RESET = 0x03
+    SOFT_SHUTDOWN = 0x05
+
+
+# RMCP+ status codes from open session responses and RAKP messages.
+RMCPPLUS_STATUS = {
+    0x01: "insufficient resources to create a session",
+    0x02: "invalid session ID",
+    0x03: "invalid payload type",
+    0x04: "invalid authentication algorithm",
+    0x05: "invalid integrity algorithm",
+    0x06: "no matching authentication payload",
+    0x07: "no matching integrity payload",
+    0x08: "inactive session ID",
+    0x09: "invalid role",
+    0x0A: "unauthorized role or privilege level requested",
+    0x0B: "insufficient resources to create a session at the requested role",
+    0x0C: "invalid name length",
+    0x0D: "unauthorized name",
+    0x0E: "unauthorized GUID",
+    0x0F: "invalid integrity check value",
+    0x10: "invalid confidentiality algorithm",
+    0x11: "no cipher suite match with proposed security algorithms",
+    0x12: "illegal or unrecognized parameter",
+}
+
+# RMCP+ status codes that mean the credentials were not accepted.
+RMCPPLUS_AUTH_STATUS = frozenset((0x09, 0x0A, 0x0D, 0x0F))
+
+# Completion code for a command that needs more privilege.
+COMPLETION_INSUFFICIENT_PRIVILEGE = 0xD4
+
+
+class IPMIError(Exception):
+    """Raised when a BMC rejects a request, or cannot be understood."""
+
+
+class IPMIAuthError(IPMIError):
+    """Raised when a BMC does not accept the credentials given."""
+
+
+class IPMITimeout(IPMIError):
+    """Raised when a BMC does not respond in time."""
+
+
+def hmac_sha1(key, *data):
+    """Return the HMAC-SHA1 of `data` concatenated, using `key`."""
+    return hmac.new(key, b"".join(data), hashlib.sha1).digest()
+
+
+def checksum(data):
+    """Return the two's complement checksum of `data`."""
+    return -sum(data) & 0xFF
+
+
+def encrypt(key, data):
+    """Encrypt `data` with AES-CBC-128, prefixed with a random IV."""
+    pad_length = 15 - len(data) % 16
+    data += bytes(range(1, pad_length + 1)) + bytes((pad_length,))
+    iv = os.urandom(16)
+    encryptor = Cipher(
+        algorithms.AES(key[:16]), modes.CBC(iv),
+        backend=default_backend()).encryptor()
+    return iv + encryptor.update(data) + encryptor.finalize()
+
+
+def decrypt(key, data):
+    """Decrypt `data`, as encrypted by `encrypt`."""
+    iv, data = data[:16], data[16:]
+    if len(iv) != 16 or len(data) == 0 or len(data) % 16 != 0:
+        raise IPMIError("Malformed encrypted payload.")
+    decryptor = Cipher(
+        algorithms.AES(key[:16]), modes.CBC(iv),
+        backend=default_backend()).decryptor()
+    data = decryptor.update(data) + decryptor.finalize()
+    return data[:-1 - data[-1]]
+
+
+def make_packet(payload_type, session_id, sequence, payload, k1=None, k2=None):
+    """Make an RMCP+ packet.
+
+    :param k1: The integrity key. If given, the packet is authenticated.
+    :param k2: The confidentiality key. If given, the payload is encrypted.
+    """
+    if k2 is not None:
+        payload_type |= PAYLOAD_ENCRYPTED
+        payload = encrypt(k2, payload)
+    if k1 is not None:
+        payload_type |= PAYLOAD_AUTHENTICATED
+    message = struct.pack(
+        "<BBIIH", AUTHTYPE_RMCPPLUS, payload_type, session_id, sequence,
+        len(payload)) + payload
+    if k1 is not None:
+        # Pad so that the integrity trailer ends on a 4 byte boundary.
+        pad_length = -(len(message) + 2) % 4
+        message += b"\xff" * pad_length + bytes(
+            (pad_length, INTEGRITY_NEXT_HEADER))
+        message += hmac_sha1(k1, message)[:INTEGRITY_LENGTH]
+    return RMCP_HEADER + message
+
+
+def parse_packet(packet, k1=None, k2=None):
+    """Parse an RMCP+ packet.
+
+    :param k1: The integrity key. If given, the packet must be authenticated.
+    :param k2: The confidentiality key, for decrypting the payload.
+    :return: ``(payload_type, session_id, payload)``.
+    :raise IPMIError: If the packet is malformed or not authentic.
+    """
+    if len(packet) < 16 or packet[:4] != RMCP_HEADER:
+        raise IPMIError("Not an RMCP packet.")
+    if packet[4] != AUTHTYPE_RMCPPLUS:
+        raise IPMIError("Not an RMCP+ packet.")
+    payload_type, session_id, _, length = struct.unpack_from(
+        "<BIIH", packet, 5)
+    payload = packet[16:16 + length]
+    if len(payload) != length:
+        raise IPMIError("Truncated RMCP+ packet.")
+    if payload_type & PAYLOAD_AUTHENTICATED:
+        if k1 is None:
+            raise IPMIError("Unexpected authenticated packet.")
+        expected = hmac_sha1(k1, packet[4:-INTEGRITY_LENGTH])
+        if not hmac.compare_digest(
+                expected[:INTEGRITY_LENGTH], packet[-INTEGRITY_LENGTH:]):
+            raise IPMIError("RMCP+ packet failed its integrity check.")
+    elif k1 is not None:
+        raise IPMIError("Unauthenticated packet in session.")
+    if payload_type & PAYLOAD_ENCRYPTED:
+        if k2 is None:
+            raise IPMIError("Unexpected encrypted packet.")
+        payload = decrypt(k2, payload)
+    return payload_type & 0x3F, session_id, payload
+
+
+def make_ipmi_request(netfn, command, rq_seq, data=b""):
+    """Make an IPMI request message for the BMC."""
+    header = bytes((BMC_ADDRESS, netfn << 2))
+    body = bytes((SOFTWARE_ID, rq_seq << 2, command)) + data
+    return (
+        header + bytes((checksum(header),)) +
+        body + bytes((checksum(body),)))
+
+
+def check_status(status):
+    """Raise an error if `status`, an RMCP+ status code, is not success."""
+    if status != 0x00:
+        message = RMCPPLUS_STATUS.get(status, "status 0x%02x" % status)
+        if status in RMCPPLUS_AUTH_STATUS:
+            raise IPMIAuthError(message)
+        else:
+            raise IPMIError(message)
+
+
+class IPMISession:
+    """An RMCP+ session with one BMC.
+
+    The session is opened on the first request, and is opened again if the
+    BMC stops answering, having dropped it. Requests are made one at a time.
+    """
+
+    def __init__(self, client, host, port, user, password, k_g=None):
+        super(IPMISession, self).__init__()
+        self.client = client
+        self.host = host
+        self.port = port
+        # IPMI user names are at most 16 bytes, passwords at most 20.
+        self.user = user.encode("utf-8")[:16]
+        self.password = password.encode("utf-8")[:20]
+        self.k_g = k_g
+        self.console_id = None
+        self.address = None
+        self.lock = DeferredLock()
+        self._reset()
+        self._waiting = None
+        self._idle = None
+
+    def _reset(self):
+        self.managed_id = None
+        self.k1 = self.k2 = None
+        self.sequence = 0
+        self.rq_seq = 0
+
+    @property
+    def active(self):
+        """Whether the session has been established with the BMC."""
+        return self.k1 is not None
+
+    def request(self, netfn, command, data=b""):
+        """Send an IPMI request to the BMC, opening the session if needed.
+
+        :return: A `Deferred` that fires with the response data.
+        """
+        return self.lock.run(self._request, netfn, command, data)
+
+    def close(self):
+        """Close the session with the BMC, if it is open."""
+        return self.lock.run(self._close)
+
+    def getPowerState(self):
+        """Return a `Deferred` that fires with "on" or "off"."""
+        d = self.request(NETFN.CHASSIS, COMMAND.GET_CHASSIS_STATUS)
+        d.addCallback(lambda data: "on" if data[0] & 0x01 else "off")
+        return d
+
+    def chassisControl(self, action):
+        """Perform `action`, one of `CHASSIS_CONTROL`."""
+        return self.request(
+            NETFN.CHASSIS, COMMAND.CHASSIS_CONTROL, bytes((action,)))
+
+    def setBootDevicePXE(self):
+        """Set the next boot, and only the next boot, to be from PXE."""
+        # Boot flags parameter: valid for the next boot only, force PXE.
+        return self.request(
+            NETFN.CHASSIS, COMMAND.SET_SYSTEM_BOOT_OPTIONS,
+            bytes((0x05, 0x80, 0x04, 0x00, 0x00, 0x00)))
+
+    @inlineCallbacks
+    def _request(self, netfn, command, data):
+        self._cancelIdle()
+        try:
+            reused = self.active
+            if not reused:
+                yield self._open()
+            try:
+                response = yield self._command(netfn, command, data)
+            except IPMITimeout:
+                if not reused:
+                    raise
+                # The BMC has probably dropped the session; open another.
+                self._reset()
+                yield self._open()
+                response = yield self._command(netfn, command, data)
+        finally:
+            if self.active:
+                self._idle = self.client.clock.callLater(
+                    self.client.idle_timeout, self._closeIdle)
+        returnValue(response)
+
+    @inlineCallbacks
+    def _close(self):
+        self._cancelIdle()
+        if self.active:
+            try:
+                yield self._command(
+                    NETFN.APP, COMMAND.CLOSE_SESSION,
+                    struct.pack("<I", self.managed_id))
+            except IPMIError:
+                pass  # The BMC will time the session out instead.
+            finally:
+                self._reset()
+
+    def _closeIdle(self):
+        self._cancelIdle()
+        # Later requests to this BMC get a new session; this one keeps
+        # receiving packets until it has been closed.
+        self.client._forget(self)
+        d = self.close()
+        d.addErrback(
+            log.err, "Failed to close IPMI session with %s." % self.host)
+        d.addCallback(lambda _: self.client._discard(self))
+        return d
+
+    def _cancelIdle(self):
+        if self._idle is not None:
+            if self._idle.active():
+                self._idle.cancel()
+            self._idle = None
+
+    @inlineCallbacks
+    def _open(self):
+        if self.address is None:
+            host = yield self.client.resolve(self.host)
+            self.address = host, self.port
+
+        role = PRIVILEGE.ADMINISTRATOR | NAME_ONLY_LOOKUP
+        names = bytes((role, len(self.user))) + self.user
+        rm = os.urandom(16)
+
+        response = yield self._exchange(
+            lambda: make_packet(
+                PAYLOAD_TYPE.OPEN_SESSION_REQUEST, 0, 0, struct.pack(
+                    "<BBHI", 0, PRIVILEGE.ADMINISTRATOR, 0,
+                    self.console_id) + CIPHER_SUITE_3),
+            PAYLOAD_TYPE.OPEN_SESSION_RESPONSE)
+        check_status(response[1])
+        managed_id, = struct.unpack_from("<I", response, 8)
+
+        response = yield self._exchange(
+            lambda: make_packet(
+                PAYLOAD_TYPE.RAKP_1, 0, 0, struct.pack(
+                    "<B3xI", 0, managed_id) + rm + struct.pack(
+                        "<B2xB", role, len(self.user)) + self.user),
+            PAYLOAD_TYPE.RAKP_2)
+        check_status(response[1])
+        rc, guid, auth = response[8:24], response[24:40], response[40:60]
+        expected = hmac_sha1(
+            self.password, struct.pack("<II", self.console_id, managed_id),
+            rm, rc, guid, names)
+        if not hmac.compare_digest(expected, auth):
+            raise IPMIAuthError("password invalid")
+        sik = hmac_sha1(
+            self.password if self.k_g is None else self.k_g, rm, rc, names)
+
+        response = yield self._exchange(
+            lambda: make_packet(
+                PAYLOAD_TYPE.RAKP_3, 0, 0, struct.pack(
+                    "<BB2xI", 0, 0, managed_id) + hmac_sha1(
+                        self.password, rc, struct.pack(
+                            "<I", self.console_id), names)),
+            PAYLOAD_TYPE.RAKP_4)
+        check_status(response[1])
+        expected = hmac_sha1(sik, rm, struct.pack("<I", managed_id), guid)
+        if not hmac.compare_digest(
+                expected[:INTEGRITY_LENGTH], response[8:20]):
+            raise IPMIError("BMC failed its integrity check.")
+
+        self.managed_id = managed_id
+        self.k1 = hmac_sha1(sik, b"\x01" * 20)
+        self.k2 = hmac_sha1(sik, b"\x02" * 20)
+        try:
+            # Sessions start at user privilege.
+            yield self._command(
+                NETFN.APP, COMMAND.SET_SESSION_PRIVILEGE_LEVEL,
+                bytes((PRIVILEGE.ADMINISTRATOR,)))
+        except IPMIError:
+            self._reset()
+            raise
+
+    @inlineCallbacks
+    def _command(self, netfn, command, data=b""):
+        self.rq_seq = rq_seq = (self.rq_seq + 1) % 64
+        message = make_ipmi_request(netfn, command, rq_seq, data)
+
+        def make():
+            # Retransmissions have new session sequence numbers so that the
+            # BMC does not reject them as replays.
+            self.sequence = (self.sequence + 1) & 0xFFFFFFFF or 1
+            return make_packet(
+                PAYLOAD_TYPE.IPMI, self.managed_id, self.sequence, message,
+                self.k1, self.k2)
+
+        def accept(payload):
+            return (
+                len(payload) >= 8 and payload[4] >> 2 == rq_seq and
+                payload[5] == command)
+
+        response = yield self._exchange(make, PAYLOAD_TYPE.IPMI, accept)
+        completion_code = response[6]
+        if completion_code == COMPLETION_INSUFFICIENT_PRIVILEGE:
+            raise IPMIAuthError("privilege level insufficient")
+        elif completion_code != 0x00:
+            raise IPMIError(
+                "Command 0x%02x failed with completion code 0x%02x." % (
+                    command, completion_code))
+        else:
+            returnValue(response[7:-1])
+
+    @inlineCallbacks
+    def _exchange(self, make, payload_type, accept=None):
+        """Send a packet and wait for the reply.
+
+        A new packet is made with `make` and sent each time the BMC does not
+        reply within the client's timeout, up to the client's retries.
+
+        :return: The payload of the first reply of `payload_type` that is
+            accepted by `accept`.
+        """
+        for _ in range(self.client.retries + 1):
+            d = Deferred()
+            self._waiting = payload_type, accept, d
+            timeout = self.client.clock.callLater(
+                self.client.timeout, d.cancel)
+            try:
+                self.client.send(make(), self.address)
+                payload = yield d
+            except CancelledError:
+                continue  # Timed out; send again.
+            except OSError as error:
+                raise IPMIError(
+                    "Could not send to %s: %s" % (self.host, error))
+            finally:
+                self._waiting = None
+                if timeout.active():
+                    timeout.cancel()
+            returnValue(payload)
+        raise IPMITimeout("No response from %s." % self.host)
+
+    def packetReceived(self, packet):
+        """Called by the client when a packet arrives for this session."""
+        if self._waiting is None:
+            return  # A late retransmission, probably.
+        payload_type, accept, d = self._waiting
+        try:
+            received_type, _, payload = parse_packet(
+                packet, self.k1, self.k2)
+        except IPMIError:
+            return  # Not one of ours; the retransmission timer will fire.
+        if received_type == payload_type:
+            if accept is None or accept(payload):
+                self._waiting = None
+                d.callback(payload)
+
+
+class IPMIProtocol(DatagramProtocol):
+    """Pass datagrams to an `IPMIClient`."""
+
+    def __init__(self, client):
+        super(IPMIProtocol, self).__init__()
+        self.client = client
+
+    def datagramReceived(self, datagram, address):
+        self.client.datagramReceived(datagram)
+
+
+class IPMIClient:
+    """Talk to many BMCs over IPMI 2.0 (RMCP+), reusing sessions.
+
+    UDP ports are opened as needed, one for each IP version. Sessions that
+    are idle for `idle_timeout` seconds are closed, to free them up on the
+    BMC; BMCs can have as few as 4 sessions.
+
+    :ivar timeout: Seconds to wait for a reply before retransmitting.
+    :ivar retries: How many times to retransmit before giving up.
+    """
+
+    def __init__(self, clock=reactor, timeout=1.0, retries=4, idle_timeout=20):
+        super(IPMIClient, self).__init__()
+        self.clock = clock
+        self.timeout = timeout
+        self.retries = retries
+        self.idle_timeout = idle_timeout
+        self._ports = {}
+        self._sessions = {}
+        self._sessions_by_id = {}
+
+    def getSession(self, host, user, password, port=IPMI_PORT, k_g=None):
+        """Return the `IPMISession` for the given BMC and credentials.
+
+        This does not contact the BMC; that happens on the first request.
+        """
+        key = host, port, user, password, k_g
+        session = self._sessions.get(key)
+        if session is None:
+            session = IPMISession(self, host, port, user, password, k_g)
+            session.console_id = self._allocateSessionID(session)
+            self._sessions[key] = session
+        return session
+
+    def _allocateSessionID(self, session):
+        while True:
+            console_id = random.randint(1, 0xFFFFFFFF)
+            if console_id not in self._sessions_by_id:
+                self._sessions_by_id[console_id] = session
+                return console_id
+
+    def _forget(self, session):
+        """Stop handing out `session` from `getSession`."""
+        for key, value in list(self._sessions.items()):
+            if value is session:
+                del self._sessions[key]
+
+    def _discard(self, session):
+        """Stop passing packets to `session`, unless it is in use again."""
+        if not session.active:
+            self._sessions_by_id.pop(session.console_id, None)
+
+    def resolve(self, host):
+        """Return a `Deferred` that fires with the IP address for `host`."""
+        host = host.strip("[]")
+        try:
+            ip_address(host)
+        except ValueError:
+            return self.clock.resolve(host)
+        else:
+            return succeed(host)
+
+    def send(self, packet, address):
+        version = ip_address(address[0]).version
+        port = self._ports.get(version)
+        if port is None:
+            port = self._ports[version] = self.clock.listenUDP(
+                0, IPMIProtocol(self), interface=(
+                    "::" if version == 6 else ""))
+        port.write(packet, address)
+
+    def datagramReceived(self, datagram):
+        if len(datagram) < 16:
+            return
+        session_id, = struct.unpack_from("<I", datagram, 6)
+        if session_id == 0 and len(datagram) >= 24:
+            # Replies before the session is established carry our session
+            # ID in the payload instead.
+            session_id, = struct.unpack_from("<I", datagram, 20)
+        session = self._sessions_by_id.get(session_id)
+        if session is not None:
+            session.packetReceived(datagram)
+
+    def stop(self):
+        """Stop listening, abandoning any sessions.
+
+        :return: A `Deferred` that fires once the ports are closed.
+        """
+        for session in self._sessions_by_id.values():
+            session._cancelIdle()
+        self._sessions.clear()
+        self._sessions_by_id.clear()
+        ports, self._ports = self._ports, {}
+        return DeferredList(
+            [maybeDeferred(port.stopListening) for port in ports.values()])
+
+
+# The client for this process.
+ipmi_client = IPMIClient()
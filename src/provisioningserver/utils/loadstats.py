@@ -0,0 +1,397 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Statistics about how loaded the reactor and thread-pools are.
+
+Everything in a region or rack process shares one reactor and a few
+thread-pools, so when it is slow to respond it is either because the reactor
+was blocked or because a thread-pool was saturated. This records:
+
+- reactor lag: how late the reactor runs a call scheduled at a fixed
+  interval, sampled by `LoadMonitorService`, and the stack of the reactor
+  thread whenever it is blocked for longer than a threshold;
+
+- for each thread-pool, how many tasks are queued and running, how long
+  they waited to start, and how long each callable takes to run; tasks
+  passed to `deferToThreadPool` are counted, not those passed directly to
+  `callInThread`;
+
+- gauges registered by other services, like the backlog of database tasks.
+"""
+
+__all__ = [
+    "load_statistics",
+    "LoadMonitorService",
+    "LoadStatistics",
+]
+
+from collections import (
+    defaultdict,
+    deque,
+)
+from sys import _current_frames as current_frames
+import threading
+import time
+import traceback
+
+from provisioningserver.logger import LegacyLogger
+from twisted.application.service import Service
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+
+
+log = LegacyLogger()
+
+
+def get_callable_name(func):
+    """Return the qualified name of `func`, for reporting."""
+    name = getattr(func, "__qualname__", None)
+    if name is None:
+        # An instance with a __call__ method, or a partial.
+        name = type(func).__qualname__
+    return "%s.%s" % (getattr(func, "__module__", None), name)
+
+
+class LoadStatistics:
+    """Thread-safe load statistics for this process."""
+
+    # The number of callables reported as the slowest.
+    slowest = 10
+
+    # The number of stacks to keep from when the reactor was blocked.
+    stacks = 5
+
+    def __init__(self):
+        super(LoadStatistics, self).__init__()
+        self._lock = threading.Lock()
+        self._gauges = {}
+        self.reset()
+
+    def reset(self):
+        """Discard all statistics gathered so far.
+
+        Registered gauges are kept.
+        """
+        with self._lock:
+            self._lag_samples = 0
+            self._lag_seconds = 0.0
+            self._lag_last = 0.0
+            self._lag_max = 0.0
+            self._stalls = 0
+            self._stall_stacks = deque(maxlen=self.stacks)
+            self._pools = defaultdict(lambda: {
+                "max_threads": None,
+                "queued": 0,
+                "running": 0,
+                "tasks": 0,
+                "wait_seconds": 0.0,
+                "max_wait_seconds": 0.0,
+            })
+            self._callables = defaultdict(lambda: {
+                "calls": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+            })
+
+    def record_lag(self, lag):
+        """Record that the reactor ran a scheduled call `lag` seconds late."""
+        with self._lock:
+            self._lag_samples += 1
+            self._lag_seconds += lag
+            self._lag_last = lag
+            self._lag_max = max(self._lag_max, lag)
+
+    def record_stall(self, blocked, stack):
+        """Record that the reactor has been blocked for `blocked` seconds.
+
+        :param stack: The formatted stack of the reactor thread.
+        """
+        with self._lock:
+            self._stalls += 1
+            self._stall_stacks.append({
+                "time": time.time(),
+                "blocked_seconds": blocked,
+                "stack": stack,
+            })
+
+    def instrument(self, threadpool, func):
+        """Wrap `func` to record its time waiting for, and in, `threadpool`.
+
+        Call this as the task is submitted to the pool; it is counted as
+        queued from then until the wrapper is called.
+        """
+        pool_name = getattr(threadpool, "name", None) or "unnamed"
+        name = get_callable_name(func)
+        submitted = time.monotonic()
+        with self._lock:
+            pool = self._pools[pool_name]
+            pool["max_threads"] = getattr(threadpool, "max", None)
+            pool["queued"] += 1
+
+        def instrumented(*args, **kwargs):
+            started = time.monotonic()
+            wait = started - submitted
+            with self._lock:
+                pool["queued"] -= 1
+                pool["running"] += 1
+                pool["tasks"] += 1
+                pool["wait_seconds"] += wait
+                pool["max_wait_seconds"] = max(pool["max_wait_seconds"], wait)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.monotonic() - started
+                with self._lock:
+                    pool["running"] -= 1
+                    stats = self._callables[pool_name, name]
+                    stats["calls"] += 1
+                    stats["seconds"] += duration
+                    stats["max_seconds"] = max(stats["max_seconds"], duration)
+
+        return instrumented
+
+    def register_gauge(self, name, gauge):
+        """Report the value returned by `gauge` under `name`.
+
+        :param gauge: A no-argument callable returning a number. It is called
+            whenever statistics are requested, from any thread.
+        """
+        with self._lock:
+            self._gauges[name] = gauge
+
+    def unregister_gauge(self, name):
+        """Stop reporting the gauge registered under `name`."""
+        with self._lock:
+            self._gauges.pop(name, None)
+
+    def get_statistics(self):
+        """Return the statistics gathered so far.
+
+        :return: A dict with the reactor lag, thread-pool statistics keyed
+            by pool name, the callables that have taken the most time in
+            thread-pools, and the values of registered gauges.
+        """
+        with self._lock:
+            callables = sorted(
+                self._callables.items(),
+                key=lambda item: item[1]["seconds"], reverse=True)
+            gauges = list(self._gauges.items())
+            statistics = {
+                "reactor": {
+                    "lag_samples": self._lag_samples,
+                    "lag_seconds": self._lag_seconds,
+                    "last_lag_seconds": self._lag_last,
+                    "max_lag_seconds": self._lag_max,
+                    "stalls": self._stalls,
+                    "recent_stalls": list(self._stall_stacks),
+                },
+                "thread_pools": {
+                    name: dict(pool) for name, pool in self._pools.items()
+                },
+                "slowest": [
+                    dict(stats, pool=pool_name, name=name)
+                    for (pool_name, name), stats in callables[:self.slowest]
+                ],
+            }
+        # Call gauges without holding the lock.
+        statistics["gauges"] = {name: gauge() for name, gauge in gauges}
+        return statistics
+
+    def render_prometheus(self):
+        """Render the statistics in the Prometheus text exposition format."""
+        statistics = self.get_statistics()
+        reactor_stats = statistics["reactor"]
+        pools = statistics["thread_pools"]
+        lines = []
+
+        def render(metric, kind, doc, samples):
+            lines.append("# HELP maas_%s %s" % (metric, doc))
+            lines.append("# TYPE maas_%s %s" % (metric, kind))
+            for labels, sample in samples:
+                if len(labels) == 0:
+                    lines.append("maas_%s %s" % (metric, sample))
+                else:
+                    lines.append("maas_%s{%s} %s" % (
+                        metric, ",".join(
+                            '%s="%s"' % (label, escape_label(value))
+                            for label, value in labels), sample))
+
+        render(
+            "reactor_lag_samples_total", "counter",
+            "Times reactor lag has been sampled.",
+            [((), reactor_stats["lag_samples"])])
+        render(
+            "reactor_lag_seconds_total", "counter",
+            "Seconds that sampled calls ran late, in total.",
+            [((), "%f" % reactor_stats["lag_seconds"])])
+        render(
+            "reactor_lag_max_seconds", "gauge",
+            "Seconds that a sampled call ran late, at most.",
+            [((), "%f" % reactor_stats["max_lag_seconds"])])
+        render(
+            "reactor_stalls_total", "counter",
+            "Times the reactor was blocked for longer than the threshold.",
+            [((), reactor_stats["stalls"])])
+        names = sorted(pools)
+        for metric, kind, doc in (
+                ("max_threads", "gauge", "Threads allowed."),
+                ("queued", "gauge", "Tasks waiting for a thread."),
+                ("running", "gauge", "Tasks running."),
+                ("tasks", "counter", "Tasks started."),
+                ("wait_seconds", "counter", "Seconds tasks waited to start."),
+                ("max_wait_seconds", "gauge",
+                 "Seconds a task waited to start, at most.")):
+            render(
+                "threadpool_%s%s" % (
+                    metric, "_total" if kind == "counter" else ""),
+                kind, doc, (
+                    ((("pool", name),), pools[name][metric])
+                    for name in names
+                    if pools[name][metric] is not None))
+        slowest = statistics["slowest"]
+        for metric, kind, doc in (
+                ("calls", "counter", "Calls of the slowest callables."),
+                ("seconds", "counter",
+                 "Seconds spent in the slowest callables."),
+                ("max_seconds", "gauge",
+                 "Seconds spent in one call of the slowest callables.")):
+            render(
+                "threadpool_callable_%s%s" % (
+                    metric, "_total" if kind == "counter" else ""),
+                kind, doc, (
+                    ((("pool", stats["pool"]), ("name", stats["name"])),
+                     stats[metric])
+                    for stats in slowest))
+        for name, value in sorted(statistics["gauges"].items()):
+            render(name, "gauge", "Registered gauge.", [((), value)])
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text exposition format."""
+    return str(value).replace(
+        "\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class LoadMonitorService(Service):
+    """Sample reactor lag, and report when this process is overloaded.
+
+    Every `interval` seconds this records how late the reactor ran it. A
+    watchdog thread captures and logs the stack of the reactor thread when
+    the reactor has been blocked for longer than `threshold` seconds.
+
+    Every `report_interval` seconds a summary of reactor lag and thread-pool
+    waits is logged, if either exceeded `threshold` seconds in that period.
+    """
+
+    clock = reactor
+
+    def __init__(
+            self, interval=1.0, threshold=0.5, report_interval=(5 * 60),
+            statistics=None):
+        super(LoadMonitorService, self).__init__()
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+        self.statistics = (
+            load_statistics if statistics is None else statistics)
+
+    def startService(self):
+        super(LoadMonitorService, self).startService()
+        # Services are started in the reactor thread.
+        self._reactorThread = threading.get_ident()
+        self._heartbeat = self._last = self.clock.seconds()
+        self._stalled = False
+        self._resetWindow()
+        self._sampler = LoopingCall(self._sample)
+        self._sampler.clock = self.clock
+        self._sampler.start(self.interval, now=False)
+        self._reporter = LoopingCall(self._report)
+        self._reporter.clock = self.clock
+        self._reporter.start(self.report_interval, now=False)
+        self._stopping = threading.Event()
+        self._startWatchdog()
+
+    def stopService(self):
+        self._stopping.set()
+        for loop in self._sampler, self._reporter:
+            if loop.running:
+                loop.stop()
+        return super(LoadMonitorService, self).stopService()
+
+    def _startWatchdog(self):
+        watchdog = threading.Thread(
+            target=self._watch, name="reactor-watchdog", daemon=True)
+        watchdog.start()
+
+    def _watch(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self._checkStall(self.clock.seconds())
+            except Exception:
+                log.err(None, "Failure checking for a blocked reactor.")
+
+    def _checkStall(self, now):
+        """Capture the reactor's stack if it has been blocked for too long.
+
+        This is called from the watchdog thread; a stall is reported once.
+        """
+        blocked = now - self._heartbeat - self.interval
+        if blocked >= self.threshold and not self._stalled:
+            self._stalled = True
+            frame = current_frames().get(self._reactorThread)
+            stack = "" if frame is None else "".join(
+                traceback.format_stack(frame))
+            self.statistics.record_stall(blocked, stack)
+            log.msg(
+                "Reactor has been blocked for %.3f seconds:\n%s" % (
+                    blocked, stack))
+
+    def _sample(self):
+        now = self.clock.seconds()
+        lag = max(0.0, now - self._last - self.interval)
+        self._last = self._heartbeat = now
+        self._stalled = False
+        self.statistics.record_lag(lag)
+        self._window_samples += 1
+        self._window_lag += lag
+        self._window_max = max(self._window_max, lag)
+
+    def _resetWindow(self):
+        self._window_samples = 0
+        self._window_lag = 0.0
+        self._window_max = 0.0
+        self._window_pools = self.statistics.get_statistics()["thread_pools"]
+
+    def _report(self):
+        statistics = self.statistics.get_statistics()
+        pools = []
+        overloaded = self._window_max >= self.threshold
+        for name, pool in sorted(statistics["thread_pools"].items()):
+            before = self._window_pools.get(name, {})
+            tasks = pool["tasks"] - before.get("tasks", 0)
+            wait = pool["wait_seconds"] - before.get("wait_seconds", 0.0)
+            mean_wait = 0.0 if tasks == 0 else wait / tasks
+            overloaded = overloaded or mean_wait >= self.threshold
+            pools.append(
+                "%s pool %d/%s running, %d queued, %d tasks waited "
+                "%.3fs on average" % (
+                    name, pool["running"], pool["max_threads"],
+                    pool["queued"], tasks, mean_wait))
+        if overloaded:
+            details = [
+                "reactor lag %.3fs at most, %.3fs on average" % (
+                    self._window_max,
+                    self._window_lag / max(1, self._window_samples)),
+            ]
+            details.extend(pools)
+            details.extend(
+                "%s %s" % (name, value)
+                for name, value in sorted(statistics["gauges"].items()))
+            log.msg("Load over the last %d seconds: %s." % (
+                self.report_interval, "; ".join(details)))
+        self._resetWindow()
+
+
+# The statistics for this process.
+load_statistics = LoadStatistics()
@@ -21,6 +21,7 @@ __all__ = [
 
 import codecs
 from collections import namedtuple
+from functools import lru_cache
 from operator import attrgetter
 import re
 import socket
@@ -47,14 +48,12 @@ from netaddr import (
     IPNetwork,
     IPRange,
 )
-from netaddr.core import (
-    AddrFormatError,
-    NotRegisteredError,
-)
+from netaddr.core import AddrFormatError
 import netifaces
 from provisioningserver.utils.dhclient import get_dhclient_info
 from provisioningserver.utils.ipaddr import get_ip_addr
 from provisioningserver.utils.iproute import get_ip_route
+from provisioningserver.utils.oui import get_oui_index
 from provisioningserver.utils.ps import running_in_container
 from provisioningserver.utils.shell import (
     call_and_check,
@@ -935,27 +934,24 @@ def format_eui(eui):
     return str(eui).replace('-', ':').lower()
 
 
+@lru_cache(4096)
+def get_oui_organization(prefix):
+    """Returns the registered organization for the specified OUI, if it is
+    known. Otherwise, returns None.
+
+    :param prefix: The 24-bit OUI, as an integer.
+    """
+    return get_oui_index().lookup(prefix)
+
+
 def get_eui_organization(eui):
     """Returns the registered organization for the specified EUI, if it can be
     determined. Otherwise, returns None.
 
     :param eui:A `netaddr.EUI` object.
     """
-    try:
-        registration = eui.oui.registration()
-        # Note that `registration` is not a dictionary, so we can't use .get().
-        return registration['org']
-    except UnicodeError:
-        # See bug #1628761. Due to corrupt data in the OUI database, and/or
-        # the fact that netaddr assumes all the data is ASCII, sometimes
-        # netaddr will raise an exception during this process.
-        return None
-    except IndexError:
-        # See bug #1748031; this is another way netaddr can fail.
-        return None
-    except NotRegisteredError:
-        # This could happen for locally-administered MACs.
-        return None
+    # The OUI is the most significant 24 bits of both EUI-48 and EUI-64.
+    return get_oui_organization(int(eui) >> (eui.version - 24))
 
 
 def get_mac_organization(mac):
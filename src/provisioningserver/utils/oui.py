@@ -0,0 +1,118 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Compact index of IEEE OUI (MA-L) registrations.
+
+`netaddr` resolves an OUI by seeking into its registry file and parsing the
+matching record every time `OUI.registration()` is called. That is fine for
+the occasional lookup, but MAAS asks for the organization of every MAC
+address it lists in the network discovery UI and API.
+
+`OUIIndex` parses the same registry once per process into a sorted array of
+24-bit prefixes, and a parallel tuple of organization names, and looks up
+prefixes with a binary search.
+"""
+
+__all__ = [
+    "get_oui_index",
+    "OUIIndex",
+]
+
+from array import array
+from bisect import bisect_left
+import threading
+
+from netaddr.eui import ieee
+
+
+def get_oui_registry_path():
+    """Return the path to the OUI registry shipped with `netaddr`."""
+    return ieee.OUI_REGISTRY_PATH
+
+
+def parse_oui_registry(lines):
+    """Parse the IEEE OUI registry.
+
+    Only the ``(hex)`` line of each record is used, e.g.::
+
+        00-00-00   (hex)		XEROX CORPORATION
+
+    :param lines: An iterable of lines from the registry, as bytes.
+    :return: An iterable of ``(prefix, organization)`` tuples, where
+        `prefix` is the OUI as an integer.
+    """
+    for line in lines:
+        if b"(hex)" not in line:
+            continue
+        fields = line.split(None, 2)
+        if len(fields) != 3:
+            continue
+        try:
+            prefix = int(fields[0].replace(b"-", b""), 16)
+        except ValueError:
+            continue
+        # The registry is not always clean UTF-8; see bug #1628761.
+        organization = fields[2].decode("utf-8", "replace").strip()
+        if prefix <= 0xFFFFFF and len(organization) != 0:
+            yield prefix, organization
+
+
+class OUIIndex:
+    """A sorted, compact index of OUI registrations."""
+
+    def __init__(self, registrations):
+        """Build the index.
+
+        :param registrations: An iterable of ``(prefix, organization)``
+            tuples. Where a prefix appears more than once the first
+            registration is kept, as `netaddr` does.
+        """
+        organizations = {}
+        for prefix, organization in registrations:
+            organizations.setdefault(prefix, organization)
+        prefixes = sorted(organizations)
+        # 'I' is at least 16 bits; 'L' is guaranteed to hold 24.
+        self.prefixes = array("L", prefixes)
+        self.organizations = tuple(
+            organizations[prefix] for prefix in prefixes)
+
+    @classmethod
+    def fromFile(cls, path):
+        """Build an index from the OUI registry at `path`."""
+        with open(path, "rb") as fd:
+            return cls(parse_oui_registry(fd))
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def lookup(self, prefix):
+        """Return the organization registered for `prefix`, or `None`.
+
+        :param prefix: The 24-bit OUI, as an integer.
+        """
+        index = bisect_left(self.prefixes, prefix)
+        if index < len(self.prefixes) and self.prefixes[index] == prefix:
+            return self.organizations[index]
+        else:
+            return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_oui_index():
+    """Return this process's `OUIIndex`, building it on first use.
+
+    If the registry cannot be read an empty index is returned, so that
+    lookups degrade to "unknown" rather than failing.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    _index = OUIIndex.fromFile(get_oui_registry_path())
+                except OSError:
+                    _index = OUIIndex([])
+    return _index
@@ -8,11 +8,17 @@ __all__ = [
     "run"
 ]
 
-from collections import namedtuple
+from collections import (
+    namedtuple,
+    OrderedDict,
+)
 import json
 from multiprocessing import cpu_count
 from multiprocessing.pool import ThreadPool
 import os
+import select
+import socket
+import struct
 import subprocess
 import sys
 from textwrap import dedent
@@ -37,6 +43,20 @@ PingParameters = namedtuple('PingParameters', ('interface', 'ip'))
 NmapParameters = namedtuple('NmapParameters', ('interface', 'cidr', 'slow'))
 
 
+# ICMP message types.
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+# Bind a socket to an interface; not exported by `socket` on older Pythons.
+SO_BINDTODEVICE = getattr(socket, "SO_BINDTODEVICE", 25)
+
+# This reads: http://maas.io/ (the same payload that `ping` is asked to send).
+PING_PAYLOAD = b"http://maas.io/ " * 3
+
+# The default number of echo requests sent per second when sweeping.
+DEFAULT_PING_RATE = 1000
+
+
 def add_arguments(parser):
     """Add this command's options to the `ArgumentParser`.
 
@@ -70,6 +90,12 @@ def add_arguments(parser):
     parser.add_argument(
         '-p', '--ping', action='store_true', required=False,
         help='Scan using ping. (Default is to scan with nmap, if installed.)')
+    parser.add_argument(
+        '-r', '--rate', required=False, type=int, default=DEFAULT_PING_RATE,
+        help='Number of ICMP echo requests to send per second during a ping '
+             'scan. Default is %d. Only applies when running as root; '
+             'otherwise a `ping` process is spawned for each host.' % (
+                 DEFAULT_PING_RATE))
     parser.add_argument(
         'interface', type=str, nargs='?',
         help="Ethernet interface to ping from. Optional if all interfaces are "
@@ -331,6 +357,182 @@ def ping_scan(to_scan: dict, threads=None, threads_per_cpu=4):
             yield from pool.imap(run_ping, jobs)
 
 
+def internet_checksum(data: bytes) -> int:
+    """Return the RFC 1071 checksum of `data`."""
+    if len(data) % 2 != 0:
+        data += b"\x00"
+    total = sum(struct.unpack("!%dH" % (len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def make_icmp_echo_request(identifier, sequence, payload=PING_PAYLOAD):
+    """Return an ICMP echo request message."""
+    header = struct.pack(
+        "!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    checksum = internet_checksum(header + payload)
+    return struct.pack(
+        "!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, identifier,
+        sequence) + payload
+
+
+def parse_icmp_echo_reply(packet):
+    """Parse an IPv4 packet, as read from a raw ICMP socket.
+
+    :return: ``(identifier, sequence)`` if `packet` is an ICMP echo reply,
+        otherwise `None`.
+    """
+    if len(packet) < 20:
+        return None
+    header_length = (packet[0] & 0x0F) * 4
+    message = packet[header_length:header_length + 8]
+    if len(message) < 8 or message[0] != ICMP_ECHO_REPLY:
+        return None
+    return struct.unpack("!HH", message[4:8])
+
+
+class ICMPSweeper:
+    """Ping many IPv4 addresses at once from a single raw socket.
+
+    Echo requests are paced at `rate` per second. Replies are matched to
+    requests by identifier and sequence number, and by source address, as
+    they arrive. Each address that has not yet replied is sent up to
+    `attempts` requests, at least `interval` seconds apart, and then
+    replies are awaited for `timeout` seconds, once, for all addresses.
+
+    Creating a raw socket needs root or CAP_NET_RAW.
+    """
+
+    def __init__(
+            self, interface, rate=DEFAULT_PING_RATE, attempts=3,
+            interval=0.2, timeout=1.0, clock=time.monotonic):
+        super(ICMPSweeper, self).__init__()
+        self.interface = interface
+        self.rate = rate
+        self.attempts = attempts
+        self.interval = interval
+        self.timeout = timeout
+        self.clock = clock
+        self.identifier = os.getpid() & 0xFFFF
+        self.sock = socket.socket(
+            socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        try:
+            # Like `ping -I <interface> -r`: send directly on the interface,
+            # bypassing the routing table.
+            self.sock.setsockopt(
+                socket.SOL_SOCKET, SO_BINDTODEVICE,
+                interface.encode("utf-8"))
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_DONTROUTE, 1)
+            # Make room for a burst of replies from a large network.
+            self.sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+            self.sock.setblocking(False)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def close(self):
+        self.sock.close()
+
+    def sweep(self, ips):
+        """Ping each of `ips`.
+
+        :return: A list of booleans, one for each of `ips`, saying if it
+            replied.
+        """
+        ips = list(ips)
+        indexes = {ip: index for index, ip in enumerate(ips)}
+        replied = [False] * len(ips)
+        pause = 1.0 / self.rate if self.rate else 0.0
+        for _ in range(self.attempts):
+            round_started = self.clock()
+            next_send = round_started
+            for index, ip in enumerate(ips):
+                if replied[index]:
+                    continue
+                self._receive(indexes, replied, next_send)
+                self._send(index, ip)
+                next_send += pause
+            if all(replied):
+                break
+            self._receive(indexes, replied, round_started + self.interval)
+        self._receive(indexes, replied, self.clock() + self.timeout)
+        return replied
+
+    def _send(self, index, ip):
+        packet = make_icmp_echo_request(self.identifier, index & 0xFFFF)
+        try:
+            self.sock.sendto(packet, (ip, 0))
+        except OSError:
+            pass  # e.g. ENOBUFS; a later attempt may get through.
+
+    def _receive(self, indexes, replied, until):
+        """Read replies until the clock reaches `until`, or all replied."""
+        while not all(replied):
+            remaining = until - self.clock()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self.sock], [], [], remaining)
+            if len(readable) == 0:
+                break
+            while True:
+                try:
+                    packet, (source, _) = self.sock.recvfrom(65535)
+                except (BlockingIOError, InterruptedError):
+                    break
+                reply = parse_icmp_echo_reply(packet)
+                if reply is None:
+                    continue
+                identifier, sequence = reply
+                index = indexes.get(source)
+                if (identifier == self.identifier and index is not None and
+                        index & 0xFFFF == sequence):
+                    replied[index] = True
+
+
+def sweep_scan(to_scan: dict, rate=DEFAULT_PING_RATE):
+    """Scans the specified networks using an `ICMPSweeper` per interface.
+
+    The `to_scan` dictionary must be in the format:
+
+        {<interface_name>: <iterable-of-cidr-strings>, ...}
+
+    Events are the same as those from `run_ping`, and in the same order.
+
+    :raise OSError: If a raw socket cannot be created; this is raised
+        before anything is sent.
+    """
+    ips_by_interface = OrderedDict()
+    for job in yield_ping_parameters(to_scan):
+        ips_by_interface.setdefault(job.interface, []).append(job.ip)
+    sweepers = []
+    try:
+        for interface in ips_by_interface:
+            sweepers.append(ICMPSweeper(interface, rate=rate))
+    except OSError:
+        for sweeper in sweepers:
+            sweeper.close()
+        raise
+    return _yield_sweep_events(sweepers, ips_by_interface)
+
+
+def _yield_sweep_events(sweepers, ips_by_interface):
+    try:
+        for sweeper in sweepers:
+            ips = ips_by_interface[sweeper.interface]
+            for ip, result in zip(ips, sweeper.sweep(ips)):
+                yield {
+                    "scan_type": "ping",
+                    "interface": sweeper.interface,
+                    "ip": ip,
+                    "result": result
+                }
+    finally:
+        for sweeper in sweepers:
+            sweeper.close()
+
+
 def write_event(event, output=sys.stdout):
     """Writes an event dictionary to the specified stream in JSON format.
 
@@ -417,9 +619,14 @@ def scan_networks(args, to_scan, stderr, stdout):
         # For a ping scan, we can easily get a count of the number of hosts,
         # and whether or not the ping was successful. It will be printed to
         # stderr for informational purposes.
+        try:
+            scanner = sweep_scan(to_scan, rate=args.rate)
+        except OSError:
+            # Raw sockets need root; spawn a `ping` for each host instead.
+            scanner = ping_scan(to_scan, threads=args.threads)
         count = 0
         hosts = 0
-        for event in ping_scan(to_scan, threads=args.threads):
+        for event in scanner:
             count += 1
             if event['result'] is True:
                 hosts += 1
@@ -28,6 +28,10 @@ from provisioningserver.logger import (
     get_maas_logger,
     LegacyLogger,
 )
+from provisioningserver.utils.arp import (
+    get_arp_bindings_from_frame,
+    update_bindings_and_get_event,
+)
 from provisioningserver.utils.beaconing import (
     age_out_uuid_queue,
     BEACON_IPV4_MULTICAST,
@@ -39,6 +43,12 @@ from provisioningserver.utils.beaconing import (
     ReceivedBeacon,
     TopologyHint,
 )
+from provisioningserver.utils.capture import (
+    is_packet_capture_available,
+    open_packet_socket,
+    PacketSocketReader,
+    read_pcap_frames,
+)
 from provisioningserver.utils.fs import (
     get_maas_common_command,
     NamedLock,
@@ -55,7 +65,10 @@ from provisioningserver.utils.twisted import (
     terminateProcess,
 )
 from twisted.application.internet import TimerService
-from twisted.application.service import MultiService
+from twisted.application.service import (
+    MultiService,
+    Service,
+)
 from twisted.internet import reactor
 from twisted.internet.defer import (
     Deferred,
@@ -66,12 +79,16 @@ from twisted.internet.error import (
     ProcessDone,
     ProcessTerminated,
 )
-from twisted.internet.interfaces import IReactorMulticast
+from twisted.internet.interfaces import (
+    IReactorMulticast,
+    IReadDescriptor,
+)
 from twisted.internet.protocol import (
     DatagramProtocol,
     ProcessProtocol,
 )
 from twisted.internet.threads import deferToThread
+from zope.interface import implementer
 from zope.interface.exceptions import DoesNotImplement
 from zope.interface.verify import verifyObject
 
@@ -301,6 +318,93 @@ class NeighbourDiscoveryService(ProcessProtocolService):
             self.ifname, callback=self.callback)
 
 
+@implementer(IReadDescriptor)
+class NeighbourCaptureService(Service):
+    """Service to observe ARP traffic on many interfaces from this process.
+
+    This does the job of a `NeighbourDiscoveryService` -- and so of `tcpdump`
+    and `maas-rack observe-arp` -- for every monitored interface at once,
+    with a single AF_PACKET socket. It needs the CAP_NET_RAW capability.
+
+    Bindings are tracked per interface, as `maas-rack observe-arp` does, and
+    the resulting events are passed to `callback` in batches.
+    """
+
+    def __init__(self, callback, clock=None):
+        super().__init__()
+        self.callback = callback
+        self.clock = reactor if clock is None else clock
+        self.interfaces = frozenset()
+        self._bindings = {}
+        self._reader = None
+
+    def setInterfaces(self, interfaces):
+        """Observe the given interfaces, and only those."""
+        self.interfaces = frozenset(interfaces)
+        self._bindings = {
+            ifname: self._bindings.get(ifname, {})
+            for ifname in self.interfaces
+        }
+
+    def startService(self):
+        self._reader = PacketSocketReader(open_packet_socket())
+        super().startService()
+        reactor.addReader(self)
+        log.msg("Neighbour capture started.")
+
+    def stopService(self):
+        if self._reader is not None:
+            reactor.removeReader(self)
+            self._reader.sock.close()
+            self._reader = None
+            log.msg("Neighbour capture stopped.")
+        return super().stopService()
+
+    def fileno(self):
+        return self._reader.sock.fileno()
+
+    def logPrefix(self):
+        return "neighbour-capture"
+
+    def doRead(self):
+        """Decode and report the bindings in frames waiting on the socket."""
+        now = int(self.clock.seconds())
+        events = []
+        for ifname, frame, vid in self._reader.read():
+            if ifname in self.interfaces:
+                self._decodeFrame(events, ifname, frame, vid, now)
+        if len(events) > 0:
+            self.callback(events)
+
+    def connectionLost(self, reason):
+        """Called by the reactor when reading fails."""
+        log.err(reason, "Neighbour capture failed.")
+        self._reader.sock.close()
+        self._reader = None
+
+    def replay(self, ifname, stream):
+        """Report the bindings in the PCAP `stream` as if seen on `ifname`.
+
+        This takes the same path as frames captured from the network, but
+        uses the time each frame was recorded.
+        """
+        self._bindings.setdefault(ifname, {})
+        events = []
+        for seen, frame in read_pcap_frames(stream):
+            self._decodeFrame(events, ifname, frame, None, seen)
+        if len(events) > 0:
+            self.callback(events)
+
+    def _decodeFrame(self, events, ifname, frame, vid, seen):
+        bindings = self._bindings[ifname]
+        for vid, ip, mac in get_arp_bindings_from_frame(frame, vid):
+            event = update_bindings_and_get_event(
+                bindings, vid, ip, mac, seen)
+            if event is not None:
+                event['interface'] = ifname
+                events.append(event)
+
+
 class BeaconingService(ProcessProtocolService):
     """Service to spawn the per-interface device discovery subprocess."""
 
@@ -934,6 +1038,99 @@ class BeaconingSocketProtocol(DatagramProtocol):
             self.beaconReceived(beacon_json)
 
 
+class NeighbourTable:
+    """Table of the neighbour bindings observed by this host.
+
+    Each `maas-rack observe-arp` process reports bindings one at a time, and
+    forgets them when it restarts. This table remembers the bindings across
+    all interfaces so that only new or changed bindings need to be reported
+    to the region straight away. Bindings that are merely seen again are
+    queued, and reported together by `takeRefreshes()`.
+
+    :ivar observed: The number of neighbour observations received.
+    :ivar reported: The number of new or changed bindings handed back for
+        reporting straight away.
+    :ivar refreshed: The number of refreshed bindings handed back for
+        reporting by `takeRefreshes()`.
+    """
+
+    # Bindings not seen for this long are forgotten.
+    expiry = timedelta(minutes=30).total_seconds()
+
+    def __init__(self, clock=None):
+        self.clock = reactor if clock is None else clock
+        # Maps (interface, ip, vid) to (mac, last seen).
+        self._bindings = {}
+        # Maps (interface, ip, vid) to the latest refreshing observation.
+        self._refreshes = OrderedDict()
+        self.observed = 0
+        self.reported = 0
+        self.refreshed = 0
+
+    @staticmethod
+    def _getKey(neighbour):
+        return neighbour['interface'], neighbour['ip'], neighbour.get('vid')
+
+    def observe(self, neighbours):
+        """Record the given neighbour observations.
+
+        :return: A list of the observations that are new or changed bindings,
+            which should be reported to the region now.
+        """
+        now = self.clock.seconds()
+        changed = []
+        for neighbour in neighbours:
+            key = self._getKey(neighbour)
+            binding = self._bindings.get(key)
+            self._bindings[key] = neighbour['mac'], now
+            if binding is None or binding[0] != neighbour['mac']:
+                # A changed binding supersedes any queued refresh.
+                self._refreshes.pop(key, None)
+                changed.append(neighbour)
+            else:
+                self._refreshes[key] = neighbour
+        self.observed += len(neighbours)
+        self.reported += len(changed)
+        return changed
+
+    def requeue(self, neighbours):
+        """Queue observations that could not be reported for a later refresh.
+
+        An observation is not queued if a later one for the same binding has
+        been queued in the meantime.
+        """
+        for neighbour in neighbours:
+            key = self._getKey(neighbour)
+            if key in self._bindings:
+                self._refreshes.setdefault(key, neighbour)
+
+    def takeRefreshes(self):
+        """Return, and forget, the queued refreshing observations.
+
+        Bindings that have not been seen for `expiry` seconds are forgotten
+        at the same time.
+        """
+        refreshes = list(self._refreshes.values())
+        self._refreshes.clear()
+        self.refreshed += len(refreshes)
+        horizon = self.clock.seconds() - self.expiry
+        self._bindings = {
+            key: binding for key, binding in self._bindings.items()
+            if binding[1] >= horizon
+        }
+        return refreshes
+
+    def forgetInterfaces(self, ifnames):
+        """Forget all bindings and queued refreshes for `ifnames`."""
+        self._bindings = {
+            key: binding for key, binding in self._bindings.items()
+            if key[0] not in ifnames
+        }
+        for key in list(self._refreshes):
+            if key[0] in ifnames:
+                del self._refreshes[key]
+
+
 class NetworksMonitoringLock(NamedLock):
     """Host scoped lock to ensure only one network monitoring service runs."""
 
@@ -952,6 +1149,9 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
 
     interval = timedelta(seconds=30).total_seconds()
 
+    # How often neighbours that have been seen again are reported.
+    neighbours_interval = timedelta(seconds=60).total_seconds()
+
     def __init__(
             self, clock=None, enable_monitoring=True, enable_beaconing=True):
         # Order is very important here. First we set the clock to the passed-in
@@ -972,6 +1172,9 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         self._monitoring_state = {}
         self._monitoring_mdns = False
         self._locked = False
+        # Whether neighbours can be captured in-process; see
+        # `_canCaptureNeighbours`.
+        self._capture_available = None
         # Use a named filesystem lock to prevent more than one monitoring
         # service running on each host machine. This service attempts to
         # acquire this lock on each loop, and then it holds the lock until the
@@ -983,6 +1186,13 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         self.interface_monitor.setName("updateInterfaces")
         self.interface_monitor.clock = self.clock
         self.interface_monitor.setServiceParent(self)
+        # Set up child service to report refreshed neighbours.
+        self.neighbours = NeighbourTable(self.clock)
+        self.neighbour_reporter = TimerService(
+            self.neighbours_interval, self.reportNeighbourRefreshes)
+        self.neighbour_reporter.setName("reportNeighbourRefreshes")
+        self.neighbour_reporter.clock = self.clock
+        self.neighbour_reporter.setServiceParent(self)
         self.beaconing_protocol = None
 
     @inlineCallbacks
@@ -1040,6 +1250,39 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         This MUST be overridden in subclasses.
         """
 
+    def observeNeighbours(self, neighbours):
+        """Receives neighbour observations from the ARP monitoring processes.
+
+        New or changed bindings are reported straight away. Bindings that
+        have merely been seen again are reported in a batch by
+        `reportNeighbourRefreshes`.
+        """
+        changed = self.neighbours.observe(neighbours)
+        if len(changed) > 0:
+            return self._reportNeighbours(changed)
+
+    def reportNeighbourRefreshes(self):
+        """Report neighbours that have been seen again since the last time."""
+        refreshes = self.neighbours.takeRefreshes()
+        if len(refreshes) > 0:
+            log.msg(
+                "Reporting %d refreshed neighbour(s); %d observation(s) "
+                "received, %d reported as new or changed, %d reported as "
+                "refreshed." % (
+                    len(refreshes), self.neighbours.observed,
+                    self.neighbours.reported, self.neighbours.refreshed))
+            return self._reportNeighbours(refreshes)
+
+    def _reportNeighbours(self, neighbours):
+        d = maybeDeferred(self.reportNeighbours, neighbours)
+        d.addErrback(self._neighboursNotReported, neighbours)
+        return d
+
+    def _neighboursNotReported(self, failure, neighbours):
+        # Try again with the next batch of refreshes.
+        self.neighbours.requeue(neighbours)
+        log.err(failure, "Failed to report neighbours.")
+
     def reportBeacons(self, beacons):
         """Receives a report of an observed beacon packet."""
         for beacon in beacons:
@@ -1160,7 +1403,7 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
 
     def _startNeighbourDiscovery(self, ifname):
         """"Start neighbour discovery service on the specified interface."""
-        service = NeighbourDiscoveryService(ifname, self.reportNeighbours)
+        service = NeighbourDiscoveryService(ifname, self.observeNeighbours)
         service.clock = self.clock
         service.setName("neighbour_discovery:" + ifname)
         service.setServiceParent(self)
@@ -1218,6 +1461,7 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
                 service.disownServiceParent()
                 maaslog.info(
                     "Stopped neighbour observation service for %s." % ifname)
+        self.neighbours.forgetInterfaces(deleted_interfaces)
 
     def _startBeaconingServices(self, new_interfaces):
         """Start monitoring services for the specified set of interfaces."""
@@ -1338,14 +1582,55 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         if len(new_interfaces) > 0:
             log.msg("Starting neighbour discovery for interfaces: %r" % (
                 new_interfaces))
-            self._startNeighbourDiscoveryServices(new_interfaces)
         if len(deleted_interfaces) > 0:
             log.msg(
                 "Stopping neighbour discovery for interfaces: %r" % (
                     deleted_interfaces))
+        if self._canCaptureNeighbours():
+            self._configureNeighbourCapture(monitored_interfaces)
+            self.neighbours.forgetInterfaces(deleted_interfaces)
+        else:
+            self._startNeighbourDiscoveryServices(new_interfaces)
             self._stopNeighbourDiscoveryServices(deleted_interfaces)
         self._monitored = monitored_interfaces
 
+    def _canCaptureNeighbours(self):
+        """Return True if neighbours can be captured in this process.
+
+        If so, a single `NeighbourCaptureService` is used for all monitored
+        interfaces. Otherwise a `NeighbourDiscoveryService` is started for
+        each interface, running `tcpdump` with `sudo`.
+        """
+        if self._capture_available is None:
+            self._capture_available = is_packet_capture_available()
+        return self._capture_available
+
+    def _configureNeighbourCapture(self, monitored_interfaces):
+        """Capture neighbours on `monitored_interfaces`, and only those."""
+        try:
+            service = self.getServiceNamed("neighbour_capture")
+        except KeyError:
+            if len(monitored_interfaces) != 0:
+                service = NeighbourCaptureService(
+                    self.observeNeighbours, self.clock)
+                service.setName("neighbour_capture")
+                service.setInterfaces(monitored_interfaces)
+                try:
+                    service.setServiceParent(self)
+                except OSError:
+                    log.err(None, (
+                        "Failed to start neighbour capture; using "
+                        "neighbour observation processes instead."))
+                    service.disownServiceParent()
+                    self._capture_available = False
+                    self._startNeighbourDiscoveryServices(
+                        monitored_interfaces)
+        else:
+            if len(monitored_interfaces) == 0:
+                service.disownServiceParent()
+            else:
+                service.setInterfaces(monitored_interfaces)
+
     def _interfacesRecorded(self, interfaces):
         """The given `interfaces` were recorded successfully."""
         self._recorded = interfaces
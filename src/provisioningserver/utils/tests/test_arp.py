@@ -27,11 +27,13 @@ from provisioningserver.utils.arp import (
     add_arguments,
     ARP,
     ARP_OPERATION,
+    get_arp_bindings_from_frame,
     run,
     SEEN_AGAIN_THRESHOLD,
     update_and_print_bindings,
     update_bindings_and_get_event,
 )
+from provisioningserver.utils.ethernet import Ethernet
 from provisioningserver.utils.network import (
     format_eui,
     hex_str_to_bytes,
@@ -253,6 +255,84 @@ class TestARP(MAASTestCase):
             arp.bindings(), [(IPAddress(pkt_sender_ip), EUI(pkt_sender_mac))])
 
 
+def make_ethernet_frame(payload, ethertype='0806', vid=None):
+    frame = hex_str_to_bytes('ffffffffffff') + hex_str_to_bytes('010203040506')
+    if vid is not None:
+        frame += hex_str_to_bytes('8100') + hex_str_to_bytes('%04x' % vid)
+    return frame + hex_str_to_bytes(ethertype) + payload
+
+
+class TestGetARPBindingsFromFrame(MAASTestCase):
+    """Tests for `get_arp_bindings_from_frame`."""
+
+    def test__returns_sender_for_request(self):
+        frame = make_ethernet_frame(make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2',
+            op=ARP_OPERATION.REQUEST))
+        self.assertEqual(
+            [(None, '192.168.0.1', '01:02:03:04:05:06')],
+            list(get_arp_bindings_from_frame(memoryview(frame))))
+
+    def test__returns_sender_and_target_for_reply(self):
+        frame = make_ethernet_frame(make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2',
+            '0a:0b:0c:0d:0e:0f', op=ARP_OPERATION.REPLY))
+        self.assertEqual([
+            (None, '192.168.0.1', '01:02:03:04:05:06'),
+            (None, '192.168.0.2', '0a:0b:0c:0d:0e:0f'),
+        ], list(get_arp_bindings_from_frame(frame)))
+
+    def test__skips_null_bindings(self):
+        frame = make_ethernet_frame(make_arp_packet(
+            '0.0.0.0', '01:02:03:04:05:06', '192.168.0.2',
+            '00:00:00:00:00:00', op=ARP_OPERATION.REPLY))
+        self.assertEqual([], list(get_arp_bindings_from_frame(frame)))
+
+    def test__returns_vid_from_tag(self):
+        frame = make_ethernet_frame(make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2'),
+            vid=0x2064)
+        self.assertEqual(
+            [(100, '192.168.0.1', '01:02:03:04:05:06')],
+            list(get_arp_bindings_from_frame(frame, vid=42)))
+
+    def test__returns_vid_given_for_untagged_frame(self):
+        frame = make_ethernet_frame(make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2'))
+        self.assertEqual(
+            [(42, '192.168.0.1', '01:02:03:04:05:06')],
+            list(get_arp_bindings_from_frame(frame, vid=42)))
+
+    def test__agrees_with_ARP_bindings(self):
+        frame = make_ethernet_frame(make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2',
+            '0a:0b:0c:0d:0e:0f', op=ARP_OPERATION.REPLY))
+        ethernet = Ethernet(frame)
+        arp = ARP(ethernet.payload, vid=ethernet.vid)
+        self.assertEqual(
+            [(arp.vid, str(ip), format_eui(mac))
+             for ip, mac in arp.bindings()],
+            list(get_arp_bindings_from_frame(frame)))
+
+    def test__ignores_invalid_frames(self):
+        arp_packet = make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2')
+        frames = [
+            b'',
+            make_ethernet_frame(b'')[:13],
+            make_ethernet_frame(arp_packet, vid=1)[:17],
+            make_ethernet_frame(arp_packet)[:-1],
+            make_ethernet_frame(arp_packet, ethertype='0800'),
+            make_ethernet_frame(make_arp_packet(
+                '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2',
+                hardware_type='0x0002')),
+            make_ethernet_frame(make_arp_packet(
+                '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2', op=3)),
+        ]
+        for frame in frames:
+            self.assertEqual([], list(get_arp_bindings_from_frame(frame)))
+
+
 class TestUpdateBindingsAndGetEvent(MAASTestCase):
 
     def test__new_binding(self):
@@ -0,0 +1,142 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for ``provisioningserver.utils.capture``."""
+
+__all__ = []
+
+import io
+import socket
+import struct
+from unittest.mock import Mock
+
+from maastesting.matchers import (
+    MockCalledOnce,
+    MockCalledOnceWith,
+)
+from maastesting.testcase import MAASTestCase
+from provisioningserver.utils import capture as capture_module
+from provisioningserver.utils.capture import (
+    ARP_FILTER,
+    attach_filter,
+    get_vid_from_auxdata,
+    is_packet_capture_available,
+    PACKET_AUXDATA,
+    PacketSocketReader,
+    read_pcap_frames,
+    SO_ATTACH_FILTER,
+    SOL_PACKET,
+    TP_STATUS_VLAN_VALID,
+    TPACKET_AUXDATA,
+)
+from provisioningserver.utils.tests.test_arp import test_input
+
+
+def make_auxdata(status=0, tci=0):
+    return SOL_PACKET, PACKET_AUXDATA, struct.pack(
+        TPACKET_AUXDATA, status, 60, 60, 0, 14, tci, 0x8100 if tci else 0)
+
+
+class TestAttachFilter(MAASTestCase):
+
+    def test__attaches_program(self):
+        sock = Mock()
+        attach_filter(sock, ARP_FILTER)
+        self.assertThat(sock.setsockopt, MockCalledOnce())
+        level, option, fprog = sock.setsockopt.call_args[0]
+        self.assertEqual(
+            (socket.SOL_SOCKET, SO_ATTACH_FILTER), (level, option))
+        self.assertEqual(struct.calcsize('HP'), len(fprog))
+        self.assertEqual(len(ARP_FILTER), struct.unpack('HP', fprog)[0])
+
+    def test__filter_jumps_stay_within_program(self):
+        for index, (code, jt, jf, k) in enumerate(ARP_FILTER):
+            # Return instructions (class BPF_RET) do not jump.
+            if code & 0x07 != 0x06:
+                self.assertLess(index + 1 + max(jt, jf), len(ARP_FILTER))
+        # The program always ends by returning.
+        self.assertEqual(0x06, ARP_FILTER[-1][0])
+
+
+class TestIsPacketCaptureAvailable(MAASTestCase):
+
+    def test__returns_False_without_permission(self):
+        self.patch(capture_module.socket, "socket").side_effect = (
+            PermissionError())
+        self.assertFalse(is_packet_capture_available())
+
+    def test__returns_True_and_closes_socket_with_permission(self):
+        sock = self.patch(capture_module.socket, "socket").return_value
+        self.assertTrue(is_packet_capture_available())
+        self.assertThat(sock.close, MockCalledOnceWith())
+
+
+class TestGetVIDFromAuxdata(MAASTestCase):
+
+    def test__returns_None_without_auxdata(self):
+        self.assertIsNone(get_vid_from_auxdata([]))
+
+    def test__returns_None_for_untagged_frame(self):
+        self.assertIsNone(get_vid_from_auxdata([make_auxdata()]))
+
+    def test__returns_vid_for_tagged_frame(self):
+        self.assertEqual(100, get_vid_from_auxdata([
+            make_auxdata(status=TP_STATUS_VLAN_VALID, tci=0x2064)]))
+
+    def test__returns_vid_from_older_kernels(self):
+        self.assertEqual(100, get_vid_from_auxdata([
+            make_auxdata(status=0, tci=0x0064)]))
+
+    def test__ignores_other_ancillary_data(self):
+        level, kind, data = make_auxdata(
+            status=TP_STATUS_VLAN_VALID, tci=100)
+        self.assertIsNone(get_vid_from_auxdata([(level, kind + 1, data)]))
+
+
+class FakePacketSocket:
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def recvmsg_into(self, buffers, ancbufsize):
+        if len(self.frames) == 0:
+            raise BlockingIOError()
+        ifname, frame, ancdata = self.frames.pop(0)
+        [buffer] = buffers
+        buffer[:len(frame)] = frame
+        return len(frame), ancdata, 0, (ifname, 0x0806, 0, 1, b"")
+
+
+class TestPacketSocketReader(MAASTestCase):
+
+    def test__reads_waiting_frames(self):
+        sock = FakePacketSocket([
+            ("eth0", b"frame0", []),
+            ("eth1", b"frame1", [make_auxdata(TP_STATUS_VLAN_VALID, 42)]),
+        ])
+        reader = PacketSocketReader(sock)
+        self.assertEqual(
+            [("eth0", b"frame0", None), ("eth1", b"frame1", 42)],
+            [(ifname, bytes(frame), vid)
+             for ifname, frame, vid in reader.read()])
+
+    def test__reads_at_most_one_batch(self):
+        sock = FakePacketSocket(("eth0", b"frame", []) for _ in range(3))
+        reader = PacketSocketReader(sock)
+        reader.batch_size = 2
+        self.assertEqual(2, len(list(reader.read())))
+        self.assertEqual(1, len(list(reader.read())))
+        self.assertEqual(0, len(list(reader.read())))
+
+
+class TestReadPCAPFrames(MAASTestCase):
+
+    def test__yields_time_and_frame(self):
+        frames = list(read_pcap_frames(io.BytesIO(test_input)))
+        self.assertEqual(
+            [(1470159914, 60), (1470159914, 42)],
+            [(time, len(frame)) for time, frame in frames])
+
+    def test__raises_EOFError_for_empty_stream(self):
+        self.assertRaises(
+            EOFError, list, read_pcap_frames(io.BytesIO(b"")))
@@ -0,0 +1,300 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.utils.ipmi`."""
+
+__all__ = []
+
+import os
+import random
+import struct
+
+from maastesting.factory import factory
+from maastesting.runtest import MAASTwistedRunTest
+from maastesting.testcase import MAASTestCase
+from provisioningserver.utils.ipmi import (
+    BMC_ADDRESS,
+    checksum,
+    CHASSIS_CONTROL,
+    CIPHER_SUITE_3,
+    COMMAND,
+    decrypt,
+    encrypt,
+    hmac_sha1,
+    IPMIAuthError,
+    IPMIClient,
+    IPMIError,
+    IPMITimeout,
+    make_ipmi_request,
+    make_packet,
+    parse_packet,
+    PAYLOAD_TYPE,
+    SOFTWARE_ID,
+)
+from testtools.testcase import ExpectedException
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.protocol import DatagramProtocol
+
+
+def make_ipmi_response(netfn, rq_seq, command, completion_code, data=b""):
+    """Make an IPMI response message from the BMC."""
+    header = bytes((SOFTWARE_ID, (netfn | 1) << 2))
+    body = bytes((BMC_ADDRESS, rq_seq << 2, command, completion_code)) + data
+    return (
+        header + bytes((checksum(header),)) +
+        body + bytes((checksum(body),)))
+
+
+class FakeBMC(DatagramProtocol):
+    """A BMC that speaks just enough RMCP+ to control its chassis power.
+
+    :ivar drop: The number of packets to ignore before responding again.
+    :ivar received: The payload types, and commands, received.
+    """
+
+    def __init__(self, user, password):
+        super(FakeBMC, self).__init__()
+        self.user = user.encode("utf-8")
+        self.password = password.encode("utf-8")
+        self.power = False
+        self.boot_options = None
+        self.drop = 0
+        self.received = []
+        self.handshakes = {}
+        self.sessions = {}
+
+    def datagramReceived(self, packet, address):
+        if self.drop > 0:
+            self.drop -= 1
+            return
+        payload_type = packet[5] & 0x3F
+        session_id, = struct.unpack_from("<I", packet, 6)
+        if payload_type == PAYLOAD_TYPE.IPMI:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return  # Unknown sessions are ignored.
+            _, _, message = parse_packet(
+                packet, session["k1"], session["k2"])
+            response = self.handleCommand(session_id, message)
+            if response is not None:
+                self.transport.write(make_packet(
+                    PAYLOAD_TYPE.IPMI, session["console_id"], 0, response,
+                    session["k1"], session["k2"]), address)
+        else:
+            self.received.append(payload_type)
+            _, _, payload = parse_packet(packet)
+            handle = {
+                PAYLOAD_TYPE.OPEN_SESSION_REQUEST: self.handleOpenSession,
+                PAYLOAD_TYPE.RAKP_1: self.handleRAKP1,
+                PAYLOAD_TYPE.RAKP_3: self.handleRAKP3,
+            }[payload_type]
+            response_type, response = handle(payload)
+            self.transport.write(
+                make_packet(response_type, 0, 0, response), address)
+
+    def handleOpenSession(self, payload):
+        console_id, = struct.unpack_from("<I", payload, 4)
+        managed_id = random.randint(1, 0xFFFFFFFF)
+        self.handshakes[managed_id] = {"console_id": console_id}
+        return PAYLOAD_TYPE.OPEN_SESSION_RESPONSE, struct.pack(
+            "<BBBxII", payload[0], 0, 4, console_id,
+            managed_id) + CIPHER_SUITE_3
+
+    def handleRAKP1(self, payload):
+        managed_id, = struct.unpack_from("<I", payload, 4)
+        handshake = self.handshakes[managed_id]
+        console_id = handshake["console_id"]
+        role, length = payload[24], payload[27]
+        user = payload[28:28 + length]
+        if user != self.user:
+            return PAYLOAD_TYPE.RAKP_2, struct.pack(
+                "<BB2xI", payload[0], 0x0D, console_id)
+        handshake.update(
+            rm=payload[8:24], rc=os.urandom(16), guid=os.urandom(16),
+            names=bytes((role, length)) + user)
+        auth = hmac_sha1(
+            self.password, struct.pack("<II", console_id, managed_id),
+            handshake["rm"], handshake["rc"], handshake["guid"],
+            handshake["names"])
+        return PAYLOAD_TYPE.RAKP_2, struct.pack(
+            "<BB2xI", payload[0], 0, console_id) + (
+                handshake["rc"] + handshake["guid"] + auth)
+
+    def handleRAKP3(self, payload):
+        managed_id, = struct.unpack_from("<I", payload, 4)
+        handshake = self.handshakes[managed_id]
+        console_id = handshake["console_id"]
+        expected = hmac_sha1(
+            self.password, handshake["rc"], struct.pack("<I", console_id),
+            handshake["names"])
+        if payload[8:28] != expected:
+            return PAYLOAD_TYPE.RAKP_4, struct.pack(
+                "<BB2xI", payload[0], 0x0F, console_id)
+        sik = hmac_sha1(
+            self.password, handshake["rm"], handshake["rc"],
+            handshake["names"])
+        self.sessions[managed_id] = {
+            "console_id": console_id,
+            "k1": hmac_sha1(sik, b"\x01" * 20),
+            "k2": hmac_sha1(sik, b"\x02" * 20),
+        }
+        check = hmac_sha1(
+            sik, handshake["rm"], struct.pack("<I", managed_id),
+            handshake["guid"])
+        return PAYLOAD_TYPE.RAKP_4, struct.pack(
+            "<BB2xI", payload[0], 0, console_id) + check[:12]
+
+    def handleCommand(self, session_id, message):
+        netfn, rq_seq, command = message[1] >> 2, message[4] >> 2, message[5]
+        data = message[6:-1]
+        self.received.append(command)
+        if command == COMMAND.GET_CHASSIS_STATUS:
+            response = bytes((0x01 if self.power else 0x00, 0, 0, 0))
+        elif command == COMMAND.CHASSIS_CONTROL:
+            self.power = data[0] in (
+                CHASSIS_CONTROL.POWER_UP, CHASSIS_CONTROL.POWER_CYCLE)
+            response = b""
+        elif command == COMMAND.SET_SYSTEM_BOOT_OPTIONS:
+            self.boot_options = data
+            response = b""
+        elif command == COMMAND.SET_SESSION_PRIVILEGE_LEVEL:
+            response = data[:1]
+        elif command == COMMAND.CLOSE_SESSION:
+            del self.sessions[session_id]
+            response = b""
+        else:
+            return make_ipmi_response(netfn, rq_seq, command, 0xC1)
+        return make_ipmi_response(netfn, rq_seq, command, 0x00, response)
+
+
+class TestPackets(MAASTestCase):
+    """Tests for making and parsing RMCP+ packets."""
+
+    def test__encrypt_and_decrypt(self):
+        key = os.urandom(20)
+        for length in 0, 1, 15, 16, 17:
+            data = os.urandom(length)
+            encrypted = encrypt(key, data)
+            self.assertEqual(0, len(encrypted) % 16)
+            self.assertEqual(data, decrypt(key, encrypted))
+
+    def test__make_and_parse_packet(self):
+        k1, k2 = os.urandom(20), os.urandom(20)
+        payload = make_ipmi_request(0x00, COMMAND.GET_CHASSIS_STATUS, 1)
+        packet = make_packet(PAYLOAD_TYPE.IPMI, 1234, 1, payload, k1, k2)
+        self.assertEqual(
+            (PAYLOAD_TYPE.IPMI, 1234, payload),
+            parse_packet(packet, k1, k2))
+
+    def test__parse_packet_rejects_tampering(self):
+        k1, k2 = os.urandom(20), os.urandom(20)
+        packet = bytearray(make_packet(
+            PAYLOAD_TYPE.IPMI, 1234, 1, b"payload", k1, k2))
+        packet[20] ^= 0xFF
+        self.assertRaises(IPMIError, parse_packet, bytes(packet), k1, k2)
+
+    def test__parse_packet_rejects_unauthenticated_in_session(self):
+        packet = make_packet(PAYLOAD_TYPE.IPMI, 1234, 1, b"payload")
+        self.assertRaises(
+            IPMIError, parse_packet, packet, os.urandom(20), os.urandom(20))
+
+
+class TestIPMIClient(MAASTestCase):
+    """Tests for `IPMIClient` against a fake BMC."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestIPMIClient, self).setUp()
+        self.user = factory.make_name("user")
+        self.password = factory.make_name("password")
+        self.bmc = FakeBMC(self.user, self.password)
+        port = reactor.listenUDP(0, self.bmc, interface="127.0.0.1")
+        self.addCleanup(port.stopListening)
+        self.port = port.getHost().port
+        self.client = IPMIClient(timeout=0.1, retries=2, idle_timeout=60)
+        self.addCleanup(self.client.stop)
+
+    def getSession(self, user=None, password=None):
+        return self.client.getSession(
+            "127.0.0.1", self.user if user is None else user,
+            self.password if password is None else password, port=self.port)
+
+    @inlineCallbacks
+    def test__gets_power_state(self):
+        session = self.getSession()
+        state = yield session.getPowerState()
+        self.assertEqual("off", state)
+        self.bmc.power = True
+        state = yield session.getPowerState()
+        self.assertEqual("on", state)
+
+    @inlineCallbacks
+    def test__controls_chassis(self):
+        session = self.getSession()
+        yield session.setBootDevicePXE()
+        yield session.chassisControl(CHASSIS_CONTROL.POWER_UP)
+        self.assertTrue(self.bmc.power)
+        self.assertEqual(b"\x05\x80\x04\x00\x00\x00", self.bmc.boot_options)
+
+    @inlineCallbacks
+    def test__reuses_session(self):
+        yield self.getSession().getPowerState()
+        yield self.getSession().getPowerState()
+        self.assertEqual(
+            1, self.bmc.received.count(PAYLOAD_TYPE.OPEN_SESSION_REQUEST))
+        self.assertEqual(1, len(self.bmc.sessions))
+
+    @inlineCallbacks
+    def test__retransmits(self):
+        self.bmc.drop = 2
+        state = yield self.getSession().getPowerState()
+        self.assertEqual("off", state)
+
+    @inlineCallbacks
+    def test__times_out(self):
+        self.bmc.drop = 100
+        with ExpectedException(IPMITimeout):
+            yield self.getSession().getPowerState()
+
+    @inlineCallbacks
+    def test__opens_new_session_when_bmc_drops_it(self):
+        session = self.getSession()
+        yield session.getPowerState()
+        self.bmc.sessions.clear()
+        self.bmc.power = True
+        state = yield session.getPowerState()
+        self.assertEqual("on", state)
+        self.assertEqual(
+            2, self.bmc.received.count(PAYLOAD_TYPE.OPEN_SESSION_REQUEST))
+
+    @inlineCallbacks
+    def test__rejects_unknown_user(self):
+        session = self.getSession(user=factory.make_name("user"))
+        with ExpectedException(IPMIAuthError):
+            yield session.getPowerState()
+
+    @inlineCallbacks
+    def test__rejects_wrong_password(self):
+        session = self.getSession(password=factory.make_name("password"))
+        with ExpectedException(IPMIAuthError):
+            yield session.getPowerState()
+        self.assertEqual({}, self.bmc.sessions)
+
+    @inlineCallbacks
+    def test__closes_session(self):
+        session = self.getSession()
+        yield session.getPowerState()
+        yield session.close()
+        self.assertFalse(session.active)
+        self.assertEqual({}, self.bmc.sessions)
+        self.assertIn(COMMAND.CLOSE_SESSION, self.bmc.received)
+
+    @inlineCallbacks
+    def test__closes_idle_session(self):
+        session = self.getSession()
+        yield session.getPowerState()
+        yield session._closeIdle()
+        self.assertEqual({}, self.bmc.sessions)
+        self.assertIsNot(session, self.getSession())
@@ -0,0 +1,348 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.utils.loadstats`."""
+
+__all__ = []
+
+from unittest.mock import sentinel
+
+from maastesting.factory import factory
+from maastesting.matchers import (
+    DocTestMatches,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.utils import loadstats
+from provisioningserver.utils.loadstats import (
+    escape_label,
+    get_callable_name,
+    LoadMonitorService,
+    LoadStatistics,
+)
+from testtools.matchers import (
+    ContainsDict,
+    Equals,
+    GreaterThan,
+    HasLength,
+)
+from twisted.internet.task import Clock
+
+
+class FakeThreadPool:
+
+    def __init__(self, name, max=10):
+        self.name = name
+        self.max = max
+
+
+class TestGetCallableName(MAASTestCase):
+
+    def test_returns_qualified_name_of_function(self):
+        self.assertEqual(
+            "provisioningserver.utils.loadstats.get_callable_name",
+            get_callable_name(get_callable_name))
+
+    def test_returns_qualified_name_of_method(self):
+        self.assertEqual(
+            "provisioningserver.utils.loadstats.LoadStatistics.reset",
+            get_callable_name(LoadStatistics.reset))
+
+
+class TestLoadStatistics(MAASTestCase):
+    """Tests for `LoadStatistics`."""
+
+    def test_starts_empty(self):
+        statistics = LoadStatistics().get_statistics()
+        self.assertEqual({
+            "lag_samples": 0,
+            "lag_seconds": 0.0,
+            "last_lag_seconds": 0.0,
+            "max_lag_seconds": 0.0,
+            "stalls": 0,
+            "recent_stalls": [],
+        }, statistics["reactor"])
+        self.assertEqual({}, statistics["thread_pools"])
+        self.assertEqual([], statistics["slowest"])
+        self.assertEqual({}, statistics["gauges"])
+
+    def test_record_lag(self):
+        stats = LoadStatistics()
+        stats.record_lag(0.25)
+        stats.record_lag(1.0)
+        stats.record_lag(0.5)
+        self.assertThat(stats.get_statistics()["reactor"], ContainsDict({
+            "lag_samples": Equals(3),
+            "lag_seconds": Equals(1.75),
+            "last_lag_seconds": Equals(0.5),
+            "max_lag_seconds": Equals(1.0),
+        }))
+
+    def test_record_stall_keeps_recent_stacks(self):
+        stats = LoadStatistics()
+        stacks = [factory.make_name("stack") for _ in range(stats.stacks + 2)]
+        for stack in stacks:
+            stats.record_stall(2.0, stack)
+        reactor_stats = stats.get_statistics()["reactor"]
+        self.assertEqual(len(stacks), reactor_stats["stalls"])
+        self.assertEqual(
+            stacks[-stats.stacks:],
+            [stall["stack"] for stall in reactor_stats["recent_stalls"]])
+
+    def test_instrument_counts_task_as_queued_until_called(self):
+        stats = LoadStatistics()
+        stats.instrument(FakeThreadPool("pool", 7), lambda: None)
+        self.assertEqual({
+            "pool": {
+                "max_threads": 7,
+                "queued": 1,
+                "running": 0,
+                "tasks": 0,
+                "wait_seconds": 0.0,
+                "max_wait_seconds": 0.0,
+            },
+        }, stats.get_statistics()["thread_pools"])
+
+    def test_instrument_counts_task_as_running_while_called(self):
+        stats = LoadStatistics()
+        running = []
+
+        def task(arg, kwarg=None):
+            pool = stats.get_statistics()["thread_pools"]["pool"]
+            running.append((pool["queued"], pool["running"]))
+            return arg, kwarg
+
+        instrumented = stats.instrument(FakeThreadPool("pool"), task)
+        self.assertEqual(
+            (sentinel.arg, sentinel.kwarg),
+            instrumented(sentinel.arg, kwarg=sentinel.kwarg))
+        self.assertEqual([(0, 1)], running)
+        self.assertThat(
+            stats.get_statistics()["thread_pools"]["pool"], ContainsDict({
+                "queued": Equals(0),
+                "running": Equals(0),
+                "tasks": Equals(1),
+            }))
+
+    def test_instrument_records_wait_and_duration(self):
+        stats = LoadStatistics()
+        monotonic = self.patch(loadstats.time, "monotonic")
+        monotonic.side_effect = [10.0, 12.5, 13.0]
+        stats.instrument(FakeThreadPool("pool"), get_callable_name)(len)
+        statistics = stats.get_statistics()
+        self.assertThat(statistics["thread_pools"]["pool"], ContainsDict({
+            "wait_seconds": Equals(2.5),
+            "max_wait_seconds": Equals(2.5),
+        }))
+        self.assertEqual([{
+            "pool": "pool",
+            "name": "provisioningserver.utils.loadstats.get_callable_name",
+            "calls": 1,
+            "seconds": 0.5,
+            "max_seconds": 0.5,
+        }], statistics["slowest"])
+
+    def test_instrument_records_failing_tasks(self):
+        stats = LoadStatistics()
+        exception_type = factory.make_exception_type()
+
+        def task():
+            raise exception_type()
+
+        instrumented = stats.instrument(FakeThreadPool("pool"), task)
+        self.assertRaises(exception_type, instrumented)
+        statistics = stats.get_statistics()
+        self.assertEqual(0, statistics["thread_pools"]["pool"]["running"])
+        self.assertEqual(1, statistics["slowest"][0]["calls"])
+
+    def test_slowest_are_sorted_and_limited(self):
+        stats = LoadStatistics()
+        stats.slowest = 2
+        monotonic = self.patch(loadstats.time, "monotonic")
+        monotonic.side_effect = [0.0, 0.0, 1.0, 0.0, 0.0, 3.0, 0.0, 0.0, 2.0]
+        pool = FakeThreadPool("pool")
+
+        def fast(arg):
+            pass
+
+        def slowest(arg):
+            pass
+
+        def slow(arg):
+            pass
+
+        for func in (fast, slowest, slow):
+            stats.instrument(pool, func)(sentinel.arg)
+        self.assertEqual(
+            [get_callable_name(slowest), get_callable_name(slow)],
+            [stat["name"] for stat in stats.get_statistics()["slowest"]])
+
+    def test_gauges_are_reported_until_unregistered(self):
+        stats = LoadStatistics()
+        stats.register_gauge("backlog", lambda: 42)
+        self.assertEqual({"backlog": 42}, stats.get_statistics()["gauges"])
+        stats.unregister_gauge("backlog")
+        self.assertEqual({}, stats.get_statistics()["gauges"])
+
+    def test_reset_keeps_gauges(self):
+        stats = LoadStatistics()
+        stats.register_gauge("backlog", lambda: 42)
+        stats.record_lag(1.0)
+        stats.instrument(FakeThreadPool("pool"), len)
+        stats.reset()
+        statistics = stats.get_statistics()
+        self.assertEqual(0, statistics["reactor"]["lag_samples"])
+        self.assertEqual({}, statistics["thread_pools"])
+        self.assertEqual({"backlog": 42}, statistics["gauges"])
+
+    def test_render_prometheus(self):
+        stats = LoadStatistics()
+        stats.record_lag(0.5)
+        stats.register_gauge("backlog", lambda: 3)
+        monotonic = self.patch(loadstats.time, "monotonic")
+        monotonic.side_effect = [0.0, 1.0, 3.0]
+        stats.instrument(FakeThreadPool("database", 20), len)("")
+        self.assertThat(stats.render_prometheus(), DocTestMatches("""\
+            # HELP maas_reactor_lag_samples_total ...
+            # TYPE maas_reactor_lag_samples_total counter
+            maas_reactor_lag_samples_total 1
+            ...
+            maas_reactor_lag_max_seconds 0.500000
+            ...
+            maas_threadpool_max_threads{pool="database"} 20
+            ...
+            maas_threadpool_wait_seconds_total{pool="database"} 1.0
+            ...
+            maas_threadpool_callable_seconds_total{\
+pool="database",name="builtins.len"} 2.0
+            ...
+            # TYPE maas_backlog gauge
+            maas_backlog 3
+            """))
+
+    def test_escape_label(self):
+        self.assertEqual(
+            'a\\\\b\\"c\\nd', escape_label('a\\b"c\nd'))
+
+
+class TestLoadMonitorService(MAASTestCase):
+    """Tests for `LoadMonitorService`."""
+
+    def make_service(self, **kwargs):
+        kwargs.setdefault("statistics", LoadStatistics())
+        service = LoadMonitorService(
+            interval=1.0, threshold=0.5, report_interval=60, **kwargs)
+        service.clock = Clock()
+        self.patch(service, "_startWatchdog")
+        return service
+
+    def test_samples_reactor_lag(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        service.clock.advance(1.0)
+        service.clock.advance(1.75)
+        self.assertThat(
+            service.statistics.get_statistics()["reactor"], ContainsDict({
+                "lag_samples": Equals(2),
+                "lag_seconds": Equals(0.75),
+                "max_lag_seconds": Equals(0.75),
+            }))
+
+    def test_starts_watchdog(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertEqual(1, service._startWatchdog.call_count)
+
+    def test_stopService_stops_sampling_and_watchdog(self):
+        service = self.make_service()
+        service.startService()
+        service.stopService()
+        self.assertFalse(service._sampler.running)
+        self.assertFalse(service._reporter.running)
+        self.assertTrue(service._stopping.is_set())
+
+    def test_checkStall_does_nothing_when_not_blocked(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        record_stall = self.patch(service.statistics, "record_stall")
+        service._checkStall(service.clock.seconds() + 1.4)
+        self.assertThat(record_stall, MockNotCalled())
+
+    def test_checkStall_captures_stack_once_per_stall(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        with TwistedLoggerFixture() as logger:
+            service._checkStall(service.clock.seconds() + 2.0)
+            service._checkStall(service.clock.seconds() + 3.0)
+        reactor_stats = service.statistics.get_statistics()["reactor"]
+        self.assertEqual(1, reactor_stats["stalls"])
+        [stall] = reactor_stats["recent_stalls"]
+        self.assertEqual(1.0, stall["blocked_seconds"])
+        # This test runs in the thread that started the service.
+        self.assertIn("test_checkStall_captures_stack_once", stall["stack"])
+        self.assertThat(logger.output, DocTestMatches(
+            "Reactor has been blocked for 1.000 seconds:..."))
+
+    def test_checkStall_reports_again_after_reactor_recovers(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        with TwistedLoggerFixture():
+            service._checkStall(service.clock.seconds() + 2.0)
+            service.clock.advance(2.0)
+            service._checkStall(service.clock.seconds() + 2.0)
+        self.assertEqual(
+            2, service.statistics.get_statistics()["reactor"]["stalls"])
+
+    def test_report_logs_nothing_when_not_overloaded(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        with TwistedLoggerFixture() as logger:
+            service.clock.pump([1.0] * 60)
+        self.assertEqual("", logger.output)
+
+    def test_report_logs_when_reactor_lags(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        with TwistedLoggerFixture() as logger:
+            service.clock.advance(1.5)
+            service.clock.pump([1.0] * 59)
+        self.assertThat(logger.output, DocTestMatches(
+            "Load over the last 60 seconds: reactor lag 0.500s at most, "
+            "0.0...s on average."))
+
+    def test_report_logs_when_thread_pool_tasks_wait(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        service.statistics.register_gauge("backlog", lambda: 12)
+        monotonic = self.patch(loadstats.time, "monotonic")
+        monotonic.side_effect = [0.0, 0.75, 1.0]
+        pool = FakeThreadPool("database", 20)
+        service.statistics.instrument(pool, len)("")
+        with TwistedLoggerFixture() as logger:
+            service.clock.pump([1.0] * 60)
+        self.assertThat(logger.output, DocTestMatches(
+            "Load over the last 60 seconds: reactor lag 0.000s at most, "
+            "0.000s on average; database pool 0/20 running, 0 queued, "
+            "1 tasks waited 0.750s on average; backlog 12."))
+
+    def test_report_considers_only_the_last_period(self):
+        service = self.make_service()
+        service.startService()
+        self.addCleanup(service.stopService)
+        with TwistedLoggerFixture() as logger:
+            service.clock.advance(1.5)
+            service.clock.pump([1.0] * 59)
+            service.clock.pump([1.0] * 60)
+        self.assertThat(logger.output.splitlines(), HasLength(1))
+        self.assertThat(
+            service.statistics.get_statistics()["reactor"]["lag_samples"],
+            GreaterThan(100))
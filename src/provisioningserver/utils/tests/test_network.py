@@ -231,21 +231,16 @@ class TestGetMACOrganization(MAASTestCase):
         self.assertThat(
             get_eui_organization(EUI(mac_address)), IsNonEmptyString)
 
-    def test_get_eui_organization_returns_None_for_UnicodeError(self):
-        mock_eui = Mock()
-        mock_eui.oui = Mock()
-        mock_eui.oui.registration = Mock()
-        mock_eui.oui.registration.side_effect = UnicodeError
-        organization = get_eui_organization(mock_eui)
-        self.assertThat(organization, Is(None))
+    def test_get_eui_organization_agrees_with_netaddr(self):
+        mac_address = "48:51:b7:00:00:00"
+        eui = EUI(mac_address)
+        self.assertEqual(
+            eui.oui.registration()['org'], get_eui_organization(eui))
 
-    def test_get_eui_organization_returns_None_for_IndexError(self):
-        mock_eui = Mock()
-        mock_eui.oui = Mock()
-        mock_eui.oui.registration = Mock()
-        mock_eui.oui.registration.side_effect = IndexError
-        organization = get_eui_organization(mock_eui)
-        self.assertThat(organization, Is(None))
+    def test_get_eui_organization_handles_eui64(self):
+        self.assertEqual(
+            get_mac_organization("48:51:b7:00:00:00"),
+            get_eui_organization(EUI("48:51:b7:ff:fe:00:00:00")))
 
     def test_get_eui_organization_returns_none_for_invalid_mac(self):
         organization = get_eui_organization(EUI("FF:FF:b7:00:00:00"))
@@ -0,0 +1,115 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the OUI index."""
+
+__all__ = []
+
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+from netaddr import EUI
+from provisioningserver.utils import oui as oui_module
+from provisioningserver.utils.oui import (
+    get_oui_index,
+    OUIIndex,
+    parse_oui_registry,
+)
+
+
+SAMPLE_REGISTRY = b"""\
+OUI/MA-L\t\t\t\t\t\t\t\tOrganization
+company_id\t\t\t\t\t\t\t\tOrganization
+\t\t\t\t\t\t\t\t\tAddress
+
+00-00-00   (hex)\t\tXEROX CORPORATION
+000000     (base 16)\t\tXEROX CORPORATION
+\t\t\t\tM/S 105-50C
+\t\t\t\tWEBSTER  NY  14580
+\t\t\t\tUS
+
+48-51-B7   (hex)\t\tIntel Corporate
+4851B7     (base 16)\t\tIntel Corporate
+\t\t\t\tLot 8, Jalan Hi-Tech 2/3
+\t\t\t\tKulim  Kedah  09000
+\t\t\t\tMY
+
+00-00-01   (hex)\t\tXEROX CORPORATION
+000001     (base 16)\t\tXEROX CORPORATION
+
+48-51-B7   (hex)\t\tDuplicate Corporate
+4851B7     (base 16)\t\tDuplicate Corporate
+
+00-00-02   (hex)\t\tCorrupt \xff Data
+000002     (base 16)\t\tCorrupt \xff Data
+"""
+
+
+class TestParseOUIRegistry(MAASTestCase):
+    """Tests for `parse_oui_registry`."""
+
+    def test__parses_hex_lines(self):
+        self.assertEqual([
+            (0x000000, "XEROX CORPORATION"),
+            (0x4851B7, "Intel Corporate"),
+            (0x000001, "XEROX CORPORATION"),
+            (0x4851B7, "Duplicate Corporate"),
+            (0x000002, "Corrupt � Data"),
+        ], list(parse_oui_registry(SAMPLE_REGISTRY.splitlines())))
+
+    def test__ignores_malformed_lines(self):
+        lines = [
+            b"(hex)",
+            b"XX-XX-XX   (hex)\t\tNobody",
+            b"00-00-03   (hex)",
+        ]
+        self.assertEqual([], list(parse_oui_registry(lines)))
+
+
+class TestOUIIndex(MAASTestCase):
+    """Tests for `OUIIndex`."""
+
+    def test__looks_up_registered_prefixes(self):
+        index = OUIIndex(parse_oui_registry(SAMPLE_REGISTRY.splitlines()))
+        self.assertEqual(4, len(index))
+        self.assertEqual("XEROX CORPORATION", index.lookup(0x000000))
+        self.assertEqual("XEROX CORPORATION", index.lookup(0x000001))
+        self.assertEqual("Intel Corporate", index.lookup(0x4851B7))
+
+    def test__returns_None_for_unregistered_prefixes(self):
+        index = OUIIndex(parse_oui_registry(SAMPLE_REGISTRY.splitlines()))
+        self.assertIsNone(index.lookup(0x000003))
+        self.assertIsNone(index.lookup(0xFFFFFF))
+
+    def test__empty_index_returns_None(self):
+        self.assertIsNone(OUIIndex([]).lookup(0x4851B7))
+
+    def test_fromFile_reads_registry(self):
+        path = self.make_file(contents=SAMPLE_REGISTRY)
+        index = OUIIndex.fromFile(path)
+        self.assertEqual("Intel Corporate", index.lookup(0x4851B7))
+
+    def test__agrees_with_netaddr(self):
+        index = get_oui_index()
+        eui = EUI("48:51:b7:00:00:00")
+        self.assertEqual(
+            eui.oui.registration()['org'], index.lookup(int(eui.oui)))
+
+
+class TestGetOUIIndex(MAASTestCase):
+    """Tests for `get_oui_index`."""
+
+    def setUp(self):
+        super().setUp()
+        self.patch(oui_module, "_index", None)
+
+    def test__builds_index_once(self):
+        path = self.make_file(contents=SAMPLE_REGISTRY)
+        self.patch(oui_module, "get_oui_registry_path").return_value = path
+        index = get_oui_index()
+        self.assertEqual("Intel Corporate", index.lookup(0x4851B7))
+        self.assertIs(index, get_oui_index())
+
+    def test__returns_empty_index_if_registry_is_missing(self):
+        path = factory.make_name("/nonexistent/oui")
+        self.patch(oui_module, "get_oui_registry_path").return_value = path
+        self.assertEqual(0, len(get_oui_index()))
@@ -9,6 +9,7 @@ from argparse import ArgumentParser
 import io
 import os
 import random
+import struct
 import subprocess
 from unittest.mock import (
     ANY,
@@ -20,19 +21,27 @@ from maastesting.matchers import (
     DocTestMatches,
     Matches,
     MockCalledOnceWith,
+    MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
 from netaddr import IPNetwork
 from provisioningserver.utils import scan_network as scan_network_module
 from provisioningserver.utils.scan_network import (
     add_arguments,
+    DEFAULT_PING_RATE,
     get_nmap_arguments,
     get_ping_arguments,
+    ICMP_ECHO_REPLY,
+    ICMPSweeper,
+    internet_checksum,
+    make_icmp_echo_request,
     NmapParameters,
+    parse_icmp_echo_reply,
     PingParameters,
     run,
     run_nmap,
     run_ping,
+    sweep_scan,
     yield_nmap_parameters,
     yield_ping_parameters,
 )
@@ -101,6 +110,16 @@ class TestScanNetworkCommand(MAASTestCase):
             ArgumentsMatching(threads=None, slow=False, ping=False),
             ANY, ANY, ANY))
 
+    def test__interprets_rate(self):
+        self.run_command('--ping', '--rate', '50')
+        self.assertThat(self.scan_networks_mock, MockCalledOnceWith(
+            ArgumentsMatching(rate=50, ping=True), ANY, ANY, ANY))
+
+    def test__default_rate(self):
+        self.run_command('--ping')
+        self.assertThat(self.scan_networks_mock, MockCalledOnceWith(
+            ArgumentsMatching(rate=DEFAULT_PING_RATE), ANY, ANY, ANY))
+
     def test__scans_all_interface_cidrs_when_zero_parameters_passed(self):
         self.run_command()
         self.assertThat(self.scan_networks_mock, MockCalledOnceWith(
@@ -168,6 +187,9 @@ class TestScanNetworkCommandEndToEnd(MAASTestCase):
         self.popen.return_value.poll = Mock()
         self.popen.return_value.poll.return_value = None
         self.popen.return_value.returncode = 0
+        # Without a raw socket, `ping` is spawned for each host.
+        self.sweep_scan_mock = self.patch(scan_network_module, 'sweep_scan')
+        self.sweep_scan_mock.side_effect = PermissionError()
         self.parser = ArgumentParser()
         add_arguments(self.parser)
 
@@ -175,6 +197,23 @@ class TestScanNetworkCommandEndToEnd(MAASTestCase):
         parsed_args = self.parser.parse_args([*args])
         return run(parsed_args, stdout=self.output, stderr=self.error_output)
 
+    def test__sweeps_with_raw_socket_when_possible(self):
+        # An address within eth1's configured network.
+        ip = factory.pick_ip_in_network(IPNetwork('192.168.0.0/24'))
+        event = {
+            "scan_type": "ping", "interface": "eth1", "ip": ip,
+            "result": True,
+        }
+        self.sweep_scan_mock.side_effect = None
+        self.sweep_scan_mock.return_value = iter([event])
+        self.run_command('--ping', '--rate', '20', 'eth1', '192.168.0.0/24')
+        self.assertThat(self.sweep_scan_mock, MockCalledOnceWith(
+            {'eth1': ['192.168.0.0/24']}, rate=20))
+        self.assertThat(self.popen, MockNotCalled())
+        self.assertThat(self.output.getvalue(), Contains(ip))
+        self.assertThat(self.error_output.getvalue(), DocTestMatches(
+            "Pinged 1 hosts (1 up)..."))
+
     def test__runs_ping_single_threaded(self):
         ip = factory.make_ip_address(ipv6=False)
         # Force the use of `ping` even if `nmap` is installed.
@@ -335,3 +374,53 @@ class TestYieldPingParameters(MAASTestCase):
             PingParameters(interface='eth0', ip='192.168.0.1'),
             PingParameters(interface='eth0', ip='192.168.0.2'),
         }))
+
+
+class TestICMPMessages(MAASTestCase):
+
+    def test__echo_request_checksum_is_valid(self):
+        message = make_icmp_echo_request(
+            random.randint(0, 0xFFFF), random.randint(0, 0xFFFF),
+            factory.make_bytes(random.choice((47, 48))))
+        self.assertEqual(0, internet_checksum(message))
+
+    def test__parses_echo_reply(self):
+        # An IPv4 header with options, i.e. longer than 20 bytes.
+        header = bytes((0x46,)) + bytes(23)
+        message = struct.pack("!BBHHH", ICMP_ECHO_REPLY, 0, 0, 1234, 56)
+        self.assertEqual(
+            (1234, 56), parse_icmp_echo_reply(header + message))
+
+    def test__ignores_other_messages(self):
+        header = bytes((0x45,)) + bytes(19)
+        self.assertIsNone(parse_icmp_echo_reply(
+            header + make_icmp_echo_request(1234, 56)))
+        self.assertIsNone(parse_icmp_echo_reply(header[:10]))
+
+
+class TestICMPSweeper(MAASTestCase):
+
+    def make_sweeper(self, *args, **kwargs):
+        try:
+            sweeper = ICMPSweeper(*args, **kwargs)
+        except PermissionError:
+            self.skipTest("Raw sockets need root or CAP_NET_RAW.")
+        else:
+            self.addCleanup(sweeper.close)
+            return sweeper
+
+    def test__pings_loopback(self):
+        sweeper = self.make_sweeper("lo", timeout=0.5)
+        self.assertEqual([True], sweeper.sweep(["127.0.0.1"]))
+
+    def test__sweep_scan_yields_events_like_run_ping(self):
+        try:
+            events = list(sweep_scan({'lo': ['127.0.0.1/32']}))
+        except PermissionError:
+            self.skipTest("Raw sockets need root or CAP_NET_RAW.")
+        self.assertEqual([{
+            "scan_type": "ping",
+            "interface": "lo",
+            "ip": "127.0.0.1",
+            "result": True,
+        }], events)
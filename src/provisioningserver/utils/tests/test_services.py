@@ -6,7 +6,9 @@
 __all__ = []
 
 from functools import partial
+import io
 import random
+import socket
 import threading
 from unittest.mock import (
     call,
@@ -36,18 +38,29 @@ from provisioningserver.utils.beaconing import (
     create_beacon_payload,
     TopologyHint,
 )
+from provisioningserver.utils.capture import (
+    PacketSocketReader,
+    TP_STATUS_VLAN_VALID,
+)
 from provisioningserver.utils.services import (
     BeaconingService,
     BeaconingSocketProtocol,
     JSONPerLineProtocol,
     MDNSResolverService,
+    NeighbourCaptureService,
     NeighbourDiscoveryService,
+    NeighbourTable,
     NetworksMonitoringLock,
     NetworksMonitoringService,
     ProcessProtocolService,
     ProtocolForObserveARP,
     ProtocolForObserveBeacons,
 )
+from provisioningserver.utils.tests import test_arp
+from provisioningserver.utils.tests.test_capture import (
+    FakePacketSocket,
+    make_auxdata,
+)
 from testtools import ExpectedException
 from testtools.matchers import (
     Equals,
@@ -303,6 +316,203 @@ class TestNetworksMonitoringService(MAASTestCase):
         # ... interfaces ARE recorded.
         self.assertThat(service.interfaces, Not(Equals([])))
 
+    def test_init_sets_up_neighbour_reporter(self):
+        service = self.makeService()
+        self.assertThat(
+            service.neighbour_reporter.step,
+            Equals(service.neighbours_interval))
+        self.assertThat(service.neighbour_reporter.call, Equals(
+            (service.reportNeighbourRefreshes, (), {})))
+
+    def test_observeNeighbours_reports_new_bindings_immediately(self):
+        service = self.makeService(clock=Clock())
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        neighbour = make_neighbour()
+        service.observeNeighbours([neighbour])
+        self.assertThat(reportNeighbours, MockCalledOnceWith([neighbour]))
+
+    def test_observeNeighbours_batches_refreshed_bindings(self):
+        service = self.makeService(clock=Clock())
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        neighbours = [make_neighbour() for _ in range(3)]
+        service.observeNeighbours(neighbours)
+        reportNeighbours.reset_mock()
+        for neighbour in neighbours:
+            service.observeNeighbours([dict(neighbour, event="REFRESHED")])
+        self.assertThat(reportNeighbours, MockNotCalled())
+        service.reportNeighbourRefreshes()
+        self.assertThat(reportNeighbours, MockCalledOnceWith([
+            dict(neighbour, event="REFRESHED") for neighbour in neighbours]))
+
+    def test_reportNeighbourRefreshes_does_nothing_without_refreshes(self):
+        service = self.makeService(clock=Clock())
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        service.observeNeighbours([make_neighbour()])
+        reportNeighbours.reset_mock()
+        service.reportNeighbourRefreshes()
+        self.assertThat(reportNeighbours, MockNotCalled())
+
+    def test_requeues_neighbours_that_could_not_be_reported(self):
+        service = self.makeService(clock=Clock())
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        reportNeighbours.side_effect = [factory.make_exception(), None]
+        neighbour = make_neighbour()
+        with TwistedLoggerFixture() as logger:
+            service.observeNeighbours([neighbour])
+        self.assertThat(logger.output, DocTestMatches(
+            "Failed to report neighbours.\n..."))
+        service.reportNeighbourRefreshes()
+        self.assertThat(reportNeighbours, MockCallsMatch(
+            call([neighbour]), call([neighbour])))
+
+    def test_configureNeighbourCapture_manages_capture_service(self):
+        service = self.makeService()
+        service._configureNeighbourCapture({"eth0"})
+        capture = service.getServiceNamed("neighbour_capture")
+        self.assertThat(capture, IsInstance(NeighbourCaptureService))
+        self.assertEqual({"eth0"}, capture.interfaces)
+        service._configureNeighbourCapture({"eth0", "eth1"})
+        self.assertIs(capture, service.getServiceNamed("neighbour_capture"))
+        self.assertEqual({"eth0", "eth1"}, capture.interfaces)
+        service._configureNeighbourCapture(set())
+        self.assertRaises(
+            KeyError, service.getServiceNamed, "neighbour_capture")
+
+    def test_configureNeighbourCapture_falls_back_to_processes(self):
+        service = self.makeService()
+        self.patch(service, "running", True)
+        self.patch(services, "open_packet_socket").side_effect = (
+            PermissionError())
+        start = self.patch(service, "_startNeighbourDiscoveryServices")
+        with TwistedLoggerFixture() as logger:
+            service._configureNeighbourCapture({"eth0"})
+        self.assertThat(logger.output, DocTestMatches(
+            "Failed to start neighbour capture; ..."))
+        self.assertThat(start, MockCalledOnceWith({"eth0"}))
+        self.assertFalse(service._canCaptureNeighbours())
+        self.assertRaises(
+            KeyError, service.getServiceNamed, "neighbour_capture")
+
+    def test_canCaptureNeighbours_checks_once(self):
+        service = self.makeService()
+        available = self.patch(services, "is_packet_capture_available")
+        available.return_value = sentinel.available
+        self.assertIs(sentinel.available, service._canCaptureNeighbours())
+        self.assertIs(sentinel.available, service._canCaptureNeighbours())
+        self.assertThat(available, MockCalledOnceWith())
+
+    def test_forgets_neighbours_when_discovery_stops(self):
+        service = self.makeService(clock=Clock())
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        neighbour = make_neighbour()
+        service.observeNeighbours([neighbour])
+        service._stopNeighbourDiscoveryServices({neighbour["interface"]})
+        service.observeNeighbours([neighbour])
+        self.assertThat(reportNeighbours, MockCallsMatch(
+            call([neighbour]), call([neighbour])))
+
+
+def make_neighbour(**kwargs):
+    neighbour = {
+        "interface": factory.make_name("eth"),
+        "ip": factory.make_ip_address(),
+        "mac": factory.make_mac_address(),
+        "time": random.randint(0, 10000),
+        "event": "NEW",
+        "vid": None,
+    }
+    neighbour.update(kwargs)
+    return neighbour
+
+
+class TestNeighbourTable(MAASTestCase):
+    """Tests for `NeighbourTable`."""
+
+    def test_observe_returns_new_bindings(self):
+        table = NeighbourTable(Clock())
+        neighbours = [make_neighbour() for _ in range(3)]
+        self.assertEqual(neighbours, table.observe(neighbours))
+        self.assertEqual([], table.takeRefreshes())
+
+    def test_observe_returns_changed_bindings(self):
+        table = NeighbourTable(Clock())
+        neighbour = make_neighbour()
+        table.observe([neighbour])
+        moved = dict(
+            neighbour, mac=factory.make_mac_address(), event="MOVED")
+        self.assertEqual([moved], table.observe([moved]))
+
+    def test_observe_distinguishes_vids(self):
+        table = NeighbourTable(Clock())
+        neighbour = make_neighbour(vid=None)
+        table.observe([neighbour])
+        tagged = dict(neighbour, vid=random.randint(1, 4094))
+        self.assertEqual([tagged], table.observe([tagged]))
+
+    def test_observe_queues_seen_bindings(self):
+        table = NeighbourTable(Clock())
+        neighbour = make_neighbour()
+        table.observe([neighbour])
+        refreshed = dict(neighbour, event="REFRESHED")
+        self.assertEqual([], table.observe([refreshed, refreshed]))
+        self.assertEqual([refreshed], table.takeRefreshes())
+        self.assertEqual([], table.takeRefreshes())
+
+    def test_changed_binding_supersedes_queued_refresh(self):
+        table = NeighbourTable(Clock())
+        neighbour = make_neighbour()
+        table.observe([neighbour, neighbour])
+        moved = dict(neighbour, mac=factory.make_mac_address())
+        table.observe([moved])
+        self.assertEqual([], table.takeRefreshes())
+
+    def test_counts_observations(self):
+        table = NeighbourTable(Clock())
+        neighbour = make_neighbour()
+        table.observe([neighbour, neighbour, neighbour])
+        table.observe([make_neighbour()])
+        table.takeRefreshes()
+        self.assertEqual(
+            (4, 2, 1), (table.observed, table.reported, table.refreshed))
+
+    def test_requeue_queues_unless_superseded(self):
+        table = NeighbourTable(Clock())
+        neighbour1 = make_neighbour()
+        neighbour2 = make_neighbour()
+        table.observe([neighbour1, neighbour2])
+        refreshed = dict(neighbour2, event="REFRESHED")
+        table.observe([refreshed])
+        table.requeue([neighbour1, neighbour2])
+        self.assertItemsEqual(
+            [neighbour1, refreshed], table.takeRefreshes())
+
+    def test_requeue_ignores_forgotten_bindings(self):
+        table = NeighbourTable(Clock())
+        neighbour = make_neighbour()
+        table.observe([neighbour])
+        table.forgetInterfaces({neighbour["interface"]})
+        table.requeue([neighbour])
+        self.assertEqual([], table.takeRefreshes())
+
+    def test_takeRefreshes_expires_old_bindings(self):
+        clock = Clock()
+        table = NeighbourTable(clock)
+        neighbour = make_neighbour()
+        table.observe([neighbour])
+        clock.advance(table.expiry + 1)
+        table.takeRefreshes()
+        self.assertEqual([neighbour], table.observe([neighbour]))
+
+    def test_forgetInterfaces_forgets_only_those_interfaces(self):
+        table = NeighbourTable(Clock())
+        neighbour1 = make_neighbour()
+        neighbour2 = make_neighbour()
+        table.observe([neighbour1, neighbour2, neighbour1, neighbour2])
+        table.forgetInterfaces({neighbour1["interface"]})
+        self.assertEqual([neighbour2], table.takeRefreshes())
+        self.assertEqual([neighbour1], table.observe([neighbour1]))
+        self.assertEqual([], table.observe([neighbour2]))
+
 
 class TestJSONPerLineProtocol(MAASTestCase):
     """Tests for `JSONPerLineProtocol`."""
@@ -609,6 +819,92 @@ class TestNeighbourDiscoveryService(MAASTestCase):
             % (ifname, ifname)))
 
 
+class TestNeighbourCaptureService(MAASTestCase):
+    """Tests for `NeighbourCaptureService`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test__replay_reports_bindings_in_one_batch(self):
+        callback = Mock()
+        service = NeighbourCaptureService(callback, Clock())
+        ifname = factory.make_name('eth')
+        service.replay(ifname, io.BytesIO(test_arp.test_input))
+        self.assertThat(callback, MockCalledOnceWith([
+            {
+                "ip": "172.16.42.1",
+                "mac": "00:24:a5:af:24:85",
+                "time": 1470159914,
+                "event": "NEW",
+                "vid": None,
+                "interface": ifname,
+            },
+            {
+                "ip": "172.16.42.109",
+                "mac": "80:fa:5b:0c:46:4e",
+                "time": 1470159914,
+                "event": "NEW",
+                "vid": None,
+                "interface": ifname,
+            },
+        ]))
+
+    def test__doRead_reports_bindings_on_monitored_interfaces(self):
+        callback = Mock()
+        clock = Clock()
+        clock.advance(random.randint(1, 1000))
+        service = NeighbourCaptureService(callback, clock)
+        service.setInterfaces({"eth0", "eth1"})
+        frame = test_arp.make_ethernet_frame(test_arp.make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2'))
+        service._reader = PacketSocketReader(FakePacketSocket([
+            ("eth0", frame, []),
+            ("eth0", frame, []),
+            ("eth1", frame, [make_auxdata(TP_STATUS_VLAN_VALID, 42)]),
+            ("eth2", frame, []),
+        ]))
+        service.doRead()
+        self.assertThat(callback, MockCalledOnceWith([
+            {
+                "ip": "192.168.0.1",
+                "mac": "01:02:03:04:05:06",
+                "time": int(clock.seconds()),
+                "event": "NEW",
+                "vid": vid,
+                "interface": ifname,
+            }
+            for ifname, vid in (("eth0", None), ("eth1", 42))
+        ]))
+
+    def test__doRead_reports_nothing_without_bindings(self):
+        callback = Mock()
+        service = NeighbourCaptureService(callback, Clock())
+        service._reader = PacketSocketReader(FakePacketSocket([]))
+        service.doRead()
+        self.assertThat(callback, MockNotCalled())
+
+    def test__setInterfaces_forgets_bindings_of_other_interfaces(self):
+        service = NeighbourCaptureService(Mock(), Clock())
+        service.setInterfaces({"eth0", "eth1"})
+        service._bindings["eth0"]["binding"] = sentinel.binding
+        service._bindings["eth1"]["binding"] = sentinel.binding
+        service.setInterfaces({"eth0"})
+        self.assertEqual(
+            {"eth0": {"binding": sentinel.binding}}, service._bindings)
+
+    def test__reads_from_packet_socket_while_running(self):
+        sock, other = socket.socketpair()
+        self.addCleanup(other.close)
+        self.patch(services, "open_packet_socket").return_value = sock
+        service = NeighbourCaptureService(Mock(), Clock())
+        service.startService()
+        try:
+            self.assertIn(service, reactor.getReaders())
+        finally:
+            service.stopService()
+        self.assertNotIn(service, reactor.getReaders())
+        self.assertEqual(-1, sock.fileno())
+
+
 class TestBeaconingService(MAASTestCase):
     """Tests for `BeaconingService`."""
 